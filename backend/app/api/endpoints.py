@@ -1,14 +1,33 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+import asyncio
+import json
+import time
+from typing import List
 from app.models.schemas import (
     ChatRequest, ChatResponse,
-    RecommendationRequest, RecommendationResponse,
+    RecommendationRequest, RecommendationResponse, ProgressWarmRequest,
     XAIRequest, XAIResponse,
+    ExecuteRequest, ExecutionInfo,
+    SubmissionRequest, GradeResponse, RegradeRequest, RegradeResponse,
     HealthResponse
 )
 from app.services.ai_service import ai_service
 from app.services.rl_service import rl_service
-from app.lib.supabase import supabase_client
+from app.services.response_cache import response_cache
+from app.services.progress_cache import progress_cache
+from app.services.conversation_context import context_store
+from app.services.incremental_analyzer import incremental_analyzer
+from app.services.grader import grader
+from app.lib.database import db, InvalidId
+from app.lib.event_log import event_log
+from app.lib.batching import batch_runner
+from app.lib.telemetry import telemetry
+from app.lib.message_queue import message_writer
+from app.lib.sandbox import sandbox
+from app.lib.startup import startup
+from app.lib.scheduler import scheduler, Overloaded
 
 router = APIRouter()
 
@@ -21,6 +40,324 @@ async def health_check():
         timestamp=datetime.now()
     )
 
+@router.get("/ready")
+async def readiness(response: Response):
+    """
+    Readiness probe (503 until the model is loaded and caches are warm)
+    
+    Unlike /health, which only says the process is up, this flips once every
+    start-up step (model load, warm-up, sandbox workers, challenge catalog)
+    has finished, so load balancers can hold traffic until then.
+    """
+    state = startup.stats()
+    if not state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return state
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for the chat response cache"""
+    return response_cache.stats()
+
+@router.get("/analysis/stats")
+async def analysis_stats():
+    """Per-conversation analysis sessions and how many statements follow-up turns reused"""
+    return incremental_analyzer.stats()
+
+@router.get("/retrieval/stats")
+async def retrieval_stats():
+    """Index of resolved debugging sessions: size, lookups and turns answered without the model"""
+    if ai_service.sessions is None:
+        return {"enabled": False}
+    return ai_service.sessions.stats()
+
+@router.get("/sandbox/stats")
+async def sandbox_stats():
+    """Worker pool, run outcomes and throughput of the code-execution sandbox"""
+    return sandbox.stats()
+
+@router.get("/coalescing/stats")
+async def coalescing_stats():
+    """Identical concurrent chat/recommendation requests served by one computation"""
+    return {
+        "chat": ai_service.flights.stats() if ai_service.flights is not None else None,
+        "recommend": rl_service.flights.stats() if rl_service.flights is not None else None,
+    }
+
+@router.get("/profile/slowest")
+async def profile_slowest(reset: bool = False):
+    """
+    Slowest profiled requests with their span breakdown
+    
+    Enabled with PROFILE_SLOWEST=N (keeps the N slowest); a
+    PROFILE_SAMPLE_RATE fraction of requests is profiled.
+    """
+    return telemetry.slowest(reset=reset)
+
+@router.get("/inference/stats")
+async def inference_stats():
+    """Queue depth, batch-size histogram and latency of the inference engine"""
+    if ai_service.engine is None:
+        return {"enabled": not ai_service.use_mock, "loaded": False, "fallbacks": ai_service.fallbacks}
+    return {"enabled": True, "loaded": True, "fallbacks": ai_service.fallbacks, **ai_service.engine.stats()}
+
+async def _load_history(request: ChatRequest) -> list:
+    """Get conversation history for context (optional; the DB is only read on a context-store miss)"""
+    if not request.conversation_id:
+        return []
+    history = context_store.get(request.conversation_id)
+    if history is not None:
+        return history
+    context_store.begin_load(request.conversation_id)
+    try:
+        rows = await db.get_conversation_history(request.conversation_id, limit=context_store.max_turns)
+    except:
+        context_store.cancel_load(request.conversation_id)
+        return []  # Continue without history if DB fails
+    return context_store.fill(request.conversation_id, rows)
+
+async def _load_histories(conversation_ids: List[str]) -> dict:
+    """Histories for many conversations: store hits, then one query for the misses"""
+    histories = {}
+    for conversation_id in conversation_ids:
+        history = context_store.get(conversation_id)
+        if history is not None:
+            histories[conversation_id] = history
+    missing = [c for c in conversation_ids if c not in histories]
+    if not missing:
+        return histories
+    for conversation_id in missing:
+        context_store.begin_load(conversation_id)
+    try:
+        rows = await db.get_conversation_histories(missing, limit=context_store.max_turns)
+    except:
+        for conversation_id in missing:
+            context_store.cancel_load(conversation_id)
+        return histories  # Continue without history if DB fails
+    for conversation_id in missing:
+        histories[conversation_id] = context_store.fill(conversation_id, rows.get(conversation_id, []))
+    return histories
+
+def _save_exchange(request: ChatRequest, response: ChatResponse):
+    """Queue the user message and tutor reply for write-behind persistence"""
+    if not request.conversation_id:
+        return
+    message_writer.enqueue(
+        conversation_id=request.conversation_id,
+        role="user",
+        content=request.message,
+        code_snippet=request.code_snippet
+    )
+    message_writer.enqueue(
+        conversation_id=request.conversation_id,
+        role="assistant",
+        content=response.reply,
+        code_snippet=response.code_suggestion
+    )
+    # The next turn's context comes from memory, not a DB read
+    context_store.append(request.conversation_id, "user", request.message, request.code_snippet)
+    context_store.append(request.conversation_id, "assistant", response.reply, response.code_suggestion)
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Event; data is always JSON so newlines are safe"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _overloaded(e: Overloaded) -> HTTPException:
+    """429 for a request the scheduler turned away, with when to retry"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(e),
+        headers={"Retry-After": e.retry_after_header}
+    )
+
+class _SlotStreamingResponse(StreamingResponse):
+    """A streamed response that gives back its scheduler slot however it ends, even if the stream never starts"""
+
+    def __init__(self, content, slot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.slot is not None:
+                self.slot.release()
+
+def _check_batch_size(items: list):
+    if len(items) > batch_runner.max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch of {len(items)} items exceeds BATCH_MAX_ITEMS={batch_runner.max_items}"
+        )
+
+def _ndjson_batch(items: list, handler) -> StreamingResponse:
+    """
+    Stream one JSON line per item as it finishes (completion order)
+    
+    Each line is `{"index": i, "result": {...}}` or `{"index": i, "error": "..."}`;
+    `index` is the item's position in the request.
+    """
+    async def lines():
+        async for index, result, error in batch_runner.stream(items, handler):
+            line = {"index": index, "result": result} if error is None else {"index": index, "error": error}
+            yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/persistence/stats")
+async def persistence_stats():
+    """Queue depth/lag and spill/drop counters for message write-behind"""
+    return message_writer.stats()
+
+@router.get("/progress/cache/stats")
+async def progress_cache_stats():
+    """Hit/miss/write-through counters for the per-student progress cache"""
+    return progress_cache.stats()
+
+@router.get("/context/stats")
+async def context_store_stats():
+    """Conversations and turns held for prompt building, hit rate, evictions and trimmed windows"""
+    return context_store.stats()
+
+@router.get("/challenges/catalog")
+async def challenge_catalog_stats():
+    """Version, size and index sizes of the in-memory challenge catalog"""
+    return rl_service.catalog_stats()
+
+@router.post("/challenges/invalidate")
+async def invalidate_challenges():
+    """
+    Drop the cached challenge catalog
+    
+    Call after editing the challenges table; the next recommendation loads
+    a new catalog version.
+    """
+    return {
+        "status": "success",
+        "stale_version": rl_service.invalidate_catalog()
+    }
+
+@router.post("/challenges/{challenge_id}/submit", response_model=GradeResponse)
+async def submit_challenge(challenge_id: str, request: SubmissionRequest):
+    """
+    Grade a student's fix against the challenge's test suite
+    
+    Tests run in parallel in the sandbox and grading stops at the first
+    failure. The outcome (and the time since the challenge was recommended
+    or last submitted, unless `time_spent` is given) is recorded as an
+    attempt and trains the recommendation policy.
+    """
+    if not grader.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Grading is disabled (SANDBOX_WORKERS=0)"
+        )
+    challenge = await rl_service.get_challenge(challenge_id)
+    if challenge is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown challenge {challenge_id}")
+    
+    result = await grader.grade(challenge, request.code_snippet)
+    if result["status"] == "error":
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=result["message"])
+    
+    time_spent = rl_service.measure_attempt(request.user_id, challenge_id, finished=result["passed"])
+    if request.time_spent is not None:
+        time_spent = request.time_spent
+    try:
+        await rl_service.update_rl_model(request.user_id, challenge_id, result["passed"], time_spent)
+    except InvalidId as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Progress update error: {str(e)}"
+        )
+    return GradeResponse(**result, time_spent=time_spent)
+
+@router.post("/challenges/regrade", response_model=RegradeResponse)
+async def regrade_submissions(request: RegradeRequest):
+    """
+    Grade a whole class's submissions in one call
+    
+    Identical submissions to the same challenge are graded once, and
+    submissions graded before are served from the grade cache. With
+    `record`, each outcome is also stored in the student's progress; a
+    regrade is not a new attempt, so it doesn't train the recommender. A
+    submission whose outcome couldn't be stored says so in its result
+    (`recorded`, `record_error`); the rest of the batch is unaffected.
+    """
+    if not grader.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Grading is disabled (SANDBOX_WORKERS=0)"
+        )
+    _check_batch_size(request.submissions)
+    start = time.perf_counter()
+    try:
+        async with scheduler.admit("batch"):
+            challenge_ids = list(dict.fromkeys(s.challenge_id for s in request.submissions))
+            challenges = dict(zip(
+                challenge_ids,
+                await asyncio.gather(*(rl_service.get_challenge(c) for c in challenge_ids))
+            ))
+            results, duplicates = await grader.grade_many(
+                [(challenges[s.challenge_id], s.code_snippet) for s in request.submissions]
+            )
+    except Overloaded as e:
+        raise _overloaded(e)
+    responses = [GradeResponse(**r) for r in results]
+    if request.record:
+        # One student's failed write (e.g. an unknown id) is reported on that result, not for the batch
+        recorded = [i for i, r in enumerate(results) if r["status"] != "error"]
+        outcomes = await asyncio.gather(*(
+            rl_service.record_progress(
+                request.submissions[i].user_id, request.submissions[i].challenge_id, results[i]["passed"]
+            )
+            for i in recorded
+        ), return_exceptions=True)
+        for i, outcome in zip(recorded, outcomes):
+            responses[i].recorded = not isinstance(outcome, Exception)
+            if isinstance(outcome, Exception):
+                responses[i].record_error = str(outcome)
+    
+    elapsed = time.perf_counter() - start
+    # Duplicates share their original's result object; errors (unknown challenge, no suite) weren't graded
+    graded = len({id(r) for r in results if r["status"] != "error"})
+    return RegradeResponse(
+        results=responses,
+        graded=graded,
+        duplicates=duplicates,
+        passed=sum(1 for r in results if r["passed"]),
+        duration_ms=round(elapsed * 1e3, 3),
+        submissions_per_sec=round(len(results) / elapsed, 1) if elapsed > 0 else 0.0
+    )
+
+@router.get("/grading/stats")
+async def grading_stats():
+    """Submissions graded, tests run/skipped by fail-fast, and the grade cache"""
+    return grader.stats()
+
+@router.get("/rl/stats")
+async def rl_stats():
+    """Recommendation policy counters (updates, mean reward, exploration)"""
+    return rl_service.policy_stats()
+
+@router.get("/rl/events/stats")
+async def rl_event_stats():
+    """Learning event log: segments on disk, attempts appended, written and dropped"""
+    return event_log.stats()
+
+@router.get("/rl/queues/stats")
+async def rl_queue_stats():
+    """Precomputed recommendation queues: hit rate, staleness and background recomputes"""
+    return rl_service.queue_stats()
+
+@router.get("/db/stats")
+async def db_stats():
+    """Backend, connection pool and per-query counters of the data-access layer"""
+    return db.stats()
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_tutor(request: ChatRequest):
     """
@@ -28,53 +365,128 @@ async def chat_with_tutor(request: ChatRequest):
     
     This is where your Next.js frontend sends debugging questions.
     The AI service analyzes code and provides guided responses.
+    Answers 429 with Retry-After when the scheduler sheds the request.
     """
     try:
-        # Get conversation history for context (optional)
-        conversation_history = []
-        if request.conversation_id:
-            try:
-                history = supabase_client.get_conversation_history(
-                    request.conversation_id, 
-                    limit=5
-                )
-                conversation_history = history
-            except:
-                pass  # Continue without history if DB fails
-        
-        # Get AI response
-        response = ai_service.get_tutor_response(
-            message=request.message,
-            code_snippet=request.code_snippet,
-            conversation_history=conversation_history
-        )
-        
-        # Save message to database (async, don't wait)
-        if request.conversation_id:
-            try:
-                supabase_client.save_message(
-                    conversation_id=request.conversation_id,
-                    role="user",
-                    content=request.message,
-                    code_snippet=request.code_snippet
-                )
-                supabase_client.save_message(
-                    conversation_id=request.conversation_id,
-                    role="assistant",
-                    content=response.reply,
-                    code_snippet=response.code_suggestion
-                )
-            except:
-                pass  # Continue even if save fails
+        async with scheduler.admit("chat", request.user_id):
+            conversation_history = await _load_history(request)
+            
+            # Get AI response
+            response = await ai_service.get_tutor_response(
+                message=request.message,
+                code_snippet=request.code_snippet,
+                conversation_history=conversation_history,
+                conversation_id=request.conversation_id
+            )
         
+        _save_exchange(request, response)
         return response
     
+    except Overloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"AI service error: {str(e)}"
         )
 
+@router.post("/chat/batch")
+async def chat_with_tutor_batch(requests: List[ChatRequest]):
+    """
+    Chat for many items in one call, streamed back as NDJSON
+    
+    Conversation histories come from the context store, with one query for
+    any conversations it doesn't hold; items then run with bounded concurrency (BATCH_CONCURRENCY), and
+    identical snippets share one computation. Items run in the scheduler's
+    batch class, behind interactive requests; an item shed under load gets
+    an error line.
+    """
+    _check_batch_size(requests)
+    conversation_ids = list(dict.fromkeys(r.conversation_id for r in requests if r.conversation_id))
+    histories = await _load_histories(conversation_ids) if conversation_ids else {}
+    
+    async def handle(request: ChatRequest) -> dict:
+        async with scheduler.admit("batch"):
+            response = await ai_service.get_tutor_response(
+                message=request.message,
+                code_snippet=request.code_snippet,
+                conversation_history=histories.get(request.conversation_id, []),
+                conversation_id=request.conversation_id
+            )
+        _save_exchange(request, response)
+        return response.model_dump(mode="json")
+    
+    return _ndjson_batch(requests, handle)
+
+@router.post("/chat/stream")
+async def chat_with_tutor_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    
+    Emits `token` events with reply text as it is generated, then
+    `explanation`, `code_suggestion` and `error_type` events, and finally
+    `done` with the complete ChatResponse. On failure an `error` event is
+    sent instead.
+    
+    When the client disconnects, Starlette cancels this generator, which
+    closes the service stream and stops generation. The scheduler slot is
+    held until the stream ends; a shed request gets 429 before any event.
+    """
+    conversation_history = await _load_history(request)
+    try:
+        slot = await scheduler.acquire("chat", request.user_id)
+    except Overloaded as e:
+        raise _overloaded(e)
+    
+    async def event_stream():
+        try:
+            async for event, data in ai_service.stream_tutor_response(
+                message=request.message,
+                code_snippet=request.code_snippet,
+                conversation_history=conversation_history,
+                conversation_id=request.conversation_id
+            ):
+                yield _sse(event, data)
+                if event == "done":
+                    _save_exchange(request, ChatResponse(**data))
+        except Exception as e:
+            yield _sse("error", {"detail": f"AI service error: {str(e)}"})
+    
+    return _SlotStreamingResponse(
+        event_stream(),
+        slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/execute", response_model=ExecutionInfo)
+async def execute_code(request: ExecuteRequest):
+    """
+    Run a snippet in the sandbox
+    
+    Returns how the run ended (ok, error, timeout, ...) with the student's
+    traceback and captured output. Limits are set by the SANDBOX_* settings.
+    Served only with SANDBOX_EXECUTE_ENDPOINT=true; runs in the scheduler's
+    chat class (rate-limited per `user_id`) and answers 429 when shed.
+    """
+    if sandbox.size == 0 or not sandbox.execute_endpoint:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Code execution is not enabled (SANDBOX_EXECUTE_ENDPOINT, SANDBOX_WORKERS)"
+        )
+    if len(request.code_snippet) > sandbox.max_code_chars or len(request.stdin) > sandbox.max_stdin_chars:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Snippet or stdin exceeds SANDBOX_MAX_CODE_CHARS={sandbox.max_code_chars}"
+                   f" / SANDBOX_MAX_STDIN_CHARS={sandbox.max_stdin_chars}"
+        )
+    try:
+        async with scheduler.admit("chat", request.user_id):
+            result = await sandbox.run(request.code_snippet, request.stdin)
+    except Overloaded as e:
+        raise _overloaded(e)
+    return ExecutionInfo(**result.to_dict())
+
 @router.post("/recommend", response_model=RecommendationResponse)
 async def get_recommendation(request: RecommendationRequest):
     """
@@ -84,15 +496,36 @@ async def get_recommendation(request: RecommendationRequest):
     Returns the next challenge the student should try based on their progress.
     """
     try:
-        recommendation = rl_service.generate_recommendation(request.user_id)
+        async with scheduler.admit("recommend"):
+            recommendation = await rl_service.generate_recommendation(request.user_id)
         return recommendation
     
+    except Overloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"RL service error: {str(e)}"
         )
 
+@router.post("/recommend/batch")
+async def get_recommendation_batch(requests: List[RecommendationRequest]):
+    """
+    Recommendations for a whole cohort (e.g. before a lab), streamed as NDJSON
+    
+    Progress for every listed student not already cached is loaded in one
+    query before the recommendations are computed.
+    """
+    _check_batch_size(requests)
+    await rl_service.prefetch_progress([r.user_id for r in requests])
+    
+    async def handle(request: RecommendationRequest) -> dict:
+        async with scheduler.admit("batch"):
+            recommendation = await rl_service.generate_recommendation(request.user_id)
+        return recommendation.model_dump(mode="json")
+    
+    return _ndjson_batch(requests, handle)
+
 @router.get("/recommend/{user_id}", response_model=RecommendationResponse)
 async def get_recommendation_by_id(user_id: str):
     """Alternative GET endpoint for recommendations (convenience)"""
@@ -107,10 +540,12 @@ async def explain_with_xai(request: XAIRequest):
     influenced the model's decision.
     """
     try:
-        explanation = ai_service.get_xai_explanation(
-            code=request.code_snippet,
-            prediction=request.model_prediction
-        )
+        async with scheduler.admit("xai"):
+            explanation = await ai_service.get_xai_explanation(
+                code=request.code_snippet,
+                prediction=request.model_prediction,
+                conversation_id=request.conversation_id
+            )
         
         return XAIResponse(
             highlighted_lines=explanation["highlighted_lines"],
@@ -118,12 +553,44 @@ async def explain_with_xai(request: XAIRequest):
             explanation_text=explanation["explanation_text"]
         )
     
+    except Overloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"XAI service error: {str(e)}"
         )
 
+@router.post("/xai/explain/batch")
+async def explain_with_xai_batch(requests: List[XAIRequest]):
+    """XAI explanations for many snippets (e.g. every submission in an assignment), streamed as NDJSON"""
+    _check_batch_size(requests)
+    
+    async def handle(request: XAIRequest) -> dict:
+        async with scheduler.admit("batch"):
+            explanation = await ai_service.get_xai_explanation(
+                code=request.code_snippet,
+                prediction=request.model_prediction,
+                conversation_id=request.conversation_id
+            )
+        return XAIResponse(
+            highlighted_lines=explanation["highlighted_lines"],
+            feature_importance=explanation["feature_importance"],
+            explanation_text=explanation["explanation_text"]
+        ).model_dump(mode="json")
+    
+    return _ndjson_batch(requests, handle)
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    """Admission control per priority class: slots in use, queue, shed requests by reason, waits"""
+    return scheduler.stats()
+
+@router.get("/batch/stats")
+async def batch_stats():
+    """Batches and items processed by the batch endpoints, items in flight"""
+    return batch_runner.stats()
+
 @router.post("/progress/update")
 async def update_progress(
     user_id: str,
@@ -134,17 +601,41 @@ async def update_progress(
     """
     Update student progress and train RL model
     
-    Called when a student completes or attempts a challenge.
+    Called when a student completes or attempts a challenge. Answers 404
+    for a challenge id the database can't hold (e.g. not a UUID on PostgreSQL).
     """
     try:
-        rl_service.update_rl_model(user_id, challenge_id, success, time_spent)
+        await rl_service.update_rl_model(user_id, challenge_id, success, time_spent)
         return {
             "status": "success",
             "message": "Progress updated successfully"
         }
     
+    except InvalidId as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Progress update error: {str(e)}"
         )
+
+@router.post("/progress/warm")
+async def warm_progress(request: ProgressWarmRequest):
+    """
+    Bulk-load progress for a class session
+    
+    Called when a session starts so the first recommendation page loads are
+    served from the progress cache instead of one DB read per student.
+    """
+    try:
+        warmed = await rl_service.warm_progress(request.user_ids)
+        return {
+            "status": "success",
+            "warmed": warmed
+        }
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Progress warm-up error: {str(e)}"
+        )
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class BatchRunner:
+    """
+    Processes a batch's items with bounded concurrency and yields results as they finish
+
+    At most `concurrency` items are in flight per batch, and a result leaves
+    as soon as its item completes, so memory stays flat however long the
+    batch is (the caller streams each result out). Results arrive in
+    completion order as `(index, result, error)`; exactly one of `result`
+    and `error` is set, and one failing item never fails the batch.
+    """
+
+    def __init__(self, concurrency: int = 8, max_items: int = 10000):
+        self.concurrency = max(1, concurrency)
+        self.max_items = max_items
+
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.item_ms_total = 0.0
+
+    async def stream(
+        self,
+        items: Sequence,
+        handler: Callable[[object], Awaitable]
+    ) -> AsyncIterator[Tuple[int, object, Optional[str]]]:
+        self.batches += 1
+        pending = set()
+        try:
+            for index, item in enumerate(items):
+                pending.add(asyncio.ensure_future(self._run(index, item, handler)))
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # The client went away mid-batch: stop the items still running
+            for task in pending:
+                task.cancel()
+            self.cancelled += len(pending)
+
+    async def _run(self, index: int, item, handler) -> Tuple[int, object, Optional[str]]:
+        start = time.perf_counter()
+        self.in_flight += 1
+        try:
+            outcome = index, await handler(item), None
+        except Exception as e:
+            self.errors += 1
+            outcome = index, None, str(e) or type(e).__name__
+        finally:
+            self.in_flight -= 1
+        self.items += 1
+        self.item_ms_total += (time.perf_counter() - start) * 1e3
+        return outcome
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_items": self.max_items,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "in_flight": self.in_flight,
+            "avg_item_ms": round(self.item_ms_total / self.items, 3) if self.items else 0.0,
+        }
+
+
+# Singleton instance
+batch_runner = BatchRunner(
+    concurrency=int(os.getenv("BATCH_CONCURRENCY", 8)),
+    max_items=int(os.getenv("BATCH_MAX_ITEMS", 10000))
+)
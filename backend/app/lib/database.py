@@ -0,0 +1,779 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+from dotenv import load_dotenv
+from app.lib.supabase import supabase_client
+from app.lib.telemetry import telemetry
+
+load_dotenv()
+
+# SQLite translation of pytutor-its/database/schema.sql (UUIDs as TEXT,
+# TEXT[] as JSON text, timestamps as ISO-8601 UTC strings)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+  id TEXT PRIMARY KEY,
+  student_id TEXT UNIQUE NOT NULL,
+  name TEXT NOT NULL,
+  email TEXT UNIQUE NOT NULL,
+  consent_given INTEGER DEFAULT 0,
+  skill_level TEXT CHECK (skill_level IN ('beginner', 'intermediate', 'advanced')) DEFAULT 'intermediate',
+  created_at TEXT,
+  updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+  id TEXT PRIMARY KEY,
+  student_id TEXT REFERENCES students(student_id) ON DELETE CASCADE,
+  title TEXT NOT NULL,
+  is_active INTEGER DEFAULT 1,
+  created_at TEXT,
+  updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+  id TEXT PRIMARY KEY,
+  conversation_id TEXT REFERENCES conversations(id) ON DELETE CASCADE,
+  role TEXT CHECK (role IN ('user', 'assistant', 'system')) NOT NULL,
+  content TEXT NOT NULL,
+  code_snippet TEXT,
+  explanation TEXT,
+  created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS challenges (
+  id TEXT PRIMARY KEY,
+  title TEXT NOT NULL,
+  description TEXT NOT NULL,
+  difficulty TEXT CHECK (difficulty IN ('Easy', 'Medium', 'Hard')) NOT NULL,
+  bug_code TEXT NOT NULL,
+  error_type TEXT NOT NULL,
+  learning_objectives TEXT NOT NULL,
+  tests TEXT NOT NULL DEFAULT '[]',
+  created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS progress (
+  id TEXT PRIMARY KEY,
+  student_id TEXT REFERENCES students(student_id) ON DELETE CASCADE,
+  challenge_id TEXT REFERENCES challenges(id) ON DELETE CASCADE,
+  status TEXT CHECK (status IN ('not_started', 'in_progress', 'completed')) DEFAULT 'not_started',
+  attempts INTEGER DEFAULT 0,
+  time_spent INTEGER DEFAULT 0,
+  completed_at TEXT,
+  created_at TEXT,
+  updated_at TEXT,
+  UNIQUE(student_id, challenge_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_conversations_student ON conversations(student_id);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_progress_student ON progress(student_id);
+CREATE INDEX IF NOT EXISTS idx_progress_challenge ON progress(challenge_id);
+"""
+
+# Sample challenges from schema.sql; ids match the mock client's "1".."6"
+SEED_CHALLENGES = [
+    ("1", "Loop Variable Scope Error", "Fix the scope issue with the loop counter variable", "Easy",
+     "for i in range(5):\n    print(i)\nprint(i)  # Error here", "NameError",
+     ["Understanding variable scope", "Loop variable lifecycle"]),
+    ("2", "List Index Out of Range", "Debug the array indexing issue in this code", "Easy",
+     "numbers = [1, 2, 3]\nfor i in range(4):\n    print(numbers[i])", "IndexError",
+     ["Array bounds checking", "Loop iteration control"]),
+    ("3", "Function Return Value", "Fix the missing return statement", "Medium",
+     "def calculate_sum(a, b):\n    result = a + b\n    # Missing return\ntotal = calculate_sum(5, 3)\nprint(total)",
+     "TypeError", ["Function return values", "None type handling"]),
+    ("4", "Syntax Error in Conditional", "Find and fix the syntax error", "Easy",
+     "x = 10\nif x > 5\n    print(\"Greater\")", "SyntaxError",
+     ["Python syntax rules", "Conditional statements"]),
+    ("5", "Type Mismatch in Operation", "Fix the type incompatibility issue", "Medium",
+     "age = \"25\"\nyears_ahead = 5\nfuture_age = age + years_ahead", "TypeError",
+     ["Type conversion", "String vs numeric operations"]),
+    ("6", "Infinite Loop Logic", "Fix the loop that never terminates", "Hard",
+     "counter = 0\nwhile counter < 10:\n    print(counter)\n    counter = counter + 0", "LogicError",
+     ["Loop termination conditions", "Variable updates in loops"]),
+]
+
+# Test suites of the seed challenges (the `tests` column). A test runs the
+# submission and passes if it finishes cleanly, prints exactly `stdout` (when
+# given) and survives `check`, code run afterwards in the same namespace (exiting
+# before the check runs fails the test).
+# `forbid` tests pass if the analyzer no longer reports that error type.
+SEED_TESTS = {
+    "1": [
+        {"name": "prints 0-4, then the last value", "stdout": "0\n1\n2\n3\n4\n4\n"},
+        {"name": "loop variable not used after the loop", "forbid": "NameError"},
+    ],
+    "2": [
+        {"name": "prints every item", "stdout": "1\n2\n3\n"},
+        {"name": "no index past the end of the list", "forbid": "IndexError"},
+    ],
+    "3": [
+        {"name": "prints the sum", "stdout": "8\n"},
+        {"name": "returns a + b", "check": "assert calculate_sum(2, 3) == 5"},
+        {"name": "handles negative numbers", "check": "assert calculate_sum(-4, 1) == -3"},
+    ],
+    "4": [
+        {"name": "prints Greater", "stdout": "Greater\n"},
+    ],
+    "5": [
+        {"name": "future_age is a number", "check": "assert future_age == 30"},
+    ],
+    "6": [
+        {"name": "counts 0-9 and stops", "stdout": "".join(f"{n}\n" for n in range(10))},
+        {"name": "counter ends at 10", "check": "assert counter == 10"},
+        {"name": "counter changes inside the loop", "forbid": "LogicError"},
+    ],
+}
+
+CHALLENGE_COLUMNS = "id, title, description, difficulty, bug_code, error_type, learning_objectives, tests"
+PROGRESS_COLUMNS = "challenge_id, status, attempts, time_spent, completed_at"
+MESSAGE_COLUMNS = "role, content, code_snippet, explanation, created_at"
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class InvalidId(ValueError):
+    """An id that can't name a row, e.g. a non-UUID where the schema stores UUIDs (the API answers 404)"""
+
+
+def _uuid(value: str, what: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(value)
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidId(f"Unknown {what} {value!r}") from None
+
+
+class RejectedRows(ValueError):
+    """The database refused the rows themselves (a constraint or bad data); retrying them can't succeed"""
+
+
+def _rejected(exc: Exception) -> bool:
+    # SQLSTATE class 22 is a data exception, 23 an integrity constraint violation (asyncpg sets `sqlstate`)
+    return isinstance(exc, sqlite3.IntegrityError) or str(getattr(exc, "sqlstate", "") or "")[:2] in ("22", "23")
+
+
+class QueryStats:
+    """Per-backend query counters shared by both implementations"""
+
+    def __init__(self):
+        self.queries = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float, timed_out: bool = False, failed: bool = False):
+        with self._lock:
+            self.queries += 1
+            self.total_ms += elapsed * 1000
+            self.timeouts += int(timed_out)
+            self.errors += int(failed)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "mean_query_ms": round(self.total_ms / self.queries, 3) if self.queries else 0.0,
+            }
+
+
+class PostgresBackend:
+    """
+    asyncpg connection pool against the Supabase/PostgreSQL schema
+
+    asyncpg prepares every statement and caches it per connection, so the
+    fixed queries below are parsed and planned once per pooled connection.
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, min_size: int = 2, max_size: int = 10, query_timeout: float = 5.0):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.query_timeout = query_timeout
+        self.pool = None
+        self.query_stats = QueryStats()
+        # Messages not written because their conversation_id isn't a UUID
+        self.skipped = 0
+
+    async def connect(self):
+        import asyncpg  # Optional dependency: pip install asyncpg
+
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            command_timeout=self.query_timeout,
+            statement_cache_size=256
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def _run(self, method: str, query: str, *args):
+        start = time.perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                result = await getattr(conn, method)(query, *args, timeout=self.query_timeout)
+        except asyncio.TimeoutError:
+            self.query_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        except Exception:
+            self.query_stats.record(time.perf_counter() - start, failed=True)
+            raise
+        self.query_stats.record(time.perf_counter() - start)
+        return result
+
+    async def get_student(self, student_id: str):
+        row = await self._run(
+            "fetchrow",
+            "SELECT id, student_id, name, skill_level FROM students WHERE student_id = $1",
+            student_id
+        )
+        return {**dict(row), "id": str(row["id"])} if row else None
+
+    async def get_student_progress(self, student_id: str):
+        rows = await self._run(
+            "fetch", f"SELECT {PROGRESS_COLUMNS} FROM progress WHERE student_id = $1", student_id
+        )
+        return [{**dict(r), "challenge_id": str(r["challenge_id"])} for r in rows]
+
+    async def get_progress_for_students(self, student_ids: list):
+        rows = await self._run(
+            "fetch",
+            f"SELECT student_id, {PROGRESS_COLUMNS} FROM progress WHERE student_id = ANY($1::text[])",
+            list(student_ids)
+        )
+        grouped = {student_id: [] for student_id in student_ids}
+        for r in rows:
+            grouped[r["student_id"]].append({**dict(r), "challenge_id": str(r["challenge_id"])})
+        return grouped
+
+    async def get_conversation_history(self, conversation_id: str, limit: int = 10):
+        try:
+            conversation = _uuid(conversation_id, "conversation")
+        except InvalidId:
+            return []  # Not a stored conversation; it has no history
+        rows = await self._run(
+            "fetch",
+            f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE conversation_id = $1 "
+            "ORDER BY created_at DESC LIMIT $2",
+            conversation, limit
+        )
+        return [dict(r) for r in reversed(rows)]
+
+    async def get_conversation_histories(self, conversation_ids: list, limit: int = 10):
+        grouped = {conversation_id: [] for conversation_id in conversation_ids}
+        valid = []
+        for conversation_id in grouped:
+            try:
+                valid.append(_uuid(conversation_id, "conversation"))
+            except InvalidId:
+                pass  # Not a stored conversation; it has no history
+        if not valid:
+            return grouped
+        rows = await self._run(
+            "fetch",
+            f"SELECT conversation_id, {MESSAGE_COLUMNS} FROM ("
+            f"SELECT conversation_id, {MESSAGE_COLUMNS}, "
+            "ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY created_at DESC) AS rn "
+            "FROM messages WHERE conversation_id = ANY($1::uuid[])"
+            ") recent WHERE rn <= $2 ORDER BY conversation_id, created_at",
+            valid, limit
+        )
+        for r in rows:
+            row = dict(r)
+            grouped.setdefault(str(row.pop("conversation_id")), []).append(row)
+        return grouped
+
+    async def save_message(self, conversation_id: str, role: str, content: str, code_snippet: str = None):
+        await self.save_messages([{
+            "conversation_id": conversation_id, "role": role,
+            "content": content, "code_snippet": code_snippet
+        }])
+        return {"conversation_id": conversation_id}
+
+    async def save_messages(self, messages: list):
+        rows = []
+        saved = []
+        for m in messages:
+            try:
+                conversation = _uuid(m["conversation_id"], "conversation")
+            except InvalidId:
+                # No stored conversation can have this id; retrying the batch would never succeed
+                self.skipped += 1
+                continue
+            rows.append((
+                conversation, m["role"], m["content"], m.get("code_snippet"),
+                datetime.fromisoformat(m.get("created_at") or _now_iso())
+            ))
+            saved.append({"conversation_id": m["conversation_id"]})
+        if rows:
+            try:
+                await self._run(
+                    "executemany",
+                    "INSERT INTO messages (conversation_id, role, content, code_snippet, created_at) "
+                    "VALUES ($1, $2, $3, $4, $5)",
+                    rows
+                )
+            except Exception as e:
+                # e.g. a well-formed conversation_id with no conversation row (foreign key)
+                if _rejected(e):
+                    raise RejectedRows(str(e)) from e
+                raise
+        return saved
+
+    async def get_all_challenges(self):
+        rows = await self._run("fetch", f"SELECT {CHALLENGE_COLUMNS} FROM challenges ORDER BY created_at")
+        return [
+            {
+                **dict(r),
+                "id": str(r["id"]),
+                "learning_objectives": list(r["learning_objectives"]),
+                # jsonb arrives as text unless a type codec is registered
+                "tests": json.loads(r["tests"]) if isinstance(r["tests"], str) else r["tests"]
+            }
+            for r in rows
+        ]
+
+    async def update_progress(self, student_id: str, challenge_id: str, status: str, time_spent: int = 0):
+        await self._run(
+            "execute",
+            """
+            INSERT INTO progress (student_id, challenge_id, status, attempts, time_spent, completed_at)
+            VALUES ($1, $2, $3, 1, $4, CASE WHEN $3 = 'completed' THEN NOW() END)
+            ON CONFLICT (student_id, challenge_id) DO UPDATE SET
+              status = CASE WHEN progress.status = 'completed' THEN 'completed' ELSE EXCLUDED.status END,
+              attempts = progress.attempts + 1,
+              time_spent = progress.time_spent + EXCLUDED.time_spent,
+              completed_at = COALESCE(progress.completed_at, EXCLUDED.completed_at)
+            """,
+            student_id, _uuid(challenge_id, "challenge"), status, time_spent
+        )
+        return {"student_id": student_id, "challenge_id": challenge_id, "status": status}
+
+    def pool_stats(self) -> dict:
+        if self.pool is None:
+            return {"size": 0, "idle": 0, "skipped_messages": self.skipped}
+        return {
+            "size": self.pool.get_size(), "idle": self.pool.get_idle_size(), "max_size": self.max_size,
+            "skipped_messages": self.skipped,
+        }
+
+
+class SQLiteBackend:
+    """
+    SQLite stand-in that runs the same schema locally (tests, benchmarks)
+
+    A fixed pool of connections is handed out through an asyncio queue and
+    each query runs on a dedicated thread. The sqlite3 module keeps a
+    per-connection cache of compiled statements (`cached_statements`), which
+    plays the role of prepared statements. A query that exceeds
+    `query_timeout` is interrupted.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, pool_size: int = 4, query_timeout: float = 5.0, seed: bool = True):
+        self.path = path
+        self.pool_size = pool_size
+        self.query_timeout = query_timeout
+        self.seed = seed
+        self.query_stats = QueryStats()
+        self._connections: Optional[asyncio.Queue] = None
+        self._all_connections: List[sqlite3.Connection] = []
+        self._threads = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="phychat-sqlite")
+
+    def _open(self) -> sqlite3.Connection:
+        in_memory = self.path == ":memory:"
+        conn = sqlite3.connect(
+            # Pooled connections must share one in-memory database
+            f"file:phychat-{id(self)}?mode=memory&cache=shared" if in_memory else self.path,
+            timeout=self.query_timeout,
+            check_same_thread=False,
+            cached_statements=256,
+            isolation_level=None,
+            uri=in_memory
+        )
+        conn.row_factory = sqlite3.Row
+        if not in_memory:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    async def connect(self):
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        setup = self._open()
+        setup.executescript(SQLITE_SCHEMA)
+        if "tests" not in {row["name"] for row in setup.execute("PRAGMA table_info(challenges)")}:
+            # Database created before challenges carried test suites
+            setup.execute("ALTER TABLE challenges ADD COLUMN tests TEXT NOT NULL DEFAULT '[]'")
+            setup.executemany(
+                "UPDATE challenges SET tests = ? WHERE id = ?",
+                [(json.dumps(tests), challenge_id) for challenge_id, tests in SEED_TESTS.items()]
+            )
+        if self.seed and setup.execute("SELECT COUNT(*) FROM challenges").fetchone()[0] == 0:
+            now = _now_iso()
+            setup.executemany(
+                f"INSERT INTO challenges ({CHALLENGE_COLUMNS}, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*c[:6], json.dumps(c[6]), json.dumps(SEED_TESTS[c[0]]), now) for c in SEED_CHALLENGES]
+            )
+            setup.execute(
+                "INSERT OR IGNORE INTO students (id, student_id, name, email, consent_given, created_at) "
+                "VALUES (?, 'TEST001', 'Test Student', 'test@example.com', 1, ?)",
+                (str(uuid.uuid4()), now)
+            )
+
+        self._connections = asyncio.Queue()
+        for _ in range(self.pool_size):
+            conn = self._open()
+            self._all_connections.append(conn)
+            self._connections.put_nowait(conn)
+        # Closed only after the pool is open so a shared in-memory DB survives
+        setup.close()
+
+    async def close(self):
+        for conn in self._all_connections:
+            conn.close()
+        self._all_connections.clear()
+        self._threads.shutdown(wait=False)
+
+    async def _run(self, fn):
+        """
+        Run fn(conn) on a pooled connection with a per-query timeout
+
+        The connection goes back to the pool when fn returns, not when the
+        caller stops waiting: after a timeout (or a cancelled caller) the
+        thread is still using it until the interrupt lands.
+        """
+        conn = await self._connections.get()
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        future = loop.run_in_executor(self._threads, fn, conn)
+
+        def release(done: asyncio.Future):
+            if not done.cancelled():
+                done.exception()  # Retrieved, so an abandoned query's error isn't logged as unhandled
+            self._connections.put_nowait(conn)
+
+        future.add_done_callback(release)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self.query_timeout)
+        except asyncio.TimeoutError:
+            conn.interrupt()
+            self.query_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        except Exception:
+            self.query_stats.record(time.perf_counter() - start, failed=True)
+            raise
+        self.query_stats.record(time.perf_counter() - start)
+        return result
+
+    async def get_student(self, student_id: str):
+        row = await self._run(lambda c: c.execute(
+            "SELECT id, student_id, name, skill_level FROM students WHERE student_id = ?", (student_id,)
+        ).fetchone())
+        return dict(row) if row else None
+
+    async def get_student_progress(self, student_id: str):
+        rows = await self._run(lambda c: c.execute(
+            f"SELECT {PROGRESS_COLUMNS} FROM progress WHERE student_id = ?", (student_id,)
+        ).fetchall())
+        return [dict(r) for r in rows]
+
+    async def get_progress_for_students(self, student_ids: list):
+        student_ids = list(student_ids)
+        grouped = {student_id: [] for student_id in student_ids}
+        # Chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(student_ids), 500):
+            chunk = student_ids[i:i + 500]
+            rows = await self._run(lambda c: c.execute(
+                f"SELECT student_id, {PROGRESS_COLUMNS} FROM progress "
+                f"WHERE student_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ).fetchall())
+            for r in rows:
+                grouped[r["student_id"]].append(dict(r))
+        return grouped
+
+    async def get_conversation_history(self, conversation_id: str, limit: int = 10):
+        rows = await self._run(lambda c: c.execute(
+            f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE conversation_id = ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (conversation_id, limit)
+        ).fetchall())
+        return [dict(r) for r in reversed(rows)]
+
+    async def get_conversation_histories(self, conversation_ids: list, limit: int = 10):
+        grouped = {conversation_id: [] for conversation_id in conversation_ids}
+        ids = list(grouped)
+        # Chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = await self._run(lambda c: c.execute(
+                f"SELECT conversation_id, {MESSAGE_COLUMNS} FROM ("
+                f"SELECT conversation_id, {MESSAGE_COLUMNS}, "
+                "ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY created_at DESC) AS rn "
+                f"FROM messages WHERE conversation_id IN ({', '.join('?' * len(chunk))})"
+                ") WHERE rn <= ? ORDER BY conversation_id, created_at",
+                (*chunk, limit)
+            ).fetchall())
+            for r in rows:
+                row = dict(r)
+                grouped[row.pop("conversation_id")].append(row)
+        return grouped
+
+    async def save_message(self, conversation_id: str, role: str, content: str, code_snippet: str = None):
+        saved = await self.save_messages([{
+            "conversation_id": conversation_id, "role": role,
+            "content": content, "code_snippet": code_snippet
+        }])
+        return saved[0]
+
+    async def save_messages(self, messages: list):
+        rows = [
+            (
+                str(uuid.uuid4()), m["conversation_id"], m["role"], m["content"],
+                m.get("code_snippet"), m.get("created_at") or _now_iso()
+            )
+            for m in messages
+        ]
+
+        def insert(conn):
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT INTO messages (id, conversation_id, role, content, code_snippet, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        try:
+            await self._run(insert)
+        except sqlite3.IntegrityError as e:
+            raise RejectedRows(str(e)) from e
+        return [{"id": r[0]} for r in rows]
+
+    async def get_all_challenges(self):
+        rows = await self._run(lambda c: c.execute(
+            f"SELECT {CHALLENGE_COLUMNS} FROM challenges ORDER BY created_at, id"
+        ).fetchall())
+        return [
+            {
+                **dict(r),
+                "learning_objectives": json.loads(r["learning_objectives"]),
+                "tests": json.loads(r["tests"])
+            }
+            for r in rows
+        ]
+
+    async def update_progress(self, student_id: str, challenge_id: str, status: str, time_spent: int = 0):
+        now = _now_iso()
+        await self._run(lambda c: c.execute(
+            """
+            INSERT INTO progress (id, student_id, challenge_id, status, attempts, time_spent,
+                                  completed_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 1, ?, CASE WHEN ? = 'completed' THEN ? END, ?, ?)
+            ON CONFLICT (student_id, challenge_id) DO UPDATE SET
+              status = CASE WHEN progress.status = 'completed' THEN 'completed' ELSE excluded.status END,
+              attempts = progress.attempts + 1,
+              time_spent = progress.time_spent + excluded.time_spent,
+              completed_at = COALESCE(progress.completed_at, excluded.completed_at),
+              updated_at = excluded.updated_at
+            """,
+            (str(uuid.uuid4()), student_id, challenge_id, status, time_spent, status, now, now, now)
+        ))
+        return {"student_id": student_id, "challenge_id": challenge_id, "status": status}
+
+    def pool_stats(self) -> dict:
+        idle = self._connections.qsize() if self._connections is not None else 0
+        return {"size": len(self._all_connections), "idle": idle, "max_size": self.pool_size}
+
+
+class MockBackend:
+    """Async adapter over the in-memory SupabaseClient mock (no DATABASE_URL set)"""
+
+    name = "mock"
+
+    def __init__(self, client=None):
+        self.client = client or supabase_client
+        self.query_stats = QueryStats()
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def get_student(self, student_id: str):
+        return self.client.get_student(student_id)
+
+    async def get_student_progress(self, student_id: str):
+        return self.client.get_student_progress(student_id)
+
+    async def get_progress_for_students(self, student_ids: list):
+        return self.client.get_progress_for_students(student_ids)
+
+    async def get_conversation_history(self, conversation_id: str, limit: int = 10):
+        return self.client.get_conversation_history(conversation_id, limit=limit)
+
+    async def get_conversation_histories(self, conversation_ids: list, limit: int = 10):
+        return self.client.get_conversation_histories(conversation_ids, limit=limit)
+
+    async def save_message(self, conversation_id: str, role: str, content: str, code_snippet: str = None):
+        return self.client.save_message(conversation_id, role, content, code_snippet)
+
+    async def save_messages(self, messages: list):
+        return self.client.save_messages(messages)
+
+    async def get_all_challenges(self):
+        return self.client.get_all_challenges()
+
+    async def update_progress(self, student_id: str, challenge_id: str, status: str, time_spent: int = 0):
+        return self.client.update_progress(student_id, challenge_id, status)
+
+    def pool_stats(self) -> dict:
+        return {"size": 0, "idle": 0}
+
+
+class _BlockingProxy:
+    """`db.blocking.<method>(...)` runs a backend call and waits for it"""
+
+    def __init__(self, client: "DatabaseClient"):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client.backend, name)
+
+        def call(*args, **kwargs):
+            timeout = self._client.backend_timeout + 1.0
+            with telemetry.span(f"db.{name}"):
+                return self._client._submit(method(*args, **kwargs)).result(timeout=timeout)
+
+        return call
+
+
+class DatabaseClient:
+    """
+    Data-access layer used by the services and routes
+
+    The backend's connection pool lives on a dedicated event loop thread, so
+    the same pool serves async callers (routes await the methods below) and
+    synchronous callers such as background threads and the `*_sync` service
+    methods (`db.blocking.<method>(...)`).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.backend_timeout = getattr(backend, "query_timeout", 5.0)
+        self.blocking = _BlockingProxy(self)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._ready is not None:
+            return
+        with self._lock:
+            if self._ready is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="phychat-db", daemon=True).start()
+            self._ready = asyncio.run_coroutine_threadsafe(self.backend.connect(), self._loop)
+
+    def _submit(self, coro) -> Future:
+        self._ensure_started()
+        self._ready.result()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _call(self, name: str, *args, **kwargs):
+        self._ensure_started()
+        await asyncio.wrap_future(self._ready)
+        with telemetry.span(f"db.{name}"):
+            future = asyncio.run_coroutine_threadsafe(getattr(self.backend, name)(*args, **kwargs), self._loop)
+            return await asyncio.wrap_future(future)
+
+    async def get_student(self, student_id: str):
+        return await self._call("get_student", student_id)
+
+    async def get_student_progress(self, student_id: str):
+        return await self._call("get_student_progress", student_id)
+
+    async def get_progress_for_students(self, student_ids: list):
+        """Progress rows for many students in one query, keyed by student ID"""
+        return await self._call("get_progress_for_students", student_ids)
+
+    async def get_conversation_history(self, conversation_id: str, limit: int = 10):
+        return await self._call("get_conversation_history", conversation_id, limit=limit)
+
+    async def get_conversation_histories(self, conversation_ids: list, limit: int = 10):
+        """Recent messages of many conversations in one query, keyed by conversation ID"""
+        return await self._call("get_conversation_histories", conversation_ids, limit=limit)
+
+    async def save_message(self, conversation_id: str, role: str, content: str, code_snippet: str = None):
+        return await self._call("save_message", conversation_id, role, content, code_snippet)
+
+    async def save_messages(self, messages: list):
+        return await self._call("save_messages", messages)
+
+    async def get_all_challenges(self):
+        return await self._call("get_all_challenges")
+
+    async def update_progress(self, student_id: str, challenge_id: str, status: str, time_spent: int = 0):
+        return await self._call("update_progress", student_id, challenge_id, status, time_spent=time_spent)
+
+    def close(self):
+        if self._ready is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.backend.close(), self._loop).result(timeout=5.0)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._ready = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "pool": self.backend.pool_stats(),
+            **self.backend.query_stats.as_dict(),
+        }
+
+
+def build_backend(url: Optional[str]):
+    """
+    Pick the backend from DATABASE_URL
+
+    - postgresql://...   -> PostgresBackend (asyncpg)
+    - sqlite:///path.db  -> SQLiteBackend running the same schema locally
+    - unset              -> MockBackend (in-memory SupabaseClient)
+    """
+    pool_size = int(os.getenv("DB_POOL_SIZE", 10))
+    query_timeout = float(os.getenv("DB_QUERY_TIMEOUT", 5))
+
+    if not url:
+        return MockBackend()
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresBackend(url, min_size=min(2, pool_size), max_size=pool_size, query_timeout=query_timeout)
+    if url.startswith("sqlite://"):
+        return SQLiteBackend(url[len("sqlite:///"):] or ":memory:", pool_size=pool_size, query_timeout=query_timeout)
+    raise ValueError(f"Unsupported DATABASE_URL scheme: {url.split(':', 1)[0]}")
+
+
+# Singleton instance
+db = DatabaseClient(build_backend(os.getenv("DATABASE_URL")))
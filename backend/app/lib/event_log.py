@@ -0,0 +1,287 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+from typing import Iterator, List, Optional, Sequence
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Student context width (bandit.STUDENT_DIM); stored in each segment header,
+# so segments written with another width are skipped rather than misread
+CONTEXT_DIM = 11
+
+# Who chose the challenge the student attempted
+RECOMMENDERS = ("none", "heuristic", "linucb")
+
+SEGMENT_MAGIC = b"PHYEVT01"
+# magic, record size, context width
+_HEADER = struct.Struct("<8sII")
+# time, user hash, challenge hash, time_spent, confidence, propensity,
+# available arm types (bitmask), success, recommender, arm type, pad, context
+_RECORD = struct.Struct(f"<dQQIffIBBBx{CONTEXT_DIM}f")
+RECORD_BYTES = _RECORD.size
+
+_ZERO_CONTEXT = (0.0,) * CONTEXT_DIM
+
+
+def stable_hash(value: str) -> int:
+    """64-bit ID hash that is the same in every process (unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+
+
+def event_dtype(context_dim: int = CONTEXT_DIM):
+    """numpy dtype of one record, field for field the same layout as the writer's struct"""
+    import numpy as np
+
+    return np.dtype([
+        ("time", "<f8"),
+        ("user", "<u8"),
+        ("challenge", "<u8"),
+        ("time_spent", "<u4"),
+        ("confidence", "<f4"),
+        ("propensity", "<f4"),
+        ("available", "<u4"),
+        ("success", "u1"),
+        ("recommender", "u1"),
+        ("arm_type", "u1"),
+        ("pad", "u1"),
+        ("context", "<f4", (context_dim,)),
+    ])
+
+
+class LearningEventLog:
+    """
+    Append-only log of every attempt the recommendation policy learns from
+
+    Each attempt (student, challenge, success, time spent, who recommended
+    it, the policy's confidence and the probability it had of picking that
+    kind of challenge) is packed into a fixed-width binary record, together
+    with the student context the policy saw. Records are buffered in memory
+    and appended to the current segment file every `flush_records` records
+    or `flush_interval_ms`, whichever comes first; a segment is rotated once
+    it reaches `segment_bytes`, and the oldest segments are deleted beyond
+    `max_segments` (0 keeps them all).
+
+    Segments are named by creation time and process ID, so several workers
+    can share a directory, and every record has the same width, so readers
+    load a segment straight into numpy batches without parsing
+    (`read_batches`). A crash loses at most the buffered tail; a torn final
+    record is ignored by readers.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        segment_bytes: int = 64 * 1024 * 1024,
+        max_segments: int = 0,
+        flush_records: int = 256,
+        flush_interval_ms: float = 1000.0
+    ):
+        self.directory = directory
+        self.segment_bytes = max(segment_bytes, _HEADER.size + RECORD_BYTES)
+        self.max_segments = max_segments
+        self.flush_records = max(1, flush_records)
+        self.flush_interval = flush_interval_ms / 1000.0
+        # Segments named before this are from earlier runs (or other workers)
+        self.started_name = self._segment_name(time.time_ns())
+
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._file = None
+        self._path: Optional[str] = None
+        self._segment_size = 0
+        self._last_write = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.deleted_segments = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    # --- writing ---
+
+    def append(
+        self,
+        user_id: str,
+        challenge_id: str,
+        success: bool,
+        time_spent: int,
+        recommender: str = "none",
+        confidence: float = 0.0,
+        propensity: float = 0.0,
+        available: int = 0,
+        arm_type: int = 0,
+        context: Optional[Sequence[float]] = None,
+        at: Optional[float] = None
+    ):
+        """Record one attempt (at `at`, default now); a cheap in-memory append except when the buffer is written out"""
+        if not self.enabled:
+            return
+        record = _RECORD.pack(
+            time.time() if at is None else at,
+            stable_hash(user_id),
+            stable_hash(challenge_id),
+            min(max(int(time_spent), 0), 0xFFFFFFFF),
+            confidence,
+            propensity,
+            available,
+            int(bool(success)),
+            RECOMMENDERS.index(recommender) if recommender in RECOMMENDERS else 0,
+            arm_type,
+            *(_ZERO_CONTEXT if context is None else context),
+        )
+        with self._lock:
+            self._buffer += record
+            self._buffered += 1
+            self.appended += 1
+            if self._buffered >= self.flush_records or time.monotonic() - self._last_write >= self.flush_interval:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        """Write what is buffered and close the current segment"""
+        with self._lock:
+            self._write()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self):
+        # Caller holds the lock
+        self._last_write = time.monotonic()
+        if not self._buffer:
+            return
+        try:
+            if self._file is None or self._segment_size + len(self._buffer) > self.segment_bytes:
+                self._rotate()
+            self._file.write(self._buffer)
+            self._segment_size += len(self._buffer)
+            self.written += self._buffered
+        except OSError as e:
+            self.dropped += self._buffered
+            print(f"WARNING: learning event log write failed: {e}")
+        self._buffer = bytearray()
+        self._buffered = 0
+
+    def _rotate(self):
+        # Caller holds the lock
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.rotations += 1
+        self._path = os.path.join(self.directory, self._segment_name(time.time_ns()))
+        self._file = open(self._path, "ab", buffering=0)
+        self._file.write(_HEADER.pack(SEGMENT_MAGIC, RECORD_BYTES, CONTEXT_DIM))
+        self._segment_size = _HEADER.size
+
+        if self.max_segments > 0:
+            for path in self.segments()[:-self.max_segments]:
+                try:
+                    os.remove(path)
+                    self.deleted_segments += 1
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _segment_name(time_ns: int) -> str:
+        return f"events-{time_ns:020d}-{os.getpid()}.seg"
+
+    # --- reading ---
+
+    def segments(self, before: Optional[str] = None) -> List[str]:
+        """Segment paths, oldest first; `before` keeps those named before it"""
+        if not self.enabled or not os.path.isdir(self.directory):
+            return []
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith("events-") and n.endswith(".seg"))
+        if before is not None:
+            names = [n for n in names if n < before]
+        return [os.path.join(self.directory, n) for n in names]
+
+    def history(self) -> List[str]:
+        """Segments written before this log was opened (what a restarted worker replays)"""
+        return self.segments(before=self.started_name)
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "segments": len(segments),
+                "bytes": sum(os.path.getsize(p) for p in segments),
+                "record_bytes": RECORD_BYTES,
+                "current_segment": os.path.basename(self._path) if self._path else None,
+                "appended": self.appended,
+                "written": self.written,
+                "buffered": self._buffered,
+                "dropped": self.dropped,
+                "rotations": self.rotations,
+                "deleted_segments": self.deleted_segments,
+            }
+
+
+def count_records(path: str) -> int:
+    """Whole records in a segment (0 for a foreign or incompatible file)"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    if len(header) < _HEADER.size:
+        return 0
+    magic, record_bytes, context_dim = _HEADER.unpack(header)
+    if magic != SEGMENT_MAGIC or record_bytes != RECORD_BYTES or context_dim != CONTEXT_DIM:
+        return 0
+    return (size - _HEADER.size) // RECORD_BYTES
+
+
+def read_batches(paths: Sequence[str], batch_records: int = 16384,
+                 start: int = 0, stop: Optional[int] = None) -> Iterator:
+    """
+    Records of the segments in order, as numpy structured arrays of up to `batch_records`
+
+    Each batch is read straight into a structured array (fixed-width
+    records need no parsing), so memory use is bounded by the batch size no
+    matter how many events the log holds. `start` / `stop` select a range of
+    record positions across all segments (e.g. a hold-out tail).
+    """
+    import numpy as np
+
+    dtype = event_dtype()
+    position = 0
+    for path in paths:
+        n = count_records(path)
+        if n == 0:
+            continue
+        lo, hi = max(start - position, 0), n if stop is None else min(stop - position, n)
+        position += n
+        if lo >= hi:
+            continue
+        with open(path, "rb") as f:
+            f.seek(_HEADER.size + lo * RECORD_BYTES)
+            for i in range(lo, hi, batch_records):
+                yield np.fromfile(f, dtype=dtype, count=min(batch_records, hi - i))
+        if stop is not None and position >= stop:
+            return
+
+
+# Singleton instance
+event_log = LearningEventLog(
+    directory=os.getenv("EVENT_LOG_DIR", "./data/events") or None,
+    segment_bytes=int(float(os.getenv("EVENT_LOG_SEGMENT_MB", 64)) * 1024 * 1024),
+    max_segments=int(os.getenv("EVENT_LOG_MAX_SEGMENTS", 0)),
+    flush_records=int(os.getenv("EVENT_LOG_FLUSH_RECORDS", 256))
+)
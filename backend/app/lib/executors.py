@@ -0,0 +1,78 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ExecutionLayer:
+    """
+    Keeps blocking work off the asyncio event loop
+
+    - I/O-bound calls (database, network) run on a bounded thread pool
+    - CPU-bound calls (code analysis, XAI, mock inference) run on a process
+      pool so they don't contend for the GIL with request handling
+
+    Pools are created lazily on first use; CPU_POOL_SIZE=0 routes CPU work to
+    the thread pool instead (useful on single-core hosts and in debugging).
+    """
+
+    def __init__(self, io_workers: int = 32, cpu_workers: Optional[int] = None):
+        self.io_workers = io_workers
+        self.cpu_workers = (os.cpu_count() or 1) if cpu_workers is None else cpu_workers
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def io_pool(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="phychat-io")
+        return self._io_pool
+
+    @property
+    def cpu_pool(self):
+        if self.cpu_workers <= 0:
+            return self.io_pool
+        if self._cpu_pool is None:
+            # spawn, not fork: the parent has live threads (engine worker, I/O pool)
+            self._cpu_pool = ProcessPoolExecutor(
+                max_workers=self.cpu_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._cpu_pool
+
+    async def run_io(self, fn: Callable, *args, **kwargs):
+        """Await a blocking I/O call on the thread pool (in the caller's context, so spans attach to its request)"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.io_pool, functools.partial(context.run, fn, *args, **kwargs))
+
+    async def run_cpu(self, fn: Callable, *args, **kwargs):
+        """
+        Await a CPU-bound call on the process pool
+
+        `fn` and its arguments must be picklable (module-level functions and
+        plain data), and so must the return value.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_pool, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=True, cancel_futures=True)
+            self._cpu_pool = None
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=True, cancel_futures=True)
+            self._io_pool = None
+
+
+# Singleton instance
+executors = ExecutionLayer(
+    io_workers=int(os.getenv("IO_POOL_SIZE", 32)),
+    cpu_workers=int(os.getenv("CPU_POOL_SIZE")) if os.getenv("CPU_POOL_SIZE") else None
+)
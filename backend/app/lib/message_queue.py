@@ -0,0 +1,316 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+from dotenv import load_dotenv
+from app.lib.database import db as database, RejectedRows
+
+load_dotenv()
+
+
+class MessageWriteBehind:
+    """
+    Write-behind persistence for chat transcripts
+
+    `enqueue` is non-blocking: messages go onto a bounded in-memory queue and
+    a background thread flushes them with bulk inserts once `flush_batch`
+    messages are waiting or `flush_interval_ms` has passed.
+
+    When the queue is full, or a bulk insert keeps failing because the
+    database is unavailable, messages spill to an append-only JSONL journal
+    on disk instead of being lost. A batch the database refuses (e.g. one
+    message for a conversation that doesn't exist) is retried one message at
+    a time; the messages it still refuses go to `rejected_path` and are
+    counted as rejected rather than journaled, so they can't hold back the
+    rest of their batch. Overflow from
+    `enqueue` is handed to the background thread, which does the journal
+    write and fsync, so a full queue never blocks the caller. The journal is
+    replayed on start and whenever the flusher is otherwise idle. A message is
+    only counted as dropped if the journal write itself fails.
+    """
+
+    def __init__(
+        self,
+        db=None,
+        max_queue_size: int = 10000,
+        flush_batch: int = 100,
+        flush_interval_ms: float = 200.0,
+        journal_path: Optional[str] = None,
+        rejected_path: Optional[str] = None,
+        max_retries: int = 3
+    ):
+        self.db = db or database.blocking
+        self.max_queue_size = max_queue_size
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.journal_path = journal_path
+        self.rejected_path = rejected_path
+        self.max_retries = max_retries
+
+        self._queue: deque = deque()
+        # Rows that found the queue full, waiting for the flusher to journal them
+        self._overflow: List[dict] = []
+        self._cond = threading.Condition()
+        self._journal_lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._next_replay = 0.0
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.flush_failures = 0
+        self.last_flush_ms = 0.0
+
+        for path in (self.journal_path, self.rejected_path):
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # --- producer side -----------------------------------------------------
+
+    def enqueue(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        code_snippet: Optional[str] = None
+    ):
+        """Queue one message for persistence; never blocks on the database or the disk"""
+        row = {
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "code_snippet": code_snippet,
+            # Stamped now so transcript order survives batching and replay
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        item = (time.monotonic(), row)
+
+        with self._cond:
+            self.enqueued += 1
+            if len(self._queue) < self.max_queue_size:
+                self._queue.append(item)
+                if len(self._queue) >= self.flush_batch:
+                    self._cond.notify()
+                return
+            if self._thread is not None:
+                # Backpressure: the flusher spills it to disk; the request doesn't wait for the fsync
+                self._overflow.append(row)
+                self._cond.notify()
+                return
+
+        # No flusher running (scripts, shutdown): nothing to hand the spill to
+        self._spill([row])
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="message-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flush what is queued and stop the background thread"""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+        # Anything the thread couldn't write goes to the journal for next start
+        with self._cond:
+            leftover = self._overflow + [row for _, row in self._queue]
+            self._overflow = []
+            self._queue.clear()
+        if leftover:
+            self._spill(leftover)
+
+    # --- flusher -----------------------------------------------------------
+
+    def _run(self):
+        self._replay_journal()
+        while True:
+            with self._cond:
+                if not self._queue and not self._overflow and not self._stopping:
+                    self._cond.wait(timeout=self.flush_interval)
+                elif len(self._queue) < self.flush_batch and not self._overflow and not self._stopping:
+                    # Give the batch until the oldest message is flush_interval old
+                    age = time.monotonic() - self._queue[0][0]
+                    if age < self.flush_interval:
+                        self._cond.wait(timeout=self.flush_interval - age)
+
+                overflow, self._overflow = self._overflow, []
+                batch = []
+                while self._queue and len(batch) < self.flush_batch:
+                    batch.append(self._queue.popleft()[1])
+                stopping = self._stopping and not self._queue
+
+            if overflow:
+                self._spill(overflow)
+            if batch:
+                self._flush(batch)
+            elif not stopping:
+                self._replay_journal()
+
+            if stopping:
+                return
+
+    def _flush(self, rows: List[dict]) -> bool:
+        for attempt in range(self.max_retries):
+            start = time.perf_counter()
+            try:
+                self.db.save_messages(rows)
+                self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+                self.flushed += len(rows)
+                return True
+            except RejectedRows:
+                done, saved = self._save_each(rows)
+                self.flushed += saved
+                if done == len(rows):
+                    return True
+                rows = rows[done:]
+            except Exception:
+                self.flush_failures += 1
+            if self._stopping:
+                break
+            time.sleep(min(2.0, 0.1 * 2 ** attempt))
+        self._spill(rows)
+        return False
+
+    def _save_each(self, rows: List[dict]) -> tuple:
+        """
+        Save a refused batch one message at a time, setting aside the ones refused again
+
+        Returns (rows handled, rows saved); it stops at the first failure that
+        isn't a refusal, leaving that row and the rest to the caller.
+        """
+        saved = 0
+        for i, row in enumerate(rows):
+            try:
+                self.db.save_messages([row])
+                saved += 1
+            except RejectedRows:
+                self._reject(row)
+            except Exception:
+                self.flush_failures += 1
+                return i, saved
+        return len(rows), saved
+
+    # --- journal -----------------------------------------------------------
+
+    def _spill(self, rows: List[dict]):
+        # Called from request threads and the flusher, so counters share the lock
+        with self._journal_lock:
+            if self._append_journal(rows):
+                self.spilled += len(rows)
+            else:
+                self.dropped += len(rows)
+
+    def _reject(self, row: dict):
+        # Kept for inspection, never replayed
+        with self._journal_lock:
+            self.rejected += 1
+            if self.rejected_path:
+                self._append_journal([row], self.rejected_path)
+
+    def _append_journal(self, rows: List[dict], path: Optional[str] = None) -> bool:
+        path = path or self.journal_path
+        if not path:
+            return False
+        try:
+            with self._journal_lock:
+                with open(path, "a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(row) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            return True
+        except OSError:
+            return False
+
+    def _replay_journal(self):
+        if not self.journal_path or time.monotonic() < self._next_replay:
+            return
+        if not os.path.exists(self.journal_path) and not os.path.exists(self.journal_path + ".replay"):
+            return
+
+        # Move the journal aside atomically; new spills start a fresh file
+        replay_path = self.journal_path + ".replay"
+        with self._journal_lock:
+            if not os.path.exists(replay_path):
+                try:
+                    os.replace(self.journal_path, replay_path)
+                except OSError:
+                    return
+
+        rows = []
+        with open(replay_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # Torn final line from a crash mid-write
+
+        for i in range(0, len(rows), self.flush_batch):
+            chunk = rows[i:i + self.flush_batch]
+            try:
+                self.db.save_messages(chunk)
+                done = saved = len(chunk)
+            except RejectedRows:
+                done, saved = self._save_each(chunk)
+            except Exception:
+                self.flush_failures += 1
+                done = saved = 0
+            self.replayed += saved
+            self.flushed += saved
+            if done < len(chunk):
+                # DB still down: put the rest back and retry later
+                if not self._append_journal(rows[i + done:]):
+                    self.dropped += len(rows) - i - done
+                self._next_replay = time.monotonic() + 5.0
+                break
+        os.remove(replay_path)
+
+    def stats(self) -> dict:
+        with self._cond:
+            depth = len(self._queue)
+            spill_pending = len(self._overflow)
+            lag = time.monotonic() - self._queue[0][0] if self._queue else 0.0
+        journal_bytes = 0
+        if self.journal_path and os.path.exists(self.journal_path):
+            journal_bytes = os.path.getsize(self.journal_path)
+        return {
+            "queue_depth": depth,
+            "max_queue_size": self.max_queue_size,
+            "queue_lag_ms": round(lag * 1000, 2),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "spilled": self.spilled,
+            "spill_pending": spill_pending,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "flush_failures": self.flush_failures,
+            "last_flush_ms": self.last_flush_ms,
+            "journal_bytes": journal_bytes,
+        }
+
+
+# Singleton instance
+message_writer = MessageWriteBehind(
+    max_queue_size=int(os.getenv("MESSAGE_QUEUE_SIZE", 10000)),
+    flush_batch=int(os.getenv("MESSAGE_FLUSH_BATCH", 100)),
+    flush_interval_ms=float(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", 200)),
+    journal_path=os.getenv("MESSAGE_JOURNAL_PATH", "./data/message_journal.jsonl") or None,
+    rejected_path=os.getenv("MESSAGE_REJECTED_PATH", "./data/message_rejected.jsonl") or None
+)
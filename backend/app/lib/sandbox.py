@@ -0,0 +1,792 @@
+import builtins
+import gc
+import io
+import linecache
+import multiprocessing
+import os
+import pickle
+import select
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import types
+from collections import deque
+from typing import Optional
+from dotenv import load_dotenv
+from app.lib.executors import executors
+
+try:
+    import resource
+except ImportError:
+    # Windows: no rlimits, only the wall-clock limit (enforced by the parent) applies
+    resource = None
+
+load_dotenv()
+
+STUDENT_FILENAME = "<student>"
+# How long past the wall-clock limit the parent waits before killing a worker
+KILL_GRACE = 0.5
+SPAWN_TIMEOUT = 30.0
+# Longest back-off between attempts to replace a worker that failed to start
+SPAWN_RETRY_MAX = 30.0
+# Statuses after which the worker is replaced rather than reused
+RECYCLE_STATUSES = {"memory_limit", "cpu_limit"}
+# Uid (and gid) workers switch to when the API runs as root: nobody
+DEFAULT_SANDBOX_UID = 65534
+# The only environment a snippet sees (HOME and TMPDIR point at its scratch directory)
+SAFE_ENV = {"PATH": "/usr/bin:/bin", "LANG": "C.UTF-8"}
+# Open files allowed per worker (RLIMIT_NOFILE)
+OPEN_FILES = 64
+# Standard modules snippets may import; loaded before the worker is confined to
+# its scratch directory, after which nothing else can be imported
+SANDBOX_MODULES = (
+    "abc", "array", "bisect", "collections", "copy", "dataclasses", "datetime", "decimal",
+    "enum", "fractions", "functools", "heapq", "itertools", "json", "math", "operator",
+    "random", "re", "statistics", "string", "time", "typing",
+)
+# Everything imported from here (the app, its settings and clients) is dropped from workers
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+
+
+class ExecutionResult:
+    """
+    Outcome of running one snippet
+
+    status is "ok", "error" (an exception escaped), "timeout" (wall-clock
+    limit), "cpu_limit", "memory_limit", "crashed" (the worker died) or
+    "unavailable" (no worker could be had). `line` is the student's line
+    that was executing when it stopped.
+    """
+
+    __slots__ = ("status", "error_type", "line", "message", "traceback", "stdout", "duration_ms")
+
+    def __init__(
+        self,
+        status: str,
+        error_type: Optional[str] = None,
+        line: Optional[int] = None,
+        message: Optional[str] = None,
+        traceback: Optional[str] = None,
+        stdout: str = "",
+        duration_ms: float = 0.0
+    ):
+        self.status = status
+        self.error_type = error_type
+        self.line = line
+        self.message = message
+        self.traceback = traceback
+        self.stdout = stdout
+        self.duration_ms = duration_ms
+
+    @property
+    def stopped(self) -> bool:
+        """The snippet ran into a limit instead of finishing"""
+        return self.status in ("timeout", "cpu_limit")
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# --- worker process ---------------------------------------------------------
+
+class _Timeout(BaseException):
+    """Raised inside student code at the wall-clock limit (BaseException: `except Exception` can't swallow it)"""
+
+
+class _CpuLimit(BaseException):
+    """Raised inside student code on SIGXCPU"""
+
+
+class _BoundedOutput(io.TextIOBase):
+    """stdout/stderr replacement that keeps the first `limit` characters"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.truncated = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        room = self.limit - self.size
+        if room > 0:
+            self.parts.append(text[:room])
+            self.size += min(len(text), room)
+        if len(text) > room:
+            self.truncated = True
+        return len(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts) + ("\n...[output truncated]" if self.truncated else "")
+
+
+_running = False
+
+
+def _interrupt(exc_type):
+    def handler(signum, frame):
+        # Only while student code runs; between jobs the signal is ignored
+        if _running:
+            raise exc_type()
+    return handler
+
+
+def _unshare(flags: int) -> bool:
+    """unshare(2) (os.unshare from Python 3.12); False where the kernel or platform refuses"""
+    try:
+        if hasattr(os, "unshare"):
+            os.unshare(flags)
+            return True
+        import ctypes
+        return ctypes.CDLL(None, use_errno=True).unshare(flags) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _forget_host():
+    """Drop the app's modules and environment so a snippet can't reach its settings or clients"""
+    os.environ.clear()
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name == "__mp_main__" or (isinstance(path, str) and os.path.abspath(path).startswith(_PROJECT_DIR + os.sep)):
+            del sys.modules[name]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    gc.collect()
+
+
+def _isolate(workdir: str, uid: Optional[int]) -> dict:
+    """
+    Confine this worker before it runs any snippet; returns what was applied
+
+    The environment becomes SAFE_ENV and the app's modules are dropped (the
+    database URL and API keys live in both). Where the kernel allows it the
+    worker then gets its own network namespace (loopback only) and is
+    chrooted to its scratch directory. As root it finally switches to `uid`:
+    root ignores RLIMIT_NPROC, which keeps snippets from starting processes.
+    """
+    for name in SANDBOX_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    _forget_host()
+    os.environ.update(SAFE_ENV, HOME=workdir, TMPDIR=workdir)
+
+    root = hasattr(os, "geteuid") and os.geteuid() == 0
+    if not hasattr(os, "fork"):
+        return {"environment": True, "network": False, "filesystem": False, "uid": None}
+    # Unprivileged, a user namespace grants what the network namespace and chroot need
+    network = _unshare(_CLONE_NEWNET) if root else _unshare(_CLONE_NEWUSER | _CLONE_NEWNET)
+    filesystem = False
+    if root and uid is not None:
+        os.chown(workdir, uid, uid)
+    try:
+        os.chroot(workdir)
+        os.chdir("/")
+        os.environ.update(HOME="/", TMPDIR="/")
+        filesystem = True
+    except OSError:
+        pass
+    if root and uid is not None:
+        os.setgroups([])
+        os.setgid(uid)
+        os.setuid(uid)
+    return {"environment": True, "network": network, "filesystem": filesystem, "uid": os.getuid()}
+
+
+def _apply_limits(limits: dict):
+    if resource is None:
+        return
+    memory = limits["memory_mb"] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (OPEN_FILES, OPEN_FILES))
+    # Writing files past 1 MB fails with an OSError instead of SIGXFSZ
+    resource.setrlimit(resource.RLIMIT_FSIZE, (1024 * 1024, 1024 * 1024))
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    signal.signal(signal.SIGXCPU, _interrupt(_CpuLimit))
+
+
+def _cpu_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _student_line(exc: BaseException, tb_exc: traceback.TracebackException) -> Optional[int]:
+    frames = [f for f in tb_exc.stack if f.filename == STUDENT_FILENAME]
+    if frames:
+        return frames[-1].lineno
+    return getattr(exc, "lineno", None) if isinstance(exc, SyntaxError) else None
+
+
+def _format_traceback(tb_exc: traceback.TracebackException) -> str:
+    # Only the student's frames: the sandbox's own frames are noise to them
+    tb_exc.stack = traceback.StackSummary.from_list(
+        [f for f in tb_exc.stack if f.filename == STUDENT_FILENAME]
+    )
+    return "".join(tb_exc.format())
+
+
+def _execute(code: str, stdin: str, limits: dict) -> dict:
+    """Run one snippet in this (worker) process and describe how it ended"""
+    global _running
+    output = _BoundedOutput(limits["output_limit"])
+    namespace = {"__name__": "__main__", "__builtins__": dict(vars(builtins))}
+    linecache.cache[STUDENT_FILENAME] = (len(code), None, code.splitlines(True), STUDENT_FILENAME)
+    result = {"status": "ok", "error_type": None, "line": None, "message": None, "traceback": None}
+
+    saved = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = io.StringIO(stdin), output, output
+    if resource is not None:
+        soft = int(_cpu_used() + limits["cpu_seconds"]) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.RLIM_INFINITY))
+        # No fork bombs: the snippet may not start processes (not enforced for root)
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    start = time.perf_counter()
+    try:
+        compiled = compile(code, STUDENT_FILENAME, "exec")
+        _running = True
+        if hasattr(signal, "setitimer"):
+            # Re-fires every 50 ms in case the student's code catches the first one
+            signal.setitimer(signal.ITIMER_REAL, limits["wall_seconds"], 0.05)
+        exec(compiled, namespace)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            result.update(status="error", error_type="SystemExit", message=f"exit({e.code!r})")
+    except BaseException as e:
+        tb_exc = traceback.TracebackException.from_exception(e)
+        result["line"] = _student_line(e, tb_exc)
+        if isinstance(e, _Timeout):
+            result.update(status="timeout", message=f"Stopped after {limits['wall_seconds']:g} s (time limit)")
+        elif isinstance(e, _CpuLimit):
+            result.update(status="cpu_limit", message=f"Stopped after {limits['cpu_seconds']:g} s of CPU time")
+        elif isinstance(e, MemoryError):
+            result.update(status="memory_limit", error_type="MemoryError",
+                          message=f"Used more than {limits['memory_mb']} MB of memory")
+        else:
+            result.update(
+                status="error",
+                error_type=type(e).__name__,
+                message=str(e),
+                traceback=_format_traceback(tb_exc)
+            )
+    finally:
+        _running = False
+        if hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        sys.stdin, sys.stdout, sys.stderr = saved
+        linecache.cache.pop(STUDENT_FILENAME, None)
+
+    result["duration_ms"] = round((time.perf_counter() - start) * 1e3, 3)
+    result["stdout"] = output.getvalue()
+    return result
+
+
+def _restore_builtins(snapshot: dict) -> bool:
+    """Put the builtins module back as it was; True if the snippet had changed it"""
+    current = vars(builtins)
+    tainted = current.keys() != snapshot.keys() or any(current[k] is not v for k, v in snapshot.items())
+    if tainted:
+        current.clear()
+        current.update(snapshot)
+    return tainted
+
+
+def _read_result(fd: int, pid: int, limits: dict) -> dict:
+    """Collect the forked run's pickled result, killing it past the wall-clock limit"""
+    deadline = time.monotonic() + limits["wall_seconds"] + KILL_GRACE / 2
+    chunks = []
+    timed_out = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+            timed_out = True
+            break
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(fd)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+    if timed_out:
+        return {"status": "timeout", "message": f"Stopped after {limits['wall_seconds']:g} s (time limit)"}
+    try:
+        result = pickle.loads(b"".join(chunks))
+        if not isinstance(result, dict) or not isinstance(result.get("status"), str):
+            raise ValueError("malformed result")
+        return result
+    except Exception:
+        return {"status": "crashed", "message": "The program stopped the interpreter (e.g. os._exit or a hard crash)"}
+
+
+def _run_forked(conn, code: str, stdin: str, limits: dict, snapshot: dict) -> dict:
+    """
+    Run one snippet in a child forked for it
+
+    Whatever the snippet changes (builtins, imported modules, globals of
+    the sandbox itself) dies with the child, so the next run starts from
+    the worker's clean state. The worker only reads the child's result.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        exit_status = 1
+        try:
+            # The snippet must not reach the worker's channel to the API process
+            conn.close()
+            os.close(read_fd)
+            result = _execute(code, stdin, limits)
+            _restore_builtins(snapshot)
+            payload = pickle.dumps(result)
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(write_fd, view):]
+            exit_status = 0
+        finally:
+            os._exit(exit_status)
+    os.close(write_fd)
+    return _read_result(read_fd, pid, limits)
+
+
+def _worker_main(conn, limits: dict, uid: Optional[int]):
+    """Worker loop: receive (code, stdin), send back the result dict; None exits"""
+    snapshot = dict(vars(builtins))
+    fork = hasattr(os, "fork")
+    # Removed by the parent when it retires the worker (a chrooted worker can't reach it by path)
+    workdir = tempfile.mkdtemp(prefix="phychat-sandbox-")
+    os.chdir(workdir)
+    isolation = _isolate(workdir, uid)
+    _apply_limits(limits)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _interrupt(_Timeout))
+    try:
+        conn.send({"ready": True, "pid": os.getpid(), "workdir": workdir, "isolation": isolation})
+    except OSError:
+        return  # The pool shut down while this worker was starting
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        try:
+            if fork:
+                conn.send(_run_forked(conn, *job, limits, snapshot))
+            else:
+                result = _execute(*job, limits)
+                # No fork: undo what we can, and have the parent retire a tampered worker
+                result["tainted"] = _restore_builtins(snapshot)
+                conn.send(result)
+        except (_Timeout, _CpuLimit):
+            # A limit signal landed in the sandbox's own bookkeeping
+            conn.send({"status": "timeout", "message": "Stopped at the time limit"})
+
+
+# --- parent side ------------------------------------------------------------
+
+def _preload_modules() -> list:
+    """
+    Modules the forkserver imports once, before forking any worker
+
+    Workers re-run the parent's main module (the whole app under `python
+    main.py`); with its imports already loaded in the forkserver that is
+    cheap, otherwise it costs ~50-100 ms per worker instead of a ~5 ms
+    fork. The main module is preloaded by name because the forkserver's
+    own "__main__" preload never receives the script path.
+    """
+    modules = [__name__, *SANDBOX_MODULES]
+    main = sys.modules["__main__"]
+    if getattr(main, "__spec__", None) is not None:
+        # `python -m pkg.mod`: workers re-run pkg.mod by name and warn if it is
+        # already imported, so preload what it imported instead
+        for value in vars(main).values():
+            name = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, "__module__", None)
+            if isinstance(name, str) and name in sys.modules and name not in modules and name != "__main__":
+                modules.append(name)
+    elif getattr(main, "__file__", None):
+        # A script: importable by its stem, since its directory is sys.path[0]
+        modules.append(os.path.splitext(os.path.basename(main.__file__))[0])
+    return modules
+
+
+class _Worker:
+    __slots__ = ("process", "conn", "workdir", "runs")
+
+    def __init__(self, process, conn, workdir: Optional[str]):
+        self.process = process
+        self.conn = conn
+        self.workdir = workdir
+        self.runs = 0
+
+
+class _Waiter:
+    __slots__ = ("ready", "worker")
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.worker: Optional[_Worker] = None
+
+
+class SandboxPool:
+    """
+    Warm pool of resource-limited processes that run student code
+
+    Workers are started ahead of time (forked from a clean fork server on
+    Linux, so no interpreter start-up on the request path) and each runs
+    one snippet at a time with:
+
+    - a wall-clock limit (SIGALRM inside the worker, which also reports the
+      line that was running; the parent kills workers that don't answer)
+    - a CPU-time limit (RLIMIT_CPU) and an address-space limit (RLIMIT_AS)
+    - bounded stdout/stderr, an empty stdin, a scratch working directory
+      and a fresh namespace with its own copy of the builtins
+    - its own forked child, so changes to shared modules (`builtins`,
+      anything in `sys.modules`) never reach later runs; without fork the
+      builtins are restored after the run and a worker whose builtins
+      were changed is retired
+
+    Before its first snippet each worker is confined (see `_isolate`): a
+    minimal environment, none of the app's modules, its own network
+    namespace and a chroot into its scratch directory where the kernel
+    allows them, and as root an unprivileged `uid`. Snippets may not start
+    processes (RLIMIT_NPROC) and open at most OPEN_FILES files. What was
+    applied is reported in `stats()["isolation"]`; a container is still the
+    stronger boundary.
+
+    Workers are replaced after `max_runs` snippets, after hitting a memory
+    or CPU limit, and when they die; replacements are spawned in the
+    background.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_runs: int = 200,
+        cpu_seconds: float = 1.0,
+        memory_mb: int = 256,
+        wall_seconds: float = 1.0,
+        output_limit: int = 8 * 1024,
+        uid: Optional[int] = DEFAULT_SANDBOX_UID,
+        max_code_chars: int = 20000,
+        max_stdin_chars: int = 10000,
+        execute_endpoint: bool = False,
+        start_method: Optional[str] = None
+    ):
+        self.size = size
+        self.max_runs = max_runs
+        self.uid = uid
+        # Largest snippet and stdin POST /api/execute accepts, and whether it is served at all
+        self.max_code_chars = max_code_chars
+        self.max_stdin_chars = max_stdin_chars
+        self.execute_endpoint = execute_endpoint
+        self.limits = {
+            "cpu_seconds": cpu_seconds,
+            "memory_mb": memory_mb,
+            "wall_seconds": wall_seconds,
+            "output_limit": output_limit,
+        }
+        self.wall_seconds = wall_seconds
+        # Callers give up when no worker frees up within this time
+        self.queue_timeout = 4 * (wall_seconds + KILL_GRACE) + SPAWN_TIMEOUT
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = "forkserver" if "forkserver" in methods else "spawn"
+        self._ctx = multiprocessing.get_context(start_method)
+        self._idle: deque = deque()
+        # Callers waiting for a worker, served first come first served
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        # What the latest worker reported from `_isolate`
+        self.isolation: Optional[dict] = None
+
+        self.runs = 0
+        self.statuses: dict = {}
+        self.spawned = 0
+        self.spawn_failures = 0
+        self.spawn_ms_total = 0.0
+        self.spawn_ms_max = 0.0
+        self.recycled = 0
+        self.killed = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.busy = 0
+        self.queue_wait_ms_total = 0.0
+        self.queue_wait_ms_max = 0.0
+        self.exec_ms_total = 0.0
+        self._finished: deque = deque(maxlen=4096)
+
+    # --- lifecycle ---
+
+    def start(self):
+        """Spawn the workers in the background (returns immediately)"""
+        with self._lock:
+            if self._started or self.size <= 0:
+                return
+            self._started = True
+            self._closed = False
+        if self._ctx.get_start_method() == "forkserver":
+            self._ctx.set_forkserver_preload(_preload_modules())
+        for _ in range(self.size):
+            self._replace()
+
+    def warm(self, timeout: float = SPAWN_TIMEOUT) -> bool:
+        """Block until every worker is ready (for startup and benchmarks)"""
+        self.start()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if len(self._idle) + self.busy >= self.size:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._started = False
+            idle = list(self._idle)
+            self._idle.clear()
+            waiters = list(self._waiters)
+            self._waiters.clear()
+        for waiter in waiters:
+            # Wakes with no worker: the run reports "unavailable"
+            waiter.ready.set()
+        for worker in idle:
+            self._retire(worker)
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, self.limits, self.uid),
+            name="phychat-sandbox", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        if not parent_conn.poll(SPAWN_TIMEOUT):
+            process.kill()
+            raise RuntimeError("sandbox worker did not start")
+        hello = parent_conn.recv()
+        isolation = hello.get("isolation")
+        if isolation != self.isolation:
+            self.isolation = isolation
+            missing = [k for k in ("network", "filesystem") if not (isolation or {}).get(k)]
+            if missing:
+                print(f"WARNING: sandbox workers run without {' or '.join(missing)} isolation")
+        return _Worker(process, parent_conn, hello.get("workdir"))
+
+    def _replace(self):
+        """Add one worker to the pool from a background thread"""
+        def spawn():
+            attempt = 0
+            while True:
+                if self._closed:
+                    return
+                start = time.perf_counter()
+                try:
+                    worker = self._spawn()
+                except Exception as e:
+                    if self._closed:
+                        return
+                    with self._lock:
+                        self.spawn_failures += 1
+                    # Never give up: the pool would stay a worker short for good
+                    delay = min(SPAWN_RETRY_MAX, 0.5 * 2 ** attempt)
+                    print(f"WARNING: sandbox worker failed to start ({e}); retrying in {delay:g} s")
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                elapsed = (time.perf_counter() - start) * 1e3
+                with self._lock:
+                    self.spawned += 1
+                    self.spawn_ms_total += elapsed
+                    self.spawn_ms_max = max(self.spawn_ms_max, elapsed)
+                if self._closed:
+                    self._retire(worker)
+                else:
+                    self._checkin(worker)
+                return
+
+        threading.Thread(target=spawn, name="phychat-sandbox-spawn", daemon=True).start()
+
+    def _retire(self, worker: _Worker):
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        worker.process.join(timeout=0.5)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join(timeout=1)
+        worker.conn.close()
+        self._remove_workdir(worker)
+
+    def _kill(self, worker: _Worker):
+        worker.process.kill()
+        worker.process.join(timeout=1)
+        worker.conn.close()
+        self._remove_workdir(worker)
+        with self._lock:
+            self.killed += 1
+
+    @staticmethod
+    def _remove_workdir(worker: _Worker):
+        if worker.workdir:
+            shutil.rmtree(worker.workdir, ignore_errors=True)
+
+    def _checkout(self, timeout: float) -> Optional[_Worker]:
+        """
+        Take an idle worker, or wait in line for one
+
+        Workers are handed straight to the longest-waiting caller; with a
+        plain queue a caller that just finished would usually grab its
+        worker back first and starve the others.
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.popleft()
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+        if waiter.ready.wait(timeout):
+            return waiter.worker
+        with self._lock:
+            if waiter.worker is None:
+                self._waiters.remove(waiter)
+        # Handed a worker just as the wait timed out: still ours
+        return waiter.worker
+
+    def _checkin(self, worker: _Worker):
+        with self._lock:
+            if not self._waiters:
+                self._idle.append(worker)
+                return
+            waiter = self._waiters.popleft()
+            waiter.worker = worker
+        waiter.ready.set()
+
+    # --- execution ---
+
+    def run_sync(self, code: str, stdin: str = "") -> ExecutionResult:
+        """Run a snippet on a pooled worker (blocks until it finishes or is stopped)"""
+        if self._closed or self.size <= 0:
+            return ExecutionResult("unavailable", message="The sandbox is disabled")
+        self.start()
+
+        queued = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        worker = self._checkout(self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+        if worker is None:
+            return self._record(ExecutionResult("unavailable", message="No sandbox worker became free"))
+        waited = (time.perf_counter() - queued) * 1e3
+        with self._lock:
+            self.busy += 1
+            self.queue_wait_ms_total += waited
+            self.queue_wait_ms_max = max(self.queue_wait_ms_max, waited)
+
+        start = time.perf_counter()
+        tainted = False
+        try:
+            worker.conn.send((code, stdin))
+            if worker.conn.poll(self.wall_seconds + KILL_GRACE):
+                data = worker.conn.recv()
+                tainted = data.pop("tainted", False)
+                result = ExecutionResult(**data)
+            else:
+                # Not even the in-worker timer got through (e.g. stuck in C code)
+                self._kill(worker)
+                worker = None
+                result = ExecutionResult("timeout", message=f"Stopped after {self.wall_seconds:g} s (time limit)")
+        except Exception:
+            # Died, or answered with something that isn't a result: never reuse it
+            self._kill(worker)
+            worker = None
+            result = ExecutionResult("crashed", message="The program stopped the interpreter (e.g. os._exit or a hard crash)")
+        if not result.duration_ms:
+            result.duration_ms = round((time.perf_counter() - start) * 1e3, 3)
+
+        with self._lock:
+            self.busy -= 1
+        if worker is None:
+            self._replace()
+        else:
+            worker.runs += 1
+            if worker.runs >= self.max_runs or result.status in RECYCLE_STATUSES or tainted or self._closed:
+                with self._lock:
+                    self.recycled += 1
+                threading.Thread(target=self._retire, args=(worker,), daemon=True).start()
+                if not self._closed:
+                    self._replace()
+            else:
+                self._checkin(worker)
+        return self._record(result)
+
+    async def run(self, code: str, stdin: str = "") -> ExecutionResult:
+        """Non-blocking run: waits on the I/O thread pool while the worker executes"""
+        return await executors.run_io(self.run_sync, code, stdin)
+
+    def _record(self, result: ExecutionResult) -> ExecutionResult:
+        with self._lock:
+            self.runs += 1
+            self.statuses[result.status] = self.statuses.get(result.status, 0) + 1
+            self.exec_ms_total += result.duration_ms
+            self._finished.append(time.monotonic())
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            recent = sum(1 for t in self._finished if now - t <= 10.0)
+            return {
+                "enabled": self.size > 0,
+                "start_method": self._ctx.get_start_method(),
+                "workers": self.size,
+                "idle": len(self._idle),
+                "busy": self.busy,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "runs": self.runs,
+                "statuses": dict(self.statuses),
+                "runs_per_sec_10s": round(recent / 10.0, 2),
+                "avg_exec_ms": round(self.exec_ms_total / self.runs, 3) if self.runs else 0.0,
+                "avg_queue_wait_ms": round(self.queue_wait_ms_total / self.runs, 3) if self.runs else 0.0,
+                "max_queue_wait_ms": round(self.queue_wait_ms_max, 3),
+                "spawned": self.spawned,
+                "spawn_failures": self.spawn_failures,
+                "avg_spawn_ms": round(self.spawn_ms_total / self.spawned, 3) if self.spawned else 0.0,
+                "max_spawn_ms": round(self.spawn_ms_max, 3),
+                "recycled": self.recycled,
+                "killed": self.killed,
+                "limits": dict(self.limits, max_runs=self.max_runs),
+                "isolation": self.isolation,
+                "execute_endpoint": self.execute_endpoint,
+            }
+
+
+# Singleton instance (SANDBOX_WORKERS=0, the default, disables execution)
+sandbox = SandboxPool(
+    size=int(os.getenv("SANDBOX_WORKERS", 0)),
+    max_runs=int(os.getenv("SANDBOX_MAX_RUNS", 200)),
+    cpu_seconds=float(os.getenv("SANDBOX_CPU_SECONDS", 1)),
+    memory_mb=int(os.getenv("SANDBOX_MEMORY_MB", 256)),
+    wall_seconds=float(os.getenv("SANDBOX_WALL_SECONDS", 1)),
+    output_limit=int(os.getenv("SANDBOX_OUTPUT_LIMIT", 8192)),
+    uid=int(os.getenv("SANDBOX_UID", DEFAULT_SANDBOX_UID)),
+    max_code_chars=int(os.getenv("SANDBOX_MAX_CODE_CHARS", 20000)),
+    max_stdin_chars=int(os.getenv("SANDBOX_MAX_STDIN_CHARS", 10000)),
+    execute_endpoint=os.getenv("SANDBOX_EXECUTE_ENDPOINT", "false").lower() == "true"
+)
@@ -0,0 +1,345 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Priority classes, most urgent first
+PRIORITIES = ("chat", "recommend", "xai", "batch")
+
+DEFAULT_LIMITS = {"chat": 16, "recommend": 8, "xai": 4, "batch": 4}
+# Latency budget per class, queueing included (0 = no budget; the class is only bounded by the queue)
+DEFAULT_SLO_MS = {"chat": 2000, "recommend": 500, "xai": 5000, "batch": 0}
+
+# Weight of the latest request in each class's service-time average
+_EWMA_ALPHA = 0.2
+# Queue waits kept per class for the percentiles in stats()
+_WAIT_WINDOW = 1024
+
+
+class Overloaded(Exception):
+    """A request the scheduler turned away; the API answers 429 with Retry-After"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server busy ({reason}), retry after {math.ceil(retry_after)} s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class _Waiter:
+    __slots__ = ("priority", "future", "queued_at")
+
+    def __init__(self, priority: str, future: asyncio.Future):
+        self.priority = priority
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class _TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+
+class Slot:
+    """A granted place to run; `release` it when the work is done (idempotent)"""
+    __slots__ = ("_scheduler", "priority", "granted_at", "released")
+
+    def __init__(self, scheduler: "AdmissionScheduler", priority: str):
+        self._scheduler = scheduler
+        self.priority = priority
+        self.granted_at = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._scheduler._release(self)
+
+
+class AdmissionScheduler:
+    """
+    Admission control in front of the AI and recommendation services
+
+    Requests take a slot before they run. `capacity` slots are shared by
+    four priority classes (chat > recommend > xai > batch), each capped at
+    its own limit, so a bulk job can hold at most its class's slots and a
+    freed slot always goes to the most urgent waiter. Requests that find no
+    slot wait in one bounded queue (FIFO within a class).
+
+    A request is turned away (`Overloaded`, answered as 429 + Retry-After)
+    instead of queued when:
+    - its student's token bucket is empty (`student_rate` requests/s, bursts
+      of `student_burst`; chat only, keyed on the request's user_id)
+    - the predicted queue wait (the service time of the requests ahead of
+      it, from a moving average per class, spread over the class's slots)
+      plus its own service time would exceed its class's latency budget.
+      Waiters of a class held at its own limit aren't ahead of other
+      classes: they can't take the free slots
+    - the queue is full and holds nothing less urgent; otherwise the newest
+      waiter of the least urgent class is shed to make room
+    A waiter still queued when its class's budget runs out is shed as well.
+
+    Runs on the event loop (no locks); `capacity=0` admits everything.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 16,
+        limits: Optional[Dict[str, int]] = None,
+        slo_ms: Optional[Dict[str, float]] = None,
+        queue_size: int = 256,
+        student_rate: float = 1.0,
+        student_burst: float = 10.0,
+        max_students: int = 10000
+    ):
+        self.capacity = capacity
+        self.limits = {p: min(capacity, (limits or {}).get(p, DEFAULT_LIMITS[p])) for p in PRIORITIES}
+        self.slo = {p: (slo_ms or {}).get(p, DEFAULT_SLO_MS[p]) / 1e3 for p in PRIORITIES}
+        self.queue_size = queue_size
+        self.student_rate = student_rate
+        self.student_burst = max(1.0, student_burst)
+        self.max_students = max_students
+
+        self._running = {p: 0 for p in PRIORITIES}
+        self._queues: Dict[str, Deque[_Waiter]] = {p: deque() for p in PRIORITIES}
+        self._buckets: "OrderedDict[str, _TokenBucket]" = OrderedDict()
+        # Seconds a slot of each class is held, on average
+        self._service = {p: 0.0 for p in PRIORITIES}
+
+        self.admitted = {p: 0 for p in PRIORITIES}
+        self.queued = {p: 0 for p in PRIORITIES}
+        self.shed = {p: {"rate_limited": 0, "slo": 0, "queue_full": 0, "evicted": 0, "timeout": 0} for p in PRIORITIES}
+        self._waits = {p: deque(maxlen=_WAIT_WINDOW) for p in PRIORITIES}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    @asynccontextmanager
+    async def admit(self, priority: str, user_id: Optional[str] = None):
+        """Hold a slot of class `priority` for the body of the `async with`"""
+        slot = await self.acquire(priority, user_id)
+        try:
+            yield slot
+        finally:
+            if slot is not None:
+                slot.release()
+
+    async def acquire(self, priority: str, user_id: Optional[str] = None) -> Optional[Slot]:
+        """
+        Wait for a slot of class `priority` (None when the scheduler is off)
+
+        Raises Overloaded when the request is turned away or shed from the
+        queue. For work that outlives the handler (a streamed response),
+        release the slot when the stream ends.
+        """
+        if not self.enabled:
+            return None
+        if priority not in self.limits:
+            raise ValueError(f"Unknown priority class {priority!r}")
+        if user_id is not None and priority == "chat":
+            self._take_token(priority, user_id)
+
+        if self._can_start(priority) and not self._queued_ahead(priority):
+            return self._grant(priority, 0.0)
+
+        wait = self._predicted_wait(priority)
+        budget = self.slo[priority]
+        if budget > 0 and wait + self._service[priority] > budget:
+            self.shed[priority]["slo"] += 1
+            raise Overloaded("latency budget", wait)
+        if self.waiting >= self.queue_size and not self._evict_below(priority):
+            self.shed[priority]["queue_full"] += 1
+            raise Overloaded("queue full", max(wait, self._service[priority]))
+
+        waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+        self._queues[priority].append(waiter)
+        self.queued[priority] += 1
+        try:
+            if budget > 0:
+                return await asyncio.wait_for(asyncio.shield(waiter.future), budget - self._service[priority])
+            return await waiter.future
+        except asyncio.TimeoutError:
+            self.shed[priority]["timeout"] += 1
+            self._abandon(waiter)
+            raise Overloaded("latency budget", self._predicted_wait(priority))
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    # --- admission ---
+
+    def _take_token(self, priority: str, user_id: str):
+        if self.student_rate <= 0:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = _TokenBucket(self.student_burst)
+            if len(self._buckets) > self.max_students:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket.tokens = min(self.student_burst, bucket.tokens + (now - bucket.updated) * self.student_rate)
+        bucket.updated = now
+        if bucket.tokens < 1.0:
+            self.shed[priority]["rate_limited"] += 1
+            raise Overloaded("rate limited", (1.0 - bucket.tokens) / self.student_rate)
+        bucket.tokens -= 1.0
+
+    def _can_start(self, priority: str) -> bool:
+        return self._running[priority] < self.limits[priority] and self.running < self.capacity
+
+    def _queued_ahead(self, priority: str) -> int:
+        """Waiters that would be served before a new request of this class"""
+        count = 0
+        for p in PRIORITIES:
+            if p == priority:
+                return count + len(self._queues[p])
+            if self._running[p] < self.limits[p]:
+                # A class held at its own limit can't take a free slot, so its waiters aren't ahead
+                count += len(self._queues[p])
+        return count
+
+    def _predicted_wait(self, priority: str) -> float:
+        """Seconds until a new request of this class would get a slot"""
+        slots = max(1, self.limits[priority])
+        work = 0.0
+        for p in PRIORITIES:
+            if p == priority:
+                work += len(self._queues[p]) * self._service[p]
+                break
+            if self._running[p] < self.limits[p]:
+                work += len(self._queues[p]) * self._service[p]
+        if not self._can_start(priority):
+            # Every usable slot is held: the next one frees in about a service time per slot
+            work += self._service[priority]
+        return work / slots
+
+    def _evict_below(self, priority: str) -> bool:
+        """Shed the newest waiter of the least urgent class below `priority`; False if there is none"""
+        rank = PRIORITIES.index(priority)
+        for p in reversed(PRIORITIES[rank + 1:]):
+            queue = self._queues[p]
+            if queue:
+                waiter = queue.pop()
+                self.shed[p]["evicted"] += 1
+                if not waiter.future.done():
+                    waiter.future.set_exception(Overloaded("evicted", self._predicted_wait(p)))
+                self._dispatch()
+                return True
+        return False
+
+    # --- slots ---
+
+    def _grant(self, priority: str, waited: float) -> Slot:
+        self._running[priority] += 1
+        self.admitted[priority] += 1
+        self._waits[priority].append(waited)
+        return Slot(self, priority)
+
+    def _release(self, slot: Slot):
+        self._running[slot.priority] -= 1
+        held = time.monotonic() - slot.granted_at
+        previous = self._service[slot.priority]
+        self._service[slot.priority] = held if previous == 0.0 else previous + _EWMA_ALPHA * (held - previous)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to the most urgent waiters"""
+        now = time.monotonic()
+        for p in PRIORITIES:
+            queue = self._queues[p]
+            while queue and self._can_start(p):
+                waiter = queue.popleft()
+                if waiter.future.done():
+                    continue  # Timed out or cancelled; already counted
+                waiter.future.set_result(self._grant(p, now - waiter.queued_at))
+            if self.running >= self.capacity:
+                return
+
+    def _abandon(self, waiter: _Waiter):
+        """A waiter gave up: drop it from the queue, or give back the slot it was just granted"""
+        try:
+            self._queues[waiter.priority].remove(waiter)
+        except ValueError:
+            pass
+        if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+            waiter.future.result().release()  # Hands the slot on
+        else:
+            waiter.future.cancel()
+            # Waiters it was holding back may be able to start now
+            self._dispatch()
+
+    def stats(self) -> dict:
+        classes = {}
+        for p in PRIORITIES:
+            waits = sorted(self._waits[p])
+            shed = self.shed[p]
+            classes[p] = {
+                "limit": self.limits[p],
+                "slo_ms": round(self.slo[p] * 1e3),
+                "running": self._running[p],
+                "waiting": len(self._queues[p]),
+                "admitted": self.admitted[p],
+                "queued": self.queued[p],
+                "shed": sum(shed.values()),
+                **shed,
+                "service_ms": round(self._service[p] * 1e3, 3),
+                "wait_p50_ms": round(waits[len(waits) // 2] * 1e3, 3) if waits else 0.0,
+                "wait_p99_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1e3, 3) if waits else 0.0,
+            }
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "running": self.running,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "student_rate": self.student_rate,
+            "student_burst": self.student_burst,
+            "students": len(self._buckets),
+            "classes": classes,
+        }
+
+
+def _class_setting(name: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    """Per-class values from e.g. SCHED_LIMITS=chat:16,recommend:8 (unlisted classes keep their default)"""
+    values = dict(defaults)
+    for item in os.getenv(name, "").split(","):
+        if ":" in item:
+            key, value = item.split(":", 1)
+            if key.strip() in values:
+                values[key.strip()] = float(value)
+    return values
+
+
+# Singleton instance
+scheduler = AdmissionScheduler(
+    capacity=int(os.getenv("SCHED_CAPACITY", 16)),
+    limits={p: int(v) for p, v in _class_setting("SCHED_LIMITS", DEFAULT_LIMITS).items()},
+    slo_ms=_class_setting("SCHED_SLO_MS", DEFAULT_SLO_MS),
+    queue_size=int(os.getenv("SCHED_QUEUE_SIZE", 256)),
+    student_rate=float(os.getenv("SCHED_STUDENT_RATE", 1.0)),
+    student_burst=float(os.getenv("SCHED_STUDENT_BURST", 10)),
+    max_students=int(os.getenv("SCHED_MAX_STUDENTS", 10000))
+)
@@ -0,0 +1,273 @@
+import hashlib
+import mmap
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so state stays per process
+    fcntl = None
+
+SHARED_STATE_SUPPORTED = fcntl is not None
+
+_MAGIC = 0x3130544154535950  # b"PYSTAT01"
+# Header words: magic, layout hash, version, active slot
+_MAGIC_WORD, _LAYOUT_WORD, _VERSION_WORD, _ACTIVE_WORD = range(4)
+_HEADER_BYTES = 64
+_SLOT_HEADER_BYTES = 64
+
+
+class FileLock:
+    """
+    Re-entrant lock shared by threads and processes (flock on a lock file)
+
+    flock excludes other processes; the RLock excludes other threads of
+    this one, which share the file descriptor and so the flock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+class SharedSlots:
+    """
+    Named float64 arrays in a memory-mapped file, shared by every worker process
+
+    The file holds two slots with the same layout. Writers (holding `lock`)
+    fill the inactive slot and then flip the header's active index and bump
+    its version, so a reader always finds a complete state in the active
+    slot and maps it without copying. Each slot has a generation counter
+    that is odd while it is being written: a reader keeps the generation it
+    saw (`read`) and checks it afterwards (`unchanged`), and redoes its work
+    in the rare case the slot was rewritten under it (two publishes while it
+    was reading).
+
+    The file outlives the workers, so a restarted worker picks up the last
+    published state at once; `flush` (every `snapshot_seconds` of publishes)
+    writes it back to disk. A file with a different layout is replaced with
+    the `initial` arrays.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        initial: Callable[[], Dict[str, np.ndarray]],
+        snapshot_seconds: float = 30.0
+    ):
+        self.path = path
+        self.snapshot_seconds = snapshot_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = FileLock(path + ".lock")
+
+        arrays = initial()
+        self._names = list(arrays)
+        self._shapes = {name: arrays[name].shape for name in self._names}
+        layout = repr([(name, self._shapes[name]) for name in self._names]).encode()
+        self._layout = int.from_bytes(hashlib.blake2b(layout, digest_size=8).digest(), "little") >> 1
+        self._slot_bytes = _SLOT_HEADER_BYTES + sum(arrays[n].size * 8 for n in self._names)
+        size = _HEADER_BYTES + 2 * self._slot_bytes
+
+        with self.lock:
+            self.created = not self._valid(size)
+            if self.created:
+                self._create(size, arrays)
+            fd = os.open(path, os.O_RDWR)
+            try:
+                self._mm = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+
+        self._header = np.ndarray((4,), dtype=np.uint64, buffer=self._mm, offset=0)
+        self._generations = [
+            np.ndarray((1,), dtype=np.uint64, buffer=self._mm, offset=self._slot_offset(slot)) for slot in (0, 1)
+        ]
+        self._views = [self._slot_views(slot) for slot in (0, 1)]
+        self._last_flush = time.monotonic()
+        self.publishes = 0
+        self.retries = 0
+
+    def _valid(self, size: int) -> bool:
+        try:
+            if os.path.getsize(self.path) != size:
+                return False
+            with open(self.path, "rb") as f:
+                header = np.frombuffer(f.read(32), dtype=np.uint64)
+        except OSError:
+            return False
+        return int(header[_MAGIC_WORD]) == _MAGIC and int(header[_LAYOUT_WORD]) == self._layout
+
+    def _create(self, size: int, arrays: Dict[str, np.ndarray]):
+        # Caller holds the lock; written aside and renamed so no reader sees a partial file
+        buffer = bytearray(size)
+        header = np.ndarray((4,), dtype=np.uint64, buffer=buffer, offset=0)
+        header[:] = (_MAGIC, self._layout, 0, 0)
+        for slot in (0, 1):
+            offset = self._slot_offset(slot) + _SLOT_HEADER_BYTES
+            for name in self._names:
+                view = np.ndarray(self._shapes[name], dtype=np.float64, buffer=buffer, offset=offset)
+                view[...] = arrays[name]
+                offset += view.nbytes
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(buffer)
+        os.replace(tmp, self.path)
+
+    def _slot_offset(self, slot: int) -> int:
+        return _HEADER_BYTES + slot * self._slot_bytes
+
+    def _slot_views(self, slot: int) -> Dict[str, np.ndarray]:
+        views = {}
+        offset = self._slot_offset(slot) + _SLOT_HEADER_BYTES
+        for name in self._names:
+            views[name] = np.ndarray(self._shapes[name], dtype=np.float64, buffer=self._mm, offset=offset)
+            offset += views[name].nbytes
+        return views
+
+    # --- readers ---
+
+    def read(self) -> Tuple[Dict[str, np.ndarray], tuple]:
+        """Zero-copy views of the current state, and a token for `unchanged`"""
+        while True:
+            slot = int(self._header[_ACTIVE_WORD])
+            generation = int(self._generations[slot][0])
+            if generation % 2 == 0:
+                return self._views[slot], (slot, generation)
+            self.retries += 1
+
+    def unchanged(self, token: tuple) -> bool:
+        """True when the slot read with `token` was not rewritten since"""
+        slot, generation = token
+        if int(self._generations[slot][0]) == generation:
+            return True
+        self.retries += 1
+        return False
+
+    @property
+    def version(self) -> int:
+        return int(self._header[_VERSION_WORD])
+
+    # --- writers (hold `lock`) ---
+
+    def latest(self) -> Dict[str, np.ndarray]:
+        """The current state; stable while the caller holds `lock`"""
+        return self._views[int(self._header[_ACTIVE_WORD])]
+
+    def publish(self, arrays: Dict[str, np.ndarray]):
+        """Write a new state into the inactive slot and make it current"""
+        target = 1 - int(self._header[_ACTIVE_WORD])
+        generation = self._generations[target]
+        generation[0] += 1
+        for name, view in self._views[target].items():
+            view[...] = arrays[name]
+        generation[0] += 1
+        self._header[_ACTIVE_WORD] = target
+        self._header[_VERSION_WORD] += 1
+        self.publishes += 1
+        if time.monotonic() - self._last_flush >= self.snapshot_seconds:
+            self.flush()
+
+    def flush(self):
+        """Write the mapped state back to disk (the restart snapshot)"""
+        self._mm.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "bytes": len(self._mm),
+            "publishes": self.publishes,
+            "read_retries": self.retries,
+        }
+
+
+class SnapshotStore:
+    """
+    Read-only arrays published once and memory-mapped by every worker
+
+    `get(key, build)` returns the arrays stored under `key`; the first
+    worker to ask builds them and writes each as a .npy file (written aside
+    and renamed into place, so readers never see a partial one), and every
+    worker maps the same files read-only, so the pages are in memory once.
+    Only the newest `keep` keys are kept on disk.
+    """
+
+    def __init__(self, directory: str, keep: int = 4):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+        self.lock = FileLock(os.path.join(directory, "snapshots.lock"))
+        self.built = 0
+        self.mapped = 0
+
+    def _path(self, key: str, name: str) -> str:
+        return os.path.join(self.directory, f"{key}.{name}.npy")
+
+    def _load(self, key: str, names) -> Optional[Dict[str, np.ndarray]]:
+        try:
+            arrays = {name: np.load(self._path(key, name), mmap_mode="r") for name in names}
+        except (OSError, ValueError):
+            return None
+        self.mapped += 1
+        return arrays
+
+    def get(self, key: str, names: Tuple[str, ...], build: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        arrays = self._load(key, names)
+        if arrays is not None:
+            return arrays
+        with self.lock:
+            arrays = self._load(key, names)  # Another worker may have built it meanwhile
+            if arrays is not None:
+                return arrays
+            for name, array in build().items():
+                tmp = f"{self._path(key, name)}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp, self._path(key, name))
+            self.built += 1
+            self._prune(key)
+        return self._load(key, names)
+
+    def _prune(self, current: str):
+        # Caller holds the lock
+        keys = {}
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".npy"):
+                key = filename.split(".", 1)[0]
+                path = os.path.join(self.directory, filename)
+                keys[key] = max(keys.get(key, 0.0), os.path.getmtime(path))
+        stale = sorted((k for k in keys if k != current), key=keys.get, reverse=True)[self.keep - 1:]
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".npy") and filename.split(".", 1)[0] in stale:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one computation
+
+    The first caller for a key (the leader) starts the computation as a
+    task; callers that arrive while it is running await the same task and
+    get the same result (or exception). Nothing is kept after it finishes,
+    so this complements a cache rather than replacing one: the cache serves
+    requests that arrive after an answer exists, single-flight serves the
+    burst that arrives before it does.
+
+    Waiters await the task through `asyncio.shield`, so a client that
+    disconnects (its request is cancelled) does not cancel the work the
+    other waiters depend on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # key -> (event loop, task, waiters)
+        self._flights: Dict[Hashable, list] = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.largest_group = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Result of `fn()`, shared with concurrent callers using the same key"""
+        loop = asyncio.get_running_loop()
+        flight = self._flights.get(key)
+        if flight is not None and flight[0] is loop:
+            flight[2] += 1
+            self.coalesced += 1
+            self.largest_group = max(self.largest_group, flight[2])
+        else:
+            # A flight left behind by a closed event loop (tests, benchmarks) is replaced
+            task = loop.create_task(fn())
+            flight = [loop, task, 1]
+            self._flights[key] = flight
+            self.leaders += 1
+            task.add_done_callback(lambda t, key=key, flight=flight: self._finish(key, flight, t))
+        return await asyncio.shield(flight[1])
+
+    def _finish(self, key: Hashable, flight: list, task: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception retrieved even if every waiter was cancelled
+        if task.cancelled() or task.exception() is not None:
+            self.errors += 1
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict:
+        calls = self.leaders + self.coalesced
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "computations": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesce_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+            "largest_group": self.largest_group,
+            "errors": self.errors,
+        }
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence
+
+
+class Startup:
+    """
+    Readiness of the components a worker needs before it should take traffic
+
+    Slow start-up work (model load, warm-up, sandbox spawn, catalog load)
+    runs on background threads via `launch`, so the server answers
+    `/api/health` straight away; `/api/ready` reports ready only once every
+    launched component has finished. A component can wait for others
+    (`after`), e.g. the warm-up waits for the model. A component that raises
+    is marked failed, as is anything waiting on it, and the worker never
+    reports ready.
+
+    A component's function may return a short detail string (what was
+    loaded, how many samples were warmed) that is shown in `stats()`.
+    """
+
+    def __init__(self):
+        self._components: "OrderedDict[str, dict]" = OrderedDict()
+        self._done: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.started_at = time.time()
+
+    def launch(self, name: str, fn: Callable[[], Optional[str]], after: Sequence[str] = ()) -> threading.Thread:
+        """Run `fn` on a background thread once the `after` components are done"""
+        with self._lock:
+            self._components[name] = {"state": "pending", "seconds": None, "detail": None, "error": None}
+            self._done[name] = threading.Event()
+        thread = threading.Thread(target=self._run, args=(name, fn, tuple(after)), name=f"startup-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, name: str, fn: Callable[[], Optional[str]], after: tuple):
+        try:
+            for dependency in after:
+                self._done[dependency].wait()
+                if self._components[dependency]["state"] != "ready":
+                    raise RuntimeError(f"{dependency} did not start")
+            self._update(name, state="loading")
+            start = time.perf_counter()
+            detail = fn()
+            self._update(name, state="ready", seconds=round(time.perf_counter() - start, 3), detail=detail)
+        except Exception as e:
+            self._update(name, state="failed", error=str(e) or type(e).__name__)
+            print(f"WARNING: startup step {name} failed: {e}")
+        finally:
+            self._done[name].set()
+
+    def _update(self, name: str, **fields):
+        with self._lock:
+            self._components[name].update(fields)
+            if fields.get("state") in ("ready", "failed"):
+                self._components[name]["ready_after_s"] = round(time.perf_counter() - self._start, 3)
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(c["state"] == "ready" for c in self._components.values())
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every launched component has finished (for scripts and benchmarks)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in list(self._done.values()):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not event.wait(remaining):
+                return False
+        return self.ready
+
+    def stats(self) -> dict:
+        with self._lock:
+            components = {name: dict(c) for name, c in self._components.items()}
+        return {
+            "ready": all(c["state"] == "ready" for c in components.values()),
+            "uptime_s": round(time.perf_counter() - self._start, 3),
+            "components": components,
+        }
+
+
+# Singleton instance
+startup = Startup()
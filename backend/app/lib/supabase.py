@@ -44,21 +44,39 @@ class SupabaseClient:
         # Mock implementation
         return []
     
+    def get_progress_for_students(self, student_ids: list):
+        """Get progress records for many students, keyed by student ID"""
+        # Mock implementation
+        return {student_id: [] for student_id in student_ids}
+    
     def get_conversation_history(self, conversation_id: str, limit: int = 10):
         """Get recent messages from a conversation"""
         # Mock implementation
         return []
     
+    def get_conversation_histories(self, conversation_ids: list, limit: int = 10):
+        """Get recent messages for many conversations, keyed by conversation ID"""
+        # Mock implementation
+        return {conversation_id: [] for conversation_id in conversation_ids}
+    
     def save_message(self, conversation_id: str, role: str, content: str, code_snippet: str = None):
         """Save a message to the database"""
         # Mock implementation - just print for debugging
         print(f"Mock save: {role} message to conversation {conversation_id}")
         return {"id": "mock-message-id"}
     
+    def save_messages(self, messages: list):
+        """Bulk insert messages (one round-trip for the whole batch)"""
+        # Mock implementation - just print for debugging
+        print(f"Mock bulk save: {len(messages)} messages")
+        return [{"id": "mock-message-id"} for _ in messages]
+    
     def get_all_challenges(self):
         """Get all available challenges"""
-        # Mock implementation
-        return [
+        # Mock implementation (test suites are shared with the SQLite seed data)
+        from app.lib.database import SEED_TESTS
+        
+        challenges = [
             {
                 "id": "1",
                 "title": "Loop Variable Scope Error",
@@ -102,6 +120,9 @@ class SupabaseClient:
                 "error_type": "LogicError"
             }
         ]
+        for challenge in challenges:
+            challenge["tests"] = SEED_TESTS[challenge["id"]]
+        return challenges
     
     def update_progress(self, student_id: str, challenge_id: str, status: str):
         """Update student progress on a challenge"""
@@ -0,0 +1,329 @@
+import bisect
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Request and span latency buckets (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Family:
+    """One metric name with a value per label combination"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts (+Inf last), then sum
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(entry[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class RequestTrace:
+    """Span breakdown of one sampled request (offsets in ms from the request start)"""
+
+    __slots__ = ("method", "route", "path", "started_at", "start", "spans", "status", "duration_ms")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.route = None
+        self.path = path
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.status = 0
+        self.duration_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "route": self.route,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "spans": [
+                {"name": name, "offset_ms": round(offset * 1e3, 3), "duration_ms": round(duration * 1e3, 3)}
+                for name, offset, duration in sorted(self.spans, key=lambda s: s[1])
+            ],
+        }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("phychat_trace", default=None)
+
+
+class Telemetry:
+    """
+    Request metrics, in-request spans and an opt-in slow-request profiler
+
+    Every HTTP request updates per-route latency histograms, status-code
+    counters and an in-flight gauge (`TelemetryMiddleware`; in-flight is
+    per method, as the route is only known once the request is routed). Code inside a
+    request wraps its phases in `telemetry.span(name)` (DB calls, sandbox,
+    analysis, inference, XAI, ...); span durations always feed a histogram,
+    and for profiled requests they are also kept on the request's trace.
+
+    Profiling is off unless PROFILE_SLOWEST > 0: then a PROFILE_SAMPLE_RATE
+    fraction of requests is traced and the slowest N traces are kept for
+    `GET /api/profile/slowest`. `render()` produces the Prometheus text
+    format served at `/metrics`, plus any registered collectors.
+    """
+
+    def __init__(self, profile_slowest: int = 0, sample_rate: float = 1.0):
+        self.profile_slowest = profile_slowest
+        self.sample_rate = sample_rate
+
+        self.requests = Counter(
+            "phychat_http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+        )
+        self.latency = Histogram(
+            "phychat_http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route")
+        )
+        self.in_flight = Gauge(
+            "phychat_http_requests_in_flight", "HTTP requests currently being served", ("method",)
+        )
+        self.spans = Histogram(
+            "phychat_span_duration_seconds", "Time spent in each phase of request handling", ("span",)
+        )
+        self._families = [self.requests, self.latency, self.in_flight, self.spans]
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+        self._slowest: List[tuple] = []  # min-heap of (duration_ms, seq, trace)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.traced = 0
+
+    # --- spans ---
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a phase of the current request (also usable outside requests)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.spans.observe((name,), end - start)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.spans.append((name, start - trace.start, end - start))
+
+    # --- requests ---
+
+    def begin_request(self, method: str, path: str) -> Optional[RequestTrace]:
+        """Count the request in flight; returns a trace when it is sampled for profiling"""
+        self.in_flight.inc((method,))
+        if self.profile_slowest > 0 and random.random() < self.sample_rate:
+            return RequestTrace(method, path)
+        return None
+
+    def end_request(self, method: str, route: str, status: int, seconds: float, trace: Optional[RequestTrace]):
+        self.in_flight.dec((method,))
+        self.requests.inc((method, route, str(status)))
+        self.latency.observe((method, route), seconds)
+        if trace is None:
+            return
+        trace.route = route
+        trace.status = status
+        trace.duration_ms = seconds * 1e3
+        with self._lock:
+            self.traced += 1
+            entry = (trace.duration_ms, next(self._seq), trace)
+            if len(self._slowest) < self.profile_slowest:
+                heapq.heappush(self._slowest, entry)
+            elif entry[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self, reset: bool = False) -> dict:
+        """The slowest profiled requests, slowest first, with their span breakdown"""
+        with self._lock:
+            entries = sorted(self._slowest, key=lambda e: e[0], reverse=True)
+            traced = self.traced
+            if reset:
+                self._slowest = []
+        return {
+            "enabled": self.profile_slowest > 0,
+            "keep": self.profile_slowest,
+            "sample_rate": self.sample_rate,
+            "traced": traced,
+            "requests": [trace.to_dict() for _, _, trace in entries],
+        }
+
+    # --- exposition ---
+
+    def register_collector(self, collector: Callable[[], Iterable[tuple]]):
+        """
+        Add metrics read at scrape time
+
+        `collector()` yields `(name, type, help, value)` tuples, e.g. cache
+        hit counters taken from a service's `stats()`.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                continue  # A broken collector must not break the scrape
+            for name, kind, help, value in samples:
+                if value is None:
+                    continue
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _route_of(scope) -> str:
+    """
+    Template of the route that served the request (e.g. /api/recommend/{user_id})
+
+    Labels use templates, not raw paths, so they stay low-cardinality. The
+    router leaves the matched route in the scope; routes from an included
+    router carry their path without the router's prefix, which is recovered
+    from the request path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope["path"]
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    for i, char in enumerate(path):
+        if char == "/" and i > 0 and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware recording every HTTP request in `telemetry`
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so streamed
+    responses (SSE, NDJSON) are timed until their last byte and are not
+    buffered.
+    """
+
+    def __init__(self, app, telemetry: Telemetry):
+        self.app = app
+        self.telemetry = telemetry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        trace = self.telemetry.begin_request(method, scope["path"])
+        # Spans anywhere in this request (and tasks it starts) land on the trace
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_trace.reset(token)
+            self.telemetry.end_request(method, _route_of(scope), status[0], time.perf_counter() - start, trace)
+
+
+# Singleton instance
+telemetry = Telemetry(
+    profile_slowest=int(os.getenv("PROFILE_SLOWEST", 0)),
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 1.0))
+)
@@ -9,6 +9,16 @@ class ChatRequest(BaseModel):
     code_snippet: Optional[str] = Field(None, description="Python code to debug")
     conversation_id: Optional[str] = Field(None, description="Conversation ID for context")
 
+class ExecutionInfo(BaseModel):
+    """What happened when the snippet was actually run in the sandbox"""
+    status: str = Field(..., description="ok, error, timeout, cpu_limit, memory_limit, crashed or unavailable")
+    error_type: Optional[str] = Field(None, description="Exception raised, e.g. IndexError")
+    line: Optional[int] = Field(None, description="Student line that was executing when it stopped")
+    message: Optional[str] = Field(None, description="Exception message or limit that was hit")
+    traceback: Optional[str] = Field(None, description="Traceback restricted to the student's code")
+    stdout: str = Field("", description="Captured output (truncated)")
+    duration_ms: float = Field(0.0, description="Execution time in the worker")
+
 class ChatResponse(BaseModel):
     """Response model for chat endpoint"""
     reply: str = Field(..., description="AI tutor's response")
@@ -16,12 +26,72 @@ class ChatResponse(BaseModel):
     confidence_score: float = Field(..., description="Model confidence (0-1)")
     code_suggestion: Optional[str] = Field(None, description="Corrected code if applicable")
     error_type: Optional[str] = Field(None, description="Type of bug detected")
+    matched: bool = Field(False, description="A bug was actually identified (analyzer rule or failed sandbox run), not the default guess")
     learning_objective: Optional[str] = Field(None, description="What the student should learn")
+    execution: Optional[ExecutionInfo] = Field(None, description="Sandbox run of the snippet, when enabled")
+
+class ExecuteRequest(BaseModel):
+    """Request model for running a snippet in the sandbox"""
+    user_id: Optional[str] = Field(None, description="Student ID (for the per-student rate limit)")
+    code_snippet: str = Field(..., description="Python code to run")
+    stdin: str = Field("", description="Text available to input()")
+
+class SubmissionRequest(BaseModel):
+    """Request model for submitting a fix to a challenge"""
+    user_id: str = Field(..., description="Student ID")
+    code_snippet: str = Field(..., description="The student's fixed code")
+    time_spent: Optional[int] = Field(None, description="Seconds spent; measured server-side when omitted")
+
+class TestResult(BaseModel):
+    """Outcome of one test case"""
+    name: str
+    status: str = Field(..., description="passed, failed or skipped (after an earlier failure)")
+    message: Optional[str] = Field(None, description="Why the test failed")
+    duration_ms: float = 0.0
+
+class GradeResponse(BaseModel):
+    """Result of grading one submission against the challenge's test suite"""
+    challenge_id: Optional[str] = None
+    status: str = Field(..., description="passed, failed, or error (no test suite / sandbox unavailable)")
+    passed: bool
+    passed_count: int
+    total: int
+    tests: List[TestResult] = []
+    message: Optional[str] = None
+    duration_ms: float = 0.0
+    cached: bool = Field(False, description="Same (normalized) submission was graded before")
+    time_spent: Optional[int] = Field(None, description="Seconds recorded for this attempt")
+    recorded: Optional[bool] = Field(None, description="Regrade with `record`: whether the outcome was stored in the student's progress")
+    record_error: Optional[str] = Field(None, description="Why the outcome couldn't be stored")
+
+class RegradeSubmission(BaseModel):
+    """One submission in a batch regrade"""
+    user_id: str
+    challenge_id: str
+    code_snippet: str
+
+class RegradeRequest(BaseModel):
+    """Request model for grading many submissions in one call"""
+    submissions: List[RegradeSubmission]
+    record: bool = Field(False, description="Also store each outcome in the student's progress (without training the recommender)")
+
+class RegradeResponse(BaseModel):
+    """Per-submission results (in request order) and batch counters"""
+    results: List[GradeResponse]
+    graded: int = Field(..., description="Distinct submissions graded or served from cache (errors excluded)")
+    duplicates: int = Field(..., description="Submissions identical to another one in the batch")
+    passed: int
+    duration_ms: float
+    submissions_per_sec: float
 
 class RecommendationRequest(BaseModel):
     """Request model for RL recommendation"""
     user_id: str = Field(..., description="Student ID")
 
+class ProgressWarmRequest(BaseModel):
+    """Request model for warming the progress cache at the start of a class session"""
+    user_ids: List[str] = Field(..., description="Student IDs in the session")
+
 class RecommendationResponse(BaseModel):
     """Response model for RL recommendation"""
     challenge_id: str = Field(..., description="Recommended challenge ID")
@@ -35,6 +105,7 @@ class XAIRequest(BaseModel):
     """Request model for XAI explanation"""
     code_snippet: str = Field(..., description="Code to analyze")
     model_prediction: str = Field(..., description="What the model predicted")
+    conversation_id: Optional[str] = Field(None, description="Conversation ID for incremental analysis")
 
 class XAIResponse(BaseModel):
     """Response model for XAI explanation"""
@@ -1,7 +1,91 @@
+import asyncio
 import os
-import random
-from typing import Optional
+import re
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, List, Optional, Tuple
 from app.models.schemas import ChatResponse
+from app.services.code_analyzer import CodeAnalysis, analyze_code
+from app.services.incremental_analyzer import incremental_analyzer
+from app.services.conversation_context import context_store, render_turn
+from app.services.response_cache import response_cache, cache_key
+from app.services.inference_engine import build_engine
+from app.services.xai_explainer import xai_explainer
+from app.lib.database import db, SEED_CHALLENGES
+from app.lib.executors import executors
+from app.lib.sandbox import sandbox
+from app.lib.single_flight import SingleFlight
+from app.lib.telemetry import telemetry
+
+try:
+    from app.services.session_index import session_index
+except ImportError:  # numpy not installed: every turn is answered by the model
+    session_index = None
+
+# Max model tokens buffered ahead of a slow SSE client
+STREAM_BUFFER_TOKENS = 32
+_STREAM_END = object()
+
+# Tutor feedback per detected error type (specialised by _specific_feedback)
+RESPONSE_TEMPLATES = {
+    "IndexError": {
+        "reply": "I can see you have an **index error** in your code. This happens when you try to access a list position that doesn't exist.",
+        "explanation": "The loop is trying to access `numbers[3]`, but your list only has 3 items (indices 0, 1, 2). Your loop should use `range(len(numbers))` instead of `range(4)`.",
+        "learning_objective": "Learn to match loop ranges with list lengths",
+        "code_suggestion": "for i in range(len(numbers)):\n    print(numbers[i])"
+    },
+    "NameError": {
+        "reply": "You're trying to use a variable **outside its scope**. Variables defined inside loops only exist within that loop.",
+        "explanation": "The variable `i` is created inside the for-loop and is destroyed when the loop ends. If you need it outside, save it to a variable before the loop ends.",
+        "learning_objective": "Understand variable scope and lifecycle",
+        "code_suggestion": "last_value = 0\nfor i in range(5):\n    last_value = i\n    print(i)\nprint(last_value)"
+    },
+    "SyntaxError": {
+        "reply": "There's a **syntax error** in your code. Python requires a colon `:` after `if`, `for`, `while`, and `def` statements.",
+        "explanation": "Line 2 is missing a colon. Python uses colons to indicate the start of an indented block.",
+        "learning_objective": "Master Python's syntax rules for control structures",
+        "code_suggestion": "if x > 5:\n    print('Greater')"
+    },
+    "TypeError": {
+        "reply": "You have a **type mismatch** error. You can't directly add a string and a number in Python.",
+        "explanation": "The variable `age` is a string ('25'), but you're trying to add a number (5) to it. Use `int(age)` to convert it first.",
+        "learning_objective": "Learn type conversion and when to use it",
+        "code_suggestion": "age = int('25')\nfuture_age = age + years_ahead"
+    },
+    "AttributeError": {
+        "reply": "You're calling a **method that doesn't exist** on this type of object.",
+        "explanation": "Each type only has certain methods. Check the spelling, or use `dir(obj)` to list what the object actually supports.",
+        "learning_objective": "Learn which methods belong to built-in types",
+        "code_suggestion": "items = [1, 2]\nitems.append(3)  # lists use append(), not push()"
+    },
+    "LogicError": {
+        "reply": "Let's think through the **logic** of your code. What should happen in each step?",
+        "explanation": "I noticed the counter isn't changing. For a loop to end, the condition must eventually become false. Your `counter = counter + 0` keeps it the same forever.",
+        "learning_objective": "Understand loop termination conditions",
+        "code_suggestion": "counter = counter + 1  # Increment by 1 instead of 0"
+    }
+}
+
+# Feedback when no rule matched and the run (if any) didn't fail: nothing specific to fix
+UNMATCHED_FEEDBACK = {
+    "reply": "I didn't spot a common bug in this code. Let's trace it together: what should it do, and what does it do instead?",
+    "explanation": (
+        "None of the usual error patterns (index ranges, scope, syntax, types, methods, loops that never end) "
+        "showed up. Run it on a small input and check each step against what you expect; printing the "
+        "variables inside loops helps."
+    ),
+    "learning_objective": "Trace code step by step to check its logic",
+    "code_suggestion": None
+}
+
+# Runtime exceptions reported under the analyzer's error types
+RUNTIME_ERROR_TYPES = {
+    "IndentationError": "SyntaxError",
+    "TabError": "SyntaxError",
+    "UnboundLocalError": "NameError",
+    "RecursionError": "LogicError"
+}
 
 class AIService:
     """
@@ -13,141 +97,711 @@ class AIService:
     
     def __init__(self):
         self.use_mock = os.getenv("USE_MOCK_AI", "true").lower() == "true"
+        # Loaded by load_model() on a start-up thread, not here: importing this
+        # module must stay fast and must not pull in transformers/torch
         self.model = None
+        self.engine = None
+        self._load_lock = threading.Lock()
+        # Chat turns answered by the analyzer alone while the model was still loading
+        self.fallbacks = 0
+        # Seed challenge snippets run through the pools and model before taking traffic
+        self.warmup_samples = int(os.getenv("WARMUP_SAMPLES", 6))
+        # Disabled with RESPONSE_CACHE_SIZE=0
+        self.cache = response_cache if response_cache.max_size > 0 else None
+        # Disabled with SANDBOX_WORKERS=0 (responses then rely on static analysis alone)
+        self.sandbox = sandbox if sandbox.size > 0 else None
+        # Disabled with COALESCE_REQUESTS=false
+        self.flights = SingleFlight("chat") if _coalescing_enabled() else None
+        # Resolved sessions answered again without inference; disabled with an empty SESSION_INDEX_DIR
+        self.sessions = session_index if session_index is not None and session_index.enabled else None
+        # Prompt tokens (history + current turn); 0 = the model's input length once it is loaded
+        self.context_budget_setting = int(os.getenv("CONTEXT_TOKEN_BUDGET", 0))
+        self.context_budget = self.context_budget_setting or 512
+    
+    def load_model(self) -> str:
+        """
+        Load the model and start the batching engine (blocking)
         
-        if not self.use_mock:
-            # TODO: Load your fine-tuned CodeT5+ model here
-            # self.model = load_model("./models/codet5_finetuned")
-            pass
+        Called from a start-up thread (see main.py), so the worker serves
+        /api/health and analyzer-only replies while a large checkpoint
+        loads. Sync callers load it on first use. Mock mode never loads
+        anything.
+        """
+        if self.use_mock:
+            return "mock responses, no model"
+        with self._load_lock:
+            if self.engine is None:
+                # CodeT5+ (or the stub when INFERENCE_MODEL=stub) behind a micro-batching engine
+                engine = build_engine()
+                # History turns are counted once, with the model's own tokenizer
+                context_store.count_tokens = engine.model.count_tokens
+                self.context_budget = self.context_budget_setting or getattr(engine.model, "max_length", 512)
+                self.model = engine.model
+                # Published last: requests switch from the analyzer to the model here
+                self.engine = engine
+        return type(self.model).__name__
     
-    def get_tutor_response(
+    def warm_up(self) -> str:
+        """
+        Run the challenges' bug_code samples through the analyzer and the model
+        
+        Spawns and primes the CPU pool workers and pays the model's
+        first-batch costs before the first students arrive. Nothing is
+        written to the response cache.
+        """
+        samples = _warmup_samples(self.warmup_samples)
+        if not samples:
+            return "disabled"
+        start = time.perf_counter()
+        message = "Why does this code fail?"
+        # All at once, so every pool worker is started and the engine sees a batch
+        jobs = [executors.cpu_pool.submit(_mock_response_job, message, code) for code in samples]
+        if self.engine is not None:
+            jobs += [self.engine.submit(self._build_prompt(message, code, None)) for code in samples]
+        for job in jobs:
+            job.result(timeout=300)
+        return f"{len(samples)} samples in {(time.perf_counter() - start) * 1e3:.0f} ms"
+    
+    async def get_tutor_response(
         self, 
         message: str, 
         code_snippet: Optional[str] = None,
-        conversation_history: list = None
+        conversation_history: list = None,
+        conversation_id: Optional[str] = None
     ) -> ChatResponse:
         """
-        Generate AI tutor response with XAI explanation
+        Generate AI tutor response with XAI explanation (non-blocking)
+        
+        Mock analysis runs on the CPU process pool; model inference is awaited
+        on the batching engine's future, so the event loop is never blocked.
+        Turns that belong to a conversation are analysed incrementally against
+        the conversation's previous snippet. The snippet is also run in the
+        sandbox (concurrently with inference), and what actually happened
+        takes precedence over the static guess.
+        
+        Concurrent requests with the same cache key (e.g. a whole class
+        pasting the same challenge) share one computation; like a cache hit,
+        a coalesced turn does not update its own conversation's session.
+        
+        Before inference, the snippet is looked up in the index of resolved
+        sessions: a near-duplicate of a snippet the model already answered
+        (with a fix) gets that reply, renamed to this snippet's identifiers,
+        as long as this snippet's own analysis finds the same error type.
         
         Args:
             message: User's question or request
             code_snippet: Python code to analyze
             conversation_history: Previous messages for context
+            conversation_id: Conversation the turn belongs to, if any
             
         Returns:
             ChatResponse with reply, explanation, and metadata
         """
         
+        key, cached = await self._cache_lookup(message, code_snippet, conversation_history)
+        if cached is not None:
+            return cached
+        
+        flight_key = self._flight_key(key, message, code_snippet, conversation_history)
+        if flight_key is None:
+            return await self._generate(key, message, code_snippet, conversation_history, conversation_id)
+        response = await self.flights.do(
+            flight_key,
+            lambda: self._generate(key, message, code_snippet, conversation_history, conversation_id)
+        )
+        # Each caller gets its own copy of the shared response
+        return response.model_copy(deep=True)
+    
+    async def _generate(
+        self,
+        key: Optional[str],
+        message: str,
+        code_snippet: Optional[str],
+        conversation_history: Optional[list],
+        conversation_id: Optional[str]
+    ) -> ChatResponse:
+        if self.engine is None:
+            data = await self._mock_fields(message, code_snippet, conversation_id)
+            response = ChatResponse(**data)
+            if not self.use_mock:
+                # Model still loading: answer from the analyzer, but don't cache it
+                self.fallbacks += 1
+                return response
+        else:
+            fingerprint, match = await self._retrieve(code_snippet)
+            data = await self._mock_fields(message, code_snippet, conversation_id) if match is not None else None
+            if data is not None and self.sessions.accept(match, data["error_type"] if data["matched"] else None):
+                data["reply"] = match.reply
+                response = ChatResponse(**data)
+            else:
+                prompt = self._build_prompt(message, code_snippet, conversation_history)
+                if data is None:
+                    # The sandbox run and the analysis go through the pools while the model answers
+                    reply, data = await asyncio.gather(
+                        self._infer(prompt),
+                        self._mock_fields(message, code_snippet, conversation_id)
+                    )
+                else:
+                    # The rejected match already ran the snippet and the analysis: only the reply is missing
+                    reply = await self._infer(prompt)
+                data["reply"] = reply.strip() or data["reply"]
+                response = ChatResponse(**data)
+                self._remember(fingerprint, response)
+        
+        self._cache_store(key, response)
+        return response
+    
+    def get_tutor_response_sync(
+        self, 
+        message: str, 
+        code_snippet: Optional[str] = None,
+        conversation_history: list = None,
+        conversation_id: Optional[str] = None
+    ) -> ChatResponse:
+        """Blocking variant of get_tutor_response for scripts, workers and benchmarks"""
+        
+        key, cached = self._cache_lookup_sync(message, code_snippet, conversation_history)
+        if cached is not None:
+            return cached
+        
+        if not self.use_mock and self.engine is None:
+            self.load_model()
+        
         if self.use_mock:
-            return self._mock_response(message, code_snippet)
+            execution = self._execute_sync(code_snippet)
+            response = self._mock_response(message, code_snippet, conversation_id, execution)
         else:
-            # TODO: Implement real CodeT5+ inference
-            # return self._codet5_inference(message, code_snippet)
-            pass
+            response = self._codet5_inference(message, code_snippet, conversation_history, conversation_id)
+        
+        self._cache_store(key, response)
+        return response
     
-    def _mock_response(self, message: str, code: Optional[str]) -> ChatResponse:
-        """Mock AI responses for development"""
+    async def stream_tutor_response(
+        self,
+        message: str,
+        code_snippet: Optional[str] = None,
+        conversation_history: list = None,
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Stream the tutor response as (event, data) pairs
         
-        # Detect error type from code
-        error_patterns = {
-            "IndexError": ["range", "list", "index", "["],
-            "NameError": ["print(i)", "variable", "scope"],
-            "SyntaxError": ["if", ":", "def", "indent"],
-            "TypeError": ["str", "int", "+", "type"],
-            "AttributeError": [".", "attribute", "method"]
+        Reply tokens are yielded as `token` events as soon as they are produced,
+        followed by `explanation`, `code_suggestion` and `error_type` events and
+        a final `done` event carrying the full ChatResponse dict.
+        
+        Model tokens flow through a bounded queue, so a slow client applies
+        backpressure to generation. If the consumer stops iterating (e.g. the
+        client disconnected and the generator is closed or cancelled),
+        generation is cancelled at the next decode step.
+        """
+        
+        key, cached = await self._cache_lookup(message, code_snippet, conversation_history)
+        if cached is not None:
+            response = cached
+            for token in _split_tokens(response.reply):
+                yield "token", token
+        elif self.engine is None:
+            data = await self._mock_fields(message, code_snippet, conversation_id)
+            response = ChatResponse(**data)
+            if not self.use_mock:
+                # Model still loading: answer from the analyzer, but don't cache it
+                self.fallbacks += 1
+                key = None
+            for token in _split_tokens(response.reply):
+                yield "token", token
+        else:
+            fingerprint, match = await self._retrieve(code_snippet)
+            data = await self._mock_fields(message, code_snippet, conversation_id) if match is not None else None
+            if data is not None and self.sessions.accept(match, data["error_type"] if data["matched"] else None):
+                data["reply"] = match.reply
+                response = ChatResponse(**data)
+                for token in _split_tokens(response.reply):
+                    yield "token", token
+            else:
+                # Structured fields are computed off the event loop while the model streams
+                fields_task = asyncio.ensure_future(
+                    self._mock_fields(message, code_snippet, conversation_id)
+                ) if data is None else None
+                prompt = self._build_prompt(message, code_snippet, conversation_history)
+                reply_parts = []
+                try:
+                    async for token in self._stream_model_tokens(prompt):
+                        reply_parts.append(token)
+                        yield "token", token
+                    if fields_task is not None:
+                        data = await fields_task
+                finally:
+                    if fields_task is not None and not fields_task.done():
+                        fields_task.cancel()
+                data["reply"] = "".join(reply_parts).strip() or data["reply"]
+                response = ChatResponse(**data)
+                self._remember(fingerprint, response)
+        
+        if cached is None:
+            self._cache_store(key, response)
+        
+        yield "explanation", response.explanation
+        yield "code_suggestion", response.code_suggestion
+        yield "error_type", {
+            "error_type": response.error_type,
+            "confidence_score": response.confidence_score,
+            "learning_objective": response.learning_objective
         }
+        yield "done", response.model_dump()
+    
+    async def _stream_model_tokens(self, prompt: str) -> AsyncIterator[str]:
+        """Bridge the model's blocking token iterator onto the event loop"""
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_TOKENS)
+        cancel = threading.Event()
         
-        detected_error = "LogicError"
-        if code:
-            code_lower = code.lower()
-            for error_type, keywords in error_patterns.items():
-                if any(keyword in code_lower for keyword in keywords):
-                    detected_error = error_type
+        def put(item) -> bool:
+            # Blocks the producer while the queue is full (backpressure), but
+            # gives up as soon as the consumer has gone away
+            future = asyncio.run_coroutine_threadsafe(tokens.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except FutureTimeoutError:
+                    if cancel.is_set():
+                        future.cancel()
+                        return False
+        
+        def produce():
+            try:
+                for token in self.model.stream_generate(prompt, cancel):
+                    if cancel.is_set() or not put(token):
+                        return
+                put(_STREAM_END)
+            except Exception as e:
+                put(e)
+        
+        producer = loop.run_in_executor(executors.io_pool, produce)
+        try:
+            while True:
+                item = await tokens.get()
+                if item is _STREAM_END:
                     break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancel.set()
+            # Don't wait on a cancelled consumer; the producer exits on its own
+            if not producer.done():
+                producer.add_done_callback(lambda f: f.exception())
+    
+    def _response_key(self, message: str, code_snippet: str, conversation_history: Optional[list]) -> str:
+        """Cache/coalescing key; the model's prompt includes the history, so its answers are keyed on it too"""
+        history = None
+        if not self.use_mock and conversation_history:
+            history = [render_turn(turn) for turn in conversation_history]
+        return cache_key(code_snippet, message, history)
+    
+    async def _cache_lookup(self, message: str, code_snippet: Optional[str], conversation_history: Optional[list]) -> tuple:
+        """
+        Identical snippets (modulo whitespace/comments) with the same intent
+        get the same answer, so skip inference on a cache hit
         
-        # Generate appropriate response
-        responses = {
-            "IndexError": {
-                "reply": "I can see you have an **index error** in your code. This happens when you try to access a list position that doesn't exist.",
-                "explanation": "The loop is trying to access `numbers[3]`, but your list only has 3 items (indices 0, 1, 2). Your loop should use `range(len(numbers))` instead of `range(4)`.",
-                "learning_objective": "Learn to match loop ranges with list lengths",
-                "code_suggestion": "for i in range(len(numbers)):\n    print(numbers[i])"
-            },
-            "NameError": {
-                "reply": "You're trying to use a variable **outside its scope**. Variables defined inside loops only exist within that loop.",
-                "explanation": "The variable `i` is created inside the for-loop and is destroyed when the loop ends. If you need it outside, save it to a variable before the loop ends.",
-                "learning_objective": "Understand variable scope and lifecycle",
-                "code_suggestion": "last_value = 0\nfor i in range(5):\n    last_value = i\n    print(i)\nprint(last_value)"
-            },
-            "SyntaxError": {
-                "reply": "There's a **syntax error** in your code. Python requires a colon `:` after `if`, `for`, `while`, and `def` statements.",
-                "explanation": "Line 2 is missing a colon. Python uses colons to indicate the start of an indented block.",
-                "learning_objective": "Master Python's syntax rules for control structures",
-                "code_suggestion": "if x > 5:\n    print('Greater')"
-            },
-            "TypeError": {
-                "reply": "You have a **type mismatch** error. You can't directly add a string and a number in Python.",
-                "explanation": "The variable `age` is a string ('25'), but you're trying to add a number (5) to it. Use `int(age)` to convert it first.",
-                "learning_objective": "Learn type conversion and when to use it",
-                "code_suggestion": "age = int('25')\nfuture_age = age + years_ahead"
-            },
-            "LogicError": {
-                "reply": "Let's think through the **logic** of your code. What should happen in each step?",
-                "explanation": "I noticed the counter isn't changing. For a loop to end, the condition must eventually become false. Your `counter = counter + 0` keeps it the same forever.",
-                "learning_objective": "Understand loop termination conditions",
-                "code_suggestion": "counter = counter + 1  # Increment by 1 instead of 0"
-            }
-        }
+        Memory is checked on the event loop; the disk tier, if any, is read
+        on the I/O pool.
+        """
+        if self.cache is None or not code_snippet:
+            return None, None
+        key = self._response_key(message, code_snippet, conversation_history)
+        cached = self.cache.get(key, disk=False)
+        if cached is None and self.cache.cache_dir:
+            cached = await executors.run_io(self.cache.get_disk, key)
+        return key, ChatResponse(**cached) if cached is not None else None
+    
+    def _cache_lookup_sync(self, message: str, code_snippet: Optional[str], conversation_history: Optional[list]) -> tuple:
+        if self.cache is None or not code_snippet:
+            return None, None
+        key = self._response_key(message, code_snippet, conversation_history)
+        cached = self.cache.get(key)
+        return key, ChatResponse(**cached) if cached is not None else None
+    
+    def _cache_store(self, key: Optional[str], response: ChatResponse):
+        if key is None:
+            return
+        value = response.model_dump()
+        self.cache.put(key, value, disk=False)
+        if self.cache.cache_dir:
+            # File writes stay off the caller's thread (the event loop, for async requests)
+            executors.io_pool.submit(self.cache.persist, key, value)
+    
+    def _flight_key(
+        self, key: Optional[str], message: str, code_snippet: Optional[str], conversation_history: Optional[list]
+    ) -> Optional[str]:
+        """Requests that would share a cache entry also share an in-flight computation"""
+        if self.flights is None or not code_snippet:
+            return None
+        return key if key is not None else self._response_key(message, code_snippet, conversation_history)
+    
+    async def _retrieve(self, code: Optional[str]) -> tuple:
+        """(fingerprint, nearest resolved session) for the snippet; (None, None) when off or no code"""
+        if self.sessions is None or not code:
+            return None, None
+        with telemetry.span("retrieval"):
+            return await executors.run_io(self.sessions.lookup, code)
+    
+    def _remember(self, fingerprint, response: ChatResponse):
+        """Index a model answer to an identified bug that came with a fix (in the background)"""
+        # Unmatched snippets all share the default error type, so their answers would match each other
+        if fingerprint is None or not response.matched or not response.code_suggestion:
+            return
+        executors.io_pool.submit(self.sessions.add, fingerprint, response.error_type, response.reply)
+    
+    async def _mock_fields(self, message: str, code: Optional[str], conversation_id: Optional[str]) -> dict:
+        """ChatResponse fields from the sandbox run and the analyzer, computed off the event loop"""
+        execution = await self._execute(code)
+        with telemetry.span("analysis"):
+            if conversation_id:
+                # Conversation sessions live in this process, so use the thread pool
+                response = await executors.run_io(self._mock_response, message, code, conversation_id, execution)
+                return response.model_dump()
+            return await executors.run_cpu(_mock_response_job, message, code, execution)
+    
+    async def _infer(self, prompt: str) -> str:
+        """Model reply from the batching engine"""
+        with telemetry.span("inference"):
+            return await asyncio.wrap_future(self.engine.submit(prompt))
+    
+    async def _execute(self, code: Optional[str]) -> Optional[dict]:
+        """Run the snippet in the sandbox; None when disabled or there is no code"""
+        if self.sandbox is None or not code or not code.strip():
+            return None
+        with telemetry.span("sandbox"):
+            return (await self.sandbox.run(code)).to_dict()
+    
+    def _execute_sync(self, code: Optional[str]) -> Optional[dict]:
+        if self.sandbox is None or not code or not code.strip():
+            return None
+        return self.sandbox.run_sync(code).to_dict()
+    
+    def _analyze(self, code: Optional[str], conversation_id: Optional[str] = None) -> CodeAnalysis:
+        """Classify the bug; follow-up turns re-analyse only the statements that changed"""
+        if conversation_id:
+            return incremental_analyzer.analyze(conversation_id, code)
+        return analyze_code(code)
+    
+    def _mock_response(
+        self,
+        message: str,
+        code: Optional[str],
+        conversation_id: Optional[str] = None,
+        execution: Optional[dict] = None
+    ) -> ChatResponse:
+        """Mock AI responses for development"""
+        
+        # Classify the bug with a single AST walk (tokenizer fallback on SyntaxError)
+        analysis = self._analyze(code, conversation_id)
+        return self._build_response(analysis, execution=execution)
+    
+    def _codet5_inference(
+        self,
+        message: str,
+        code: Optional[str],
+        conversation_history: Optional[list] = None,
+        conversation_id: Optional[str] = None
+    ) -> ChatResponse:
+        """Generate the tutor reply with the model; structured fields come from the analyzer"""
+        prompt = self._build_prompt(message, code, conversation_history)
+        future = executors.io_pool.submit(self._execute_sync, code)
+        reply = self.engine.infer(prompt)
+        return self._build_response(
+            self._analyze(code, conversation_id),
+            reply=reply.strip() or None,
+            execution=future.result()
+        )
+    
+    def _build_prompt(self, message: str, code: Optional[str], conversation_history: Optional[list]) -> str:
+        """Current turn plus as much recent history as fits in the context budget"""
+        current = f"user: {message}"
+        if code:
+            current += f"\ncode:\n{code}"
+        history = context_store.window(
+            conversation_history, self.context_budget, reserved=context_store.count_tokens(current)
+        )
+        return "\n".join([render_turn(turn) for turn in history] + [current])
+    
+    def _build_response(
+        self,
+        analysis: CodeAnalysis,
+        reply: Optional[str] = None,
+        execution: Optional[dict] = None
+    ) -> ChatResponse:
+        """
+        Assemble a ChatResponse from the analysis (and optional model reply)
+        
+        When the sandbox run failed, the failure decides the error type: a
+        static finding of the same type is promoted to primary (and gets its
+        specific explanation), otherwise the runtime error is explained from
+        the traceback. A clean run leaves the static analysis in charge, and
+        when no rule matched either, the feedback is generic, with no code
+        suggestion.
+        """
+        runtime_error = self._runtime_error_type(execution)
+        confirmed = None
+        if runtime_error is not None:
+            confirmed = self._matching_finding(analysis, runtime_error, execution["line"])
+            if confirmed is not None:
+                analysis = analysis.with_primary(confirmed)
         
-        response_data = responses.get(detected_error, responses["LogicError"])
+        if runtime_error is not None and confirmed is None:
+            detected_error = runtime_error
+            response_data = self._runtime_feedback(runtime_error, execution)
+            confidence = 0.9
+        elif not analysis.matched:
+            # The LogicError template describes a specific bug; don't claim it without evidence
+            detected_error = analysis.error_type
+            response_data = dict(UNMATCHED_FEEDBACK)
+            confidence = self._analysis_confidence(analysis)
+        else:
+            detected_error = analysis.error_type
+            response_data = dict(RESPONSE_TEMPLATES.get(detected_error, RESPONSE_TEMPLATES["LogicError"]))
+            response_data.update(self._specific_feedback(analysis))
+            confidence = 0.97 if confirmed is not None else self._analysis_confidence(analysis)
         
         return ChatResponse(
-            reply=response_data["reply"],
+            reply=reply or response_data["reply"],
             explanation=response_data["explanation"],
-            confidence_score=round(random.uniform(0.82, 0.95), 2),
+            confidence_score=confidence,
             code_suggestion=response_data.get("code_suggestion"),
             error_type=detected_error,
-            learning_objective=response_data["learning_objective"]
+            matched=analysis.matched or runtime_error is not None,
+            learning_objective=response_data["learning_objective"],
+            execution=execution
         )
     
-    def get_xai_explanation(self, code: str, prediction: str) -> dict:
+    def _runtime_error_type(self, execution: Optional[dict]) -> Optional[str]:
+        """Error type the sandbox run demonstrated, if it failed"""
+        if execution is None:
+            return None
+        if execution["status"] in ("timeout", "cpu_limit"):
+            return "LogicError"
+        if execution["status"] != "error" or execution["error_type"] == "SystemExit":
+            return None
+        return RUNTIME_ERROR_TYPES.get(execution["error_type"], execution["error_type"])
+    
+    def _matching_finding(self, analysis: CodeAnalysis, error_type: str, line: Optional[int]) -> Optional[dict]:
+        """The static finding of that type closest to where the run failed"""
+        candidates = [f for f in analysis.findings if f["error_type"] == error_type]
+        if not candidates:
+            return None
+        if line is None:
+            return candidates[0]
+        return min(candidates, key=lambda f: abs(f["line"] - line))
+    
+    def _runtime_feedback(self, error_type: str, execution: dict) -> dict:
+        """Feedback for a failure the static analysis did not predict"""
+        line = execution["line"]
+        where = f" on line {line}" if line else ""
+        if execution["status"] in ("timeout", "cpu_limit"):
+            feedback = dict(RESPONSE_TEMPLATES["LogicError"])
+            feedback["explanation"] = (
+                f"Your program was still running when it was stopped ({execution['message']}); "
+                f"it was executing line {line}. Check that every loop's condition eventually becomes false."
+                if line else
+                f"Your program was still running when it was stopped ({execution['message']}). "
+                "Check that every loop's condition eventually becomes false."
+            )
+            return feedback
+        raised = f"`{execution['error_type']}: {execution['message']}`" if execution["message"] else f"`{execution['error_type']}`"
+        if error_type in RESPONSE_TEMPLATES:
+            feedback = dict(RESPONSE_TEMPLATES[error_type])
+            feedback["explanation"] = f"Running your code raised {raised}{where}."
+            return feedback
+        return {
+            "reply": f"Running your code raised a **{execution['error_type']}**{where}.",
+            "explanation": (
+                f"Python stopped with {raised}{where}. Read the traceback from the bottom up: "
+                "the last line says what went wrong, the lines above it show where."
+            ),
+            "learning_objective": "Read tracebacks to locate runtime errors",
+            "code_suggestion": None
+        }
+    
+    def _specific_feedback(self, analysis: CodeAnalysis) -> dict:
+        """Tailor the explanation to the structural feature that was detected"""
+        detail = analysis.detail
+        line = analysis.line
+        reason = detail.get("reason")
+        
+        if analysis.error_type == "IndexError" and "over" in detail:
+            name, index, over = detail["list"], detail["index"], detail["over"]
+            reach = f"len({name})" if over == 1 else f"len({name}) + {over - 1}"
+            feedback = {
+                "explanation": (
+                    f"On line {line}, `{name}[{index}]` can reach index `{reach}`, "
+                    f"but the last item of `{name}` is at `len({name}) - 1`."
+                )
+            }
+            fixed, variable = detail.get("fixed"), detail.get("variable")
+            if fixed:
+                feedback["explanation"] += f" Use `{fixed}` instead of `{detail['header']}`."
+                feedback["code_suggestion"] = (
+                    f"for {variable} in {fixed}:\n    print({name}[{index}])"
+                    if fixed.startswith("range(") else
+                    f"while {fixed}:\n    print({name}[{index}])\n    {variable} += 1"
+                )
+            else:
+                feedback["explanation"] += f" Use `{name}[-1]` (or `{name}[len({name}) - 1]`) for the last item."
+                feedback["code_suggestion"] = f"last = {name}[-1]"
+            return feedback
+        
+        if analysis.error_type == "IndexError" and "list" in detail:
+            name, length, bound = detail["list"], detail["length"], detail["bound"]
+            feedback = {
+                "explanation": (
+                    f"On line {line}, `{name}[{detail['index']}]` can reach index {bound - 1}, "
+                    f"but `{name}` only has {length} items (indices 0 to {length - 1})."
+                )
+            }
+            if detail["index"].isidentifier():
+                feedback["explanation"] += f" Use `range(len({name}))` instead of `range({bound})`."
+                feedback["code_suggestion"] = (
+                    f"for {detail['index']} in range(len({name})):\n    print({name}[{detail['index']}])"
+                )
+            return feedback
+        
+        if analysis.error_type == "NameError" and reason == "loop_scope":
+            return {
+                "explanation": (
+                    f"Line {line} uses `{detail['name']}` after the loop that created it has finished. "
+                    "Save the value to a variable defined before the loop if you need it afterwards."
+                )
+            }
+        
+        if analysis.error_type == "NameError" and reason == "undefined":
+            return {
+                "reply": f"The name `{detail['name']}` is **never defined** before it's used.",
+                "explanation": (
+                    f"Line {line} uses `{detail['name']}`, but no assignment, import or function "
+                    "creates it. Check for typos or define it first."
+                ),
+                "learning_objective": "Define variables before using them",
+                "code_suggestion": None
+            }
+        
+        if analysis.error_type == "SyntaxError" and line:
+            if reason == "missing_colon":
+                return {"explanation": f"Line {line} starts a block with `{detail['keyword']}` but is missing a colon `:` at the end."}
+            return {"explanation": f"Python could not parse line {line}. Check brackets, quotes, colons and indentation around it."}
+        
+        if analysis.error_type == "TypeError" and reason == "missing_return":
+            func = detail["function"]
+            result = detail.get("result")
+            returned = f"    return {result}" if result else "    return value  # the value the function computes"
+            return {
+                "reply": f"Your function `{func}` **doesn't return a value**, so its result is `None`.",
+                "explanation": (
+                    f"Line {line} stores the result of `{func}(...)`, but `{func}` has no `return` "
+                    "statement. Add `return` with the value you computed."
+                ),
+                "learning_objective": "Understand function return values and None",
+                "code_suggestion": f"def {func}({detail.get('params', '')}):\n    ...  # your code\n{returned}"
+            }
+        
+        if analysis.error_type == "TypeError" and detail.get("variable"):
+            return {
+                "explanation": (
+                    f"On line {line}, `{detail['variable']}` is a string, but it is combined with a number. "
+                    f"Use `int({detail['variable']})` to convert it first."
+                )
+            }
+        
+        if analysis.error_type == "AttributeError":
+            return {
+                "explanation": (
+                    f"Line {line} calls `.{detail['attribute']}` on `{detail['variable']}`, "
+                    f"which is a `{detail['type']}`. `{detail['type']}` objects have no `{detail['attribute']}` attribute."
+                )
+            }
+        
+        if analysis.error_type == "LogicError" and reason in ("noop_update", "no_update"):
+            variable = detail["variable"]
+            what = "adds 0 to" if reason == "noop_update" else "never changes"
+            return {
+                "explanation": (
+                    f"The `while` loop on line {detail['loop_line']} depends on `{variable}`, but the loop body "
+                    f"{what} `{variable}`. The condition can never become false, so the loop runs forever."
+                ),
+                "code_suggestion": f"{variable} = {variable} + 1  # Increment by 1 instead of 0"
+            }
+        
+        if analysis.error_type == "LogicError" and reason == "no_exit":
+            return {
+                "explanation": (
+                    f"The `while True` loop on line {detail['loop_line']} has no `break`, `return` or `raise`, "
+                    "so nothing ever stops it."
+                ),
+                "code_suggestion": "while True:\n    if done:\n        break"
+            }
+        
+        return {}
+    
+    def _analysis_confidence(self, analysis: CodeAnalysis) -> float:
+        """Structural matches are more certain than the default LogicError guess"""
+        if not analysis.matched:
+            return 0.55
+        if analysis.error_type == "SyntaxError":
+            return 0.95 if analysis.detail.get("reason") == "missing_colon" else 0.85
+        # Several independent findings make the primary one slightly less certain
+        return round(max(0.75, 0.92 - 0.03 * (len(analysis.findings) - 1)), 2)
+    
+    async def get_xai_explanation(self, code: str, prediction: str, conversation_id: Optional[str] = None) -> dict:
+        """Non-blocking XAI explanation (CPU process pool; thread pool for conversation turns)"""
+        with telemetry.span("xai"):
+            if conversation_id:
+                return await executors.run_io(self.get_xai_explanation_sync, code, prediction, conversation_id)
+            return await executors.run_cpu(_xai_explanation_job, code, prediction)
+    
+    def get_xai_explanation_sync(self, code: str, prediction: str, conversation_id: Optional[str] = None) -> dict:
         """
-        Generate XAI (SHAP/LIME) explanation
+        Generate an occlusion-based XAI explanation
         
         Args:
             code: The code snippet analyzed
             prediction: What the model predicted
+            conversation_id: Conversation whose analysis session to start from
             
         Returns:
             Dictionary with highlighted lines and feature importance
         """
-        
-        if self.use_mock:
-            return self._mock_xai_explanation(code)
-        else:
-            # TODO: Implement SHAP analysis
-            # return self._shap_analysis(code, prediction)
-            pass
-    
-    def _mock_xai_explanation(self, code: str) -> dict:
-        """Mock XAI explanation for development"""
-        lines = code.split('\n')
-        
-        # Simulate highlighting problematic lines
-        highlighted = []
-        for i, line in enumerate(lines, 1):
-            if any(keyword in line.lower() for keyword in ['range', 'for', 'if', '[']):
-                highlighted.append(i)
-        
-        return {
-            "highlighted_lines": highlighted[:3],  # Top 3 most important
-            "feature_importance": {
-                "loop_range": 0.85,
-                "list_access": 0.72,
-                "variable_usage": 0.45
-            },
-            "explanation_text": "The error is most influenced by the loop range and list access pattern."
-        }
+        session = incremental_analyzer.session(conversation_id, code) if conversation_id else None
+        return xai_explainer.explain(code, prediction, session)
+
+def _coalescing_enabled() -> bool:
+    return os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+
+
+def _warmup_samples(limit: int) -> List[str]:
+    """Up to `limit` challenge bug_code snippets (the seed set if the DB is unavailable)"""
+    if limit <= 0:
+        return []
+    try:
+        rows = db.blocking.get_all_challenges()
+        samples = [r["bug_code"] for r in rows if r.get("bug_code")]
+    except:
+        samples = []
+    return (samples or [c[4] for c in SEED_CHALLENGES])[:limit]
+
+
+def _split_tokens(text: str) -> List[str]:
+    """Word-level chunks (with trailing whitespace) for streaming a known reply"""
+    return re.findall(r"\S+\s*", text or "")
+
+# Process-pool entry points: module-level so they pickle, and they use the
+# worker process's own singleton
+
+def _mock_response_job(message: str, code: Optional[str], execution: Optional[dict] = None) -> dict:
+    return ai_service._mock_response(message, code, execution=execution).model_dump()
+
+def _xai_explanation_job(code: str, prediction: str) -> dict:
+    return ai_service.get_xai_explanation_sync(code, prediction)
 
 # Singleton instance
 ai_service = AIService()
@@ -0,0 +1,435 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.lib.shared_state import SharedSlots, SnapshotStore
+from app.services.challenge_catalog import Challenge, ChallengeCatalog
+from app.services.progress_cache import StudentProgress
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+ERROR_TYPES = ("NameError", "IndexError", "TypeError", "SyntaxError", "AttributeError", "LogicError")
+
+# Student context: bias, mastery per error type (+ other), attempts, time, completions
+STUDENT_DIM = 1 + len(ERROR_TYPES) + 1 + 3
+# Challenge features: bias, difficulty one-hot, error type one-hot (+ other)
+CHALLENGE_DIM = 1 + len(DIFFICULTIES) + len(ERROR_TYPES) + 1
+
+# `confidence` is the posterior probability that expected reward beats this
+REWARD_TARGET = 0.5
+
+# Challenges with the same features are interchangeable to the policy; an arm
+# type is a (difficulty or other, error type or other) pair
+ARM_TYPES = (len(DIFFICULTIES) + 1) * (len(ERROR_TYPES) + 1)
+
+
+def challenge_features(challenge: Challenge) -> np.ndarray:
+    f = np.zeros(CHALLENGE_DIM)
+    f[0] = 1.0
+    if challenge.difficulty in DIFFICULTIES:
+        f[1 + DIFFICULTIES.index(challenge.difficulty)] = 1.0
+    error_slot = ERROR_TYPES.index(challenge.error_type) if challenge.error_type in ERROR_TYPES else len(ERROR_TYPES)
+    f[1 + len(DIFFICULTIES) + error_slot] = 1.0
+    return f
+
+
+def arm_type(challenge: Challenge) -> int:
+    d = DIFFICULTIES.index(challenge.difficulty) if challenge.difficulty in DIFFICULTIES else len(DIFFICULTIES)
+    e = ERROR_TYPES.index(challenge.error_type) if challenge.error_type in ERROR_TYPES else len(ERROR_TYPES)
+    return d * (len(ERROR_TYPES) + 1) + e
+
+
+def _arm_type_features() -> np.ndarray:
+    F = np.zeros((ARM_TYPES, CHALLENGE_DIM))
+    F[:, 0] = 1.0
+    for t in range(ARM_TYPES):
+        d, e = divmod(t, len(ERROR_TYPES) + 1)
+        if d < len(DIFFICULTIES):
+            F[t, 1 + d] = 1.0
+        F[t, 1 + len(DIFFICULTIES) + e] = 1.0
+    return F
+
+
+# Challenge features of each arm type (row t == challenge_features of any challenge of type t)
+ARM_TYPE_FEATURES = _arm_type_features()
+_TYPE_BITS = np.int64(1) << np.arange(ARM_TYPES, dtype=np.int64)
+
+
+def student_features(progress: StudentProgress, catalog: ChallengeCatalog) -> np.ndarray:
+    """Context vector from cached progress; O(challenges the student has touched)"""
+    x = np.zeros(STUDENT_DIM)
+    x[0] = 1.0
+    for challenge_id in progress.completed:
+        challenge = catalog.get(challenge_id)
+        if challenge is None:
+            continue
+        slot = ERROR_TYPES.index(challenge.error_type) if challenge.error_type in ERROR_TYPES else len(ERROR_TYPES)
+        x[1 + slot] += 1.0
+    # An error type counts as mastered after three completions
+    x[1:2 + len(ERROR_TYPES)] = np.minimum(x[1:2 + len(ERROR_TYPES)] / 3.0, 1.0)
+
+    attempts = sum(progress.attempts.values())
+    x[-3] = min(math.log1p(attempts) / math.log(50), 1.0)
+    x[-2] = min(progress.time_spent / max(attempts, 1) / 900.0, 1.0)
+    x[-1] = min(len(progress.completed) / 20.0, 1.0)
+    return x
+
+
+def reward(success: bool, time_spent: int) -> float:
+    """1 for a solve, discounted by up to 0.3 for long solves; 0 for a failure"""
+    if not success:
+        return 0.0
+    return 1.0 - 0.3 * min(max(time_spent, 0) / 1800.0, 1.0)
+
+
+def batch_rewards(success: np.ndarray, time_spent: np.ndarray) -> np.ndarray:
+    """`reward` for arrays of outcomes"""
+    return np.where(success > 0, 1.0 - 0.3 * np.clip(time_spent / 1800.0, 0.0, 1.0), 0.0)
+
+
+class Selection(NamedTuple):
+    """A recommendation, with what an off-policy evaluator needs to reweight it"""
+    challenge: Challenge
+    confidence: float
+    # Probability the policy had of picking a challenge of this arm type
+    propensity: float
+    arm_type: int
+    # Bitmask of arm types with at least one challenge the student hasn't completed
+    available: int
+
+
+class _ArmIndex:
+    """
+    Feature matrix for one catalog snapshot (rebuilt when the catalog changes)
+
+    With a `store`, the matrices are built by the first worker to see this
+    catalog content and memory-mapped read-only by the others.
+    """
+
+    __slots__ = ("catalog", "features", "types", "type_counts", "position")
+
+    def __init__(self, catalog: ChallengeCatalog, store: Optional[SnapshotStore] = None):
+        self.catalog = catalog
+        if store is None:
+            arrays = self._build(catalog)
+        else:
+            arrays = store.get(self._key(catalog), ("features", "types"), lambda: self._build(catalog))
+        self.features = arrays["features"]
+        self.types = arrays["types"]
+        self.type_counts = np.bincount(self.types, minlength=ARM_TYPES)
+        self.position = {c.id: i for i, c in enumerate(catalog.challenges)}
+
+    @staticmethod
+    def _build(catalog: ChallengeCatalog) -> Dict[str, np.ndarray]:
+        return {
+            "features": np.array([challenge_features(c) for c in catalog.challenges]).reshape(-1, CHALLENGE_DIM),
+            "types": np.array([arm_type(c) for c in catalog.challenges], dtype=np.int64),
+        }
+
+    @staticmethod
+    def _key(catalog: ChallengeCatalog) -> str:
+        # Catalog versions are per worker; what the matrices depend on is the content
+        digest = hashlib.blake2b(digest_size=12)
+        for c in catalog.challenges:
+            digest.update(f"{c.id}\x00{c.difficulty}\x00{c.error_type}\x01".encode())
+        return f"arms-{digest.hexdigest()}"
+
+
+class LinUCBPolicy:
+    """
+    Contextual bandit over challenges (LinUCB with a shared linear model)
+
+    The expected reward of giving challenge `a` to a student with context
+    `x` is `kron(x, f_a) . theta`, so what is learned from one challenge
+    transfers to others with the same difficulty / error type. Scores for
+    every challenge come from two small matrix products against the arm
+    feature matrix, and each observed outcome is a rank-1 Sherman-Morrison
+    update of the inverse design matrix.
+
+    With `exploration` > 0 that share of recommendations is a uniformly
+    random uncompleted challenge instead, so every kind of challenge keeps a
+    known, non-zero chance of being shown (`Selection.propensity`), which is
+    what lets logged outcomes score other policies offline.
+
+    Updates publish new arrays rather than mutating shared ones, so scoring
+    reads a consistent (A_inv, theta) pair without taking the lock. State is
+    read through `_read` / `_unchanged` and written through `_latest` /
+    `_commit` under `_lock`, which `SharedLinUCBPolicy` maps onto memory
+    shared by every worker.
+    """
+
+    def __init__(self, alpha: float = 0.5, noise: float = 0.5, exploration: float = 0.0,
+                 seed: Optional[int] = None):
+        self.alpha = alpha
+        self.noise = noise
+        self.exploration = min(max(exploration, 0.0), 1.0)
+        self.dim = STUDENT_DIM * CHALLENGE_DIM
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._arms: Optional[_ArmIndex] = None
+        self._store: Optional[SnapshotStore] = None
+
+        # Ridge prior A = I, with prior mean encoding the old curriculum
+        # (Easy first, Hard once a student has completions) for cold start
+        prior = np.zeros((STUDENT_DIM, CHALLENGE_DIM))
+        prior[0, 1:1 + len(DIFFICULTIES)] = (0.6, 0.45, 0.3)
+        prior[-1, 1:1 + len(DIFFICULTIES)] = (-0.4, 0.1, 0.4)
+        self._b = prior.reshape(-1)
+        self._state = (np.eye(self.dim), self._b.copy())
+
+        self.updates = 0
+        self.total_reward = 0.0
+        self.recommendations = 0
+        self.explored = 0
+
+    # --- state access ---
+
+    @property
+    def trained_through(self) -> float:
+        """Logged attempts up to this time are already in the state (0: none are)"""
+        return 0.0
+
+    def _read(self) -> Tuple[np.ndarray, np.ndarray, object]:
+        """(A_inv, theta, token) for scoring, without the lock"""
+        A_inv, theta = self._state
+        return A_inv, theta, None
+
+    def _unchanged(self, token) -> bool:
+        """False when the state read with `token` changed under the reader (who then retries)"""
+        return True
+
+    def _latest(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(A_inv, b) to update from; caller holds the lock"""
+        return self._state[0], self._b
+
+    def _commit(self, A_inv: np.ndarray, b: np.ndarray, count: int, reward_sum: float):
+        """Publish an updated state; caller holds the lock"""
+        self._b = b
+        self._state = (A_inv, A_inv @ b)
+        self.updates += count
+        self.total_reward += reward_sum
+
+    def exclusive(self):
+        """Hold off every other update (in every worker, when the state is shared)"""
+        return self._lock
+
+    def close(self):
+        pass
+
+    def _arm_index(self, catalog: ChallengeCatalog) -> _ArmIndex:
+        arms = self._arms
+        if arms is None or arms.catalog is not catalog:
+            arms = _ArmIndex(catalog, self._store)
+            self._arms = arms
+        return arms
+
+    def score(self, x: np.ndarray, catalog: ChallengeCatalog) -> Tuple[np.ndarray, np.ndarray]:
+        """Posterior mean and std of the reward for every challenge in the catalog"""
+        F = self._arm_index(catalog).features
+        while True:
+            A_inv, theta, token = self._read()
+            mean = F @ (x @ theta.reshape(STUDENT_DIM, CHALLENGE_DIM))
+            # kron(x, f)^T A_inv kron(x, f) == f^T B f with B contracted over x once
+            B = np.einsum("i,iajb,j->ab", x, A_inv.reshape(STUDENT_DIM, CHALLENGE_DIM, STUDENT_DIM, CHALLENGE_DIM), x)
+            if self._unchanged(token):
+                break
+        variance = np.einsum("ka,ka->k", F @ B, F)
+        return mean, self.noise * np.sqrt(np.maximum(variance, 0.0))
+
+    def select(self, progress: StudentProgress, catalog: ChallengeCatalog) -> Optional[Selection]:
+        """Highest upper confidence bound among challenges not yet completed"""
+        ranked = self.rank(progress, catalog, 1)
+        return ranked[0] if ranked else None
+
+    def rank(self, progress: StudentProgress, catalog: ChallengeCatalog, depth: int) -> List[Selection]:
+        """
+        Up to `depth` challenges not yet completed, best first
+
+        The first is what `select` picks (exploration included); the rest
+        follow by upper confidence bound. Only the first is a draw of the
+        policy, so the others carry no propensity and aren't reweighted offline.
+        """
+        if len(catalog) == 0:
+            return []
+        x = student_features(progress, catalog)
+        mean, std = self.score(x, catalog)
+        ucb = mean + self.alpha * std
+
+        arms = self._arm_index(catalog)
+        # Challenges of each type still open to the student, from the completed ones
+        done = [i for i in map(arms.position.get, progress.completed) if i is not None]
+        ucb[done] = -np.inf
+        per_type = arms.type_counts - np.bincount(arms.types[done], minlength=ARM_TYPES)
+
+        best = ucb.max()
+        if best == -np.inf:
+            return []
+        # Challenges with identical features tie exactly; pick among them uniformly
+        ties = np.flatnonzero(ucb >= best)
+        if self.exploration > 0 and self._rng.random() < self.exploration:
+            # Uniform over open challenges: redraw completed ones (at least one is open)
+            index = self._rng.randrange(len(ucb))
+            while ucb[index] == -np.inf:
+                index = self._rng.randrange(len(ucb))
+            self.explored += 1
+        else:
+            index = int(ties[self._rng.randrange(len(ties))]) if len(ties) > 1 else int(ties[0])
+
+        kind = int(arms.types[index])
+        greedy_share = np.count_nonzero(arms.types[ties] == kind) / len(ties)
+        propensity = (1.0 - self.exploration) * greedy_share + self.exploration * per_type[kind] / per_type.sum()
+
+        available = int(_TYPE_BITS[per_type > 0].sum())
+        self.recommendations += 1
+        ranked = [Selection(
+            catalog.challenges[index],
+            self._confidence(mean[index], std[index]),
+            round(float(propensity), 6),
+            kind,
+            available,
+        )]
+        if depth > 1:
+            ucb[index] = -np.inf
+            k = min(depth - 1, len(ucb)) - 1
+            top = np.argpartition(-ucb, k)[:k + 1]
+            for i in top[np.argsort(-ucb[top], kind="stable")]:
+                if ucb[i] == -np.inf:
+                    break
+                ranked.append(Selection(
+                    catalog.challenges[i], self._confidence(mean[i], std[i]), 0.0, int(arms.types[i]), available
+                ))
+        return ranked
+
+    def update(self, x: np.ndarray, challenge: Challenge, reward_value: float):
+        """Rank-1 Sherman-Morrison update for one observed (context, challenge, reward)"""
+        phi = np.kron(x, challenge_features(challenge))
+        with self._lock:
+            A_inv, b = self._latest()
+            u = A_inv @ phi
+            self._commit(A_inv - np.outer(u, u) / (1.0 + phi @ u), b + reward_value * phi, 1, reward_value)
+
+    def update_batch(self, X: np.ndarray, F: np.ndarray, rewards: np.ndarray):
+        """
+        Fold many observations in at once (contexts X, challenge features F)
+
+        The posterior only depends on the sums of outer products and of
+        reward-weighted features, so this ends in the same state as one
+        `update` per row, at the cost of one matrix inversion per batch.
+        """
+        if len(X) == 0:
+            return
+        Phi = (X[:, :, None] * F[:, None, :]).reshape(len(X), self.dim)
+        with self._lock:
+            A_inv, b = self._latest()
+            self._commit(np.linalg.inv(np.linalg.inv(A_inv) + Phi.T @ Phi), b + Phi.T @ rewards,
+                         len(X), float(rewards.sum()))
+
+    def score_types(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Posterior mean and std of the reward of every arm type, for a batch of contexts"""
+        F = ARM_TYPE_FEATURES
+        while True:
+            A_inv, theta, token = self._read()
+            mean = X @ theta.reshape(STUDENT_DIM, CHALLENGE_DIM) @ F.T
+            # Per type t, M_t = (I kron f_t)^T A_inv (I kron f_t), so var = x^T M_t x
+            M = np.einsum("ta,iajb,tb->tij", F, A_inv.reshape(STUDENT_DIM, CHALLENGE_DIM, STUDENT_DIM, CHALLENGE_DIM), F)
+            if self._unchanged(token):
+                break
+        XM = (X @ M.transpose(1, 0, 2).reshape(STUDENT_DIM, -1)).reshape(len(X), ARM_TYPES, STUDENT_DIM)
+        variance = np.einsum("ntj,nj->nt", XM, X)
+        return mean, self.noise * np.sqrt(np.maximum(variance, 0.0))
+
+    def _confidence(self, mean: float, std: float) -> float:
+        if std <= 0:
+            return 1.0 if mean > REWARD_TARGET else 0.0
+        z = (mean - REWARD_TARGET) / std
+        return round(0.5 * (1.0 + math.erf(z / math.sqrt(2.0))), 4)
+
+    def stats(self) -> dict:
+        return {
+            "policy": "linucb",
+            "alpha": self.alpha,
+            "exploration": self.exploration,
+            "dimensions": self.dim,
+            "updates": self.updates,
+            "recommendations": self.recommendations,
+            "explored": self.explored,
+            "mean_reward": round(self.total_reward / self.updates, 4) if self.updates else 0.0,
+        }
+
+
+class SharedLinUCBPolicy(LinUCBPolicy):
+    """
+    LinUCB whose state lives in memory shared by every worker on the host
+
+    Every uvicorn worker maps the same (A_inv, b, theta) from `directory`
+    (`SharedSlots`), so an update made by one worker is what the next
+    recommendation in any worker scores with, and the matrices are held
+    once instead of per worker. Arm feature matrices are shared the same
+    way, as read-only snapshots (`SnapshotStore`).
+
+    Updates take a cross-process lock; scoring never does. The state file
+    is flushed to disk every `snapshot_seconds`, so restarted workers
+    continue from it instead of replaying the learning event log.
+    """
+
+    def __init__(self, directory: str, snapshot_seconds: float = 30.0, **kwargs):
+        super().__init__(**kwargs)
+        initial = {
+            "A_inv": np.eye(self.dim),
+            "b": self._b,
+            "theta": self._b.copy(),
+            # updates, total reward, newest attempt time
+            "meta": np.zeros(3),
+        }
+        self._shared = SharedSlots(
+            f"{directory.rstrip('/')}/policy.state", lambda: initial, snapshot_seconds=snapshot_seconds
+        )
+        self._store = SnapshotStore(directory)
+        self._lock = self._shared.lock
+        self.directory = directory
+
+    @property
+    def trained_through(self) -> float:
+        # Attempts are stamped before their update commits, so each is older than its commit
+        return float(self._shared.read()[0]["meta"][2])
+
+    def _read(self):
+        views, token = self._shared.read()
+        return views["A_inv"], views["theta"], token
+
+    def _unchanged(self, token) -> bool:
+        return self._shared.unchanged(token)
+
+    def _latest(self):
+        views = self._shared.latest()
+        return views["A_inv"], views["b"]
+
+    def _commit(self, A_inv: np.ndarray, b: np.ndarray, count: int, reward_sum: float):
+        meta = self._shared.latest()["meta"]
+        self._shared.publish({
+            "A_inv": A_inv,
+            "b": b,
+            "theta": A_inv @ b,
+            "meta": (meta[0] + count, meta[1] + reward_sum, time.time()),
+        })
+        self.updates += count
+        self.total_reward += reward_sum
+
+    def close(self):
+        self._shared.close()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        meta = self._shared.read()[0]["meta"]
+        updates = int(meta[0])
+        stats.update({
+            "updates": updates,
+            "mean_reward": round(float(meta[1]) / updates, 4) if updates else 0.0,
+            "worker_updates": self.updates,
+            "shared": {**self._shared.stats(), "arm_snapshots_built": self._store.built},
+        })
+        return stats
@@ -0,0 +1,145 @@
+import random
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+
+class Challenge:
+    """Compact, read-only challenge record"""
+
+    __slots__ = ("id", "title", "description", "difficulty", "error_type", "learning_objectives", "tests")
+
+    def __init__(
+        self,
+        id: str,
+        title: str,
+        description: str,
+        difficulty: str,
+        error_type: str,
+        learning_objectives: Tuple[str, ...] = (),
+        tests: Tuple[dict, ...] = ()
+    ):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.difficulty = difficulty
+        self.error_type = error_type
+        self.learning_objectives = learning_objectives
+        self.tests = tests
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Challenge":
+        return cls(
+            id=str(row["id"]),
+            title=row["title"],
+            description=row["description"],
+            difficulty=row["difficulty"],
+            error_type=row.get("error_type") or "",
+            learning_objectives=tuple(row.get("learning_objectives") or ()),
+            tests=tuple(row.get("tests") or ())
+        )
+
+
+class ChallengeCatalog:
+    """
+    Immutable snapshot of the challenge table with lookup indexes
+
+    Built once per refresh; requests only read it, so a refresh swaps in a
+    new catalog (with `version` bumped) and never mutates one in use.
+    Candidates by difficulty, error type or learning objective are located
+    with one dict lookup.
+    """
+
+    def __init__(self, challenges: Iterable[Challenge], version: int = 1, ttl: float = 300.0):
+        self.challenges: Tuple[Challenge, ...] = tuple(challenges)
+        self.version = version
+        self.loaded_at = time.time()
+        self.expires_at = self.loaded_at + ttl
+
+        self.by_id: Dict[str, Challenge] = {}
+        by_difficulty: Dict[str, list] = {}
+        by_error_type: Dict[str, list] = {}
+        by_objective: Dict[str, list] = {}
+        for challenge in self.challenges:
+            self.by_id[challenge.id] = challenge
+            by_difficulty.setdefault(challenge.difficulty, []).append(challenge)
+            by_error_type.setdefault(challenge.error_type, []).append(challenge)
+            for objective in challenge.learning_objectives:
+                by_objective.setdefault(objective, []).append(challenge)
+
+        self.by_difficulty = {k: tuple(v) for k, v in by_difficulty.items()}
+        self.by_error_type = {k: tuple(v) for k, v in by_error_type.items()}
+        self.by_objective = {k: tuple(v) for k, v in by_objective.items()}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict], version: int = 1, ttl: float = 300.0) -> "ChallengeCatalog":
+        return cls((Challenge.from_row(row) for row in rows), version=version, ttl=ttl)
+
+    def __len__(self) -> int:
+        return len(self.challenges)
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def get(self, challenge_id: str) -> Optional[Challenge]:
+        return self.by_id.get(challenge_id)
+
+    def with_difficulty(self, difficulty: str) -> Sequence[Challenge]:
+        return self.by_difficulty.get(difficulty, ())
+
+    def with_error_type(self, error_type: str) -> Sequence[Challenge]:
+        return self.by_error_type.get(error_type, ())
+
+    def with_objective(self, objective: str) -> Sequence[Challenge]:
+        return self.by_objective.get(objective, ())
+
+    def remaining(self, difficulties: Sequence[str], exclude: set) -> int:
+        """Number of challenges in these tiers not in `exclude` (O(len(exclude)))"""
+        total = sum(len(self.with_difficulty(d)) for d in difficulties)
+        for challenge_id in exclude:
+            challenge = self.by_id.get(challenge_id)
+            if challenge is not None and challenge.difficulty in difficulties:
+                total -= 1
+        return total
+
+    def sample(
+        self,
+        difficulties: Sequence[str],
+        exclude: set,
+        rng: random.Random = random,
+        attempts: int = 8
+    ) -> Optional[Challenge]:
+        """
+        Uniformly pick a challenge from these tiers that is not in `exclude`
+
+        Students have completed a small fraction of a large catalog, so a few
+        random draws almost always succeed; only a nearly exhausted tier
+        falls back to scanning it.
+        """
+        pools = [self.with_difficulty(d) for d in difficulties]
+        size = sum(len(pool) for pool in pools)
+        if size == 0 or self.remaining(difficulties, exclude) == 0:
+            return None
+
+        for _ in range(attempts):
+            index = rng.randrange(size)
+            for pool in pools:
+                if index < len(pool):
+                    break
+                index -= len(pool)
+            if pool[index].id not in exclude:
+                return pool[index]
+
+        candidates = [c for pool in pools for c in pool if c.id not in exclude]
+        return rng.choice(candidates)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "size": len(self.challenges),
+            "loaded_at": self.loaded_at,
+            "expires_in_seconds": round(max(0.0, self.expires_at - time.time()), 1),
+            "by_difficulty": {k: len(v) for k, v in self.by_difficulty.items()},
+            "error_types": len(self.by_error_type),
+            "learning_objectives": len(self.by_objective),
+        }
@@ -0,0 +1,690 @@
+import ast
+import builtins
+import io
+import tokenize
+from typing import Dict, List, Optional
+
+# Statements that must end their header line with a colon
+BLOCK_KEYWORDS = {
+    "if", "elif", "else", "for", "while", "def", "class",
+    "try", "except", "finally", "with", "async"
+}
+
+BUILTIN_NAMES = set(dir(builtins))
+
+# Literal types we can reason about for TypeError / AttributeError checks
+KNOWN_TYPES = {"str": str, "int": int, "float": float, "list": list, "dict": dict, "tuple": tuple}
+
+# List methods that change the length, so a tracked literal length no longer holds
+MUTATING_METHODS = {"append", "extend", "insert", "pop", "remove", "clear"}
+
+# When several findings exist, earlier lines win; ties are broken by this order
+ERROR_PRIORITY = ["SyntaxError", "IndexError", "TypeError", "NameError", "AttributeError", "LogicError"]
+
+
+class CodeAnalysis:
+    """Result of analysing a single snippet"""
+
+    __slots__ = ("error_type", "line", "detail", "findings", "parsed")
+
+    def __init__(self, findings: List[dict], parsed: bool):
+        self.findings = sorted(
+            findings,
+            key=lambda f: (f["line"], ERROR_PRIORITY.index(f["error_type"]))
+        )
+        self.parsed = parsed
+
+        if self.findings:
+            primary = self.findings[0]
+            self.error_type = primary["error_type"]
+            self.line = primary["line"]
+            self.detail = primary["detail"]
+        else:
+            self.error_type = "LogicError"
+            self.line = None
+            self.detail = {}
+
+    @property
+    def matched(self) -> bool:
+        """True when a structural rule fired (as opposed to the default guess)"""
+        return bool(self.findings)
+
+    def with_primary(self, finding: dict) -> "CodeAnalysis":
+        """Copy with `finding` as the primary result (e.g. the one running the code confirmed)"""
+        analysis = CodeAnalysis(self.findings, self.parsed)
+        analysis.error_type = finding["error_type"]
+        analysis.line = finding["line"]
+        analysis.detail = finding["detail"]
+        return analysis
+
+
+class _FeatureVisitor(ast.NodeVisitor):
+    """
+    Single tree walk that extracts structural bug features
+
+    Tracks literal list lengths and simple variable types as assignments are
+    seen, and keeps a stack of enclosing loops / functions so that subscripts,
+    updates and returns can be checked against their context without a
+    second pass over the tree. `no_return_funcs` maps each function without
+    a return value to its parameters and the last name its body assigns.
+    """
+
+    def __init__(self):
+        self.findings: List[dict] = []
+        self.list_lengths: Dict[str, int] = {}
+        self.var_types: Dict[str, str] = {}
+        self.defined: set = set()
+        # Loop variable -> (list, k, loop header, k in the header): it stays
+        # below len(list) + k (list None: below k); k moves with `+=`
+        self.loop_bounds: Dict[str, tuple] = {}
+        self.ended_loop_vars: Dict[str, int] = {}
+        self.no_return_funcs: Dict[str, tuple] = {}
+        self.while_stack: List[dict] = []
+        # Innermost loop last: a while loop's context, or None for a for loop
+        self.loop_stack: List[Optional[dict]] = []
+        self.func_stack: List[dict] = []
+        self.loads: List[tuple] = []
+        self.func_depth = 0
+        self._current_line = 1
+
+    def add(self, error_type: str, line: int, **detail):
+        self.findings.append({"error_type": error_type, "line": line, "detail": detail})
+
+    # --- definitions -------------------------------------------------------
+
+    def _bind(self, target: ast.AST, value: Optional[ast.AST]):
+        if isinstance(target, ast.Name):
+            name = target.id
+            self.defined.add(name)
+            self.ended_loop_vars.pop(name, None)
+            self.list_lengths.pop(name, None)
+            self.var_types.pop(name, None)
+            self.loop_bounds.pop(name, None)
+
+            if isinstance(value, (ast.List, ast.Tuple)):
+                self.list_lengths[name] = len(value.elts)
+                self.var_types[name] = "list" if isinstance(value, ast.List) else "tuple"
+            elif isinstance(value, ast.Dict):
+                self.var_types[name] = "dict"
+            elif value is not None:
+                value_type = self._expr_type(value)
+                if value_type:
+                    self.var_types[name] = value_type
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self._bind(elt, None)
+
+    def _expr_type(self, node: ast.AST) -> Optional[str]:
+        if isinstance(node, ast.Constant) and not isinstance(node.value, bool):
+            type_name = type(node.value).__name__
+            return type_name if type_name in KNOWN_TYPES else None
+        if isinstance(node, ast.JoinedStr):
+            return "str"
+        if isinstance(node, ast.Name):
+            return self.var_types.get(node.id)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in ("str", "int", "float", "input"):
+                return "str" if node.func.id == "input" else node.func.id
+        return None
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.defined.add((alias.asname or alias.name).split(".")[0])
+
+    visit_ImportFrom = visit_Import
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        self._check_update(node.targets, node.value)
+        self._check_missing_return(node.value, node.lineno)
+        for target in node.targets:
+            if not isinstance(target, ast.Name):
+                self.visit(target)
+            if isinstance(target, ast.Subscript) and isinstance(target.slice, ast.Slice) and isinstance(target.value, ast.Name):
+                # Slice assignment can resize the list
+                self.list_lengths.pop(target.value.id, None)
+            self._bind(target, node.value)
+
+    def visit_AnnAssign(self, node):
+        if node.value is not None:
+            self.visit(node.value)
+            self._check_update([node.target], node.value)
+        self._bind(node.target, node.value)
+
+    def visit_AugAssign(self, node):
+        self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            self.defined.add(node.target.id)
+            self.list_lengths.pop(node.target.id, None)
+            self._shift_bound(node.target.id, node.op, node.value)
+            is_noop = (
+                isinstance(node.op, (ast.Add, ast.Sub))
+                and isinstance(node.value, ast.Constant)
+                and node.value.value == 0
+            )
+            self._mark_updated(node.target.id, is_noop)
+        else:
+            self.visit(node.target)
+
+    def _bind_arguments(self, args: ast.arguments):
+        for arg in args.args + args.kwonlyargs + args.posonlyargs:
+            self.defined.add(arg.arg)
+        if args.vararg:
+            self.defined.add(args.vararg.arg)
+        if args.kwarg:
+            self.defined.add(args.kwarg.arg)
+
+    def visit_FunctionDef(self, node):
+        self.defined.add(node.name)
+        self._bind_arguments(node.args)
+
+        self.func_stack.append({"returns_value": False})
+        self.func_depth += 1
+        for stmt in node.body:
+            self.visit(stmt)
+        self.func_depth -= 1
+        ctx = self.func_stack.pop()
+
+        if not ctx["returns_value"] and not _is_stub(node.body):
+            self.no_return_funcs[node.name] = (ast.unparse(node.args), _last_assigned(node.body))
+        else:
+            self.no_return_funcs.pop(node.name, None)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.defined.add(node.name)
+        self.generic_visit(node)
+
+    def visit_Lambda(self, node):
+        self._bind_arguments(node.args)
+        self.visit(node.body)
+
+    def visit_comprehension(self, node):
+        self._bind(node.target, None)
+        self.visit(node.iter)
+        for cond in node.ifs:
+            self.visit(cond)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.defined.add(node.name)
+        self.generic_visit(node)
+
+    def visit_With(self, node):
+        for item in node.items:
+            self.visit(item.context_expr)
+            if item.optional_vars is not None:
+                self._bind(item.optional_vars, None)
+        for stmt in node.body:
+            self.visit(stmt)
+
+    def visit_Global(self, node):
+        self.defined.update(node.names)
+
+    visit_Nonlocal = visit_Global
+
+    def visit_Return(self, node):
+        self._exit_enclosing_while()
+        if node.value is not None:
+            self.visit(node.value)
+            if self.func_stack and not (
+                isinstance(node.value, ast.Constant) and node.value.value is None
+            ):
+                self.func_stack[-1]["returns_value"] = True
+
+    # --- loops -------------------------------------------------------------
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        bound = _range_stop(node.iter)
+        loop_var = node.target.id if isinstance(node.target, ast.Name) else None
+
+        self._bind(node.target, None)
+        if loop_var and bound is not None:
+            self.loop_bounds[loop_var] = bound + (node.iter, bound[1])
+
+        self.loop_stack.append(None)
+        for stmt in node.body:
+            self.visit(stmt)
+        self.loop_stack.pop()
+
+        if loop_var:
+            self.loop_bounds.pop(loop_var, None)
+            # Only module-level loops: function locals legitimately outlive loops
+            if self.func_depth == 0:
+                self.ended_loop_vars[loop_var] = node.end_lineno or node.lineno
+
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    def visit_While(self, node):
+        self.visit(node.test)
+        watched = _condition_names(node.test)
+        ctx = {
+            "line": node.lineno,
+            "watched": watched,
+            "constant_true": isinstance(node.test, ast.Constant) and bool(node.test.value),
+            "updated": set(),
+            "noop_updates": {},
+            "has_exit": False,
+        }
+        self.while_stack.append(ctx)
+        self.loop_stack.append(ctx)
+        bounded = _while_bound(node.test)
+        if bounded is not None:
+            self.loop_bounds[bounded[0]] = bounded[1:]
+        for stmt in node.body:
+            self.visit(stmt)
+        if bounded is not None:
+            self.loop_bounds.pop(bounded[0], None)
+        self.loop_stack.pop()
+        self.while_stack.pop()
+
+        if not ctx["has_exit"]:
+            if ctx["constant_true"]:
+                self.add("LogicError", node.lineno, reason="no_exit", loop_line=node.lineno)
+            elif watched and not (watched & ctx["updated"]):
+                name = sorted(watched)[0]
+                noop_line = ctx["noop_updates"].get(name)
+                self.add(
+                    "LogicError",
+                    noop_line or node.lineno,
+                    reason="noop_update" if noop_line else "no_update",
+                    variable=name,
+                    loop_line=node.lineno
+                )
+
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    def visit_Break(self, node):
+        # A break leaves only the innermost loop, which may be a for loop
+        if self.loop_stack and self.loop_stack[-1] is not None:
+            self.loop_stack[-1]["has_exit"] = True
+
+    def _exit_enclosing_while(self):
+        for ctx in self.while_stack:
+            ctx["has_exit"] = True
+
+    def _check_update(self, targets: List[ast.AST], value: ast.AST):
+        for target in targets:
+            if isinstance(target, ast.Name):
+                self._mark_updated(target.id, _is_noop_update(target.id, value))
+
+    def _mark_updated(self, name: str, is_noop: bool):
+        for ctx in self.while_stack:
+            if name not in ctx["watched"]:
+                continue
+            if is_noop:
+                ctx["noop_updates"].setdefault(name, self._current_line)
+            else:
+                ctx["updated"].add(name)
+
+    # --- expressions -------------------------------------------------------
+
+    def visit(self, node):
+        line = getattr(node, "lineno", None)
+        if line is not None:
+            self._current_line = line
+        return super().visit(node)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.loads.append((node.id, node.lineno))
+            ended_at = self.ended_loop_vars.get(node.id)
+            if ended_at is not None and node.lineno > ended_at:
+                self.add("NameError", node.lineno, name=node.id, reason="loop_scope")
+        elif isinstance(node.ctx, ast.Store):
+            self.defined.add(node.id)
+
+    def visit_Subscript(self, node):
+        self.generic_visit(node)
+        if not isinstance(node.value, ast.Name):
+            return
+        name = node.value.id
+        index = node.slice
+        if isinstance(index, ast.Constant) and isinstance(index.value, int):
+            length = self.list_lengths.get(name)
+            if length is not None and (index.value >= length or index.value < -length):
+                self.add(
+                    "IndexError", node.lineno,
+                    list=name, length=length, bound=index.value + 1, index=str(index.value)
+                )
+            return
+
+        # The largest index the subscript can reach, as len(ref) + k (ref None: k)
+        loop = None
+        reach = _len_offset(index)
+        if reach is None:
+            var = _var_offset(index)
+            if var is None or var[0] not in self.loop_bounds:
+                return
+            ref, stop, header, header_stop = self.loop_bounds[var[0]]
+            reach = (ref, stop - 1 + var[1])
+            loop = (var[0], header, header_stop)
+        ref, k = reach
+
+        if ref == name:
+            if k >= 0:
+                # Past the end whatever the list holds
+                self._add_overrun(node, name, k + 1, loop)
+            return
+        length = self.list_lengths.get(name)
+        if length is None:
+            return
+        if ref is not None:
+            if ref not in self.list_lengths:
+                return
+            k += self.list_lengths[ref]
+        if k >= length:
+            self.add(
+                "IndexError", node.lineno,
+                list=name, length=length, bound=k + 1, index=ast.unparse(index)
+            )
+
+    def _add_overrun(self, node: ast.Subscript, name: str, over: int, loop: Optional[tuple]):
+        """`name[...]` reaches `over` past its last index; `loop` is the bounding loop, if any"""
+        variable = header = fixed = None
+        if loop is not None:
+            variable, header_node, header_stop = loop
+            header = ast.unparse(header_node)
+            # The same loop, stopping `over` earlier
+            stop = ast.unparse(_len_expr(name, header_stop - over))
+            if isinstance(header_node, ast.Compare):
+                fixed = f"{variable} < {stop}"
+            else:
+                fixed = f"range({', '.join([ast.unparse(a) for a in header_node.args[:-1]] + [stop])})"
+        self.add(
+            "IndexError", node.lineno,
+            list=name, length=self.list_lengths.get(name), over=over,
+            index=ast.unparse(node.slice), variable=variable, header=header, fixed=fixed
+        )
+
+    def _shift_bound(self, name: str, op: ast.operator, value: ast.AST):
+        """`i += k` moves a loop variable's bound with it; other updates drop it"""
+        bound = self.loop_bounds.pop(name, None)
+        if bound is None:
+            return
+        if isinstance(op, (ast.Add, ast.Sub)) and isinstance(value, ast.Constant) and type(value.value) is int:
+            step = value.value if isinstance(op, ast.Add) else -value.value
+            self.loop_bounds[name] = (bound[0], bound[1] + step) + bound[2:]
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if not isinstance(node.op, (ast.Add, ast.Sub)):
+            return
+        left, right = self._expr_type(node.left), self._expr_type(node.right)
+        numeric = ("int", "float")
+        if (left == "str" and right in numeric) or (left in numeric and right == "str"):
+            str_side = node.left if left == "str" else node.right
+            self.add(
+                "TypeError", node.lineno,
+                reason="str_int_binop",
+                variable=str_side.id if isinstance(str_side, ast.Name) else None,
+                left=left, right=right
+            )
+
+    def visit_Attribute(self, node):
+        self.generic_visit(node)
+        if isinstance(node.value, ast.Name) and isinstance(node.ctx, ast.Load):
+            type_name = self.var_types.get(node.value.id)
+            if type_name and not hasattr(KNOWN_TYPES[type_name], node.attr):
+                self.add(
+                    "AttributeError", node.lineno,
+                    variable=node.value.id, type=type_name, attribute=node.attr
+                )
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id in ("exit", "quit"):
+            self._exit_enclosing_while()
+        elif (
+            isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name)
+            and node.func.attr in MUTATING_METHODS
+        ):
+            self.list_lengths.pop(node.func.value.id, None)
+
+    def visit_Delete(self, node):
+        self.generic_visit(node)
+        for target in node.targets:
+            if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+                self.list_lengths.pop(target.value.id, None)
+
+    def visit_Raise(self, node):
+        self.generic_visit(node)
+        self._exit_enclosing_while()
+
+    def _check_missing_return(self, value: ast.AST, line: int):
+        if (
+            isinstance(value, ast.Call)
+            and isinstance(value.func, ast.Name)
+            and value.func.id in self.no_return_funcs
+        ):
+            params, result = self.no_return_funcs[value.func.id]
+            self.add(
+                "TypeError", line,
+                reason="missing_return", function=value.func.id, params=params, result=result
+            )
+
+    def finish(self):
+        # Undefined names are resolved after the walk so later definitions
+        # (e.g. functions declared below their caller) are taken into account
+        reported = set()
+        for name, line in self.loads:
+            if name in self.defined or name in BUILTIN_NAMES or name in reported:
+                continue
+            reported.add(name)
+            self.add("NameError", line, name=name, reason="undefined")
+
+
+def _is_stub(body: List[ast.stmt]) -> bool:
+    """Functions that are only a docstring / pass / ... are not flagged"""
+    for stmt in body:
+        if isinstance(stmt, ast.Pass):
+            continue
+        if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+            continue
+        return False
+    return True
+
+
+def _last_assigned(body: List[ast.stmt]) -> Optional[str]:
+    """Name the last top-level assignment of a function body binds (its likely result)"""
+    for stmt in reversed(body):
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+            return stmt.targets[0].id
+        if isinstance(stmt, (ast.AugAssign, ast.AnnAssign)) and isinstance(stmt.target, ast.Name):
+            return stmt.target.id
+    return None
+
+
+def _range_stop(node: ast.AST) -> Optional[tuple]:
+    """Stop of `range(stop)` / `range(start, stop)` as (list, k) for `len(list) + k`, or (None, k)"""
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "range"
+        and node.args
+        and len(node.args) <= 2
+    ):
+        return _bound_expr(node.args[-1])
+    return None
+
+
+def _while_bound(test: ast.AST) -> Optional[tuple]:
+    """(variable, list, k, test, k) for `while var < len(list) + k` (or `<=`, or a literal stop)"""
+    if (
+        isinstance(test, ast.Compare)
+        and len(test.ops) == 1
+        and isinstance(test.ops[0], (ast.Lt, ast.LtE))
+        and isinstance(test.left, ast.Name)
+    ):
+        bound = _bound_expr(test.comparators[0])
+        if bound is not None:
+            if isinstance(test.ops[0], ast.LtE):
+                bound = (bound[0], bound[1] + 1)
+            return (test.left.id, *bound, test, bound[1])
+    return None
+
+
+def _bound_expr(node: ast.AST) -> Optional[tuple]:
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return None, node.value
+    return _len_offset(node)
+
+
+def _int_offset(node: ast.AST) -> Optional[tuple]:
+    """(base, k) for `base`, `base + k`, `base - k` and `k + base`"""
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+        if isinstance(node.right, ast.Constant) and type(node.right.value) is int:
+            return node.left, node.right.value if isinstance(node.op, ast.Add) else -node.right.value
+        if isinstance(node.op, ast.Add) and isinstance(node.left, ast.Constant) and type(node.left.value) is int:
+            return node.right, node.left.value
+        return None
+    return node, 0
+
+
+def _len_offset(node: ast.AST) -> Optional[tuple]:
+    """(list, k) for `len(list) + k`"""
+    base = _int_offset(node)
+    if base is None:
+        return None
+    call, k = base
+    if (
+        isinstance(call, ast.Call)
+        and isinstance(call.func, ast.Name)
+        and call.func.id == "len"
+        and len(call.args) == 1
+        and isinstance(call.args[0], ast.Name)
+    ):
+        return call.args[0].id, k
+    return None
+
+
+def _var_offset(node: ast.AST) -> Optional[tuple]:
+    """(name, k) for `name + k`"""
+    base = _int_offset(node)
+    if base is not None and isinstance(base[0], ast.Name):
+        return base[0].id, base[1]
+    return None
+
+
+def _len_expr(name: str, k: int) -> ast.AST:
+    """`len(name) + k` as a tree (k = 0: `len(name)`)"""
+    call = ast.Call(func=ast.Name("len"), args=[ast.Name(name)], keywords=[])
+    if k == 0:
+        return call
+    return ast.BinOp(call, ast.Add() if k > 0 else ast.Sub(), ast.Constant(abs(k)))
+
+
+def _condition_names(test: ast.AST) -> set:
+    if isinstance(test, ast.Compare):
+        return {n.id for n in [test.left, *test.comparators] if isinstance(n, ast.Name)}
+    if isinstance(test, ast.Name):
+        return {test.id}
+    if isinstance(test, ast.BoolOp):
+        names = set()
+        for value in test.values:
+            names |= _condition_names(value)
+        return names
+    return set()
+
+
+def _is_noop_update(name: str, value: ast.AST) -> bool:
+    """Detect `x = x + 0`, `x = x - 0` and `x = x`"""
+    if isinstance(value, ast.Name):
+        return value.id == name
+    return (
+        isinstance(value, ast.BinOp)
+        and isinstance(value.op, (ast.Add, ast.Sub))
+        and isinstance(value.left, ast.Name)
+        and value.left.id == name
+        and isinstance(value.right, ast.Constant)
+        and value.right.value == 0
+    )
+
+
+# Nesting too deep for the parser or the tree walk (e.g. `x = ---...-1`)
+_TOO_DEEP = (RecursionError, MemoryError)
+
+
+def _scan_tokens(code: str, error_line: Optional[int], invalid: bool = True) -> List[dict]:
+    """
+    Tokenizer-only fallback used when the snippet does not parse
+
+    Looks for block headers (`if`, `for`, `def`, ...) whose logical line does
+    not end with a colon, which is the most common student syntax error.
+    With `invalid`, a generic SyntaxError is reported when nothing else is.
+    """
+    findings = []
+    line_tokens: List[tokenize.TokenInfo] = []
+
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                _check_header(line_tokens, findings)
+                line_tokens = []
+            elif tok.type not in (
+                tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT
+            ):
+                line_tokens.append(tok)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        _check_header(line_tokens, findings)
+
+    if not findings and invalid:
+        findings.append({
+            "error_type": "SyntaxError",
+            "line": error_line or 1,
+            "detail": {"reason": "invalid_syntax"}
+        })
+    return findings
+
+
+def _check_header(tokens: List[tokenize.TokenInfo], findings: List[dict]):
+    if not tokens:
+        return
+    first = tokens[0]
+    if first.type != tokenize.NAME or first.string not in BLOCK_KEYWORDS:
+        return
+    if tokens[-1].string != ":":
+        findings.append({
+            "error_type": "SyntaxError",
+            "line": first.start[0],
+            "detail": {"reason": "missing_colon", "keyword": first.string}
+        })
+
+
+def _shallow_analysis(code: str) -> CodeAnalysis:
+    """Analysis of a snippet nested too deeply to parse or walk: tokenizer checks only"""
+    return CodeAnalysis(_scan_tokens(code, None, invalid=False), parsed=False)
+
+
+def analyze_code(code: Optional[str]) -> CodeAnalysis:
+    """
+    Classify the most likely bug in a Python snippet
+
+    Args:
+        code: Python source submitted by the student
+
+    Returns:
+        CodeAnalysis with the primary error type, its line and details
+    """
+    if not code or not code.strip():
+        return CodeAnalysis([], parsed=False)
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return CodeAnalysis(_scan_tokens(code, e.lineno), parsed=False)
+    except _TOO_DEEP:
+        return _shallow_analysis(code)
+
+    visitor = _FeatureVisitor()
+    try:
+        visitor.visit(tree)
+    except _TOO_DEEP:
+        return _shallow_analysis(code)
+    visitor.finish()
+    return CodeAnalysis(visitor.findings, parsed=True)
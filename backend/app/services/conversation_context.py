@@ -0,0 +1,244 @@
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rough per-turn bookkeeping (dict, deque slot, token count) on top of the text itself
+TURN_OVERHEAD_BYTES = 200
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Words and punctuation marks: a close, tokenizer-free stand-in for subword counts"""
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+def render_turn(turn: dict) -> str:
+    """A history turn as it appears in the model prompt"""
+    return f"{turn.get('role', 'user')}: {turn.get('content', '')}"
+
+
+class ConversationContextStore:
+    """
+    Recent turns of active conversations, kept in memory for prompt building
+
+    Each conversation holds a ring buffer of its last `max_turns` messages,
+    each with its prompt token count computed once when it enters the store.
+    `window` picks the most recent turns that fit a token budget from those
+    counts, so old turns are never re-tokenized and the model input size is
+    bounded no matter how large earlier messages were.
+
+    Messages are appended as they are saved, so a cached conversation is
+    never behind its own transcript and the DB is only read on a miss
+    (`begin_load` / `fill`, rehydrating from the messages table). Whole
+    conversations are evicted least-recently-used once the store's estimated
+    size exceeds `max_bytes`. A message saved while its conversation is not
+    cached is not stored; the next turn rehydrates it from the DB, where the
+    write-behind queue puts it within a flush interval.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_turns: int = 20,
+        count_tokens: Callable[[str], int] = estimate_tokens
+    ):
+        self.max_bytes = max_bytes
+        self.max_turns = max(1, max_turns)
+        self.count_tokens = count_tokens
+        # conversation_id -> [deque of turns, bytes]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        # conversation_id -> [loads in flight, turns saved during the load]
+        self._loading: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.appended = 0
+        self.rehydrated = 0
+        self.windows = 0
+        self.trimmed = 0
+
+    # --- turns ---
+
+    def _turn(self, role: str, content: str, code_snippet: Optional[str] = None) -> dict:
+        turn = {"role": role, "content": content or "", "code_snippet": code_snippet}
+        turn["tokens"] = self.count_tokens(render_turn(turn))
+        return turn
+
+    @staticmethod
+    def _size(turn: dict) -> int:
+        return len(turn["content"]) + len(turn["code_snippet"] or "") + TURN_OVERHEAD_BYTES
+
+    # --- lookups ---
+
+    def get(self, conversation_id: str) -> Optional[List[dict]]:
+        """The conversation's recent turns, oldest first (None on a miss)"""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            return list(entry[0])
+
+    def missing(self, conversation_ids: Iterable[str]) -> List[str]:
+        """IDs not in the store, deduplicated (a probe, not counted as lookups)"""
+        with self._lock:
+            return [c for c in dict.fromkeys(conversation_ids) if c not in self._entries]
+
+    def begin_load(self, conversation_id: str):
+        """Mark a DB read in flight; call before reading the conversation's messages"""
+        with self._lock:
+            loading = self._loading.setdefault(conversation_id, [0, []])
+            loading[0] += 1
+
+    def fill(self, conversation_id: str, rows: List[dict]) -> List[dict]:
+        """
+        Store messages read after `begin_load` and return the turns
+
+        Messages saved while the read was in flight are added after the rows,
+        unless the read already saw them.
+        """
+        turns = [self._turn(r.get("role", "user"), r.get("content"), r.get("code_snippet")) for r in rows]
+        with self._lock:
+            loading = self._loading.get(conversation_id)
+            if loading is not None:
+                seen = {(t["role"], t["content"]) for t in turns}
+                turns.extend(t for t in loading[1] if (t["role"], t["content"]) not in seen)
+                loading[0] -= 1
+                if loading[0] <= 0:
+                    del self._loading[conversation_id]
+            turns = turns[-self.max_turns:]
+            if conversation_id not in self._entries:
+                self._insert(conversation_id, turns)
+                self.rehydrated += 1
+            else:
+                # A concurrent load got there first and may have seen more
+                turns = list(self._entries[conversation_id][0])
+        return turns
+
+    def cancel_load(self, conversation_id: str):
+        """The read started by `begin_load` failed; nothing is stored"""
+        with self._lock:
+            loading = self._loading.get(conversation_id)
+            if loading is not None:
+                loading[0] -= 1
+                if loading[0] <= 0:
+                    del self._loading[conversation_id]
+
+    def append(self, conversation_id: str, role: str, content: str, code_snippet: Optional[str] = None):
+        """Record a saved message (called next to the write-behind enqueue)"""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            loading = self._loading.get(conversation_id)
+            if entry is None and loading is None:
+                return
+        turn = self._turn(role, content, code_snippet)
+        with self._lock:
+            loading = self._loading.get(conversation_id)
+            if loading is not None:
+                loading[1].append(turn)
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            turns = entry[0]
+            if len(turns) == turns.maxlen:
+                entry[1] -= self._size(turns[0])
+                self.bytes -= self._size(turns[0])
+            turns.append(turn)
+            entry[1] += self._size(turn)
+            self.bytes += self._size(turn)
+            self.appended += 1
+            self._entries.move_to_end(conversation_id)
+            self._evict()
+
+    # --- prompt building ---
+
+    def window(self, turns: Optional[List[dict]], budget: int, reserved: int = 0) -> List[dict]:
+        """
+        The most recent turns that fit in `budget - reserved` prompt tokens, oldest first
+
+        Turns are taken newest first and stop at the first one that doesn't
+        fit, so the history stays contiguous. One token per turn is counted
+        for the line break that joins it to the prompt.
+        """
+        remaining = budget - reserved
+        picked = []
+        turns = turns or []
+        for turn in reversed(turns):
+            tokens = turn.get("tokens")
+            if tokens is None:
+                tokens = self.count_tokens(render_turn(turn))  # Rows that didn't come through the store
+            if tokens + 1 > remaining:
+                break
+            picked.append(turn)
+            remaining -= tokens + 1
+        self.windows += 1
+        if len(picked) < len(turns):
+            self.trimmed += 1
+        picked.reverse()
+        return picked
+
+    # --- housekeeping ---
+
+    def invalidate(self, conversation_id: str):
+        with self._lock:
+            entry = self._entries.pop(conversation_id, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "conversations": len(self._entries),
+                "turns": sum(len(entry[0]) for entry in self._entries.values()),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_turns": self.max_turns,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "appended": self.appended,
+                "rehydrated": self.rehydrated,
+                "windows": self.windows,
+                "windows_trimmed": self.trimmed,
+            }
+
+    def _insert(self, conversation_id: str, turns: List[dict]):
+        # Caller holds the lock
+        if self.max_bytes <= 0:
+            return
+        size = sum(self._size(t) for t in turns)
+        self._entries[conversation_id] = [deque(turns, maxlen=self.max_turns), size]
+        self.bytes += size
+        self._evict()
+
+    def _evict(self):
+        # Caller holds the lock
+        while self.bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry[1]
+            self.evictions += 1
+
+
+# Singleton instance
+context_store = ConversationContextStore(
+    max_bytes=int(float(os.getenv("CONTEXT_STORE_MB", 64)) * 1024 * 1024),
+    max_turns=int(os.getenv("CONTEXT_MAX_TURNS", 20))
+)
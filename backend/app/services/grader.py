@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from app.lib.executors import executors
+from app.lib.sandbox import SandboxPool, STUDENT_FILENAME, sandbox
+from app.lib.telemetry import telemetry
+from app.services.challenge_catalog import Challenge
+from app.services.code_analyzer import analyze_code
+from app.services.response_cache import ResponseCache, normalize_code
+
+load_dotenv()
+
+# Longest expected/actual output quoted back in a failure message
+MAX_QUOTED_OUTPUT = 200
+
+# Program run for a test with a check: the submission, then the check, in one
+# namespace. Everything the harness needs is bound as a default argument
+# before the submission starts, so the submission can neither rebind it nor
+# end the run early (SystemExit) to skip the check.
+_HARNESS = """\
+class _ExitedEarly(Exception):
+    pass
+class _CheckFailed(Exception):
+    pass
+def _harness(submission, check, namespace, exec=exec, compile=compile, type=type, str=str, repr=repr,
+             Exception=Exception, SystemExit=SystemExit, ExitedEarly=_ExitedEarly, CheckFailed=_CheckFailed):
+    try:
+        exec(compile(submission, {student!r}, "exec"), namespace)
+    except SystemExit as e:
+        raise ExitedEarly(repr(e.code)) from None
+    try:
+        exec(compile(check, "<check>", "exec"), namespace)
+    except Exception as e:
+        raise CheckFailed(type(e).__name__ + ": " + str(e)) from None
+_harness({submission!r}, {check!r}, globals())
+"""
+
+
+def suite_fingerprint(tests: Sequence[dict]) -> str:
+    """Changes whenever a challenge's test suite is edited"""
+    return hashlib.sha256(json.dumps(list(tests), sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def grade_key(challenge: Challenge, code: str) -> str:
+    """Content address of (challenge, test suite, normalized submission)"""
+    payload = f"{challenge.id}\0{suite_fingerprint(challenge.tests)}\0{normalize_code(code)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _test_name(test: dict, index: int) -> str:
+    return test.get("name") or f"test {index + 1}"
+
+
+def _quote(text: str) -> str:
+    text = text if len(text) <= MAX_QUOTED_OUTPUT else text[:MAX_QUOTED_OUTPUT] + "..."
+    return json.dumps(text)
+
+
+def _same_output(actual: str, expected: str) -> bool:
+    """Exact match up to trailing whitespace on each line and at the end"""
+    def lines(text: str) -> list:
+        return [line.rstrip() for line in text.rstrip().split("\n")]
+    return lines(actual) == lines(expected)
+
+
+def _judge(test: dict, code: str, execution: dict) -> Tuple[bool, Optional[str]]:
+    """Did one run satisfy the test? (passed, failure message)"""
+    status = execution["status"]
+    if status in ("timeout", "cpu_limit", "memory_limit", "crashed"):
+        return False, execution["message"]
+    if status == "error":
+        line = execution["line"]
+        if test.get("check") and execution["error_type"] == "_ExitedEarly":
+            return False, f"The program exited (exit({execution['message']})) before the test's check ran"
+        if test.get("check") and execution["error_type"] == "_CheckFailed":
+            # Raised by the test's own check code, which runs after the submission
+            failed = test["check"].splitlines()[-1].strip()
+            if execution["message"].startswith("AssertionError:"):
+                return False, f"Check failed: `{failed}`"
+            return False, f"`{failed}` raised {execution['message']}"
+        where = f" on line {line}" if line else ""
+        return False, f"{execution['error_type']}{where}: {execution['message']}"
+    if "stdout" in test and not _same_output(execution["stdout"], test["stdout"]):
+        return False, f"Expected output {_quote(test['stdout'])}, got {_quote(execution['stdout'])}"
+    return True, None
+
+
+def _program(code: str, test: dict) -> str:
+    """The submission, run through the check harness when the test has a check"""
+    if not test.get("check"):
+        return code
+    return _HARNESS.format(student=STUDENT_FILENAME, submission=code, check=test["check"])
+
+
+class Grader:
+    """
+    Runs submissions against their challenge's test suite
+
+    Cheap checks come first, in this process: a submission that does not
+    compile, or that the analyzer still flags for a `forbid` test, fails
+    without touching the sandbox. The remaining tests run in parallel, one
+    per sandbox worker, and grading stops at the first failure (tests not
+    yet started are skipped). Results are cached per (challenge, test suite,
+    normalized submission), so resubmitting the same fix, or regrading a
+    class where many students submitted identical code, runs it once.
+    With `fail_fast=False` every test runs (a full report).
+    """
+
+    def __init__(self, pool: SandboxPool, cache: Optional[ResponseCache] = None, fail_fast: bool = True):
+        self.pool = pool
+        self.cache = cache
+        self.fail_fast = fail_fast
+        # One runner per sandbox worker; runners only wait on the sandbox, so
+        # grading from the shared I/O pool can't deadlock on them
+        self._runners = ThreadPoolExecutor(
+            max_workers=max(1, pool.size), thread_name_prefix="phychat-grader"
+        )
+        self._lock = threading.Lock()
+
+        self.graded = 0
+        self.passed = 0
+        self.tests_run = 0
+        self.tests_skipped = 0
+        self.failed_fast = 0
+        self.grade_ms_total = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool.size > 0
+
+    def grade_sync(self, challenge: Challenge, code: str) -> dict:
+        """Grade one submission (blocks until its tests finish or one fails)"""
+        key = grade_key(challenge, code) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return {**cached, "cached": True}
+
+        result = self._run_suite(challenge, code)
+        # Infrastructure problems ("error") are retried next time, not cached
+        if key is not None and result["status"] != "error":
+            self.cache.put(key, result)
+        return result
+
+    async def grade(self, challenge: Challenge, code: str) -> dict:
+        """Non-blocking grade: waits on the I/O thread pool while tests run"""
+        with telemetry.span("grading"):
+            return await executors.run_io(self.grade_sync, challenge, code)
+
+    async def grade_many(self, submissions: List[Tuple[Optional[Challenge], str]]) -> Tuple[List[dict], int]:
+        """
+        Grade a batch (e.g. a class regrade); results are in input order
+
+        Identical submissions to the same challenge are graded once. Returns
+        the results and how many submissions were duplicates in the batch.
+        """
+        unique = {}
+        keys = []
+        for challenge, code in submissions:
+            if challenge is None:
+                keys.append(None)
+                continue
+            key = grade_key(challenge, code)
+            unique.setdefault(key, (challenge, code))
+            keys.append(key)
+
+        graded = await asyncio.gather(*(self.grade(challenge, code) for challenge, code in unique.values()))
+        by_key = dict(zip(unique, graded))
+        results = [
+            by_key[key] if key is not None else self._error(None, "Unknown challenge")
+            for key in keys
+        ]
+        return results, sum(1 for key in keys if key is not None) - len(unique)
+
+    # --- running a suite ---
+
+    def _run_suite(self, challenge: Challenge, code: str) -> dict:
+        start = time.perf_counter()
+        tests = list(challenge.tests)
+        if not tests:
+            return self._error(challenge, "This challenge has no test suite")
+        if not self.enabled:
+            return self._error(challenge, "Code execution is disabled (SANDBOX_WORKERS=0)")
+
+        results: List[Optional[dict]] = [None] * len(tests)
+        runtime = [i for i, test in enumerate(tests) if "forbid" not in test]
+        failed = self._precheck(code, tests, results)
+
+        if runtime and not (failed and self.fail_fast):
+            failed = self._run_parallel(code, tests, runtime, results) or failed
+
+        for i, test in enumerate(tests):
+            if results[i] is None:
+                results[i] = {"name": _test_name(test, i), "status": "skipped", "message": None, "duration_ms": 0.0}
+        if any(r["status"] == "unavailable" for r in results):
+            return self._error(challenge, "No sandbox worker was available; try again")
+
+        passed_count = sum(1 for r in results if r["status"] == "passed")
+        skipped = sum(1 for r in results if r["status"] == "skipped")
+        result = {
+            "challenge_id": challenge.id,
+            "status": "failed" if failed else "passed",
+            "passed": not failed,
+            "passed_count": passed_count,
+            "total": len(tests),
+            "tests": results,
+            "message": None,
+            "duration_ms": round((time.perf_counter() - start) * 1e3, 3),
+            "cached": False,
+        }
+        with self._lock:
+            self.graded += 1
+            self.passed += int(not failed)
+            self.tests_run += len(tests) - skipped
+            self.tests_skipped += skipped
+            self.failed_fast += int(failed and skipped > 0)
+            self.grade_ms_total += result["duration_ms"]
+        return result
+
+    def _precheck(self, code: str, tests: List[dict], results: List[Optional[dict]]) -> bool:
+        """In-process checks (compile, static `forbid` tests); True on a failure"""
+        try:
+            compile(code, STUDENT_FILENAME, "exec")
+        except SyntaxError as e:
+            # Every test would fail the same way; report it on the first
+            results[0] = {
+                "name": _test_name(tests[0], 0),
+                "status": "failed",
+                "message": f"SyntaxError on line {e.lineno}: {e.msg}",
+                "duration_ms": 0.0,
+            }
+            return True
+
+        forbidden = [i for i, test in enumerate(tests) if "forbid" in test]
+        if not forbidden:
+            return False
+        start = time.perf_counter()
+        analysis = analyze_code(code)
+        elapsed = round((time.perf_counter() - start) * 1e3, 3)
+        failed = False
+        for i in forbidden:
+            finding = next((f for f in analysis.findings if f["error_type"] == tests[i]["forbid"]), None)
+            results[i] = {
+                "name": _test_name(tests[i], i),
+                "status": "passed" if finding is None else "failed",
+                "message": None if finding is None else f"Still has the {finding['error_type']} on line {finding['line']}",
+                "duration_ms": elapsed,
+            }
+            failed = failed or finding is not None
+            if failed and self.fail_fast:
+                break
+        return failed
+
+    def _run_parallel(self, code: str, tests: List[dict], indexes: List[int], results: List[Optional[dict]]) -> bool:
+        """Run tests on the sandbox concurrently; stop at the first failure (fail_fast)"""
+        stop = threading.Event()
+        pending = {self._runners.submit(self._run_test, code, tests[i], i, stop): i for i in indexes}
+        failed = False
+        while pending and not (failed and self.fail_fast):
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                results[i] = future.result()
+                if results[i]["status"] != "passed":
+                    failed = True
+        if pending:
+            stop.set()
+            for future in pending:
+                # Not started yet: never runs. Already running: finishes in
+                # the background and its result is dropped.
+                future.cancel()
+        return failed
+
+    def _run_test(self, code: str, test: dict, index: int, stop: threading.Event) -> dict:
+        name = _test_name(test, index)
+        if stop.is_set():
+            return {"name": name, "status": "skipped", "message": None, "duration_ms": 0.0}
+        execution = self.pool.run_sync(_program(code, test), test.get("stdin", "")).to_dict()
+        if execution["status"] == "unavailable":
+            return {"name": name, "status": "unavailable", "message": execution["message"], "duration_ms": 0.0}
+        passed, message = _judge(test, code, execution)
+        return {
+            "name": name,
+            "status": "passed" if passed else "failed",
+            "message": message,
+            "duration_ms": execution["duration_ms"],
+        }
+
+    def _error(self, challenge: Optional[Challenge], message: str) -> dict:
+        return {
+            "challenge_id": challenge.id if challenge is not None else None,
+            "status": "error",
+            "passed": False,
+            "passed_count": 0,
+            "total": len(challenge.tests) if challenge is not None else 0,
+            "tests": [],
+            "message": message,
+            "duration_ms": 0.0,
+            "cached": False,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "graded": self.graded,
+                "passed": self.passed,
+                "tests_run": self.tests_run,
+                "tests_skipped": self.tests_skipped,
+                "failed_fast": self.failed_fast,
+                "avg_grade_ms": round(self.grade_ms_total / self.graded, 3) if self.graded else 0.0,
+            }
+        stats["cache"] = self.cache.stats() if self.cache is not None else None
+        return stats
+
+
+def _build_grader() -> Grader:
+    cache = ResponseCache(
+        max_size=int(os.getenv("GRADE_CACHE_SIZE", 10000)),
+        ttl=float(os.getenv("GRADE_CACHE_TTL", 86400))
+    )
+    # Disabled with GRADE_CACHE_SIZE=0
+    return Grader(sandbox, cache if cache.max_size > 0 else None)
+
+
+# Singleton instance
+grader = _build_grader()
@@ -0,0 +1,561 @@
+import ast
+import bisect
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from app.services.code_analyzer import (
+    BUILTIN_NAMES, CodeAnalysis, _FeatureVisitor, _TOO_DEEP, _scan_tokens, _shallow_analysis
+)
+
+load_dotenv()
+
+_MISSING = object()
+
+# Shared state is copied before every N-th top-level statement
+CHECKPOINT_EVERY = 16
+
+# Top-level lines that continue the previous statement rather than start one
+_CONTINUATION_KEYWORDS = {"else", "elif", "except", "finally"}
+_LEADING_WORD_RE = re.compile(r"[A-Za-z_]\w*")
+# Lines without these characters only change the bracket depth
+_STRING_RE = re.compile(r"[\"'#\\]")
+
+
+def _scan_line(line: str, depth: int, triple: Optional[str]) -> Tuple[int, Optional[str], bool]:
+    """Bracket depth, open triple-quote and backslash continuation after `line`"""
+    if triple is None and not _STRING_RE.search(line):
+        opened = line.count("(") + line.count("[") + line.count("{")
+        closed = line.count(")") + line.count("]") + line.count("}")
+        return max(0, depth + opened - closed), None, False
+
+    i, n = 0, len(line)
+    comment = False
+    while i < n:
+        if triple is not None:
+            end = line.find(triple, i)
+            if end < 0:
+                break
+            i, triple = end + 3, None
+            continue
+        c = line[i]
+        if c == "#":
+            comment = True
+            break
+        if c in "\"'":
+            if line.startswith(c * 3, i):
+                triple, i = c * 3, i + 3
+                continue
+            j = i + 1
+            while j < n and line[j] != c:
+                j += 2 if line[j] == "\\" else 1
+            i = j + 1
+            continue
+        if c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth = max(0, depth - 1)
+        i += 1
+
+    continued = triple is None and not comment and line.rstrip().endswith("\\")
+    return depth, triple, continued
+
+
+def _starts_statement(line: str) -> bool:
+    """Whether a line at bracket depth 0, outside strings, opens a new top-level statement"""
+    if not line or line[0] in " \t#" or not line.strip():
+        return False
+    word = _LEADING_WORD_RE.match(line)
+    return not (word and word.group(0) in _CONTINUATION_KEYWORDS)
+
+
+def _next_start(lines: List[str], begin: int) -> int:
+    """The first top-level statement start after `begin` (itself a start)"""
+    depth, triple, continued = 0, None, False
+    after_decorator = False
+    for i in range(begin, len(lines)):
+        line = lines[i]
+        if depth == 0 and triple is None and not continued and _starts_statement(line):
+            if i > begin and not after_decorator:
+                return i
+            after_decorator = line.startswith("@")
+        depth, triple, continued = _scan_line(line, depth, triple)
+    return len(lines)
+
+
+def _find_starts(lines: List[str]) -> List[int]:
+    starts = [0]
+    while True:
+        start = _next_start(lines, starts[-1])
+        if start >= len(lines):
+            return starts
+        starts.append(start)
+
+
+class _State:
+    """Cross-statement visitor state: list lengths, types, ended loops, no-return functions"""
+
+    __slots__ = ("list_lengths", "var_types", "ended_loop_vars", "no_return_funcs")
+
+    def __init__(self):
+        self.list_lengths: Dict[str, int] = {}
+        self.var_types: Dict[str, str] = {}
+        self.ended_loop_vars: Dict[str, int] = {}
+        self.no_return_funcs: Dict[str, tuple] = {}
+
+    def copy(self) -> "_State":
+        state = _State()
+        state.list_lengths = dict(self.list_lengths)
+        state.var_types = dict(self.var_types)
+        state.ended_loop_vars = dict(self.ended_loop_vars)
+        state.no_return_funcs = dict(self.no_return_funcs)
+        return state
+
+    def __eq__(self, other) -> bool:
+        return (
+            self.list_lengths == other.list_lengths
+            and self.var_types == other.var_types
+            and self.ended_loop_vars == other.ended_loop_vars
+            and self.no_return_funcs == other.no_return_funcs
+        )
+
+    def value(self, name: str) -> tuple:
+        return (
+            self.list_lengths.get(name, _MISSING),
+            self.var_types.get(name, _MISSING),
+            name in self.ended_loop_vars,
+            self.no_return_funcs.get(name, _MISSING),
+        )
+
+    def apply(self, writes: List[tuple]):
+        for field, name, value in writes:
+            target = getattr(self, field)
+            if value is _MISSING:
+                target.pop(name, None)
+            else:
+                # Loops from earlier statements have always ended before any later load
+                target[name] = 0 if field == "ended_loop_vars" else value
+
+
+class _OverlayDict:
+    """Writes stay local to the statement; reads through to the shared state are recorded"""
+
+    def __init__(self, visitor: "_SegmentVisitor", base: dict):
+        self.visitor = visitor
+        self.base = base
+        self.local: dict = {}
+
+    def get(self, key, default=None):
+        if key in self.local:
+            value = self.local[key]
+            return default if value is _MISSING else value
+        self.visitor.read(key)
+        return self.base.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.local[key] = value
+
+    def pop(self, key, default=None):
+        # The visitor never uses the popped value, so this is not a read
+        self.local[key] = _MISSING
+        return default
+
+
+class _SegmentVisitor(_FeatureVisitor):
+    """The classifier's visitor, run over one top-level statement against shared state"""
+
+    def __init__(self, state: _State):
+        super().__init__()
+        self.state = state
+        self.reads: Dict[str, tuple] = {}
+        self.list_lengths = _OverlayDict(self, state.list_lengths)
+        self.var_types = _OverlayDict(self, state.var_types)
+        self.ended_loop_vars = _OverlayDict(self, state.ended_loop_vars)
+        self.no_return_funcs = _OverlayDict(self, state.no_return_funcs)
+
+    def read(self, name: str):
+        if name not in self.reads:
+            self.reads[name] = self.state.value(name)
+
+    def writes(self) -> List[tuple]:
+        out = []
+        for field in ("list_lengths", "var_types", "ended_loop_vars", "no_return_funcs"):
+            for name, value in getattr(self, field).local.items():
+                out.append((field, name, value))
+        return out
+
+
+class _Segment:
+    """
+    One top-level statement: parse tree and its analysis
+
+    `origin` maps tree line numbers to the snippet: a tree line `n` is line
+    `n + start - origin`, where `start` is the statement's current first
+    line, so statements keep their trees when edits above them move them.
+    `reads` snapshots the shared state the statement looked at; while those
+    values are unchanged, its findings and effects (`writes`) are reused.
+    Segments are never mutated once analysed, so sessions can share them.
+    """
+
+    __slots__ = ("tree", "origin", "reads", "writes", "defined", "free", "findings")
+
+    def __init__(self, tree: Optional[ast.Module], origin: int = 0):
+        self.tree = tree
+        self.origin = origin
+        self.reads: Optional[Dict[str, tuple]] = None
+        self.writes: List[tuple] = []
+        self.defined: set = set()
+        self.free: List[tuple] = []
+        self.findings: List[dict] = []
+
+    @classmethod
+    def parse(cls, text: str) -> "_Segment":
+        try:
+            return cls(ast.parse(text))
+        except (SyntaxError, *_TOO_DEEP):
+            return cls(None)
+
+    def is_current(self, state: _State) -> bool:
+        return self.reads is not None and all(state.value(n) == v for n, v in self.reads.items())
+
+    def analysed(self, state: _State) -> "_Segment":
+        segment = _Segment(self.tree, self.origin)
+        visitor = _SegmentVisitor(state)
+        visitor.visit(self.tree)
+        segment.reads = visitor.reads
+        segment.writes = visitor.writes()
+        segment.defined = visitor.defined
+        segment.findings = visitor.findings
+        # First load of each name not bound here; resolved against the whole snippet later
+        seen = set()
+        for name, line in visitor.loads:
+            if name not in seen and name not in visitor.defined and name not in BUILTIN_NAMES:
+                seen.add(name)
+                segment.free.append((name, line))
+        return segment
+
+
+def _shift(finding: dict, offset: int) -> dict:
+    detail = {k: v + offset if k.endswith("_line") and isinstance(v, int) else v for k, v in finding["detail"].items()}
+    return {"error_type": finding["error_type"], "line": finding["line"] + offset, "detail": detail}
+
+
+class AnalysisSession:
+    """
+    Analysed snapshot of one snippet: lines, statement boundaries and segments
+
+    `checkpoints` holds copies of the shared state before every
+    CHECKPOINT_EVERY-th statement, so a derived session starts visiting at
+    the checkpoint just before the edit, and stops once its state matches
+    the previous session's again (everything after is then unchanged).
+    """
+
+    __slots__ = ("lines", "starts", "segments", "checkpoints", "analysis", "reanalysed", "used_at")
+
+    def __init__(
+        self,
+        lines: List[str],
+        starts: List[int],
+        segments: List[_Segment],
+        previous: Optional["AnalysisSession"] = None,
+        first: int = 0,
+        sources: Optional[List[int]] = None
+    ):
+        self.lines = lines
+        self.starts = starts
+        self.segments = segments
+        self.checkpoints: Dict[int, _State] = {}
+        self.reanalysed = 0
+        self.used_at = time.time()
+        self.analysis = self._evaluate(previous, first, sources)
+
+    @property
+    def reused(self) -> int:
+        return len(self.segments) - self.reanalysed
+
+    def _evaluate(self, previous: Optional["AnalysisSession"], first: int, sources: Optional[List[int]]) -> CodeAnalysis:
+        if not any(line.strip() for line in self.lines):
+            return CodeAnalysis([], parsed=False)
+        if any(s.tree is None for s in self.segments):
+            code = "\n".join(self.lines)
+            try:
+                tree = ast.parse(code)
+            except SyntaxError as e:
+                return CodeAnalysis(_scan_tokens(code, e.lineno), parsed=False)
+            except _TOO_DEEP:
+                return _shallow_analysis(code)
+            # The statement split disagreed with the parser: analyse as one statement
+            self.starts = [0]
+            self.segments = [_Segment(tree)]
+            previous = sources = None
+
+        try:
+            self._fold(previous, first, sources)
+        except _TOO_DEEP:
+            return _shallow_analysis("\n".join(self.lines))
+
+        findings = []
+        offsets = [start - s.origin for s, start in zip(self.segments, self.starts)]
+        for segment, offset in zip(self.segments, offsets):
+            if segment.findings:
+                findings.extend(_shift(f, offset) for f in segment.findings)
+
+        # Undefined names need every definition in the snippet (as in analyze_code)
+        defined = set().union(*(s.defined for s in self.segments))
+        reported = set()
+        for segment, offset in zip(self.segments, offsets):
+            for name, line in segment.free:
+                if name not in defined and name not in reported:
+                    reported.add(name)
+                    findings.append({"error_type": "NameError", "line": line + offset,
+                                     "detail": {"name": name, "reason": "undefined"}})
+        return CodeAnalysis(findings, parsed=True)
+
+    def _fold(self, previous: Optional["AnalysisSession"], first: int, sources: Optional[List[int]]):
+        """
+        Thread the shared state through the statements, re-visiting stale ones
+
+        `sources[k]` is the previous session's index of statement `k` (-1 if
+        new). Where a run of statements is carried over unchanged and the
+        state entering it equals the previous session's, the run is skipped
+        to its last checkpoint without visiting anything.
+        """
+        segments = self.segments
+        old = previous.checkpoints if previous is not None else {}
+        begin = max((k for k in old if k <= first), default=0)
+        state, borrowed = old.get(begin) or _State(), begin in old
+        self.checkpoints = {k: c for k, c in old.items() if k < begin}
+        last_checkpoint = -CHECKPOINT_EVERY
+
+        k = begin
+        while k < len(segments):
+            j = sources[k] if sources is not None else -1
+            checkpoint = old.get(j)
+            if checkpoint is not None and (checkpoint is state or checkpoint == state):
+                run = 1
+                while k + run < len(segments) and sources[k + run] == j + run:
+                    run += 1
+                reached = j
+                for q in range(j, j + run + 1):
+                    if q in old:
+                        self.checkpoints[k + q - j] = old[q]
+                        reached = q
+                last_checkpoint = k + reached - j
+                if reached > j:
+                    k += reached - j
+                    state, borrowed = old[reached], True
+                    continue
+            elif k - last_checkpoint >= CHECKPOINT_EVERY:
+                self.checkpoints[k] = state if borrowed else state.copy()
+                last_checkpoint = k
+
+            segment = segments[k]
+            if not segment.is_current(state):
+                segment = segments[k] = segment.analysed(state)
+                self.reanalysed += 1
+            if segment.writes:
+                if borrowed:
+                    # Checkpoints are shared between sessions and never mutated
+                    state, borrowed = state.copy(), False
+                state.apply(segment.writes)
+            k += 1
+
+
+def _split_module(tree: ast.Module) -> Tuple[List[int], List[_Segment]]:
+    """Statement starts and segments from a whole-snippet parse (one parse instead of one per statement)"""
+    starts: List[int] = []
+    segments: List[_Segment] = []
+    for stmt in tree.body:
+        decorators = getattr(stmt, "decorator_list", None) or []
+        start = min([stmt.lineno] + [d.lineno for d in decorators]) - 1
+        if starts and starts[-1] == start:
+            # `a = 1; b = 2` shares a line: one segment
+            segments[-1].tree.body.append(stmt)
+            continue
+        starts.append(start)
+        segments.append(_Segment(ast.Module(body=[stmt], type_ignores=[]), origin=start))
+    if not starts:
+        return [0], [_Segment(tree)]
+    # Leading comments / blank lines belong to the first statement
+    segments[0].origin -= starts[0]
+    starts[0] = 0
+    return starts, segments
+
+
+def build_session(code: str) -> AnalysisSession:
+    """Analyse a snippet from scratch"""
+    lines = code.split("\n")
+    try:
+        starts, segments = _split_module(ast.parse(code))
+    except (SyntaxError, *_TOO_DEEP):
+        starts = _find_starts(lines)
+        bounds = starts + [len(lines)]
+        segments = [_Segment.parse("\n".join(lines[bounds[k]:bounds[k + 1]])) for k in range(len(starts))]
+    return AnalysisSession(lines, starts, segments)
+
+
+def derive_session(previous: AnalysisSession, code: str) -> AnalysisSession:
+    """
+    Analyse an edited snippet against a previous session
+
+    Statements before the first changed line are kept as they are. From
+    there on, each statement whose lines are identical to one of the
+    previous session's (wherever it moved to) keeps its parse tree; only
+    edited statements are re-split with the line scanner and re-parsed.
+    Statements are then re-visited only if the shared state they read
+    (list lengths, types, ...) changed.
+    """
+    new_lines = code.split("\n")
+    old_lines = previous.lines
+    if new_lines == old_lines:
+        return previous
+
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+
+    old_starts = previous.starts
+    old_bounds = old_starts + [len(old_lines)]
+    # One statement earlier: an inserted `else:` or decorator can attach to it
+    first = max(0, bisect.bisect_right(old_starts, prefix) - 2)
+    # Statements from `last` on lie in the unchanged suffix
+    last = bisect.bisect_left(old_starts, len(old_lines) - suffix)
+    delta = len(new_lines) - len(old_lines)
+
+    by_first_line: Dict[str, List[int]] = {}
+    for k in range(first, last):
+        by_first_line.setdefault(old_lines[old_starts[k]], []).append(k)
+
+    def match(k: int, i: int) -> int:
+        """Length of old statement `k` if it reappears unchanged at line `i`, else 0"""
+        a, b = old_bounds[k], old_bounds[k + 1]
+        end = i + b - a
+        if new_lines[i:end] != old_lines[a:b]:
+            return 0
+        # The next line must still start a statement, or `k` has grown
+        if end < len(new_lines) and (new_lines[end - 1].startswith("@") or not _starts_statement(new_lines[end])):
+            return 0
+        return b - a
+
+    starts = old_starts[:first]
+    segments = previous.segments[:first]
+    sources = list(range(first))
+    i, expect = old_starts[first], first
+    while i < len(new_lines):
+        tail = bisect.bisect_left(old_starts, i - delta, last)
+        if tail < len(old_starts) and old_starts[tail] == i - delta:
+            # Back in step with the previous session: the rest splits the same way
+            starts.extend(start + delta for start in old_starts[tail:])
+            segments.extend(previous.segments[tail:])
+            sources.extend(range(tail, len(old_starts)))
+            break
+        candidates = by_first_line.get(new_lines[i], ())
+        if expect not in candidates or not match(expect, i):
+            # Nearest to where the previous statement was found first (snippets repeat lines)
+            candidates = sorted(candidates, key=lambda k: abs(k - expect))
+        else:
+            candidates = (expect,)
+        for k in candidates:
+            length = match(k, i)
+            if length:
+                starts.append(i)
+                segments.append(previous.segments[k])
+                sources.append(k)
+                i, expect = i + length, k + 1
+                break
+        else:
+            end = _next_start(new_lines, i)
+            starts.append(i)
+            segments.append(_Segment.parse("\n".join(new_lines[i:end])))
+            sources.append(-1)
+            i, expect = end, expect + 1
+
+    return AnalysisSession(new_lines, starts, segments, previous, first, sources)
+
+
+class IncrementalAnalyzer:
+    """
+    Per-conversation analysis state for follow-up turns
+
+    Each conversation keeps the last analysed session. A re-submitted
+    snippet is diffed against it and only the edited statements are
+    re-parsed and re-analysed, so a one-line change costs about the same
+    regardless of snippet size. Sessions are kept in an LRU with a TTL.
+    """
+
+    def __init__(self, max_sessions: int = 1024, ttl: float = 1800.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, AnalysisSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.full = 0
+        self.incremental = 0
+        self.segments_reused = 0
+        self.segments_reanalysed = 0
+
+    def analyze(self, conversation_id: str, code: Optional[str]) -> CodeAnalysis:
+        return self.session(conversation_id, code).analysis
+
+    def session(self, conversation_id: str, code: Optional[str]) -> AnalysisSession:
+        """The conversation's session for `code`, derived from its previous one when possible"""
+        now = time.time()
+        with self._lock:
+            previous = self._sessions.get(conversation_id)
+            if previous is not None and now - previous.used_at > self.ttl:
+                previous = None
+
+        session = build_session(code or "") if previous is None else derive_session(previous, code or "")
+        session.used_at = now
+
+        with self._lock:
+            if previous is None:
+                self.full += 1
+            elif session is not previous:
+                self.incremental += 1
+            if session is not previous:
+                self.segments_reused += session.reused
+                self.segments_reanalysed += session.reanalysed
+            self._sessions[conversation_id] = session
+            self._sessions.move_to_end(conversation_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def forget(self, conversation_id: str):
+        with self._lock:
+            self._sessions.pop(conversation_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "full_analyses": self.full,
+                "incremental_analyses": self.incremental,
+                "segments_reused": self.segments_reused,
+                "segments_reanalysed": self.segments_reanalysed,
+            }
+
+
+# Singleton instance
+incremental_analyzer = IncrementalAnalyzer(
+    max_sessions=int(os.getenv("ANALYSIS_SESSIONS", 1024)),
+    ttl=float(os.getenv("ANALYSIS_SESSION_TTL", 1800))
+)
@@ -0,0 +1,273 @@
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Iterator, List, Optional
+
+
+class StubSeq2SeqModel:
+    """
+    Local stand-in for CodeT5+ used for benchmarks and development
+
+    Mimics the cost profile of a batched CPU forward pass: a fixed overhead
+    per call plus a cost proportional to the padded batch (batch size x
+    longest input), so batching amortizes the overhead just like the real
+    model. Output is deterministic for a given prompt.
+    """
+
+    def __init__(
+        self,
+        batch_overhead_ms: float = 20.0,
+        per_token_us: float = 2.0,
+        max_length: int = 512,
+        decode_step_ms: float = 5.0,
+        load_seconds: float = 0.0
+    ):
+        # Stands in for reading a checkpoint (start-up benchmarks)
+        time.sleep(load_seconds)
+        self.batch_overhead_ms = batch_overhead_ms
+        self.per_token_us = per_token_us
+        self.max_length = max_length
+        self.decode_step_ms = decode_step_ms
+
+    def _tokenize(self, prompt: str) -> List[int]:
+        return [ord(ch) % 256 for ch in prompt[:self.max_length]]
+
+    def count_tokens(self, text: str) -> int:
+        return len(text)
+
+    def _prefill(self, prompts: List[str]) -> List[str]:
+        """Encoder pass over the padded batch; returns the eventual outputs"""
+        token_ids = [self._tokenize(p) for p in prompts]
+        padded_len = max(len(ids) for ids in token_ids)
+        padded = [ids + [0] * (padded_len - len(ids)) for ids in token_ids]
+
+        time.sleep((self.batch_overhead_ms * 1000 + self.per_token_us * len(padded) * padded_len) / 1e6)
+
+        outputs = []
+        for ids in padded:
+            checksum = sum(ids) % 9973
+            outputs.append(f"Let's look at this together (trace {checksum:04d}). Which line do you think fails first?")
+        return outputs
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        outputs = self._prefill(prompts)
+        # Decode steps are shared by the whole batch
+        steps = max(len(o.split()) for o in outputs)
+        time.sleep(steps * self.decode_step_ms / 1000.0)
+        return outputs
+
+    def stream_generate(self, prompt: str, cancel: threading.Event) -> Iterator[str]:
+        """Yield the output word by word, one simulated decode step each"""
+        output = self._prefill([prompt])[0]
+        for token in re.findall(r"\S+\s*", output):
+            if cancel.is_set():
+                return
+            time.sleep(self.decode_step_ms / 1000.0)
+            yield token
+
+
+class CodeT5Model:
+    """Fine-tuned CodeT5+ checkpoint (heavy imports happen only here)"""
+
+    def __init__(self, model_path: str, max_length: int = 512, max_new_tokens: int = 128):
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+        import torch
+
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_path)
+        self.model.eval()
+        self.max_length = max_length
+        self.max_new_tokens = max_new_tokens
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        inputs = self.tokenizer(
+            prompts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt"
+        )
+        with self.torch.inference_mode():
+            output_ids = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens)
+        return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+
+    def stream_generate(self, prompt: str, cancel: threading.Event) -> Iterator[str]:
+        """
+        Yield decoded text as it is generated
+
+        Streams run as a single sequence outside the batching engine; setting
+        `cancel` stops generation at the next decode step.
+        """
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        class _Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return cancel.is_set()
+
+        inputs = self.tokenizer(prompt, truncation=True, max_length=self.max_length, return_tensors="pt")
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        def generate():
+            with self.torch.inference_mode():
+                self.model.generate(
+                    **inputs,
+                    max_new_tokens=self.max_new_tokens,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_Cancelled()])
+                )
+
+        thread = threading.Thread(target=generate, daemon=True)
+        thread.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        finally:
+            cancel.set()
+            thread.join()
+
+
+class InferenceEngine:
+    """
+    Dynamic micro-batching in front of a seq2seq model
+
+    Callers submit prompts and get a Future back. A single worker thread
+    takes the first queued request, keeps collecting until either
+    `max_batch_size` items are gathered or `max_wait_ms` has elapsed, runs
+    one padded forward pass for the whole batch and resolves every future.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        max_queue_size: int = 1024,
+        latency_window: int = 2048
+    ):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.batch_size_histogram = {}
+        self.requests_total = 0
+        self.batches_total = 0
+        self.errors_total = 0
+
+        self._worker = threading.Thread(target=self._run, name="inference-engine", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str) -> Future:
+        """Queue a prompt; raises queue.Full when the engine is saturated"""
+        future = Future()
+        self._queue.put_nowait((prompt, future, time.perf_counter()))
+        return future
+
+    def infer(self, prompt: str, timeout: Optional[float] = 30.0) -> str:
+        """Blocking helper for synchronous callers"""
+        return self.submit(prompt).result(timeout=timeout)
+
+    def shutdown(self):
+        self._stop.set()
+        self._worker.join(timeout=1.0)
+
+    def _collect_batch(self) -> List[tuple]:
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # Drop requests whose caller already gave up
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                outputs = self.model.generate_batch([item[0] for item in batch])
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors_total += len(batch)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            with self._stats_lock:
+                self.batches_total += 1
+                self.requests_total += len(batch)
+                self.batch_size_histogram[len(batch)] = self.batch_size_histogram.get(len(batch), 0) + 1
+                for _, _, enqueued_at in batch:
+                    self._latencies.append(now - enqueued_at)
+
+            for (_, future, _), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            histogram = dict(sorted(self.batch_size_histogram.items()))
+            requests, batches, errors = self.requests_total, self.batches_total, self.errors_total
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            index = min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))
+            return round(latencies[index] * 1000, 2)
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests_total": requests,
+            "batches_total": batches,
+            "errors_total": errors,
+            "mean_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "batch_size_histogram": histogram,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p99_ms": percentile(0.99),
+        }
+
+
+def load_model():
+    """Pick the model backend from INFERENCE_MODEL (`codet5` or `stub`)"""
+    if os.getenv("INFERENCE_MODEL", "codet5").lower() == "stub":
+        return StubSeq2SeqModel(load_seconds=float(os.getenv("INFERENCE_STUB_LOAD_SECONDS", 0)))
+    return CodeT5Model(os.getenv("MODEL_PATH", "./models/codet5_finetuned"))
+
+
+def build_engine(model=None) -> InferenceEngine:
+    return InferenceEngine(
+        model or load_model(),
+        max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH", 16)),
+        max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", 10))
+    )
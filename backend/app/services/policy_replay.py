@@ -0,0 +1,173 @@
+"""
+Offline training and evaluation of recommendation policies from the learning event log
+
+`train` streams logged attempts into a LinUCB policy in batches, which
+rebuilds the online policy (or fits a candidate with other settings) from
+any number of events in bounded memory.
+
+`evaluate` scores candidate policies on logged attempts without deploying
+them, by inverse propensity scoring: an attempt counts towards a candidate
+in proportion to how much more (or less) likely the candidate was to pick
+that kind of challenge than the policy that actually picked it. Only
+attempts at a challenge the logging policy recommended with a known
+propensity are usable, so this needs RL_POLICY=linucb with
+RL_EXPLORATION > 0; with no exploration only candidates that agree with the
+logged choices can be scored. Candidates choose among arm types (difficulty
+x error type), since challenges of one type are indistinguishable to them.
+
+Run from the backend directory:
+    python -m app.services.policy_replay [--dir ./data/events] [--holdout 0.2]
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, Iterable
+
+import numpy as np
+
+from app.lib.event_log import event_log, count_records, read_batches
+from app.services.bandit import ARM_TYPE_FEATURES, ARM_TYPES, LinUCBPolicy, batch_rewards
+
+# A candidate maps a batch of contexts and available-type masks to the
+# probability of choosing each arm type (rows sum to 1 over available types)
+Candidate = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+_TYPE_BITS = np.uint32(1) << np.arange(ARM_TYPES, dtype=np.uint32)
+
+
+def available_types(masks: np.ndarray) -> np.ndarray:
+    """Bitmasks of available arm types as a boolean (events x types) matrix"""
+    return (masks[:, None].astype(np.uint32) & _TYPE_BITS) != 0
+
+
+def train(policy: LinUCBPolicy, batches: Iterable, since: float = 0.0) -> dict:
+    """Fold logged attempts newer than `since` into `policy`, one batched update per chunk of records"""
+    events = 0
+    start = time.perf_counter()
+    for batch in batches:
+        if since > 0:
+            batch = batch[batch["time"] > since]
+        X = batch["context"].astype(np.float64)
+        F = ARM_TYPE_FEATURES[batch["arm_type"]]
+        policy.update_batch(X, F, batch_rewards(batch["success"], batch["time_spent"]))
+        events += len(batch)
+    elapsed = time.perf_counter() - start
+    return {"events": events, "seconds": round(elapsed, 3), "events_per_s": round(events / elapsed) if elapsed else 0}
+
+
+def greedy(policy: LinUCBPolicy, alpha: float = None, exploration: float = 0.0) -> Candidate:
+    """
+    The arm type with the highest upper confidence bound under `policy`
+
+    `alpha` overrides the policy's exploration weight and `exploration`
+    mixes in that share of uniformly random available types.
+    """
+    alpha = policy.alpha if alpha is None else alpha
+
+    def probabilities(X: np.ndarray, available: np.ndarray) -> np.ndarray:
+        mean, std = policy.score_types(X)
+        ucb = np.where(available, mean + alpha * std, -np.inf)
+        choice = np.zeros_like(ucb)
+        choice[np.arange(len(X)), ucb.argmax(axis=1)] = 1.0
+        if exploration > 0:
+            choice = (1.0 - exploration) * choice + exploration * available / available.sum(axis=1, keepdims=True)
+        return choice
+
+    return probabilities
+
+
+def uniform() -> Candidate:
+    """A uniformly random available arm type (a floor any useful policy should beat)"""
+    def probabilities(X: np.ndarray, available: np.ndarray) -> np.ndarray:
+        return available / available.sum(axis=1, keepdims=True)
+
+    return probabilities
+
+
+def evaluate(batches: Iterable, candidates: Dict[str, Candidate]) -> dict:
+    """
+    Estimated mean reward of each candidate on the logged attempts
+
+    Per candidate: `ips` (unbiased, can be noisy), `snips` (self-normalized,
+    lower variance, slightly biased), its standard error, the effective
+    sample size behind it, and the share of attempts where it agreed with
+    the logged choice. `logged` is the mean reward actually observed on the
+    usable attempts, i.e. the logging policy's own value.
+    """
+    sums = {name: np.zeros(4) for name in candidates}  # sum w*r, sum (w*r)^2, sum w, sum w^2
+    matched = {name: 0 for name in candidates}
+    usable = total = 0
+    logged_reward = 0.0
+
+    for batch in batches:
+        total += len(batch)
+        keep = (batch["propensity"] > 0) & (batch["available"] != 0) & (batch["recommender"] > 0)
+        if not keep.any():
+            continue
+        batch = batch[keep]
+        X = batch["context"].astype(np.float64)
+        available = available_types(batch["available"])
+        rows = np.arange(len(batch))
+        types = batch["arm_type"].astype(np.int64)
+        propensity = batch["propensity"].astype(np.float64)
+        rewards = batch_rewards(batch["success"], batch["time_spent"])
+        usable += len(batch)
+        logged_reward += float(rewards.sum())
+
+        for name, candidate in candidates.items():
+            target = candidate(X, available)[rows, types]
+            w = target / propensity
+            sums[name] += (float((w * rewards).sum()), float(((w * rewards) ** 2).sum()), float(w.sum()), float((w ** 2).sum()))
+            matched[name] += int(np.count_nonzero(target))
+
+    results = {}
+    for name, totals in sums.items():
+        wr, wr2, w, w2 = (float(v) for v in totals)
+        ips = wr / usable if usable else 0.0
+        results[name] = {
+            "ips": round(ips, 4),
+            "snips": round(wr / w, 4) if w else 0.0,
+            "stderr": round(float(np.sqrt(max(wr2 / usable - ips ** 2, 0.0) / usable)), 4) if usable else 0.0,
+            "effective_samples": round(w ** 2 / w2) if w2 else 0,
+            "match_rate": round(matched[name] / usable, 4) if usable else 0.0,
+        }
+    return {
+        "events": total,
+        "usable": usable,
+        "logged": round(logged_reward / usable, 4) if usable else 0.0,
+        "candidates": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain and compare recommendation policies on the learning event log")
+    parser.add_argument("--dir", default=event_log.directory, help="event log directory")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of the newest events kept for evaluation")
+    parser.add_argument("--alphas", default="0,0.25,0.5,1,2", help="exploration weights of the LinUCB candidates")
+    parser.add_argument("--batch", type=int, default=16384, help="records per batch")
+    args = parser.parse_args(argv)
+
+    event_log.directory = args.dir
+    segments = event_log.segments()
+    events = sum(count_records(p) for p in segments)
+    split = int(events * (1.0 - args.holdout))
+    if split == 0 or split == events:
+        sys.exit(f"Need events both to train on and to hold out ({events} events in {args.dir})")
+
+    # Candidates are fitted on the older events and scored on the newer ones
+    policy = LinUCBPolicy()
+    fit = train(policy, read_batches(segments, args.batch, stop=split))
+    alphas = [float(a) for a in args.alphas.split(",")]
+    candidates = {f"linucb alpha={a:g}": greedy(policy, alpha=a) for a in alphas}
+    candidates["uniform"] = uniform()
+
+    start = time.perf_counter()
+    report = evaluate(read_batches(segments, args.batch, start=split), candidates)
+    report["train"] = fit
+    report["evaluate_seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
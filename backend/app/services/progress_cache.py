@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class StudentProgress:
+    """One student's progress as sets for O(1) membership checks"""
+
+    __slots__ = ("completed", "in_progress", "attempts", "time_spent")
+
+    def __init__(self):
+        self.completed = set()
+        self.in_progress = set()
+        self.attempts: Dict[str, int] = {}
+        self.time_spent = 0
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "StudentProgress":
+        progress = cls()
+        for row in rows:
+            challenge_id = str(row["challenge_id"])
+            if row.get("status") == "completed":
+                progress.completed.add(challenge_id)
+            elif row.get("status") == "in_progress":
+                progress.in_progress.add(challenge_id)
+            progress.attempts[challenge_id] = row.get("attempts") or 0
+            progress.time_spent += row.get("time_spent") or 0
+        return progress
+
+    def copy(self) -> "StudentProgress":
+        progress = StudentProgress()
+        progress.completed = set(self.completed)
+        progress.in_progress = set(self.in_progress)
+        progress.attempts = dict(self.attempts)
+        progress.time_spent = self.time_spent
+        return progress
+
+    def apply(self, challenge_id: str, status: str, time_spent: int = 0):
+        """Mirror the progress upsert: completion is sticky, attempts count up"""
+        if status == "completed" or challenge_id in self.completed:
+            self.completed.add(challenge_id)
+            self.in_progress.discard(challenge_id)
+        elif status == "in_progress":
+            self.in_progress.add(challenge_id)
+        self.attempts[challenge_id] = self.attempts.get(challenge_id, 0) + 1
+        self.time_spent += time_spent
+
+
+class ProgressCache:
+    """
+    Per-student progress cache (LRU + TTL) kept consistent by write-through
+
+    `update` is called after every progress write we make, so a cached entry
+    never lags behind our own writes; the TTL only bounds staleness from
+    writes made elsewhere. A DB read that races with one of our writes is
+    not stored (see `begin_load` / `fill`), so a stale snapshot can't
+    overwrite the write-through result.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._loading: Dict[str, int] = {}
+        self._raced = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.write_throughs = 0
+        self.warmed = 0
+
+    def get(self, student_id: str) -> Optional[StudentProgress]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(student_id)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[student_id]
+                self.expirations += 1
+            self.misses += 1
+        return None
+
+    def missing(self, student_ids: Iterable[str]) -> List[str]:
+        """IDs without a fresh entry, deduplicated (a probe, not counted as lookups)"""
+        now = time.time()
+        with self._lock:
+            return [
+                student_id for student_id in dict.fromkeys(student_ids)
+                if student_id not in self._entries or now - self._entries[student_id][0] > self.ttl
+            ]
+
+    def begin_load(self, student_id: str):
+        """Mark a DB read in flight; call before reading progress rows"""
+        with self._lock:
+            self._loading[student_id] = self._loading.get(student_id, 0) + 1
+
+    def fill(self, student_id: str, rows: List[dict]) -> StudentProgress:
+        """Store rows read after `begin_load`, unless a write raced the read"""
+        progress = StudentProgress.from_rows(rows)
+        with self._lock:
+            pending = self._loading.get(student_id, 1) - 1
+            if pending > 0:
+                self._loading[student_id] = pending
+            else:
+                self._loading.pop(student_id, None)
+            if student_id in self._raced:
+                if pending <= 0:
+                    self._raced.discard(student_id)
+                return progress
+            self._insert(student_id, progress)
+        return progress
+
+    def warm(self, rows_by_student: Dict[str, List[dict]]):
+        """Bulk-load progress for many students (e.g. when a class session starts)"""
+        with self._lock:
+            for student_id, rows in rows_by_student.items():
+                if student_id not in self._loading:
+                    self._insert(student_id, StudentProgress.from_rows(rows))
+                    self.warmed += 1
+
+    def update(self, student_id: str, challenge_id: str, status: str, time_spent: int = 0):
+        """Write-through after a successful progress write"""
+        with self._lock:
+            if student_id in self._loading:
+                self._raced.add(student_id)
+            entry = self._entries.get(student_id)
+            if entry is None:
+                return
+            entry[1].apply(challenge_id, status, time_spent)
+            self.write_throughs += 1
+
+    def invalidate(self, student_id: str):
+        with self._lock:
+            self._entries.pop(student_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "write_throughs": self.write_throughs,
+                "warmed": self.warmed,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _insert(self, student_id: str, progress: StudentProgress):
+        # Caller holds the lock
+        self._entries[student_id] = (time.time(), progress)
+        self._entries.move_to_end(student_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+# Singleton instance
+progress_cache = ProgressCache(
+    max_size=int(os.getenv("PROGRESS_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("PROGRESS_CACHE_TTL", 300))
+)
@@ -0,0 +1,226 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from app.models.schemas import RecommendationResponse
+
+# A queued recommendation: the response, and how it was picked (see RLService._start_attempt)
+QueuedItem = Tuple[RecommendationResponse, Optional[tuple]]
+
+# Served ages kept for the staleness percentiles in stats()
+_AGE_WINDOW = 1024
+
+
+class _StudentQueue:
+    __slots__ = ("items", "built_at", "catalog_version", "generation", "dirty")
+
+    def __init__(self, items: List[QueuedItem], catalog_version: int, generation: int):
+        self.items = deque(items)
+        self.built_at = time.monotonic()
+        self.catalog_version = catalog_version
+        self.generation = generation
+        self.dirty = False
+
+
+class RecommendationQueues:
+    """
+    Precomputed next-challenge queues, refreshed in the background
+
+    Each active student (one who has asked for a recommendation) gets a
+    short ranked queue of next challenges. `peek` serves the head with a
+    dict lookup; a miss returns None and the caller computes the queue
+    synchronously and `store`s it.
+
+    A recorded attempt (`attempted`) drops a solved challenge from the
+    student's queue and schedules a recompute, and so does a queue older
+    than `ttl` or built from an older catalog when it is served. Until the
+    background worker (`start`) has recomputed it, the old queue is still
+    served (counted as `stale`); without a running worker a stale queue is a
+    miss instead. A recompute that raced an attempt is discarded (see
+    `begin` / `store`), so a queue never comes back with a challenge the
+    student just solved. Queues are LRU-evicted beyond `max_students`.
+    """
+
+    def __init__(self, depth: int = 3, ttl: float = 60.0, max_students: int = 10000):
+        self.depth = depth
+        self.ttl = ttl
+        self.max_students = max_students
+        self._queues: "OrderedDict[str, _StudentQueue]" = OrderedDict()
+        # Student -> attempts recorded, so a recompute can tell it was overtaken
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # Students waiting for a recompute, oldest first
+        self._pending: "OrderedDict[str, None]" = OrderedDict()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.discarded = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+        self._ages = deque(maxlen=_AGE_WINDOW)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # --- serving ---
+
+    def peek(self, user_id: str, catalog) -> Optional[QueuedItem]:
+        """Head of the student's queue, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            queue = self._queues.get(user_id)
+            if queue is None or not queue.items:
+                self.misses += 1
+                return None
+            response, shown = queue.items[0]
+            fresh = (not queue.dirty and now - queue.built_at <= self.ttl
+                     and queue.catalog_version == catalog.version)
+            # A challenge dropped from the catalog can't be served, stale or not
+            servable = shown is None or catalog.get(response.challenge_id) is not None
+            if not fresh and (not self.running or not servable):
+                self.misses += 1
+                return None
+            self._queues.move_to_end(user_id)
+            self._ages.append(now - queue.built_at)
+            if fresh:
+                self.hits += 1
+                return response, shown
+            self.stale += 1
+        self.schedule(user_id)
+        return response, shown
+
+    def begin(self, user_id: str) -> int:
+        """Token for a recompute about to start; pass it to `store`"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def store(self, user_id: str, token: int, items: List[QueuedItem], catalog_version: int) -> bool:
+        """Install a computed queue, unless an attempt was recorded since `begin`"""
+        with self._lock:
+            if self._generations.get(user_id, 0) != token:
+                self.discarded += 1
+                return False
+            self._queues[user_id] = _StudentQueue(items, catalog_version, token)
+            self._queues.move_to_end(user_id)
+            while len(self._queues) > self.max_students:
+                evicted, _ = self._queues.popitem(last=False)
+                self._generations.pop(evicted, None)
+                self.evictions += 1
+            return True
+
+    def attempted(self, user_id: str, challenge_id: str, solved: bool):
+        """An attempt was recorded: drop a solved challenge and recompute the queue"""
+        with self._lock:
+            queue = self._queues.get(user_id)
+            if queue is None:
+                return  # Not an active student; the next request computes one
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if solved:
+                queue.items = deque(item for item in queue.items if item[0].challenge_id != challenge_id)
+            queue.dirty = True
+        self.schedule(user_id)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._queues.pop(user_id, None)
+            self._generations.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._queues.clear()
+            self._generations.clear()
+            self._pending.clear()
+
+    # --- background refresh ---
+
+    def schedule(self, user_id: str):
+        """Queue a recompute for the background worker (safe from any thread)"""
+        loop = self._loop
+        if loop is None:
+            return
+        with self._lock:
+            self._pending[user_id] = None
+        try:
+            if asyncio.get_running_loop() is loop:
+                self._wake.set()
+                return
+        except RuntimeError:
+            pass
+        try:
+            loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # Loop closed; the pending entry is picked up on the next start
+
+    def start(self, refresh: Callable[[str], Awaitable]):
+        """Run the worker that recomputes queues with `refresh(user_id)` (call from the event loop)"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run(refresh))
+        if self._pending:
+            self._wake.set()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    async def _run(self, refresh: Callable[[str], Awaitable]):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        break
+                    user_id, _ = self._pending.popitem(last=False)
+                    if user_id not in self._queues:
+                        continue  # Evicted or invalidated meanwhile
+                try:
+                    await refresh(user_id)
+                    self.refreshes += 1
+                except Exception:
+                    self.refresh_errors += 1
+                # Recomputes are CPU work on the event loop; let requests in between
+                await asyncio.sleep(0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            served = self.hits + self.stale
+            lookups = served + self.misses
+            ages = sorted(self._ages)
+            return {
+                "depth": self.depth,
+                "ttl_seconds": self.ttl,
+                "students": len(self._queues),
+                "max_students": self.max_students,
+                "running": self.running,
+                "pending": len(self._pending),
+                "hits": self.hits,
+                "stale": self.stale,
+                "misses": self.misses,
+                "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+                "fresh_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "discarded": self.discarded,
+                "refresh_errors": self.refresh_errors,
+                "evictions": self.evictions,
+                "age_p50_seconds": round(ages[len(ages) // 2], 3) if ages else 0.0,
+                "age_p99_seconds": round(ages[min(len(ages) - 1, int(len(ages) * 0.99))], 3) if ages else 0.0,
+            }
+
@@ -0,0 +1,312 @@
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import tokenize
+from collections import OrderedDict
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Message intents that change what the tutor answers for the same snippet,
+# matched as whole words in this order (asking for a hint outranks "fix")
+INTENT_KEYWORDS = {
+    "hint": ["hint", "hints", "clue", "clues", "nudge"],
+    "fix": ["fix", "correct", "solve", "solution", "repair"],
+    "explain": ["why", "explain", "what", "understand", "meaning"],
+}
+
+# "Don't fix it", "do not tell me", "without giving the answer": the student wants a hint
+_NEGATED_REQUEST = re.compile(
+    r"\b(?:don'?t|do not|dont|without|no)\s+(?:\w+\s+)?(?:fix|solve|tell|give|giving|show|showing|correct|solution|answer)"
+)
+
+# A full disk tier is pruned to this fraction of its limit, so pruning (a directory scan) is rare
+_DISK_PRUNE_TO = 0.9
+
+# Tokens that never change what a snippet does or where its lines are
+_SKIPPED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.ENDMARKER, tokenize.ENCODING}
+
+
+def normalize_code(code: str) -> str:
+    """
+    Canonical form of a snippet for cache keys
+
+    Built from the snippet's tokens, one output line per source line that
+    has any: comments and spacing inside a line are dropped, so
+    `x=1  # note` and `x = 1` hash the same, and indentation becomes
+    indent/dedent markers, so 2- and 4-space indented copies also match.
+    String literals are kept verbatim (a `#` or run of spaces inside one
+    is content), and every line keeps its line number, because cached
+    answers quote line numbers ("On line 3 ..."). A snippet that doesn't
+    tokenize (unclosed brackets, bad dedent) is keyed on its raw lines.
+    """
+    rows = {}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in _SKIPPED_TOKENS:
+                continue
+            if token.type == tokenize.INDENT:
+                text = ">"
+            elif token.type == tokenize.DEDENT:
+                text = "<"
+            else:
+                text = token.string
+            rows.setdefault(token.start[0], []).append(text)
+    except (tokenize.TokenError, SyntaxError):
+        return "raw\0" + "\n".join(line.rstrip() for line in code.expandtabs(4).splitlines())
+    return "\n".join(f"{row}|" + "\x1f".join(texts) for row, texts in rows.items())
+
+
+def message_intent(message: str) -> str:
+    """Coarse intent of the student's message (fix / hint / explain / debug)"""
+    text = (message or "").lower().replace("\u2019", "'")
+    if _NEGATED_REQUEST.search(text):
+        return "hint"
+    words = set(re.findall(r"\b\w+\b", text))
+    for intent, keywords in INTENT_KEYWORDS.items():
+        if words.intersection(keywords):
+            return intent
+    return "debug"
+
+
+def cache_key(code: str, message: str, history: Optional[List[str]] = None) -> str:
+    """
+    Content address of a (normalized snippet, intent) pair
+
+    `history` is the rendered conversation the answer was generated with,
+    for answers whose prompt includes it; different histories never share
+    an entry.
+    """
+    payload = message_intent(message) + "\0" + normalize_code(code)
+    if history:
+        payload += "\0" + hashlib.sha256("\n".join(history).encode("utf-8")).hexdigest()
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Bounded LRU + TTL cache for tutor responses
+
+    Entries live in memory in recency order; when `cache_dir` is set they are
+    also written to a content-addressed directory so warm entries survive a
+    restart. Values are plain dicts (the serialized ChatResponse). Async
+    callers look up memory with `get(key, disk=False)` and leave `get_disk`
+    and `persist` (file I/O) to a thread.
+
+    The disk tier holds at most `max_disk_entries` files: an expired file is
+    deleted when it is read, and a write that takes the tier past the limit
+    deletes expired files and then the oldest ones.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 3600.0,
+        cache_dir: Optional[str] = None,
+        max_disk_entries: int = 10000
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        # Files in the disk tier, counted on the first write (other workers' writes show up at the next prune)
+        self._disk_count: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_hits = 0
+        self.disk_evictions = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, key: str, disk: bool = True) -> Optional[dict]:
+        """
+        Cached value from memory, else from the disk tier
+
+        With `disk=False` a memory miss returns None without reading the
+        disk tier (and isn't counted yet); follow up with `get_disk`.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            if not self.cache_dir:
+                self.misses += 1
+                return None
+        return self.get_disk(key) if disk else None
+
+    def get_disk(self, key: str) -> Optional[dict]:
+        """Disk-tier lookup after a memory miss (blocking file I/O)"""
+        now = time.time()
+        entry = self._disk_read(key)
+        expired = entry is not None and now - entry[0] > self.ttl
+        with self._lock:
+            if entry is not None and not expired:
+                self._insert(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry[1]
+            self.misses += 1
+            self.expirations += int(expired)
+        if expired:
+            self._disk_remove(self._disk_path(key))
+        return None
+
+    def put(self, key: str, value: dict, disk: bool = True):
+        """Store a value; with `disk=False` the disk tier is left to `persist`"""
+        entry = (time.time(), value)
+        with self._lock:
+            self._insert(key, entry)
+        if disk:
+            self._disk_write(key, entry)
+
+    def persist(self, key: str, value: dict):
+        """Write a value to the disk tier (blocking file I/O)"""
+        self._disk_write(key, (time.time(), value))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir:
+            # Otherwise the next lookup would bring every entry back from disk
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with self._lock:
+                self._disk_count = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "disk_entries": self._disk_count,
+                "max_disk_entries": self.max_disk_entries,
+                "disk_evictions": self.disk_evictions,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "disk_tier": bool(self.cache_dir),
+            }
+
+    def _insert(self, key: str, entry: tuple):
+        # Caller holds the lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def _disk_read(self, key: str) -> Optional[tuple]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["stored_at"], data["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _disk_write(self, key: str, entry: tuple):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            added = not os.path.exists(path)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": entry[0], "value": entry[1]}, f)
+            # Atomic publish so concurrent readers never see a partial file
+            os.replace(tmp_path, path)
+        except OSError:
+            return  # Disk tier is best-effort
+        with self._lock:
+            if self._disk_count is not None:
+                self._disk_count += int(added)
+            full = self._disk_count is None or self._disk_count > self.max_disk_entries
+        if full:
+            self._prune_disk()
+
+    def _disk_remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_count is not None:
+                self._disk_count -= 1
+
+    def _prune_disk(self):
+        """Count the disk tier; past the limit, delete expired files, then the oldest"""
+        if not self._prune_lock.acquire(blocking=False):
+            return  # Another thread is already pruning
+        try:
+            files = []
+            for shard in os.scandir(self.cache_dir):
+                if shard.is_dir():
+                    for f in os.scandir(shard.path):
+                        if f.name.endswith(".json"):
+                            try:
+                                files.append((f.stat().st_mtime, f.path))
+                            except OSError:
+                                pass  # Deleted meanwhile
+            files.sort()
+            now = time.time()
+            keep = len(files)
+            if keep > self.max_disk_entries:
+                target = int(self.max_disk_entries * _DISK_PRUNE_TO)
+                for mtime, path in files:
+                    if keep <= target and now - mtime <= self.ttl:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    keep -= 1
+            with self._lock:
+                self.disk_evictions += len(files) - keep
+                self._disk_count = keep
+        except OSError:
+            pass  # Disk tier is best-effort
+        finally:
+            self._prune_lock.release()
+
+
+def _build_cache() -> ResponseCache:
+    return ResponseCache(
+        max_size=int(os.getenv("RESPONSE_CACHE_SIZE", 1024)),
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", 3600)),
+        cache_dir=os.getenv("RESPONSE_CACHE_DIR") or None,
+        max_disk_entries=int(os.getenv("RESPONSE_CACHE_DISK_SIZE", 10000))
+    )
+
+
+# Singleton instance
+response_cache = _build_cache()
@@ -1,23 +1,78 @@
+import asyncio
+import os
 import random
-from typing import List
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+from dotenv import load_dotenv
 from app.models.schemas import RecommendationResponse
-from app.lib.supabase import supabase_client
+from app.lib.database import db, SEED_TESTS
+from app.lib.event_log import event_log, read_batches
+from app.lib.executors import executors
+from app.lib.single_flight import SingleFlight
+from app.lib.telemetry import telemetry
+from app.services.progress_cache import progress_cache, StudentProgress
+from app.services.challenge_catalog import Challenge, ChallengeCatalog
+from app.services.recommendation_queue import QueuedItem, RecommendationQueues
+
+try:
+    from app.lib.shared_state import SHARED_STATE_SUPPORTED
+    from app.services.bandit import LinUCBPolicy, SharedLinUCBPolicy, arm_type, reward, student_features
+except ImportError:  # numpy not installed: fall back to the difficulty heuristic
+    LinUCBPolicy = None
+
+load_dotenv()
+
+# How long a catalog built from fallback data lives before the DB is retried
+CATALOG_RETRY_SECONDS = 5.0
+# Attempt clocks kept for measuring time spent (oldest dropped first)
+MAX_ATTEMPT_CLOCKS = 100_000
+# A tab left open overnight is not time spent on the challenge
+MAX_MEASURED_SECONDS = 2 * 3600
 
 class RLService:
     """
     Reinforcement Learning Service - Personalized Recommendations
     
-    This is where your RL Agent will live for adaptive learning.
-    Currently using MOCK logic based on simple heuristics.
+    Recommendations come from a LinUCB contextual bandit (`policy`) that
+    learns from every progress update. With no policy (RL_POLICY=heuristic
+    or numpy missing) the Easy → Medium → Hard heuristic is used instead.
+    
+    Every attempt is also appended to the learning event log, with who
+    recommended the challenge and how likely that was, so policies can be
+    retrained and compared offline (`app/services/policy_replay.py`).
+    
+    With `queues`, each active student's next few challenges are ranked
+    ahead of time and recomputed in the background after every attempt, so
+    a recommendation is usually a lookup (see RecommendationQueues).
     """
     
-    def __init__(self):
-        self.challenges_cache = None
+    def __init__(self, catalog_ttl: float = 300.0, policy=None, coalesce: bool = True, events=None,
+                 queues: Optional[RecommendationQueues] = None):
+        self.catalog_ttl = catalog_ttl
+        self.policy = policy
+        self.queues = queues
+        # Re-renders fire the same student's recommendation several times at once
+        self.flights = SingleFlight("recommend") if coalesce else None
+        self.catalog: Optional[ChallengeCatalog] = None
+        self._catalog_lock = threading.Lock()
+        self._catalog_refresh: Optional[asyncio.Lock] = None
+        # (user_id, challenge_id) -> when the current attempt started
+        self._attempt_clocks: "OrderedDict[tuple, float]" = OrderedDict()
+        # (user_id, challenge_id) -> (recommender, confidence, propensity, arm type, available types)
+        self._shown: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._clock_lock = threading.Lock()
+        self.events = events if events is not None else event_log
     
-    def generate_recommendation(self, user_id: str) -> RecommendationResponse:
+    async def generate_recommendation(self, user_id: str) -> RecommendationResponse:
         """
         Generate personalized challenge recommendation using RL
         
+        Served from the student's precomputed queue when there is one;
+        otherwise computed now, and concurrent calls for the same student
+        share one computation.
+        
         Args:
             user_id: Student ID
             
@@ -25,52 +80,277 @@ class RLService:
             RecommendationResponse with next recommended challenge
         """
         
-        # Get student progress from database
+        if self.queues is not None:
+            queued = self._serve_queued(user_id, await self._get_catalog_async())
+            if queued is not None:
+                return queued
+        if self.flights is None:
+            return await self._generate_recommendation(user_id)
+        recommendation = await self.flights.do(user_id, lambda: self._generate_recommendation(user_id))
+        return recommendation.model_copy()
+    
+    async def _generate_recommendation(self, user_id: str) -> RecommendationResponse:
+        with telemetry.span("recommendation"):
+            progress = await self._load_progress(user_id)
+            catalog = await self._get_catalog_async()
+            token = self.queues.begin(user_id) if self.queues is not None else None
+            ranked = await self._rank_async(progress, catalog, self.queues.depth if self.queues is not None else 1)
+            return self._choose(user_id, token, ranked, catalog)
+    
+    def generate_recommendation_sync(self, user_id: str) -> RecommendationResponse:
+        """Blocking variant of generate_recommendation for scripts and benchmarks"""
+        catalog = self._get_catalog()
+        if self.queues is not None:
+            queued = self._serve_queued(user_id, catalog)
+            if queued is not None:
+                return queued
+        return self._recommend(user_id, self._load_progress_sync(user_id), catalog)
+    
+    def _serve_queued(self, user_id: str, catalog: ChallengeCatalog) -> Optional[RecommendationResponse]:
+        queued = self.queues.peek(user_id, catalog)
+        if queued is None:
+            return None
+        response, shown = queued
+        if shown is not None:
+            self._start_attempt(user_id, response.challenge_id, shown)
+        return response.model_copy()
+    
+    async def _refresh_queue(self, user_id: str):
+        """Recompute a student's queue (the background scheduler's job)"""
+        token = self.queues.begin(user_id)
+        progress = await self._load_progress(user_id)
+        catalog = await self._get_catalog_async()
+        with telemetry.span("recommendation_refresh"):
+            ranked = await self._rank_async(progress, catalog, self.queues.depth)
+            self.queues.store(user_id, token, ranked, catalog.version)
+    
+    def start_scheduler(self):
+        """Start recomputing queues in the background (call from the event loop)"""
+        if self.queues is not None:
+            self.queues.start(self._refresh_queue)
+    
+    async def stop_scheduler(self):
+        if self.queues is not None:
+            await self.queues.stop()
+    
+    async def _load_progress(self, user_id: str) -> StudentProgress:
+        """Student progress (cached; the DB is only read on a miss)"""
+        progress = progress_cache.get(user_id)
+        if progress is None:
+            progress_cache.begin_load(user_id)
+            try:
+                rows = await db.get_student_progress(user_id)
+            except:
+                rows = []
+            progress = progress_cache.fill(user_id, rows)
+        return progress
+    
+    def _load_progress_sync(self, user_id: str) -> StudentProgress:
+        progress = progress_cache.get(user_id)
+        if progress is None:
+            progress_cache.begin_load(user_id)
+            try:
+                rows = db.blocking.get_student_progress(user_id)
+            except:
+                rows = []
+            progress = progress_cache.fill(user_id, rows)
+        return progress
+    
+    async def warm_progress(self, user_ids: List[str]) -> int:
+        """Bulk-load progress for a class session so the first page loads hit the cache"""
+        rows_by_student = await db.get_progress_for_students(user_ids)
+        progress_cache.warm(rows_by_student)
+        return len(rows_by_student)
+    
+    async def prefetch_progress(self, user_ids: List[str]) -> int:
+        """Load every listed student's progress not already cached, in one query"""
+        missing = progress_cache.missing(user_ids)
+        if not missing:
+            return 0
         try:
-            progress = supabase_client.get_student_progress(user_id)
-            completed_ids = [p['challenge_id'] for p in progress if p.get('status') == 'completed']
-            in_progress_ids = [p['challenge_id'] for p in progress if p.get('status') == 'in_progress']
+            rows_by_student = await db.get_progress_for_students(missing)
         except:
-            completed_ids = []
-            in_progress_ids = []
+            return 0  # Each recommendation falls back to its own read
+        progress_cache.warm(rows_by_student)
+        return len(missing)
+    
+    def _recommend(self, user_id: str, progress: StudentProgress, catalog: ChallengeCatalog) -> RecommendationResponse:
+        """Pick the next challenge given the student's cached progress (and queue the runners-up)"""
+        token = self.queues.begin(user_id) if self.queues is not None else None
+        ranked = self._rank(progress, catalog, self.queues.depth if self.queues is not None else 1)
+        return self._choose(user_id, token, ranked, catalog)
+    
+    def _choose(self, user_id: str, token, ranked: List[QueuedItem], catalog: ChallengeCatalog) -> RecommendationResponse:
+        """Serve the best of `ranked` and queue the runners-up"""
+        if self.queues is not None:
+            self.queues.store(user_id, token, ranked, catalog.version)
         
-        # Get all challenges
-        all_challenges = self._get_challenges()
+        response, shown = ranked[0]
+        if shown is not None:
+            self._start_attempt(user_id, response.challenge_id, shown)
+        # The queued copy is shared with later requests
+        return response.model_copy() if self.queues is not None else response
+    
+    async def _rank_async(self, progress: StudentProgress, catalog: ChallengeCatalog, depth: int) -> List[QueuedItem]:
+        """
+        `_rank` on the I/O thread pool, off the event loop
         
-        # Filter out completed challenges
-        available_challenges = [
-            c for c in all_challenges 
-            if c['id'] not in completed_ids
-        ]
+        The policy's numpy scoring releases the GIL; it works on a copy of
+        the progress, which write-through updates change in place.
+        """
+        return await executors.run_io(self._rank, progress.copy(), catalog, depth)
+    
+    def _rank(self, progress: StudentProgress, catalog: ChallengeCatalog, depth: int) -> List[QueuedItem]:
+        """Up to `depth` next challenges, best first, with how each was picked"""
+        completed_ids = progress.completed
+        ranked = []
+        
+        if self.policy is not None:
+            # RL Logic: highest upper confidence bound for this student's context
+            for selected in self.policy.rank(progress, catalog, depth):
+                shown = ("linucb", selected.confidence, selected.propensity, selected.arm_type, selected.available)
+                ranked.append((selected.challenge, selected.confidence, shown))
+        else:
+            # Heuristic: difficulty progression, no posterior to report
+            picked = set(completed_ids)
+            while len(ranked) < depth:
+                recommended = self._select_by_difficulty(catalog, completed_ids, exclude=picked)
+                if recommended is None:
+                    break
+                picked.add(recommended.id)
+                # Its choice probabilities are not tracked, so it can't be reweighted offline
+                ranked.append((recommended, 0.5, ("heuristic", 0.5, 0.0, 0, 0)))
         
-        if not available_challenges:
+        if not ranked:
             # All challenges completed!
-            return self._congratulations_response()
+            return [(self._congratulations_response(), None)]
         
-        # RL Logic: Pick based on difficulty progression
-        recommended = self._select_by_difficulty(available_challenges, completed_ids)
+        return [
+            (RecommendationResponse(
+                challenge_id=recommended.id,
+                title=recommended.title,
+                description=recommended.description,
+                difficulty=recommended.difficulty,
+                reason=self._generate_reason(recommended, len(completed_ids)),
+                confidence=confidence
+            ), shown)
+            for recommended, confidence, shown in ranked
+        ]
+    
+    async def _get_catalog_async(self) -> ChallengeCatalog:
+        """Current challenge catalog, refreshed without blocking the event loop"""
+        catalog = self.catalog
+        if catalog is not None and not catalog.expired:
+            return catalog
         
-        return RecommendationResponse(
-            challenge_id=recommended['id'],
-            title=recommended['title'],
-            description=recommended['description'],
-            difficulty=recommended['difficulty'],
-            reason=self._generate_reason(recommended, len(completed_ids)),
-            confidence=round(random.uniform(0.78, 0.92), 2)
-        )
+        if self._catalog_refresh is None:
+            self._catalog_refresh = asyncio.Lock()
+        async with self._catalog_refresh:
+            # Another request may have refreshed it while we waited
+            if self.catalog is not catalog and not self.catalog.expired:
+                return self.catalog
+            try:
+                rows = await db.get_all_challenges()
+            except:
+                rows = None
+            # Indexing a large catalog takes a while; keep it off the event loop
+            return await executors.run_io(self._install_catalog, rows)
     
-    def _get_challenges(self) -> List[dict]:
-        """Get all challenges (with caching)"""
-        if self.challenges_cache:
-            return self.challenges_cache
+    def _get_catalog(self) -> ChallengeCatalog:
+        """Current challenge catalog (blocking refresh for sync callers)"""
+        catalog = self.catalog
+        if catalog is not None and not catalog.expired:
+            return catalog
         
         try:
-            challenges = supabase_client.get_all_challenges()
-            self.challenges_cache = challenges
-            return challenges
+            rows = db.blocking.get_all_challenges()
         except:
-            # Fallback mock challenges
-            return [
+            rows = None
+        return self._install_catalog(rows)
+    
+    def warm_catalog(self) -> str:
+        """Load the challenge catalog before the first recommendation needs it"""
+        return f"{len(self._get_catalog())} challenges"
+    
+    def _install_catalog(self, rows: Optional[List[dict]]) -> ChallengeCatalog:
+        """Swap in a new catalog version built from rows (None = DB unavailable)"""
+        with self._catalog_lock:
+            version = self.catalog.version + 1 if self.catalog else 1
+            if rows is not None:
+                # An empty table is a valid catalog; it is cached like any other
+                catalog = ChallengeCatalog.from_rows(rows, version=version, ttl=self.catalog_ttl)
+            elif self.catalog is not None:
+                # Keep serving the last good catalog and retry the DB shortly
+                catalog = ChallengeCatalog(self.catalog.challenges, version=version, ttl=CATALOG_RETRY_SECONDS)
+            else:
+                catalog = ChallengeCatalog.from_rows(
+                    self._fallback_challenges(), version=version, ttl=CATALOG_RETRY_SECONDS
+                )
+            self.catalog = catalog
+            return catalog
+    
+    async def get_challenge(self, challenge_id: str) -> Optional[Challenge]:
+        """Challenge by ID from the current catalog (None if unknown)"""
+        return (await self._get_catalog_async()).get(challenge_id)
+    
+    def get_challenge_sync(self, challenge_id: str) -> Optional[Challenge]:
+        return self._get_catalog().get(challenge_id)
+    
+    def _start_attempt(self, user_id: str, challenge_id: str, shown: Optional[tuple] = None):
+        """
+        Start the clock when a challenge is shown, unless an attempt is already running
+        
+        `shown` (how the challenge was picked) is kept until the next attempt
+        at it is logged; a newer recommendation of the same challenge replaces it.
+        """
+        key = (user_id, challenge_id)
+        with self._clock_lock:
+            if shown is not None:
+                self._shown[key] = shown
+                self._shown.move_to_end(key)
+                while len(self._shown) > MAX_ATTEMPT_CLOCKS:
+                    self._shown.popitem(last=False)
+            if key in self._attempt_clocks:
+                return
+            self._attempt_clocks[key] = time.time()
+            while len(self._attempt_clocks) > MAX_ATTEMPT_CLOCKS:
+                self._attempt_clocks.popitem(last=False)
+    
+    def measure_attempt(self, user_id: str, challenge_id: str, finished: bool) -> int:
+        """
+        Seconds spent since the challenge was recommended or last submitted
+        
+        Each submission restarts the clock, because progress accumulates
+        `time_spent` over attempts; a passing submission stops it. Returns 0
+        when the challenge was never recommended to this student.
+        """
+        key = (user_id, challenge_id)
+        now = time.time()
+        with self._clock_lock:
+            started = self._attempt_clocks.pop(key, None)
+            if not finished:
+                self._attempt_clocks[key] = now
+        if started is None:
+            return 0
+        return int(min(now - started, MAX_MEASURED_SECONDS))
+    
+    def invalidate_catalog(self) -> int:
+        """Force the next recommendation to reload challenges; returns the stale version"""
+        with self._catalog_lock:
+            if self.catalog is None:
+                return 0
+            self.catalog.expires_at = 0.0
+            return self.catalog.version
+    
+    def catalog_stats(self) -> dict:
+        catalog = self.catalog
+        if catalog is None:
+            return {"loaded": False}
+        return {"loaded": True, **catalog.stats()}
+    
+    def _fallback_challenges(self) -> List[dict]:
+        """Fallback mock challenges when the database is unavailable"""
+        challenges = [
                 {
                     "id": "1",
                     "title": "Loop Variable Scope Error",
@@ -114,11 +394,18 @@ class RLService:
                     "error_type": "LogicError"
                 }
             ]
+        for challenge in challenges:
+            challenge["tests"] = SEED_TESTS[challenge["id"]]
+        return challenges
     
-    def _select_by_difficulty(self, challenges: List[dict], completed_count: int) -> dict:
+    def _select_by_difficulty(self, catalog: ChallengeCatalog, completed_ids: set,
+                              exclude: Optional[set] = None) -> Optional[Challenge]:
         """
         RL Heuristic: Progress from Easy → Medium → Hard
         
+        Candidates come straight from the catalog's difficulty index, minus
+        `exclude` (default: the completed ones); returns None when none is left.
+        
         Real RL would use:
         - Q-learning or Policy Gradient
         - Reward = (student_success - time_spent) * difficulty_weight
@@ -126,27 +413,27 @@ class RLService:
         """
         
         # Difficulty progression logic
+        completed_count = len(completed_ids)
         if completed_count < 2:
             # Start with Easy
-            easy_challenges = [c for c in challenges if c['difficulty'] == 'Easy']
-            if easy_challenges:
-                return random.choice(easy_challenges)
-        
+            tiers = [('Easy',), ('Medium', 'Hard')]
         elif completed_count < 4:
             # Move to Medium after 2 Easy completions
-            medium_challenges = [c for c in challenges if c['difficulty'] == 'Medium']
-            if medium_challenges:
-                return random.choice(medium_challenges)
-        
-        # Advanced: Mix Medium and Hard
-        advanced = [c for c in challenges if c['difficulty'] in ['Medium', 'Hard']]
-        if advanced:
-            return random.choice(advanced)
+            tiers = [('Medium',), ('Medium', 'Hard')]
+        else:
+            # Advanced: Mix Medium and Hard
+            tiers = [('Medium', 'Hard')]
         
         # Fallback: Any available challenge
-        return random.choice(challenges)
+        tiers.append(tuple(catalog.by_difficulty))
+        
+        for difficulties in tiers:
+            recommended = catalog.sample(difficulties, completed_ids if exclude is None else exclude)
+            if recommended is not None:
+                return recommended
+        return None
     
-    def _generate_reason(self, challenge: dict, completed_count: int) -> str:
+    def _generate_reason(self, challenge: Challenge, completed_count: int) -> str:
         """Generate human-readable reason for recommendation"""
         
         reasons = {
@@ -167,7 +454,7 @@ class RLService:
             ]
         }
         
-        difficulty = challenge.get('difficulty', 'Medium')
+        difficulty = challenge.difficulty or 'Medium'
         options = reasons.get(difficulty, reasons['Medium'])
         return random.choice(options)
     
@@ -182,7 +469,28 @@ class RLService:
             confidence=1.0
         )
     
-    def update_rl_model(self, user_id: str, challenge_id: str, success: bool, time_spent: int):
+    async def update_rl_model(self, user_id: str, challenge_id: str, success: bool, time_spent: int):
+        """Non-blocking model update (awaits the async DB client)"""
+        context = None
+        if self.policy is not None or self.events.enabled:
+            progress = await self._load_progress(user_id)
+            context = self._attempt_context(progress, await self._get_catalog_async(), challenge_id)
+        
+        status = "completed" if success else "in_progress"
+        await db.update_progress(user_id, challenge_id, status, time_spent=time_spent)
+        self._recorded(user_id, challenge_id, success, time_spent, context)
+    
+    async def record_progress(self, user_id: str, challenge_id: str, success: bool, time_spent: int = 0):
+        """
+        Store an outcome in the student's progress without training the policy
+        
+        For outcomes that aren't a fresh attempt, such as a class regrade.
+        """
+        status = "completed" if success else "in_progress"
+        await db.update_progress(user_id, challenge_id, status, time_spent=time_spent)
+        self._recorded(user_id, challenge_id, success, time_spent)
+    
+    def update_rl_model_sync(self, user_id: str, challenge_id: str, success: bool, time_spent: int):
         """
         Update RL model based on student performance
         
@@ -191,13 +499,129 @@ class RLService:
             challenge_id: Completed challenge ID
             success: Whether student succeeded
             time_spent: Time in seconds
-            
-        TODO: Implement actual RL training loop
-        Currently just updates database
+        
+        The bandit learns from the student's context before this attempt,
+        but only once the attempt is in the database, so a failed write
+        never trains it (or logs an event) on an attempt that wasn't stored.
         """
+        context = None
+        if self.policy is not None or self.events.enabled:
+            context = self._attempt_context(self._load_progress_sync(user_id), self._get_catalog(), challenge_id)
         
         status = "completed" if success else "in_progress"
-        supabase_client.update_progress(user_id, challenge_id, status)
+        db.blocking.update_progress(user_id, challenge_id, status, time_spent=time_spent)
+        self._recorded(user_id, challenge_id, success, time_spent, context)
+    
+    def _recorded(self, user_id: str, challenge_id: str, success: bool, time_spent: int,
+                  context: Optional[tuple] = None):
+        """After a successful progress write: cache it, learn from it (given its context), requeue"""
+        progress_cache.update(user_id, challenge_id, "completed" if success else "in_progress", time_spent)
+        if context is not None:
+            self._learn(user_id, context, challenge_id, success, time_spent)
+        if self.queues is not None:
+            self.queues.attempted(user_id, challenge_id, success)
+    
+    def _attempt_context(self, progress: StudentProgress, catalog: ChallengeCatalog,
+                         challenge_id: str) -> Optional[tuple]:
+        """(challenge, student features) before the attempt is applied; None if it isn't in the catalog"""
+        challenge = catalog.get(challenge_id)
+        if challenge is None:
+            return None  # Not in the current catalog; nothing to attribute the reward to
+        return challenge, student_features(progress, catalog) if LinUCBPolicy is not None else None
+    
+    def _learn(self, user_id: str, context: tuple, challenge_id: str, success: bool, time_spent: int):
+        challenge, x = context
+        # Stamped before the update, so a restore never replays an attempt the state already has
+        at = time.time()
+        if self.policy is not None:
+            self.policy.update(x, challenge, reward(success, time_spent))
+        
+        with self._clock_lock:
+            # Only the first attempt after a recommendation is credited to it
+            shown = self._shown.pop((user_id, challenge_id), None)
+        recommender, confidence, propensity, _, available = shown or ("none", 0.0, 0.0, 0, 0)
+        self.events.append(
+            user_id, challenge_id, success, time_spent,
+            recommender=recommender,
+            confidence=confidence,
+            propensity=propensity,
+            available=available,
+            arm_type=arm_type(challenge) if x is not None else 0,
+            context=x.tolist() if x is not None else None,
+            at=at
+        )
+    
+    def restore_policy(self) -> str:
+        """
+        Rebuild the policy from the learning events of earlier runs
+        
+        Streams the log's older segments in batches (bounded memory), so a
+        restarted worker recommends with everything learned before, instead
+        of from the cold-start prior. Attempts logged by this worker are
+        already learned online and are not replayed, and neither is anything
+        a shared policy state already holds (other workers' updates, or the
+        snapshot a restart picked up); every other update waits meanwhile.
+        """
+        if self.policy is None or not self.events.enabled:
+            return "skipped"
+        from app.services.policy_replay import train
+        
+        segments = self.events.history()
+        with self.policy.exclusive():
+            since = self.policy.trained_through
+            result = train(self.policy, read_batches(segments), since=since)
+        if since:
+            return f"{result['events']} events from {len(segments)} segments after the shared state"
+        return f"{result['events']} events from {len(segments)} segments"
+    
+    def close(self):
+        if self.policy is not None:
+            self.policy.close()
+    
+    def queue_stats(self) -> dict:
+        if self.queues is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.queues.stats()}
+    
+    def policy_stats(self) -> dict:
+        if self.policy is None:
+            return {"policy": "heuristic"}
+        return self.policy.stats()
+
+
+def _build_policy():
+    if os.getenv("RL_POLICY", "linucb").lower() == "heuristic":
+        return None
+    if LinUCBPolicy is None:
+        print("WARNING: numpy not installed. Using heuristic recommendations.")
+        return None
+    settings = dict(
+        alpha=float(os.getenv("RL_ALPHA", 0.5)),
+        exploration=float(os.getenv("RL_EXPLORATION", 0.05))
+    )
+    shared_dir = os.getenv("RL_SHARED_STATE_DIR", "")
+    if shared_dir:
+        if SHARED_STATE_SUPPORTED:
+            return SharedLinUCBPolicy(
+                shared_dir, snapshot_seconds=float(os.getenv("RL_SNAPSHOT_SECONDS", 30)), **settings
+            )
+        print("WARNING: shared policy state needs fcntl (not on Windows). Each worker keeps its own policy.")
+    return LinUCBPolicy(**settings)
+
+def _build_queues() -> Optional[RecommendationQueues]:
+    depth = int(os.getenv("RECOMMEND_QUEUE_DEPTH", 3))
+    if depth <= 0:
+        return None
+    return RecommendationQueues(
+        depth=depth,
+        ttl=float(os.getenv("RECOMMEND_QUEUE_TTL", 60)),
+        max_students=int(os.getenv("RECOMMEND_QUEUE_SIZE", 10000))
+    )
 
 # Singleton instance
-rl_service = RLService()
+rl_service = RLService(
+    catalog_ttl=float(os.getenv("CHALLENGE_CATALOG_TTL", 300)),
+    policy=_build_policy(),
+    coalesce=os.getenv("COALESCE_REQUESTS", "true").lower() == "true",
+    queues=_build_queues()
+)
@@ -0,0 +1,463 @@
+import ast
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.lib.shared_state import SHARED_STATE_SUPPORTED, FileLock
+from app.services.code_analyzer import BUILTIN_NAMES
+
+load_dotenv()
+
+# MinHash signature length, split into LSH bands of NUM_PERM // BANDS rows:
+# snippets with Jaccard similarity s share a band with probability
+# 1 - (1 - s^4)^16, i.e. 0.9998 at s = 0.8 and 0.12 at s = 0.3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+NGRAM = 3
+
+# Near-identical snippets with the same error type are stored once
+DUPLICATE_SIMILARITY = 0.98
+
+_SEED = 0x5E55
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32
+_rng = np.random.default_rng(_SEED)
+# a < 2**32 and h < 2**32, so a * h + b never overflows uint64
+_PERM_A = _rng.integers(1, 2 ** 32, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64)
+# Odd multipliers that fold a band's rows into one 64-bit bucket key
+_BAND_MULT = _rng.integers(1, 2 ** 63, ROWS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+SIGNATURE_MAGIC = b"PHYSIG01"
+_SIGNATURE_HEADER = np.array([NUM_PERM, _SEED], dtype="<u4").tobytes()
+_HEADER_BYTES = len(SIGNATURE_MAGIC) + len(_SIGNATURE_HEADER)
+_SIGNATURE_BYTES = NUM_PERM * 4
+
+# Tokens for snippets that don't parse: identifiers, numbers, strings, punctuation
+_TOKEN_RE = re.compile(r"[A-Za-z_]\w*|\d+(?:\.\d+)?|\"[^\"\n]*\"?|'[^'\n]*'?|\S")
+_KEYWORDS = {
+    "False", "None", "True", "and", "as", "assert", "async", "await", "break", "class", "continue", "def",
+    "del", "elif", "else", "except", "finally", "for", "from", "global", "if", "import", "in", "is",
+    "lambda", "nonlocal", "not", "or", "pass", "raise", "return", "try", "while", "with", "yield",
+}
+# Code in a reply: fenced blocks and inline spans
+_CODE_RE = re.compile(r"```.*?```|`[^`\n]*`", re.DOTALL)
+
+
+class Fingerprint(NamedTuple):
+    """MinHash signature of a snippet, and its identifiers in order of first use"""
+    signature: np.ndarray
+    names: Tuple[str, ...]
+
+
+class SessionMatch(NamedTuple):
+    """A stored session similar to the query, with its reply adapted to the query's names"""
+    id: int
+    similarity: float
+    error_type: Optional[str]
+    reply: str
+
+
+def _node_token(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.expr_context):
+        return None
+    if isinstance(node, ast.Name):
+        return f"Name:{node.id}" if node.id in BUILTIN_NAMES else "Name"
+    if isinstance(node, ast.Attribute):
+        return f"Attr:{node.attr}"
+    if isinstance(node, ast.Constant):
+        return f"Const:{type(node.value).__name__}"
+    return type(node).__name__
+
+
+def _ast_features(tree: ast.AST) -> Tuple[List[str], List[str], List[str]]:
+    """Node tokens in preorder, parent>child pairs, and identifiers in order of first use"""
+    tokens, pairs, names = [], [], {}
+    stack = [(tree, "")]
+    while stack:
+        node, parent = stack.pop()
+        token = _node_token(node)
+        if token is None:
+            continue
+        tokens.append(token)
+        pairs.append(f"{parent}>{token}")
+        name = getattr(node, "id", None) or getattr(node, "arg", None)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            name = node.name
+        if isinstance(name, str) and name not in BUILTIN_NAMES:
+            names.setdefault(name, None)
+        stack.extend((child, token) for child in reversed(list(ast.iter_child_nodes(node))))
+    return tokens, pairs, list(names)
+
+
+def _token_features(code: str) -> Tuple[List[str], List[str], List[str]]:
+    """Fallback for code that doesn't parse: identifiers and literals abstracted away"""
+    tokens, names = [], {}
+    for token in _TOKEN_RE.findall(code):
+        if token[0].isalpha() or token[0] == "_":
+            if token in _KEYWORDS or token in BUILTIN_NAMES:
+                tokens.append(token)
+            else:
+                tokens.append("ID")
+                names.setdefault(token, None)
+        elif token[0].isdigit():
+            tokens.append("NUM")
+        elif token[0] in "\"'":
+            tokens.append("STR")
+        else:
+            tokens.append(token)
+    return ["T:" + t for t in tokens], [], list(names)
+
+
+def fingerprint(code: Optional[str]) -> Optional[Fingerprint]:
+    """
+    MinHash of a snippet's hashed n-grams (None when there is nothing to hash)
+
+    Parsable code is shingled as n-grams of its AST in preorder plus
+    parent>child pairs; variable names and literal values are abstracted
+    away, builtins, attributes and literal types are kept, so a renamed
+    copy of a snippet has the same fingerprint. Code that doesn't parse is
+    shingled as n-grams of abstracted tokens instead.
+    """
+    if not code or not code.strip():
+        return None
+    try:
+        tokens, shingles, names = _ast_features(ast.parse(code))
+    except (SyntaxError, ValueError, RecursionError):
+        tokens, shingles, names = _token_features(code)
+    if len(tokens) >= NGRAM:
+        shingles += ["\x1f".join(tokens[i:i + NGRAM]) for i in range(len(tokens) - NGRAM + 1)]
+    else:
+        shingles += tokens
+    if not shingles:
+        return None
+    hashes = np.unique(np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles)))
+    signature = ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+    return Fingerprint((signature & np.uint64(0xFFFFFFFF)).astype(np.uint32), tuple(names))
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """LSH bucket key of every band of every signature, as a (signatures x bands) uint64 array"""
+    rows = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    return (rows * _BAND_MULT).sum(axis=2)
+
+
+def adapt_reply(reply: str, stored_names: Sequence[str], names: Sequence[str]) -> str:
+    """
+    Rename the stored snippet's identifiers to the query's inside the reply's code
+
+    Names are paired by order of first use, which lines up when the two
+    snippets have the same structure; otherwise the reply is returned as is.
+    """
+    if len(stored_names) != len(names):
+        return reply
+    mapping = {old: new for old, new in zip(stored_names, names) if old != new}
+    if not mapping:
+        return reply
+    pattern = re.compile(r"\b(" + "|".join(map(re.escape, mapping)) + r")\b")
+    return _CODE_RE.sub(lambda code: pattern.sub(lambda m: mapping[m.group(1)], code.group(0)), reply)
+
+
+class SessionIndex:
+    """
+    Approximate nearest-neighbour index of resolved debugging sessions
+
+    Every model answer that came with a fix is stored with the snippet's
+    MinHash `fingerprint`: the answer as a JSON line in `answers.jsonl`,
+    its offset in `offsets.bin` and the signature in `signatures.bin`, all
+    append-only, so the index survives restarts and is rebuilt from them on
+    start. Lookups go through LSH: each signature is cut into BANDS bands,
+    and only entries sharing a band's bucket with the query are compared
+    (by the share of equal MinHash values, an estimate of their Jaccard
+    similarity). A match at or above `threshold` is returned with its reply
+    adapted to the query's identifiers.
+
+    Each band's buckets are a sorted array of keys with the matching entry
+    IDs (binary search, a few bytes per entry); entries added since the last
+    merge sit in a per-band dict until there are enough of them to merge.
+    Workers sharing a directory append under a file lock, and each picks up
+    the others' entries whenever it adds one.
+    """
+
+    def __init__(self, directory: Optional[str] = None, threshold: float = 0.8,
+                 max_candidates: int = 256, bucket_limit: int = 1024):
+        self.directory = directory
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.bucket_limit = bucket_limit
+
+        self._lock = threading.RLock()
+        self._signatures = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self._offsets = np.zeros(0, dtype=np.int64)
+        self._count = 0
+        # Per band: sorted bucket keys and entry IDs for entries [0, _merged)
+        self._keys = [np.zeros(0, dtype=np.uint64) for _ in range(BANDS)]
+        self._ids = [np.zeros(0, dtype=np.int32) for _ in range(BANDS)]
+        self._merged = 0
+        # Per band: bucket key -> IDs of entries added since the last merge
+        self._tail: List[Dict[int, List[int]]] = [{} for _ in range(BANDS)]
+        self._reader = None
+
+        self.queries = 0
+        self.hits = 0
+        self.served = 0
+        self.rejected = 0
+        self.added = 0
+        self.duplicates = 0
+        self.merges = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            lock_path = os.path.join(self.directory, "index.lock")
+            # Without flock (Windows) only this process's threads are excluded
+            self._file_lock = FileLock(lock_path) if SHARED_STATE_SUPPORTED else threading.RLock()
+            with self._file_lock:
+                self._open()
+                self._catch_up()
+            self._merge()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # --- files ---
+
+    def _open(self):
+        # Caller holds the file lock
+        path = self._path("signatures.bin")
+        header = b""
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                header = f.read(_HEADER_BYTES)
+        if header != SIGNATURE_MAGIC + _SIGNATURE_HEADER:
+            if header:
+                print(f"WARNING: session index in {self.directory} has another layout; starting a new one")
+            with open(path, "wb") as f:
+                f.write(SIGNATURE_MAGIC + _SIGNATURE_HEADER)
+            for name in ("offsets.bin", "answers.jsonl"):
+                open(self._path(name), "wb").close()
+        self._answers = open(self._path("answers.jsonl"), "ab")
+        self._offsets_file = open(self._path("offsets.bin"), "ab")
+        self._signatures_file = open(path, "ab")
+        self._reader = open(self._path("answers.jsonl"), "rb")
+
+    def _catch_up(self):
+        """Load entries appended by other workers (caller holds the file lock)"""
+        signatures = (os.path.getsize(self._path("signatures.bin")) - _HEADER_BYTES) // _SIGNATURE_BYTES
+        offsets = os.path.getsize(self._path("offsets.bin")) // 8
+        total = min(signatures, offsets)
+        # A write torn by a crash leaves one file ahead; cut it back so the next append lines up
+        os.truncate(self._path("signatures.bin"), _HEADER_BYTES + total * _SIGNATURE_BYTES)
+        os.truncate(self._path("offsets.bin"), total * 8)
+        if total <= self._count:
+            return
+        new = total - self._count
+        with open(self._path("signatures.bin"), "rb") as f:
+            f.seek(_HEADER_BYTES + self._count * _SIGNATURE_BYTES)
+            signatures = np.fromfile(f, dtype="<u4", count=new * NUM_PERM).reshape(new, NUM_PERM)
+        with open(self._path("offsets.bin"), "rb") as f:
+            f.seek(self._count * 8)
+            offsets = np.fromfile(f, dtype="<i8", count=new)
+        self._append(signatures, offsets)
+
+    def _append(self, signatures: np.ndarray, offsets: np.ndarray):
+        """Add entries to the in-memory index"""
+        with self._lock:
+            start, n = self._count, len(signatures)
+            if start + n > len(self._signatures):
+                capacity = max(1024, 2 * len(self._signatures), start + n)
+                grown = np.zeros((capacity, NUM_PERM), dtype=np.uint32)
+                grown[:start] = self._signatures[:start]
+                self._signatures = grown
+                grown_offsets = np.zeros(capacity, dtype=np.int64)
+                grown_offsets[:start] = self._offsets[:start]
+                self._offsets = grown_offsets
+            self._signatures[start:start + n] = signatures
+            self._offsets[start:start + n] = offsets
+            self._count = start + n
+            if self._count - self._merged >= max(4096, self._merged // 8):
+                self._merge()
+                return
+            keys = band_keys(signatures)
+            for band in range(BANDS):
+                tail = self._tail[band]
+                for i, key in enumerate(keys[:, band].tolist()):
+                    tail.setdefault(key, []).append(start + i)
+
+    def _merge(self):
+        """Fold the entries added since the last merge into the sorted band arrays"""
+        with self._lock:
+            if self._count == self._merged:
+                return
+            new_ids = np.arange(self._merged, self._count, dtype=np.int32)
+            keys = band_keys(self._signatures[self._merged:self._count])
+            for band in range(BANDS):
+                order = np.argsort(keys[:, band], kind="stable")
+                band_keys_, band_ids = keys[order, band], new_ids[order]
+                positions = np.searchsorted(self._keys[band], band_keys_, side="right")
+                self._keys[band] = np.insert(self._keys[band], positions, band_keys_)
+                self._ids[band] = np.insert(self._ids[band], positions, band_ids)
+                self._tail[band] = {}
+            self._merged = self._count
+            self.merges += 1
+
+    # --- queries ---
+
+    def _nearest(self, signature: np.ndarray) -> Optional[Tuple[int, float]]:
+        """
+        Most similar entry among those sharing a bucket with `signature`
+
+        Bands made of very common shingles have huge buckets, so at most
+        `bucket_limit` entries are taken from each, and of those only the
+        `max_candidates` that share the most bands with the query (a close
+        match shares several) are compared in full.
+        """
+        keys = band_keys(signature[None, :])[0].tolist()
+        candidates = []
+        with self._lock:
+            for band, key in enumerate(keys):
+                sorted_keys = self._keys[band]
+                lo = int(np.searchsorted(sorted_keys, np.uint64(key), side="left"))
+                if lo < len(sorted_keys) and sorted_keys[lo] == key:
+                    hi = int(np.searchsorted(sorted_keys, np.uint64(key), side="right"))
+                    candidates.append(self._ids[band][lo:min(hi, lo + self.bucket_limit)])
+                recent = self._tail[band].get(key)
+                if recent:
+                    candidates.append(np.asarray(recent[-self.bucket_limit:], dtype=np.int32))
+            if not candidates:
+                return None
+            ids, collisions = np.unique(np.concatenate(candidates), return_counts=True)
+            if len(ids) > self.max_candidates:
+                ids = ids[np.argpartition(-collisions, self.max_candidates - 1)[:self.max_candidates]]
+            similarity = np.count_nonzero(self._signatures[ids] == signature, axis=1)
+        best = int(similarity.argmax())
+        return int(ids[best]), float(similarity[best]) / NUM_PERM
+
+    def _answer(self, entry: int) -> dict:
+        with self._lock:
+            self._reader.seek(int(self._offsets[entry]))
+            return json.loads(self._reader.readline())
+
+    def query(self, fingerprint: Fingerprint) -> Optional[SessionMatch]:
+        """The most similar stored session at or above `threshold`, if any"""
+        if not self.enabled:
+            return None
+        self.queries += 1
+        if self._count == 0:
+            return None
+        nearest = self._nearest(fingerprint.signature)
+        if nearest is None or nearest[1] < self.threshold:
+            return None
+        self.hits += 1
+        entry, similarity = nearest
+        answer = self._answer(entry)
+        return SessionMatch(
+            entry, round(similarity, 4), answer["error_type"],
+            adapt_reply(answer["reply"], answer["names"], fingerprint.names)
+        )
+
+    def lookup(self, code: Optional[str]) -> Tuple[Optional[Fingerprint], Optional[SessionMatch]]:
+        """Fingerprint `code` and find its nearest stored session (the fingerprint is reused by `add`)"""
+        if not self.enabled:
+            return None, None
+        fp = fingerprint(code)
+        return fp, self.query(fp) if fp is not None else None
+
+    def accept(self, match: SessionMatch, error_type: Optional[str]) -> bool:
+        """Serve the match only if this snippet's own analysis agrees on the error type (None: no bug found, never)"""
+        accepted = match.error_type == error_type
+        if accepted:
+            self.served += 1
+        else:
+            self.rejected += 1
+        return accepted
+
+    # --- writes ---
+
+    def add(self, fp: Fingerprint, error_type: Optional[str], reply: str) -> bool:
+        """Store a resolved session; False when a near-identical one is already stored"""
+        if not self.enabled:
+            return False
+        line = json.dumps({"error_type": error_type, "reply": reply, "names": list(fp.names)}).encode() + b"\n"
+        with self._file_lock:
+            self._catch_up()
+            nearest = self._nearest(fp.signature) if self._count else None
+            if nearest is not None and nearest[1] >= DUPLICATE_SIMILARITY and self._answer(nearest[0])["error_type"] == error_type:
+                self.duplicates += 1
+                return False
+            self._write([fp.signature], [line])
+        self.added += 1
+        return True
+
+    def add_many(self, fingerprints: Sequence[Fingerprint], answers: Sequence[Tuple[Optional[str], str]]) -> int:
+        """Bulk load (backfills, benchmarks): no duplicate check, one write per file"""
+        if not self.enabled or not fingerprints:
+            return 0
+        lines = [
+            json.dumps({"error_type": error_type, "reply": reply, "names": list(fp.names)}).encode() + b"\n"
+            for fp, (error_type, reply) in zip(fingerprints, answers)
+        ]
+        with self._file_lock:
+            self._catch_up()
+            self._write([fp.signature for fp in fingerprints], lines)
+        self.added += len(lines)
+        return len(lines)
+
+    def _write(self, signatures: List[np.ndarray], lines: List[bytes]):
+        # Caller holds the file lock; answers first, so every signature on disk has its answer
+        start = os.fstat(self._answers.fileno()).st_size
+        offsets = np.cumsum([start] + [len(line) for line in lines[:-1]], dtype=np.int64)
+        self._answers.write(b"".join(lines))
+        self._answers.flush()
+        self._offsets_file.write(offsets.astype("<i8").tobytes())
+        self._offsets_file.flush()
+        signatures = np.asarray(signatures, dtype="<u4").reshape(len(lines), NUM_PERM)
+        self._signatures_file.write(signatures.tobytes())
+        self._signatures_file.flush()
+        self._append(signatures, offsets)
+
+    def close(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            for f in (self._answers, self._offsets_file, self._signatures_file, self._reader):
+                f.close()
+            self.directory = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": self._count,
+                "threshold": self.threshold,
+                "bands": BANDS,
+                "rows_per_band": ROWS,
+                "memory_bytes": int(self._count * (_SIGNATURE_BYTES + 8 + BANDS * 12)),
+                "queries": self.queries,
+                "hits": self.hits,
+                "served": self.served,
+                "rejected": self.rejected,
+                "hit_rate": round(self.served / self.queries, 4) if self.queries else 0.0,
+                "added": self.added,
+                "duplicates": self.duplicates,
+                "merges": self.merges,
+            }
+
+
+# Singleton instance
+session_index = SessionIndex(
+    directory=os.getenv("SESSION_INDEX_DIR", "./data/sessions") or None,
+    threshold=float(os.getenv("SESSION_INDEX_THRESHOLD", 0.8))
+)
@@ -0,0 +1,279 @@
+import hashlib
+import keyword
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from app.services.code_analyzer import ERROR_PRIORITY, CodeAnalysis
+from app.services.incremental_analyzer import AnalysisSession, build_session, derive_session
+from app.services.response_cache import normalize_code
+
+load_dotenv()
+
+# Identifiers and numbers outside string literals are the maskable tokens
+_TOKEN_RE = re.compile(r"""[rbfuRBFU]{0,2}(?:"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|[A-Za-z_]\w*|\d+(?:\.\d+)?""")
+_TOKEN_MASK = "None"
+
+
+def score(analysis: CodeAnalysis, prediction: str) -> float:
+    """How strongly the classifier supports `prediction` for one variant"""
+    if analysis.error_type == prediction and analysis.matched:
+        return 1.0
+    if any(f["error_type"] == prediction for f in analysis.findings):
+        return 0.5
+    return 0.0
+
+
+def score_batch(
+    variants: List[str],
+    prediction: str,
+    baseline: AnalysisSession,
+    require_parse: bool = False
+) -> Tuple[List[Optional[float]], int]:
+    """
+    Score every variant in one pass, evaluating each distinct text once
+
+    Masking the same identifier twice on a line, or masking a line that is
+    already `pass`, yields identical programs, so duplicates are collapsed
+    before the classifier runs. Each variant is analysed incrementally
+    against the `baseline` session, re-analysing only the masked statement
+    and those depending on it. Returns the scores and the number of
+    classifier evaluations actually made. With `require_parse`, variants
+    the masking itself broke (e.g. `None = ...`) score None.
+    """
+    unique: Dict[str, Optional[float]] = {}
+    for variant in variants:
+        if variant not in unique:
+            analysis = derive_session(baseline, variant).analysis
+            unique[variant] = None if require_parse and not analysis.parsed else score(analysis, prediction)
+    return [unique[v] for v in variants], len(unique)
+
+
+def resolve_prediction(prediction: Optional[str], analysis: CodeAnalysis) -> str:
+    """Map the caller's free-text prediction onto one of the classifier's labels"""
+    text = (prediction or "").lower()
+    for error_type in ERROR_PRIORITY:
+        if error_type.lower() in text:
+            return error_type
+    return analysis.error_type
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _mask_line(lines: List[str], index: int) -> str:
+    line = lines[index]
+    following = next((l for l in lines[index + 1:] if l.strip()), "")
+    # A masked block header must still open a block, or the body becomes a new error
+    is_header = line.rstrip().endswith(":") or _indent(following) > _indent(line)
+    replacement = line[:_indent(line)] + ("if True:" if is_header else "pass")
+    return "\n".join(lines[:index] + [replacement] + lines[index + 1:])
+
+
+def _line_tokens(line: str) -> List[Tuple[int, int, str]]:
+    tokens = []
+    code = line.split("#", 1)[0] if "'" not in line and '"' not in line else line
+    for match in _TOKEN_RE.finditer(code):
+        text = match.group(0)
+        if text[-1] in "'\"" or keyword.iskeyword(text):
+            continue
+        tokens.append((match.start(), match.end(), text))
+    return tokens
+
+
+class OcclusionExplainer:
+    """
+    Occlusion-based attribution for the bug classifier
+
+    A line's attribution is how much the classifier's support for the
+    prediction drops when that line is masked; the same is done for the
+    identifiers and numbers inside the top lines. Variants are built up
+    front and scored in batches, most likely lines first, until the top
+    ranking stops changing or `sample_budget` classifier evaluations are
+    spent.
+
+    Attributions are memoized per (prediction, finding signature,
+    normalized line): when a student edits one line and re-asks, and the
+    classifier's findings are unchanged, only the edited line is scored
+    again.
+    """
+
+    def __init__(
+        self,
+        sample_budget: int = 64,
+        chunk_size: int = 8,
+        patience: int = 2,
+        top_k: int = 3,
+        memo_size: int = 4096
+    ):
+        self.sample_budget = sample_budget
+        self.chunk_size = chunk_size
+        self.patience = patience
+        self.top_k = top_k
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.explanations = 0
+        self.evaluations = 0
+        self.memo_hits = 0
+        self.early_stops = 0
+
+    def explain(self, code: str, prediction: Optional[str] = None, session: Optional[AnalysisSession] = None) -> dict:
+        """
+        Attribute `prediction` to lines and tokens of `code`
+
+        `session` is an already analysed session for `code` (e.g. the
+        conversation's); without one the snippet is analysed here.
+        """
+        lines = code.split("\n")
+        session = session or build_session(code)
+        baseline = session.analysis
+        label = resolve_prediction(prediction, baseline)
+        base_score = score(baseline, label)
+        signature = self._signature(baseline, lines)
+        evaluations = 1
+
+        candidates = [i for i, line in enumerate(lines) if line.strip() and not line.strip().startswith("#")]
+        memo_keys = {i: self._memo_key(label, signature, lines[i]) for i in candidates}
+
+        line_attr: Dict[int, float] = {}
+        token_attr: Dict[int, Dict[str, float]] = {}
+        for i in candidates:
+            entry = self._memo_get(memo_keys[i])
+            if entry is not None:
+                line_attr[i] = entry["line"]
+                if entry.get("tokens") is not None:
+                    token_attr[i] = entry["tokens"]
+
+        # Lines with findings first, then by distance to the primary finding;
+        # the same order breaks ties between equally attributed lines
+        finding_lines = {f["line"] - 1 for f in baseline.findings}
+        anchor = (baseline.line or 1) - 1
+        order = sorted(candidates, key=lambda i: (i not in finding_lines, abs(i - anchor), i))
+        priority = {i: rank for rank, i in enumerate(order)}
+        pending = [i for i in order if i not in line_attr]
+
+        stable = 0
+        ranking = self._ranking(line_attr, priority)
+        while pending and evaluations < self.sample_budget:
+            chunk = pending[:min(self.chunk_size, self.sample_budget - evaluations)]
+            pending = pending[len(chunk):]
+            scores, evaluated = score_batch([_mask_line(lines, i) for i in chunk], label, session)
+            evaluations += evaluated
+            for i, s in zip(chunk, scores):
+                line_attr[i] = round(base_score - s, 4)
+                self._memo_put(memo_keys[i], {"line": line_attr[i], "tokens": None})
+
+            new_ranking = self._ranking(line_attr, priority)
+            stable = stable + 1 if new_ranking == ranking and line_attr else 0
+            ranking = new_ranking
+            if pending and stable >= self.patience:
+                with self._lock:
+                    self.early_stops += 1
+                break
+
+        # Token-level occlusion inside the top lines, with whatever budget is left
+        for i in ranking:
+            if i in token_attr or line_attr.get(i, 0) <= 0:
+                continue
+            tokens = _line_tokens(lines[i])
+            if not tokens or evaluations + len(tokens) > self.sample_budget:
+                continue
+            variants = []
+            for start, end, _ in tokens:
+                masked = lines[i][:start] + _TOKEN_MASK + lines[i][end:]
+                variants.append("\n".join(lines[:i] + [masked] + lines[i + 1:]))
+            scores, evaluated = score_batch(variants, label, session, require_parse=baseline.parsed)
+            evaluations += evaluated
+            token_attr[i] = {}
+            for (_, _, text), s in zip(tokens, scores):
+                if s is None:
+                    continue
+                token_attr[i][text] = max(token_attr[i].get(text, 0.0), round(base_score - s, 4))
+            self._memo_put(memo_keys[i], {"line": line_attr[i], "tokens": token_attr[i]})
+
+        with self._lock:
+            self.explanations += 1
+            self.evaluations += evaluations
+
+        return self._result(lines, label, ranking, line_attr, token_attr, evaluations)
+
+    def _ranking(self, line_attr: Dict[int, float], priority: Dict[int, int]) -> List[int]:
+        positive = [i for i, a in line_attr.items() if a > 0]
+        return sorted(positive, key=lambda i: (-line_attr[i], priority[i]))[:self.top_k]
+
+    def _result(self, lines, label, ranking, line_attr, token_attr, evaluations) -> dict:
+        importance = {}
+        for i in ranking:
+            importance[f"line {i + 1}"] = line_attr[i]
+            for text, value in sorted(token_attr.get(i, {}).items(), key=lambda kv: -kv[1]):
+                if value > 0:
+                    importance[f"{text} (line {i + 1})"] = value
+
+        if ranking:
+            top = ranking[0]
+            text = (
+                f"The {label} prediction depends most on line {top + 1} "
+                f"(`{lines[top].strip()}`): masking it lowers the classifier's support by {line_attr[top]:.2f}."
+            )
+            tokens = [t for t, v in sorted(token_attr.get(top, {}).items(), key=lambda kv: -kv[1]) if v > 0]
+            if tokens:
+                text += " The key parts are " + ", ".join(f"`{t}`" for t in tokens[:3]) + "."
+        else:
+            text = f"No single line changes the {label} prediction when masked; the issue is spread across the code."
+
+        return {
+            "highlighted_lines": [i + 1 for i in ranking],
+            "feature_importance": importance,
+            "explanation_text": text,
+            "evaluations": evaluations,
+        }
+
+    def _signature(self, analysis: CodeAnalysis, lines: List[str]) -> str:
+        parts = []
+        for f in analysis.findings:
+            line = lines[f["line"] - 1] if 0 < f["line"] <= len(lines) else ""
+            parts.append(f"{f['error_type']}:{normalize_code(line)}")
+        return "\n".join(parts)
+
+    def _memo_key(self, label: str, signature: str, line: str) -> str:
+        payload = f"{label}\0{signature}\0{normalize_code(line)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _memo_get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._memo.get(key)
+            if entry is not None:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+            return entry
+
+    def _memo_put(self, key: str, entry: dict):
+        with self._lock:
+            self._memo[key] = entry
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "explanations": self.explanations,
+                "evaluations": self.evaluations,
+                "evaluations_per_explanation": round(self.evaluations / self.explanations, 2) if self.explanations else 0.0,
+                "memo_size": len(self._memo),
+                "memo_hits": self.memo_hits,
+                "early_stops": self.early_stops,
+                "sample_budget": self.sample_budget,
+            }
+
+
+# Singleton instance
+xai_explainer = OcclusionExplainer(
+    sample_budget=int(os.getenv("XAI_SAMPLE_BUDGET", 64)),
+    memo_size=int(os.getenv("XAI_MEMO_SIZE", 4096))
+)
@@ -0,0 +1,88 @@
+"""
+Benchmark: recommendation latency with large challenge catalogs
+
+Compares the previous list-scanning selection (filter completed ids, then
+one list comprehension per difficulty tier) with ChallengeCatalog's
+difficulty index at 10k and 100k challenges, for students at each stage of
+the Easy -> Medium -> Hard progression. Also reports the catalog build time
+paid once per refresh.
+
+Run from the backend directory:
+    python -m benchmarks.bench_challenge_catalog
+"""
+import random
+import statistics
+import time
+
+from app.services.challenge_catalog import ChallengeCatalog
+from app.services.progress_cache import StudentProgress
+from app.services.rl_service import RLService
+
+DIFFICULTIES = ["Easy"] * 4 + ["Medium"] * 4 + ["Hard"] * 2
+ERROR_TYPES = ["NameError", "IndexError", "TypeError", "SyntaxError", "AttributeError", "LogicError"]
+
+
+def make_rows(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": str(i),
+            "title": f"Challenge {i}",
+            "description": "Find and fix the bug",
+            "difficulty": rng.choice(DIFFICULTIES),
+            "error_type": rng.choice(ERROR_TYPES),
+            "learning_objectives": [f"objective-{rng.randrange(200)}"],
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_select(rows: list, completed_ids: list) -> dict:
+    """The pre-catalog path: O(n*m) filter, then a scan per tier"""
+    available = [c for c in rows if c["id"] not in completed_ids]
+    count = len(completed_ids)
+    if count < 2:
+        easy = [c for c in available if c["difficulty"] == "Easy"]
+        if easy:
+            return random.choice(easy)
+    elif count < 4:
+        medium = [c for c in available if c["difficulty"] == "Medium"]
+        if medium:
+            return random.choice(medium)
+    advanced = [c for c in available if c["difficulty"] in ["Medium", "Hard"]]
+    return random.choice(advanced or available)
+
+
+def time_ms(fn, repeat: int) -> tuple:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.99) - 1)]
+
+
+def main():
+    service = RLService()
+    print(f"{'challenges':>10} {'completed':>9} {'legacy p50':>11} {'catalog p50':>12} {'catalog p99':>12}")
+    for n in (10_000, 100_000):
+        rows = make_rows(n)
+        start = time.perf_counter()
+        catalog = ChallengeCatalog.from_rows(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for completed in (0, 3, 50):
+            progress = StudentProgress()
+            progress.completed.update(str(i) for i in range(completed))
+            completed_list = list(progress.completed)
+
+            legacy_repeat = 20 if n >= 100_000 else 100
+            legacy_p50, _ = time_ms(lambda: legacy_select(rows, completed_list), legacy_repeat)
+            new_p50, new_p99 = time_ms(lambda: service._recommend("bench", progress, catalog), 2000)
+            print(f"{n:>10,} {completed:>9} {legacy_p50:>9.3f}ms {new_p50:>10.4f}ms {new_p99:>10.4f}ms")
+        print(f"{'':>10} catalog build (once per refresh): {build_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Time-to-first-token for /api/chat/stream vs. /api/chat, plus cancellation
+
+Runs the model path with the stub model (USE_MOCK_AI=false,
+INFERENCE_MODEL=stub) under uvicorn in a background thread.
+Run from the backend directory:
+    python -m benchmarks.bench_chat_stream
+"""
+import os
+
+os.environ.setdefault("USE_MOCK_AI", "false")
+os.environ.setdefault("INFERENCE_MODEL", "stub")
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+# Every request comes from one user: keep the per-student rate limit out of the timings
+os.environ.setdefault("SCHED_STUDENT_RATE", "0")
+# Repeats of one snippet would be answered from the resolved-session index instead of streamed by the model
+os.environ.setdefault("SESSION_INDEX_DIR", "")
+
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.services.ai_service import ai_service
+from benchmarks.load_health_vs_chat import free_port, start_server
+
+SNIPPET = "numbers = [1, 2, 3]\nfor i in range(4):\n    print(numbers[i])"
+
+
+async def time_blocking(client: httpx.AsyncClient) -> float:
+    start = time.perf_counter()
+    response = await client.post("/api/chat", json={"user_id": "bench", "message": "help", "code_snippet": SNIPPET})
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def time_stream(client: httpx.AsyncClient) -> tuple:
+    start = time.perf_counter()
+    first = None
+    body = {"user_id": "bench", "message": "help", "code_snippet": SNIPPET}
+    async with client.stream("POST", "/api/chat/stream", json=body) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if first is None and line.startswith("event: token"):
+                first = (time.perf_counter() - start) * 1000
+    return first, (time.perf_counter() - start) * 1000
+
+
+async def check_cancellation(client: httpx.AsyncClient) -> tuple:
+    """Disconnect after the first token and count how many tokens were still produced"""
+    model = ai_service.model
+    original_stream = model.stream_generate
+    produced = [0]
+
+    def counting_stream(prompt, cancel):
+        for token in original_stream(prompt, cancel):
+            produced[0] += 1
+            yield token
+
+    model.stream_generate = counting_stream
+    model.decode_step_ms = 50.0
+    try:
+        body = {"user_id": "bench", "message": "help", "code_snippet": SNIPPET}
+        async with client.stream("POST", "/api/chat/stream", json=body) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: token"):
+                    break
+        await asyncio.sleep(1.0)
+    finally:
+        model.stream_generate = original_stream
+        model.decode_step_ms = 5.0
+    total_tokens = len(model._prefill(["x"])[0].split())
+    return produced[0], total_tokens
+
+
+async def main(rounds: int = 20):
+    port = free_port()
+    server = start_server(port)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+        await time_blocking(client)  # warm the CPU pool
+
+        blocking = [await time_blocking(client) for _ in range(rounds)]
+        streamed = [await time_stream(client) for _ in range(rounds)]
+        produced, total = await check_cancellation(client)
+
+    server.should_exit = True
+    print(f"/api/chat         full response p50: {statistics.median(blocking):7.1f} ms")
+    print(f"/api/chat/stream  first token   p50: {statistics.median(s[0] for s in streamed):7.1f} ms")
+    print(f"/api/chat/stream  last event    p50: {statistics.median(s[1] for s in streamed):7.1f} ms")
+    print(f"cancellation: {produced}/{total} tokens generated after disconnect at first token")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
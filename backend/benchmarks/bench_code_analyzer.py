@@ -0,0 +1,73 @@
+"""
+Per-snippet latency of the AST error classifier
+
+Run from the backend directory:
+    python -m benchmarks.bench_code_analyzer
+"""
+import statistics
+import time
+
+from app.services.ai_service import AIService
+from app.services.code_analyzer import analyze_code
+
+# Realistic building blocks taken from the challenge bug_code samples
+BLOCKS = [
+    "numbers = [1, 2, 3]\nfor i in range(3):\n    print(numbers[i])",
+    "def calculate_sum(a, b):\n    result = a + b\n    return result",
+    "age = int('25')\nyears_ahead = 5\nfuture_age = age + years_ahead",
+    "counter = 0\nwhile counter < 10:\n    counter = counter + 1",
+    "if counter > 5:\n    print('Greater')\nelse:\n    print('Smaller')",
+]
+
+BUGGY_TAIL = "values = [1, 2]\nfor j in range(5):\n    print(values[j])"
+
+SIZES = [1, 10, 50, 100, 250, 500]
+
+
+def make_snippet(lines: int, buggy: bool = True, broken: bool = False) -> str:
+    """Build a snippet of roughly `lines` lines ending in a known bug"""
+    out = []
+    i = 0
+    # Whole blocks only, so the filler itself always parses
+    while len(out) < lines:
+        out.extend(BLOCKS[i % len(BLOCKS)].split("\n"))
+        i += 1
+    if buggy:
+        out.extend(BUGGY_TAIL.split("\n"))
+    if broken:
+        out.append("if x > 5")
+    return "\n".join(out)
+
+
+def time_call(fn, arg, repeats: int) -> list:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def run(repeats: int = 200):
+    service = AIService()
+    print(f"{'lines':>6} {'mode':>10} {'p50 us':>10} {'p99 us':>10} {'detected':>12}")
+    for size in SIZES:
+        for mode, snippet in (
+            ("ast", make_snippet(size)),
+            ("tokenize", make_snippet(size, broken=True)),
+        ):
+            samples = sorted(time_call(analyze_code, snippet, repeats))
+            p50 = statistics.median(samples)
+            p99 = samples[int(len(samples) * 0.99) - 1]
+            detected = analyze_code(snippet).error_type
+            print(f"{size:>6} {mode:>10} {p50:>10.1f} {p99:>10.1f} {detected:>12}")
+
+    # End-to-end mock response including ChatResponse construction (cache bypassed)
+    service.cache = None
+    snippet = make_snippet(100)
+    samples = sorted(time_call(lambda s: service.get_tutor_response_sync("help", s), snippet, repeats))
+    print(f"\nget_tutor_response (100 lines) p50: {statistics.median(samples):.1f} us")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,118 @@
+"""
+Benchmark: conversation history from the DB vs. the context store
+
+Points DATABASE_URL at a throwaway SQLite file holding 500 conversations of
+20 messages and reports:
+- history per chat turn: the previous DB read (last 5 messages) vs. a
+  context-store hit, and the one-off rehydration on a miss
+- prompt building for a conversation where the student pasted a
+  2000-line file a few turns back: prompt size without a budget (last 5
+  messages, as before) and with the 512-token window, and the time to
+  pick the window from precomputed counts vs. re-tokenizing every turn
+
+Run from the backend directory:
+    python -m benchmarks.bench_context_store
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="phychat-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+
+import statistics
+import time
+import uuid
+
+from app.lib.database import db
+from app.services.conversation_context import ConversationContextStore, estimate_tokens, render_turn
+from benchmarks.bench_code_analyzer import make_snippet
+
+CONVERSATIONS = 500
+MESSAGES = 20
+BUDGET = 512
+
+
+def time_us(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def seed() -> list:
+    ids = [str(uuid.uuid4()) for _ in range(CONVERSATIONS)]
+    rows = []
+    for conversation_id in ids:
+        for i in range(MESSAGES):
+            rows.append({
+                "conversation_id": conversation_id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"turn {i}: why does my loop fail at index {i}?",
+                "code_snippet": make_snippet(10) if i % 2 == 0 else None,
+                "created_at": f"2024-01-01T00:00:{i:02d}+00:00",
+            })
+    db.blocking.save_messages(rows)
+    return ids
+
+
+def history_per_turn(ids: list):
+    store = ConversationContextStore()
+    db_us = time_us(lambda: db.blocking.get_conversation_history(ids[7], limit=5), 500)
+
+    start = time.perf_counter()
+    for conversation_id in ids:
+        store.begin_load(conversation_id)
+        store.fill(conversation_id, db.blocking.get_conversation_history(conversation_id, limit=store.max_turns))
+    rehydrate_us = (time.perf_counter() - start) / len(ids) * 1e6
+
+    hit_us = time_us(lambda: store.get(ids[7]), 5000)
+    stats = store.stats()
+    print(
+        f"history per turn: DB read {db_us:8.1f} us   store hit {hit_us:6.2f} us   "
+        f"rehydrate on miss {rehydrate_us:8.1f} us  ({stats['conversations']} conversations, "
+        f"{stats['bytes'] / 1024 / 1024:.1f} MiB)"
+    )
+
+
+def prompt_window():
+    store = ConversationContextStore()
+    conversation_id = "pasted"
+    store.begin_load(conversation_id)
+    store.fill(conversation_id, [])
+    for i in range(MESSAGES):
+        content = make_snippet(2000) if i == MESSAGES - 4 else f"turn {i}: still failing, what now?"
+        store.append(conversation_id, "user" if i % 2 == 0 else "assistant", content)
+    turns = store.get(conversation_id)
+    current = "user: and this one?\ncode:\n" + make_snippet(20)
+
+    unbounded = "\n".join([render_turn(t) for t in turns[-5:]] + [current])
+    window = store.window(turns, BUDGET, reserved=estimate_tokens(current))
+    bounded = "\n".join([render_turn(t) for t in window] + [current])
+    print(
+        f"prompt tokens: last 5 messages {estimate_tokens(unbounded):6d}   "
+        f"budgeted window {estimate_tokens(bounded):4d} (budget {BUDGET}, {len(window)} turns)"
+    )
+
+    def retokenize():
+        remaining = BUDGET - estimate_tokens(current)
+        for turn in reversed(turns):
+            tokens = estimate_tokens(render_turn(turn))
+            if tokens + 1 > remaining:
+                break
+            remaining -= tokens + 1
+
+    precomputed_us = time_us(lambda: store.window(turns, BUDGET, reserved=estimate_tokens(current)), 500)
+    retokenize_us = time_us(retokenize, 500)
+    print(f"window selection: precomputed counts {precomputed_us:8.1f} us   re-tokenizing turns {retokenize_us:8.1f} us")
+
+
+def main():
+    ids = seed()
+    history_per_turn(ids)
+    prompt_window()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: N concurrent simulated students against a real database
+
+Points DATABASE_URL at a throwaway SQLite file (same schema as
+database/schema.sql), boots the app under uvicorn and has each student loop
+through a session: ask for a recommendation, send a few chat turns in one
+conversation (history reads + transcript writes), then report progress.
+Prints per-endpoint latency, overall throughput and the DB layer's counters.
+
+Run from the backend directory:
+    python -m benchmarks.bench_db_students [students] [sessions_per_student]
+"""
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="phychat-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+os.environ.setdefault("MESSAGE_JOURNAL_PATH", os.path.join(_tmp, "journal.jsonl"))
+os.environ.setdefault("EVENT_LOG_DIR", os.path.join(_tmp, "events"))
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from app.lib.database import db
+from app.lib.message_queue import message_writer
+from benchmarks.load_health_vs_chat import free_port, start_server, summarize
+
+SNIPPETS = [
+    "numbers = [1, 2, 3]\nfor i in range(4):\n    print(numbers[i])",
+    "x = 10\nif x > 5\n    print('Greater')",
+    "age = '25'\nfuture_age = age + 5",
+    "counter = 0\nwhile counter < 10:\n    counter = counter + 0",
+]
+
+
+async def timed(samples: dict, name: str, request):
+    start = time.perf_counter()
+    response = await request
+    samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+    response.raise_for_status()
+    return response.json()
+
+
+async def student(client: httpx.AsyncClient, index: int, sessions: int, samples: dict):
+    user_id = f"bench-student-{index}"
+    for session in range(sessions):
+        rec = await timed(samples, "recommend", client.get(f"/api/recommend/{user_id}"))
+
+        conversation_id = str(uuid.uuid4())
+        for turn in range(3):
+            await timed(samples, "chat", client.post("/api/chat", json={
+                "user_id": user_id,
+                "conversation_id": conversation_id,
+                "message": f"turn {turn}: why does this fail?",
+                "code_snippet": SNIPPETS[(index + session + turn) % len(SNIPPETS)],
+            }))
+
+        await timed(samples, "progress", client.post("/api/progress/update", params={
+            "user_id": user_id,
+            "challenge_id": rec["challenge_id"],
+            "success": session % 2 == 0,
+            "time_spent": 60,
+        }))
+
+
+async def main(students: int = 50, sessions: int = 4):
+    port = free_port()
+    server = start_server(port)
+    limits = httpx.Limits(max_connections=students + 4)
+    samples = {}
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        await client.get("/api/recommend/warm-up")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(student(client, i, sessions, samples) for i in range(students)))
+        elapsed = time.perf_counter() - started
+
+        # Let the write-behind queue drain before reading its counters
+        while message_writer.stats()["queue_depth"]:
+            await asyncio.sleep(0.05)
+
+    server.should_exit = True
+    total = sum(len(s) for s in samples.values())
+    print(f"DATABASE_URL={os.environ['DATABASE_URL']}")
+    print(f"{students} students x {sessions} sessions: {total} requests in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    for name in ("recommend", "chat", "progress"):
+        print(f"  {name:<10} {summarize(samples[name])}")
+    print(f"db:          {db.stats()}")
+    print(f"persistence: flushed={message_writer.stats()['flushed']} spilled={message_writer.stats()['spilled']}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    asyncio.run(main(*args))
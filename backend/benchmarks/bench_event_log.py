@@ -0,0 +1,84 @@
+"""
+Benchmark: learning event log ingest and offline replay
+
+Writes synthetic attempts (random student contexts, arm types and
+propensities, as the LinUCB policy with exploration logs them) to a
+throwaway event log and reports:
+- ingest: events/sec through LearningEventLog.append (what each progress
+  update pays), and bytes per event on disk
+- replay: events/sec streaming the segments into a batched LinUCB update
+  (retraining), and through the IPS evaluator with three candidates
+- peak RSS after writing and after each replay; it should not grow with
+  the number of events, since segments are read batch by batch
+
+Run from the backend directory:
+    python -m benchmarks.bench_event_log [events]
+"""
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from app.lib.event_log import LearningEventLog, read_batches
+from app.services.bandit import ARM_TYPES, STUDENT_DIM, LinUCBPolicy
+from app.services.policy_replay import evaluate, greedy, train, uniform
+
+EVENTS = 2_000_000
+SEGMENT_MB = 64
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ingest(log: LearningEventLog, n: int) -> float:
+    rng = random.Random(0)
+    # A pool of contexts keeps generating inputs out of the timed loop's cost
+    contexts = [[1.0] + [rng.random() for _ in range(STUDENT_DIM - 1)] for _ in range(1024)]
+    start = time.perf_counter()
+    for i in range(n):
+        log.append(
+            f"student-{i % 50_000}", f"challenge-{i % 997}", i % 3 != 0, 60 + i % 900,
+            recommender="linucb",
+            confidence=0.6,
+            propensity=0.05 + 0.9 * (i % 2),
+            available=(1 << ARM_TYPES) - 1,
+            arm_type=i % ARM_TYPES,
+            context=contexts[i % 1024]
+        )
+    log.close()
+    return time.perf_counter() - start
+
+
+def main(events: int = EVENTS):
+    directory = tempfile.mkdtemp(prefix="phychat-events-")
+    try:
+        log = LearningEventLog(directory, segment_bytes=SEGMENT_MB * 1024 * 1024)
+        elapsed = ingest(log, events)
+        stats = log.stats()
+        print(
+            f"ingest   {events / elapsed:10,.0f} events/s  ({elapsed / events * 1e6:.2f} us each)   "
+            f"{stats['bytes'] / events:.1f} bytes/event, {stats['segments']} segments   peak RSS {peak_rss_mb():.0f} MiB"
+        )
+
+        segments = log.segments()
+        result = train(LinUCBPolicy(), read_batches(segments))
+        print(f"retrain  {result['events_per_s']:10,} events/s  ({result['seconds']:.2f} s)   peak RSS {peak_rss_mb():.0f} MiB")
+
+        policy = LinUCBPolicy()
+        candidates = {"alpha=0": greedy(policy, alpha=0.0), "alpha=1": greedy(policy, alpha=1.0), "uniform": uniform()}
+        start = time.perf_counter()
+        report = evaluate(read_batches(segments), candidates)
+        elapsed = time.perf_counter() - start
+        print(
+            f"evaluate {report['events'] / elapsed:10,.0f} events/s  ({elapsed:.2f} s, {len(candidates)} candidates)   "
+            f"peak RSS {peak_rss_mb():.0f} MiB"
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
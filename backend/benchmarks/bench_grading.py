@@ -0,0 +1,128 @@
+"""
+Benchmark: grading challenge submissions
+
+Reports:
+- how each seed challenge's buggy code and a correct fix grade
+- submissions/sec for unique submissions with 1, 2 and 4 sandbox workers
+- a class regrade (30 students x 6 challenges, many identical fixes):
+  cold, then again with every result cached
+- fail-fast vs. running the whole suite for a submission that fails its
+  first test while later tests are slow
+
+Run from the backend directory:
+    python -m benchmarks.bench_grading
+"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.lib.database import SEED_CHALLENGES, SEED_TESTS
+from app.lib.sandbox import SandboxPool
+from app.services.challenge_catalog import Challenge
+from app.services.grader import Grader
+from app.services.response_cache import ResponseCache
+
+# A correct fix for each seed challenge
+FIXES = {
+    "1": "last_value = 0\nfor i in range(5):\n    last_value = i\n    print(i)\nprint(last_value)\n",
+    "2": "numbers = [1, 2, 3]\nfor i in range(len(numbers)):\n    print(numbers[i])\n",
+    "3": "def calculate_sum(a, b):\n    result = a + b\n    return result\ntotal = calculate_sum(5, 3)\nprint(total)\n",
+    "4": "x = 10\nif x > 5:\n    print(\"Greater\")\n",
+    "5": "age = int(\"25\")\nyears_ahead = 5\nfuture_age = age + years_ahead\n",
+    "6": "counter = 0\nwhile counter < 10:\n    print(counter)\n    counter = counter + 1\n",
+}
+
+CHALLENGES = {
+    c[0]: Challenge(c[0], c[1], c[2], c[3], c[5], tests=tuple(SEED_TESTS[c[0]]))
+    for c in SEED_CHALLENGES
+}
+
+# Fails its first (fast) test; the other three each loop for a while
+SLOW_SUITE = Challenge(
+    "slow", "Slow suite", "", "Hard", "LogicError",
+    tests=tuple({"name": f"n={n}", "stdin": str(n), "stdout": str(n)} for n in (0, 3, 3, 3))
+)
+SLOW_CODE = "n = int(input())\nfor _ in range(n * 300000):\n    pass\nprint(n + 1 if n == 0 else n)\n"
+
+
+def unique_submission(challenge_id: str, k: int) -> str:
+    # A distinct statement makes every submission a cache miss
+    return FIXES[challenge_id] + f"_submission = {k}\n"
+
+
+def seed_results(grader: Grader):
+    print(f"{'challenge':<28} {'bug':<22} {'fix':<10} {'fix ms':>7}")
+    for challenge in SEED_CHALLENGES:
+        bug = grader.grade_sync(CHALLENGES[challenge[0]], challenge[4])
+        fix = grader.grade_sync(CHALLENGES[challenge[0]], FIXES[challenge[0]])
+        bug_label = f"{bug['status']} {bug['passed_count']}/{bug['total']}"
+        skipped = sum(1 for t in bug["tests"] if t["status"] == "skipped")
+        if skipped:
+            bug_label += f" ({skipped} skipped)"
+        print(f"{challenge[1]:<28} {bug_label:<22} {fix['status']:<10} {fix['duration_ms']:>7.1f}")
+
+
+def throughput(submissions: int = 120):
+    print(f"\n{'workers':>8} {'submissions/sec':>16} {'avg ms':>8}")
+    for workers in (1, 2, 4):
+        pool = SandboxPool(size=workers)
+        pool.warm()
+        grader = Grader(pool)
+        ids = list(FIXES)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as clients:
+            list(clients.map(lambda k: grader.grade_sync(CHALLENGES[ids[k % 6]], unique_submission(ids[k % 6], k)),
+                             range(submissions)))
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {submissions / elapsed:>16.1f} {grader.stats()['avg_grade_ms']:>8.1f}")
+        pool.shutdown()
+
+
+def class_regrade(pool: SandboxPool):
+    rng = random.Random(7)
+    batch = []
+    for student in range(30):
+        for challenge_id in FIXES:
+            # Most students converge on the canonical fix; some are unique
+            code = FIXES[challenge_id] if rng.random() < 0.7 else unique_submission(challenge_id, student)
+            batch.append((CHALLENGES[challenge_id], code))
+
+    grader = Grader(pool, ResponseCache(max_size=10000, ttl=3600))
+    for label in ("cold", "cached"):
+        start = time.perf_counter()
+        results, duplicates = asyncio.run(grader.grade_many(batch))
+        elapsed = time.perf_counter() - start
+        print(
+            f"regrade {label:<7} {len(batch)} submissions ({duplicates} duplicates) in {elapsed * 1e3:.0f} ms "
+            f"-> {len(batch) / elapsed:.0f} submissions/sec, {sum(r['passed'] for r in results)} passed"
+        )
+
+
+def fail_fast(pool: SandboxPool):
+    print()
+    for flag in (True, False):
+        grader = Grader(pool, fail_fast=flag)
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            result = grader.grade_sync(SLOW_SUITE, SLOW_CODE)
+            samples.append((time.perf_counter() - start) * 1e3)
+        statuses = ", ".join(t["status"] for t in result["tests"])
+        print(f"fail_fast={flag!s:<5}: {min(samples):>6.1f} ms [{statuses}]")
+
+
+def main():
+    pool = SandboxPool(size=2)
+    pool.warm()
+    seed_results(Grader(pool))
+    print()
+    class_regrade(pool)
+    fail_fast(pool)
+    pool.shutdown()
+    throughput()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: incremental re-analysis of edited snippets
+
+A student re-submits the same snippet with a one-line change (a list
+literal in the middle of the file grows by one element). Compares a full
+`analyze_code` of every turn with the per-conversation
+IncrementalAnalyzer, which re-parses only the edited statement and
+re-visits the statements that read what it changed. Also reports the
+first turn, which builds the session, and checks both paths agree.
+
+Run from the backend directory:
+    python -m benchmarks.bench_incremental_analysis
+"""
+import statistics
+
+from app.services.code_analyzer import analyze_code
+from app.services.incremental_analyzer import IncrementalAnalyzer
+from benchmarks.bench_code_analyzer import make_snippet, time_call
+
+SIZES = [100, 250, 500, 1000]
+
+
+def edited_turns(snippet: str, n: int) -> list:
+    """The snippet with a list literal near the middle edited differently each turn"""
+    lines = snippet.split("\n")
+    index = next(i for i in range(len(lines) // 2, len(lines)) if lines[i].startswith("numbers ="))
+    turns = []
+    for k in range(n):
+        edited = list(lines)
+        edited[index] = "numbers = [1, 2, 3" + ", 4" * (k % 3) + "]"
+        turns.append("\n".join(edited))
+    return turns
+
+
+def signature(analysis) -> tuple:
+    return analysis.parsed, [(f["error_type"], f["line"], f["detail"]) for f in analysis.findings]
+
+
+def main(repeats: int = 100):
+    print(f"{'lines':>6} {'full p50 ms':>12} {'first turn ms':>14} {'follow-up p50 ms':>17} {'speedup':>8} {'match':>6}")
+    for size in SIZES:
+        snippet = make_snippet(size)
+        turns = edited_turns(snippet, repeats)
+
+        full = statistics.median(time_call(analyze_code, turns[0], repeats)) / 1e3
+
+        first = statistics.median(
+            time_call(lambda code: IncrementalAnalyzer().analyze("bench", code), snippet, 10)
+        ) / 1e3
+
+        analyzer = IncrementalAnalyzer()
+        analyzer.analyze("bench", snippet)
+        samples = []
+        match = True
+        for code in turns:
+            samples.extend(time_call(lambda c: analyzer.analyze("bench", c), code, 1))
+            match = match and signature(analyzer.analyze("bench", code)) == signature(analyze_code(code))
+        follow_up = statistics.median(samples) / 1e3
+
+        print(
+            f"{len(snippet.splitlines()):>6} {full:>12.2f} {first:>14.2f} {follow_up:>17.2f} "
+            f"{full / follow_up:>7.1f}x {'yes' if match else 'NO':>6}"
+        )
+    stats = analyzer.stats()
+    print(f"\nsegments reused / re-analysed: {stats['segments_reused']:,} / {stats['segments_reanalysed']:,}")
+
+
+if __name__ == "__main__":
+    main()
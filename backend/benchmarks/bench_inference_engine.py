@@ -0,0 +1,48 @@
+"""
+Throughput vs. batch size for the micro-batching inference engine
+
+Uses the StubSeq2SeqModel so no GPU or downloaded weights are needed.
+Run from the backend directory:
+    python -m benchmarks.bench_inference_engine
+"""
+import threading
+import time
+
+from app.services.inference_engine import InferenceEngine, StubSeq2SeqModel
+
+PROMPT = "user: help\ncode:\nnumbers = [1, 2, 3]\nfor i in range(4):\n    print(numbers[i])"
+
+
+def run_load(max_batch_size: int, clients: int = 64, requests_per_client: int = 4) -> dict:
+    engine = InferenceEngine(StubSeq2SeqModel(), max_batch_size=max_batch_size, max_wait_ms=10)
+
+    def client():
+        for _ in range(requests_per_client):
+            engine.infer(PROMPT)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    stats = engine.stats()
+    engine.shutdown()
+    stats["throughput_rps"] = round(clients * requests_per_client / elapsed, 1)
+    return stats
+
+
+def run():
+    print(f"{'batch':>6} {'req/s':>8} {'mean batch':>11} {'p50 ms':>8} {'p99 ms':>8}")
+    for max_batch_size in (1, 2, 4, 8, 16, 32):
+        stats = run_load(max_batch_size)
+        print(
+            f"{max_batch_size:>6} {stats['throughput_rps']:>8} {stats['mean_batch_size']:>11} "
+            f"{stats['latency_p50_ms']:>8} {stats['latency_p99_ms']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,83 @@
+"""
+Benchmark: LinUCB recommendation policy
+
+1. Learning quality: synthetic students (benchmarks/student_simulator.py)
+   work through a catalog under the old difficulty heuristic and under
+   LinUCB; compares reward, solve rate and skill gained.
+2. Throughput: recommendations/sec and updates/sec with 100k students and
+   10k challenges (scoring is one vectorized pass over all challenges).
+
+Run from the backend directory:
+    python -m benchmarks.bench_rl_bandit
+"""
+import random
+import time
+
+from app.services.bandit import LinUCBPolicy, reward, student_features
+from app.services.challenge_catalog import ChallengeCatalog
+from app.services.progress_cache import StudentProgress
+from app.services.rl_service import RLService
+from benchmarks.bench_challenge_catalog import make_rows
+from benchmarks.student_simulator import make_students, simulate
+
+
+def quality(students: int = 300, steps: int = 30, challenges: int = 600):
+    catalog = ChallengeCatalog.from_rows(make_rows(challenges, seed=1))
+    print(f"Learning quality: {students} students x {steps} steps, {challenges} challenges")
+
+    heuristic = RLService()
+    result = simulate(
+        lambda s, c: heuristic._select_by_difficulty(c, s.progress.completed),
+        lambda *args: None,
+        catalog, make_students(students, seed=2), steps
+    )
+    print(f"  heuristic  {result}")
+
+    policy = LinUCBPolicy(seed=3)
+
+    def choose(student, catalog):
+        selected = policy.select(student.progress, catalog)
+        return selected[0] if selected else None
+
+    def learn(student, catalog, challenge, success, time_spent):
+        policy.update(student_features(student.progress, catalog), challenge, reward(success, time_spent))
+
+    result = simulate(choose, learn, catalog, make_students(students, seed=2), steps)
+    print(f"  linucb     {result}")
+
+
+def throughput(students: int = 100_000, challenges: int = 10_000, requests: int = 20_000):
+    rng = random.Random(0)
+    catalog = ChallengeCatalog.from_rows(make_rows(challenges))
+    ids = [c.id for c in catalog.challenges]
+
+    population = []
+    for _ in range(students):
+        progress = StudentProgress()
+        for challenge_id in rng.sample(ids, rng.randrange(0, 20)):
+            progress.apply(challenge_id, rng.choice(("completed", "in_progress")), rng.randrange(60, 900))
+        population.append(progress)
+
+    policy = LinUCBPolicy(seed=0)
+    service = RLService(policy=policy)
+    service._recommend("bench", population[0], catalog)  # Build the arm feature matrix
+
+    print(f"Throughput: {students:,} students x {challenges:,} challenges")
+    start = time.perf_counter()
+    for _ in range(requests):
+        service._recommend("bench", population[rng.randrange(students)], catalog)
+    elapsed = time.perf_counter() - start
+    print(f"  recommend  {requests / elapsed:8.0f} req/s  ({elapsed / requests * 1e3:.3f} ms each)")
+
+    challenge = catalog.challenges[0]
+    start = time.perf_counter()
+    for _ in range(requests):
+        progress = population[rng.randrange(students)]
+        policy.update(student_features(progress, catalog), challenge, reward(rng.random() < 0.6, 300))
+    elapsed = time.perf_counter() - start
+    print(f"  update     {requests / elapsed:8.0f} upd/s  ({elapsed / requests * 1e3:.3f} ms each)")
+
+
+if __name__ == "__main__":
+    quality()
+    throughput()
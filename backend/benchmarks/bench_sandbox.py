@@ -0,0 +1,127 @@
+"""
+Benchmark: sandboxed execution of student snippets
+
+Reports what isolation costs and what it buys:
+- worker start-up with the forkserver (pre-forked from a server that only
+  imported the sandbox) vs. a plain spawn start
+- per-run overhead of a pooled worker vs. exec() in this process
+- how each seed challenge actually ends, and how quickly an infinite loop
+  is stopped at the wall-clock limit
+- runs/sec with 1, 2 and 4 workers under concurrent load
+- /api/chat (mock) latency with and without running the snippet
+
+Run from the backend directory:
+    python -m benchmarks.bench_sandbox
+"""
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.lib.database import SEED_CHALLENGES
+from app.lib.sandbox import SandboxPool
+from app.services.ai_service import ai_service
+
+WORK = "total = 0\nfor k in range(20000):\n    total += k * k\n"
+
+
+def median_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(samples)
+
+
+def spawn_cost():
+    print(f"{'start method':>13} {'first worker ms':>16} {'respawn ms':>11}")
+    for method in ("forkserver", "spawn"):
+        pool = SandboxPool(size=1, max_runs=1, start_method=method)
+        start = time.perf_counter()
+        pool.warm()
+        first = (time.perf_counter() - start) * 1e3
+        # max_runs=1: every run waits for the worker spawned after the previous one
+        respawn = median_ms(lambda: pool.run_sync("pass"), 10)
+        print(f"{method:>13} {first:>16.1f} {respawn:>11.1f}")
+        pool.shutdown()
+
+
+def run_overhead(pool: SandboxPool):
+    snippet = "print(sum(range(10)))"
+    compiled = compile(snippet, "<student>", "exec")
+    in_process = median_ms(lambda: exec(compiled, {"print": lambda *a: None}), 200)
+    pooled = median_ms(lambda: pool.run_sync(snippet), 200)
+    print(f"\nper run: exec() in-process {in_process:.3f} ms, pooled worker {pooled:.3f} ms")
+
+
+def seed_challenges(pool: SandboxPool):
+    print(f"\n{'challenge':<28} {'expected':<12} {'status':<8} {'raised':<12} {'line':>4} {'ms':>8}")
+    for challenge in SEED_CHALLENGES:
+        start = time.perf_counter()
+        result = pool.run_sync(challenge[4])
+        elapsed = (time.perf_counter() - start) * 1e3
+        print(
+            f"{challenge[1]:<28} {challenge[5]:<12} {result.status:<8} "
+            f"{result.error_type or '-':<12} {result.line or '-':>4} {elapsed:>8.1f}"
+        )
+    start = time.perf_counter()
+    result = pool.run_sync("while True:\n    try:\n        pass\n    except Exception:\n        pass\n")
+    elapsed = (time.perf_counter() - start) * 1e3
+    print(
+        f"\n`while True` (catching Exception): {result.status} on line {result.line} after {elapsed:.0f} ms "
+        f"(limit {pool.wall_seconds * 1e3:.0f} ms)"
+    )
+
+
+def throughput(runs: int = 400):
+    print(f"\n{'workers':>8} {'runs/sec':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for workers in (1, 2, 4):
+        pool = SandboxPool(size=workers)
+        pool.warm()
+        latencies = []
+
+        def one(_):
+            start = time.perf_counter()
+            pool.run_sync(WORK)
+            latencies.append((time.perf_counter() - start) * 1e3)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as clients:
+            list(clients.map(one, range(runs)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        print(
+            f"{workers:>8} {runs / elapsed:>9.0f} {statistics.median(latencies):>8.2f} "
+            f"{latencies[int(len(latencies) * 0.99) - 1]:>8.2f}"
+        )
+        pool.shutdown()
+
+
+def chat_latency(pool: SandboxPool):
+    ai_service.cache = None
+    snippet = SEED_CHALLENGES[1][4]
+    chat = lambda: ai_service.get_tutor_response_sync("help me debug", snippet)
+    ai_service.sandbox = None
+    without = median_ms(chat, 200)
+    ai_service.sandbox = pool
+    with_sandbox = median_ms(chat, 200)
+    response = chat()
+    print(
+        f"\nchat (mock, sync): {without:.2f} ms static only, {with_sandbox:.2f} ms with the run "
+        f"-> {response.error_type} at {response.confidence_score} confidence"
+    )
+
+
+def main():
+    spawn_cost()
+    pool = SandboxPool(size=2)
+    pool.warm()
+    run_overhead(pool)
+    seed_challenges(pool)
+    chat_latency(pool)
+    pool.shutdown()
+    throughput()
+
+
+if __name__ == "__main__":
+    main()
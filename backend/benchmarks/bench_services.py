@@ -0,0 +1,114 @@
+"""
+Micro-benchmarks: tutor response, XAI explanation and recommendation
+
+Times the service calls behind /api/chat, /api/xai/explain and
+/api/recommend directly (no HTTP, no sandbox, no process pool) on synthetic
+inputs of growing size:
+- AIService._mock_response on 10 to 1000-line snippets
+- the occlusion XAI explanation (AIService.get_xai_explanation_sync) on
+  10 to 500-line snippets
+- RLService.generate_recommendation_sync on 100 to 100k-challenge catalogs,
+  for students with 0 to 500 completed challenges (cached progress, so it
+  times policy selection, not the DB)
+
+Prints a table and writes a JSON report (same layout as load_sessions) so
+runs can be compared across commits.
+
+Run from the backend directory:
+    python -m benchmarks.bench_services [report.json]
+"""
+import sys
+import time
+
+from app.services.ai_service import AIService
+from app.services.progress_cache import progress_cache
+from app.services.rl_service import RLService, _build_policy
+from benchmarks.bench_challenge_catalog import make_rows
+from benchmarks.bench_code_analyzer import make_snippet
+from benchmarks.report import build_report, latency_summary, write_report
+
+SNIPPET_SIZES = [10, 100, 1000]
+XAI_SIZES = [10, 100, 500]
+CATALOG_SIZES = [100, 10_000, 100_000]
+COMPLETED = [0, 50, 500]
+
+
+def sample(fn, budget_s: float = 1.0, min_runs: int = 5, max_runs: int = 2000) -> list:
+    """Per-call latencies (ms): as many calls as fit in the budget, within bounds"""
+    fn()  # Warm-up (imports, first-call caches)
+    samples = []
+    deadline = time.perf_counter() + budget_s
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return samples
+
+
+def row(name: str, params: dict, samples: list) -> dict:
+    result = {"name": name, **params, "runs": len(samples), **latency_summary(samples)}
+    label = " ".join(f"{k}={v}" for k, v in params.items())
+    print(
+        f"{name:<16} {label:<32} runs={len(samples):<5} p50={result['p50_ms']:9.3f} ms  p99={result['p99_ms']:9.3f} ms",
+        file=sys.stderr,
+    )
+    return result
+
+
+def bench_mock_response(service: AIService) -> list:
+    results = []
+    for lines in SNIPPET_SIZES:
+        snippet = make_snippet(lines)
+        samples = sample(lambda: service._mock_response("why does this fail?", snippet))
+        results.append(row("mock_response", {"lines": lines}, samples))
+    return results
+
+
+def bench_xai(service: AIService) -> list:
+    results = []
+    for lines in XAI_SIZES:
+        snippet = make_snippet(lines)
+        samples = sample(lambda: service.get_xai_explanation_sync(snippet, "debug"), budget_s=2.0, min_runs=3)
+        results.append(row("xai_explanation", {"lines": lines}, samples))
+    return results
+
+
+def bench_recommendation() -> list:
+    results = []
+    for n in CATALOG_SIZES:
+        # A long TTL keeps the installed synthetic catalog for the whole run
+        service = RLService(catalog_ttl=3600, policy=_build_policy(), coalesce=False)
+        rows = make_rows(n)
+        service._install_catalog(rows)
+        for completed in COMPLETED:
+            if completed >= n:
+                continue
+            user_id = f"bench-{n}-{completed}"
+            progress_cache.begin_load(user_id)
+            progress_cache.fill(user_id, [
+                {"challenge_id": rows[i]["id"], "status": "completed", "attempts": 1, "time_spent": 60}
+                for i in range(completed)
+            ])
+            samples = sample(lambda: service.generate_recommendation_sync(user_id))
+            results.append(row("recommendation", {"challenges": n, "completed": completed}, samples))
+    return results
+
+
+def main(output: str = None):
+    # No sandbox: these time the analysis and response building only
+    service = AIService()
+    service.sandbox = None
+    service.cache = None
+    results = bench_mock_response(service) + bench_xai(service) + bench_recommendation()
+    config = {
+        "snippet_sizes": SNIPPET_SIZES,
+        "xai_sizes": XAI_SIZES,
+        "catalog_sizes": CATALOG_SIZES,
+        "completed": COMPLETED,
+        "policy": RLService(policy=_build_policy()).policy_stats()["policy"],
+    }
+    write_report(build_report("bench_services", config, results), output)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,187 @@
+"""
+Benchmark: resolved-session retrieval index at 1M stored sessions
+
+Generates synthetic student programs (3-10 statements drawn from templates
+shaped like the challenges' bug code, with random names and constants,
+some nested) and loads their fingerprints into a throwaway SessionIndex.
+Then queries it with near-duplicates of stored programs: renamed
+variables, changed constants, and in a share of them one statement
+inserted or removed. Reports:
+- fingerprints/sec, bulk insert rate, single `add` latency and the time to
+  reopen the index from disk
+- lookup latency (fingerprint + LSH query) p50/p99
+- recall: of the queries whose most similar stored program (by exhaustive
+  comparison of signatures against every entry) clears the threshold,
+  the share for which the index finds an entry just as similar (recall@1)
+  and the share for which it finds any entry above the threshold (what
+  decides whether the model is skipped)
+- peak RSS
+
+Run from the backend directory:
+    python -m benchmarks.bench_session_index [sessions] [report.json]
+"""
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.session_index import SessionIndex, fingerprint
+from benchmarks.report import build_report, latency_summary, write_report
+
+SESSIONS = 1_000_000
+QUERIES = 1000
+CHUNK = 50_000
+
+NAMES = ["numbers", "values", "items", "total", "count", "result", "data", "scores", "age", "name",
+         "index", "x", "y", "n", "word", "text", "price", "grades", "matrix", "row"]
+
+STATEMENTS = [
+    "{a} = [{n}, {m}, {k}]",
+    "{a} = {n}",
+    "{a} = '{n}'",
+    "{a} = {b} + {n}",
+    "{a} = {b} * {c}",
+    "{a} = int({b})",
+    "{a} = len({b})",
+    "{a}.append({n})",
+    "{a} = {b}.upper()",
+    "print({a})",
+    "print({a}[{n}])",
+    "{a} += 1",
+    "{a} = {b}[{n}]",
+    "{a} = {{'{b}': {n}}}",
+    "return {a}",
+]
+
+BLOCKS = [
+    "for {a} in range({n}):",
+    "for {a} in {b}:",
+    "while {a} < {n}:",
+    "if {a} > {n}:",
+    "def {a}({b}, {c}):",
+]
+
+
+def make_program(rng: random.Random) -> list:
+    """Lines of a random program (the statements as separate lines, for mutating)"""
+    lines = []
+    for _ in range(rng.randint(3, 10)):
+        if rng.random() < 0.3:
+            lines.append(rng.choice(BLOCKS))
+            for _ in range(rng.randint(1, 3)):
+                lines.append("    " + rng.choice(STATEMENTS))
+        else:
+            lines.append(rng.choice(STATEMENTS))
+    return lines
+
+
+def render(lines: list, rng: random.Random) -> str:
+    """Fill in names and constants"""
+    names = rng.sample(NAMES, 3)
+    fields = {"a": names[0], "b": names[1], "c": names[2]}
+    return "\n".join(
+        line.format(**fields, n=rng.randint(0, 99), m=rng.randint(0, 99), k=rng.randint(0, 99)) for line in lines
+    )
+
+
+def mutate(lines: list, rng: random.Random) -> list:
+    """A near-duplicate: half the time one statement more or less"""
+    lines = list(lines)
+    if rng.random() < 0.5:
+        if rng.random() < 0.5 and len(lines) > 3:
+            del lines[rng.randrange(len(lines))]
+        else:
+            lines.insert(rng.randrange(len(lines) + 1), rng.choice(STATEMENTS[:13]))
+    return lines
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def exhaustive_best(signatures: np.ndarray, query: np.ndarray) -> int:
+    """Highest number of MinHash values any stored entry shares with `query`"""
+    best = 0
+    for start in range(0, len(signatures), 200_000):
+        best = max(best, int(np.count_nonzero(signatures[start:start + 200_000] == query, axis=1).max()))
+    return best
+
+
+def main(sessions: int = SESSIONS, output: str = None):
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp(prefix="phychat-sessions-")
+    try:
+        index = SessionIndex(directory)
+        programs = []
+        fingerprint_s = insert_s = 0.0
+        for start in range(0, sessions, CHUNK):
+            batch = [make_program(rng) for _ in range(min(CHUNK, sessions - start))]
+            programs.extend(batch[:QUERIES // max(1, sessions // CHUNK) + 1])
+            codes = [render(lines, rng) for lines in batch]
+            began = time.perf_counter()
+            fingerprints = [fingerprint(code) for code in codes]
+            fingerprint_s += time.perf_counter() - began
+            began = time.perf_counter()
+            index.add_many(fingerprints, [("IndexError", f"Check the loop bounds in `{fp.names[0]}`.") for fp in fingerprints])
+            insert_s += time.perf_counter() - began
+        print(f"fingerprint {sessions / fingerprint_s:10,.0f} /s   bulk insert {sessions / insert_s:10,.0f} /s   "
+              f"entries {len(index):,}   peak RSS {peak_rss_mb():.0f} MiB", file=sys.stderr)
+
+        add_ms = []
+        for _ in range(200):
+            fp = fingerprint(render(make_program(rng), rng))
+            began = time.perf_counter()
+            index.add(fp, "IndexError", "Check the loop bounds.")
+            add_ms.append((time.perf_counter() - began) * 1e3)
+
+        began = time.perf_counter()
+        index.close()
+        index = SessionIndex(directory)
+        reopen_s = time.perf_counter() - began
+        print(f"reopen {reopen_s:.2f} s   add p50 {latency_summary(add_ms)['p50_ms']:.3f} ms", file=sys.stderr)
+
+        signatures = index._signatures[:len(index)]
+        lookup_ms, found, hits, eligible = [], 0, 0, 0
+        for lines in programs[:QUERIES]:
+            code = render(mutate(lines, rng), rng)
+            began = time.perf_counter()
+            fp, match = index.lookup(code)
+            lookup_ms.append((time.perf_counter() - began) * 1e3)
+            best = exhaustive_best(signatures, fp.signature)
+            if best / signatures.shape[1] >= index.threshold:
+                eligible += 1
+                hits += match is not None
+                found += match is not None and round(match.similarity * signatures.shape[1]) == best
+        lookup = latency_summary(lookup_ms)
+        recall = found / eligible if eligible else 0.0
+        hit_recall = hits / eligible if eligible else 0.0
+        print(f"lookup p50 {lookup['p50_ms']:.3f} ms  p99 {lookup['p99_ms']:.3f} ms   recall@1 {recall:.4f}  "
+              f"hit recall {hit_recall:.4f} ({eligible} queries above the threshold)   peak RSS {peak_rss_mb():.0f} MiB",
+              file=sys.stderr)
+
+        results = {
+            "entries": len(index),
+            "fingerprints_per_s": round(sessions / fingerprint_s),
+            "bulk_inserts_per_s": round(sessions / insert_s),
+            "add": latency_summary(add_ms),
+            "reopen_s": round(reopen_s, 2),
+            "lookup": lookup,
+            "recall_at_1": round(recall, 4),
+            "hit_recall": round(hit_recall, 4),
+            "queries_above_threshold": eligible,
+            "peak_rss_mb": round(peak_rss_mb()),
+            "index": index.stats(),
+        }
+        index.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    config = {"sessions": sessions, "queries": QUERIES, "threshold": results["index"]["threshold"]}
+    write_report(build_report("bench_session_index", config, results), output)
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]), *sys.argv[2:3])
@@ -0,0 +1,134 @@
+"""
+Benchmark: per-worker policy state vs. state shared by every worker
+
+Starts 1, 4 and 16 worker processes the way uvicorn --workers does (spawn,
+each importing the app's modules and building its own challenge catalog),
+with the LinUCB policy either per process (RL_SHARED_STATE_DIR unset) or in
+shared memory (SharedLinUCBPolicy). Per worker it reports:
+- RSS and PSS (proportional set size: shared pages divided among the
+  processes mapping them, so it is the memory a worker really adds) once
+  the catalog and arm feature matrix are built
+- the cost of a policy update while every worker updates at once (in
+  shared mode each takes the cross-process lock and publishes a new state
+  version), and of a recommendation reading the state
+
+Linux only (PSS comes from /proc/self/smaps_rollup). Prints a table and
+writes a JSON report (same layout as bench_services).
+
+Run from the backend directory:
+    python -m benchmarks.bench_shared_state [report.json]
+"""
+import multiprocessing
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.report import build_report, latency_summary, write_report
+
+WORKERS = [1, 4, 16]
+CHALLENGES = 50_000
+UPDATES = 300
+SELECTS = 100
+
+
+def memory_mb() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"rss_mb": round(fields["Rss"], 1), "pss_mb": round(fields["Pss"], 1)}
+
+
+def worker(index: int, directory: str, challenges: int, barrier, results):
+    import numpy as np
+
+    from app.services.bandit import STUDENT_DIM, LinUCBPolicy, SharedLinUCBPolicy
+    from app.services.challenge_catalog import ChallengeCatalog
+    from app.services.progress_cache import StudentProgress
+    from benchmarks.bench_challenge_catalog import make_rows
+
+    catalog = ChallengeCatalog.from_rows(make_rows(challenges))
+    policy = SharedLinUCBPolicy(directory, seed=index) if directory else LinUCBPolicy(seed=index)
+    progress = StudentProgress()
+    policy.select(progress, catalog)  # Builds (or maps) the arm feature matrix
+    memory = memory_mb()
+
+    rng = random.Random(index)
+    contexts = np.random.default_rng(index).random((UPDATES, STUDENT_DIM))
+    contexts[:, 0] = 1.0
+    barrier.wait()
+
+    update_ms = []
+    start = time.perf_counter()
+    for x in contexts:
+        begin = time.perf_counter()
+        policy.update(x, catalog.challenges[rng.randrange(challenges)], float(rng.random() < 0.6))
+        update_ms.append((time.perf_counter() - begin) * 1e3)
+    update_wall = time.perf_counter() - start
+
+    select_ms = []
+    for _ in range(SELECTS):
+        begin = time.perf_counter()
+        policy.select(progress, catalog)
+        select_ms.append((time.perf_counter() - begin) * 1e3)
+
+    results.put({**memory, "update_ms": update_ms, "update_wall_s": update_wall, "select_ms": select_ms,
+                 "final_updates": policy.stats()["updates"]})
+
+
+def run(workers: int, shared: bool, challenges: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    directory = tempfile.mkdtemp(prefix="phychat-shared-") if shared else ""
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(i, directory, challenges, barrier, results)) for i in range(workers)
+    ]
+    try:
+        for p in processes:
+            p.start()
+        rows = [results.get(timeout=600) for _ in processes]
+        for p in processes:
+            p.join()
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    update_ms = [ms for row in rows for ms in row["update_ms"]]
+    return {
+        "workers": workers,
+        "state": "shared" if shared else "per-process",
+        "rss_mb_per_worker": round(sum(r["rss_mb"] for r in rows) / workers, 1),
+        "pss_mb_per_worker": round(sum(r["pss_mb"] for r in rows) / workers, 1),
+        "update": latency_summary(update_ms),
+        "updates_per_s": round(len(update_ms) / max(r["update_wall_s"] for r in rows)),
+        "select": latency_summary([ms for row in rows for ms in row["select_ms"]]),
+        # Shared: every worker's updates land in one state; per-process: each sees only its own
+        "updates_seen_by_a_worker": max(r["final_updates"] for r in rows),
+    }
+
+
+def main(output: str = None):
+    results = []
+    print(f"{'workers':>7} {'state':<12} {'RSS/worker':>11} {'PSS/worker':>11} {'update p50':>11} "
+          f"{'update p99':>11} {'updates/s':>10} {'select p50':>11} {'updates seen':>13}", file=sys.stderr)
+    for workers in WORKERS:
+        for shared in (False, True):
+            row = run(workers, shared, CHALLENGES)
+            results.append(row)
+            print(
+                f"{workers:>7} {row['state']:<12} {row['rss_mb_per_worker']:>8.1f} MB {row['pss_mb_per_worker']:>8.1f} MB "
+                f"{row['update']['p50_ms']:>8.3f} ms {row['update']['p99_ms']:>8.3f} ms {row['updates_per_s']:>10} "
+                f"{row['select']['p50_ms']:>8.2f} ms {row['updates_seen_by_a_worker']:>13}",
+                file=sys.stderr,
+            )
+    config = {"workers": WORKERS, "challenges": CHALLENGES, "updates_per_worker": UPDATES, "selects_per_worker": SELECTS}
+    write_report(build_report("bench_shared_state", config, results), output)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
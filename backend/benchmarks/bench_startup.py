@@ -0,0 +1,109 @@
+"""
+Benchmark: cold start in mock and stubbed-model modes
+
+Each mode starts a fresh `uvicorn main:app` process and polls it, reporting
+seconds from launch until /api/health answers and until /api/ready reports
+ready (model loaded, warm-up and sandbox done), and the latency of a chat
+turn sent as soon as /api/health is up. Modes:
+- mock: USE_MOCK_AI=true
+- stub: the stub model, which loads instantly
+- stub, slow load: the stub with a 3 s simulated checkpoint load; health
+  answers while the model loads and early chat turns get analyzer replies
+
+Also runs `python -X importtime -c "import main"` per mode, reporting the
+import time of main, the slowest imports, and whether transformers, torch
+or shap were loaded at import.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.load_health_vs_chat import free_port
+
+MODES = {
+    "mock": {"USE_MOCK_AI": "true"},
+    "stub": {"USE_MOCK_AI": "false", "INFERENCE_MODEL": "stub"},
+    "stub, slow load": {"USE_MOCK_AI": "false", "INFERENCE_MODEL": "stub", "INFERENCE_STUB_LOAD_SECONDS": "3"},
+}
+
+HEAVY = ("transformers", "torch", "shap")
+
+CHAT = {"user_id": "cold", "message": "why does this fail?", "code_snippet": "numbers = [1, 2]\nprint(numbers[2])"}
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(env: dict) -> tuple:
+    """(ms to import main, [(ms, module)] slowest of main's own imports, heavy modules loaded)"""
+    code = f"import main, sys; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env, capture_output=True, text=True, timeout=300
+    )
+    top = []
+    total_ms = 0.0
+    for line in out.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        ms = int(match.group(2)) / 1000
+        depth = len(match.group(3))
+        if depth == 1 and match.group(4) == "main":
+            total_ms = ms
+        elif depth == 3:
+            top.append((ms, match.group(4)))  # Imported directly by main (cumulative)
+    top.sort(reverse=True)
+    return total_ms, top[:4], out.stdout.strip() or "none"
+
+
+def launch(env: dict) -> tuple:
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    health = ready = first_chat = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            while time.perf_counter() - start < 120:
+                try:
+                    if health is None and client.get("/api/health").status_code == 200:
+                        health = time.perf_counter() - start
+                        chat_start = time.perf_counter()
+                        client.post("/api/chat", json=CHAT).raise_for_status()
+                        first_chat = time.perf_counter() - chat_start
+                    if health is not None and client.get("/api/ready").status_code == 200:
+                        ready = time.perf_counter() - start
+                        break
+                except httpx.TransportError:
+                    pass  # Not listening yet
+                time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return health, ready, first_chat
+
+
+def main():
+    print(f"{'mode':<16} {'import main':>11} {'health':>8} {'ready':>8} {'first chat':>11}  heavy imports  slowest imports")
+    for name, overrides in MODES.items():
+        env = {**os.environ, **overrides}
+        import_ms, slowest, heavy = import_profile(env)
+        health, ready, first_chat = launch(env)
+        slow = ", ".join(f"{module} {ms:.0f}" for ms, module in slowest)
+        print(
+            f"{name:<16} {import_ms:>8.0f} ms {health:>6.2f} s {ready:>6.2f} s {first_chat * 1e3:>8.0f} ms  "
+            f"{heavy:<13}  {slow} (ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
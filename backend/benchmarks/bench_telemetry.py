@@ -0,0 +1,95 @@
+"""
+Benchmark: cost of request instrumentation
+
+Reports:
+- per-request overhead of TelemetryMiddleware around a trivial ASGI app,
+  with profiling off and with every request traced
+- cost of one telemetry.span() with and without an active trace
+- /metrics render time after traffic on 40 routes x 5 status codes and
+  20 span names
+
+Run from the backend directory:
+    python -m benchmarks.bench_telemetry
+"""
+import asyncio
+import time
+
+from app.lib.telemetry import Telemetry, TelemetryMiddleware, _current_trace, RequestTrace
+
+
+class _Route:
+    path = "/api/recommend/{user_id}"
+    path_regex = None
+
+
+async def _app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _send(message):
+    pass
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def per_request_us(app, n: int = 50000) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/recommend/STU001"}
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), _receive, _send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def span_us(telemetry: Telemetry, n: int = 200000) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        with telemetry.span("db.get_student_progress"):
+            pass
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def middleware_overhead():
+    bare = await per_request_us(_app)
+    off = await per_request_us(TelemetryMiddleware(_app, telemetry=Telemetry(profile_slowest=0)))
+    on = await per_request_us(TelemetryMiddleware(_app, telemetry=Telemetry(profile_slowest=20, sample_rate=1.0)))
+    print(f"per request: bare app {bare:.2f} us, instrumented {off:.2f} us, instrumented + every request traced {on:.2f} us")
+
+
+def spans():
+    telemetry = Telemetry()
+    without = span_us(telemetry)
+    token = _current_trace.set(RequestTrace("GET", "/"))
+    try:
+        # Bounded list per trace in practice; this one just grows during the loop
+        with_trace = span_us(telemetry)
+    finally:
+        _current_trace.reset(token)
+    print(f"span: {without:.2f} us (no trace), {with_trace:.2f} us (traced request)")
+
+
+def render():
+    telemetry = Telemetry()
+    for r in range(40):
+        for status in (200, 201, 404, 422, 500):
+            telemetry.end_request("GET", f"/api/route_{r}", status, 0.003 * (r + 1), None)
+    for s in range(20):
+        for k in range(100):
+            telemetry.spans.observe((f"span_{s}",), 0.0001 * k)
+    start = time.perf_counter()
+    text = telemetry.render()
+    elapsed = (time.perf_counter() - start) * 1e3
+    print(f"/metrics render: {elapsed:.2f} ms for {len(text.splitlines())} lines ({len(text) / 1024:.0f} KiB)")
+
+
+def main():
+    asyncio.run(middleware_overhead())
+    spans()
+    render()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: occlusion XAI explanations
+
+For snippets of increasing size, compares exhaustive occlusion (every line
+masked, no budget, no memo) with the explainer's default settings, then
+measures a student editing one line and asking again (memoized lines are
+not re-scored). Reports explanations/sec and classifier evaluations per
+explanation.
+
+Run from the backend directory:
+    python -m benchmarks.bench_xai_explainer
+"""
+import time
+
+from app.services.xai_explainer import OcclusionExplainer
+from benchmarks.bench_code_analyzer import make_snippet
+
+SIZES = [10, 50, 200]
+
+
+def measure(explainer: OcclusionExplainer, snippets: list) -> tuple:
+    evaluations = 0
+    start = time.perf_counter()
+    for snippet in snippets:
+        evaluations += explainer.explain(snippet, "IndexError")["evaluations"]
+    elapsed = time.perf_counter() - start
+    return len(snippets) / elapsed, evaluations / len(snippets)
+
+
+def edited_copies(snippet: str, n: int) -> list:
+    """The same snippet with one (different) filler line edited each time"""
+    lines = snippet.split("\n")
+    copies = []
+    for k in range(n):
+        edited = list(lines)
+        edited[0] = f"numbers = [1, 2, 3, {k}]"
+        copies.append("\n".join(edited))
+    return copies
+
+
+def main(repeats: int = 20):
+    print(f"{'lines':>6} {'mode':>22} {'expl/s':>9} {'evals/expl':>11}")
+    for size in SIZES:
+        snippet = make_snippet(size)
+        # Distinct snippets so the cold runs never hit the memo
+        cold = [f"{snippet}\nunique_{k} = {k}" for k in range(repeats)]
+
+        exhaustive = OcclusionExplainer(sample_budget=10 ** 6, patience=10 ** 6, memo_size=0)
+        rate, evals = measure(exhaustive, cold)
+        print(f"{size:>6} {'exhaustive occlusion':>22} {rate:>9.1f} {evals:>11.1f}")
+
+        budgeted = OcclusionExplainer(memo_size=0)
+        rate, evals = measure(budgeted, cold)
+        print(f"{size:>6} {'budget + early stop':>22} {rate:>9.1f} {evals:>11.1f}")
+
+        memoized = OcclusionExplainer()
+        memoized.explain(snippet, "IndexError")
+        rate, evals = measure(memoized, edited_copies(snippet, repeats))
+        print(f"{size:>6} {'edit one line, re-ask':>22} {rate:>9.1f} {evals:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
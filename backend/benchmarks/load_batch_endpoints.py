@@ -0,0 +1,135 @@
+"""
+Load test: batch endpoints vs. one HTTP call per item
+
+Points DATABASE_URL at a throwaway SQLite file seeded with progress for a
+cohort, boots the app under uvicorn, and compares the way an LMS script
+works today (one request per item, sequentially) with one call to each
+batch endpoint streaming NDJSON:
+- recommendations for the whole cohort (cold progress cache each time)
+- chat for a set of submissions, each in its own conversation
+- XAI explanations for the same submissions
+
+Reports wall time, time to the first NDJSON line and DB queries issued.
+
+Run from the backend directory:
+    python -m benchmarks.load_batch_endpoints [students]
+"""
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="phychat-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+os.environ.setdefault("MESSAGE_JOURNAL_PATH", os.path.join(_tmp, "journal.jsonl"))
+os.environ.setdefault("EVENT_LOG_DIR", os.path.join(_tmp, "events"))
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+from app.lib.database import db, SEED_CHALLENGES
+from app.services.progress_cache import progress_cache
+from benchmarks.load_health_vs_chat import free_port, start_server
+
+
+def queries() -> int:
+    return db.stats()["queries"]
+
+
+def seed_progress(students: int):
+    for i in range(students):
+        for challenge in SEED_CHALLENGES[: i % 4]:
+            db.blocking.update_progress(f"cohort-{i}", challenge[0], "completed", time_spent=120)
+
+
+def submissions(students: int) -> list:
+    return [
+        {
+            "user_id": f"cohort-{i}",
+            "conversation_id": str(uuid.uuid4()),
+            "message": "why does this fail?",
+            # A per-student statement so every item is distinct work; the
+            # infinite-loop challenge is left out (each run would take the
+            # full sandbox wall-clock limit)
+            "code_snippet": f"{SEED_CHALLENGES[i % 5][4]}\nattempt_{i} = {i}",
+        }
+        for i in range(students)
+    ]
+
+
+async def sequential(client: httpx.AsyncClient, method: str, url, bodies: list) -> tuple:
+    before = queries()
+    start = time.perf_counter()
+    for body in bodies:
+        if method == "GET":
+            response = await client.get(url(body))
+        else:
+            response = await client.post(url(body), json=body)
+        response.raise_for_status()
+    return time.perf_counter() - start, None, queries() - before
+
+
+async def batch(client: httpx.AsyncClient, url: str, bodies: list) -> tuple:
+    before = queries()
+    start = time.perf_counter()
+    first = None
+    lines = 0
+    async with client.stream("POST", url, json=bodies) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            if first is None:
+                first = time.perf_counter() - start
+            if "error" in json.loads(line):
+                raise RuntimeError(line)
+            lines += 1
+    assert lines == len(bodies), (lines, len(bodies))
+    return time.perf_counter() - start, first, queries() - before
+
+
+def report(name: str, n: int, one_by_one: tuple, batched: tuple):
+    seq_s, _, seq_q = one_by_one
+    batch_s, first_s, batch_q = batched
+    print(
+        f"{name:<10} {n:>5} items  sequential {seq_s:6.2f} s ({seq_q:>5} queries)   "
+        f"batch {batch_s:6.2f} s ({batch_q:>4} queries, first line {first_s * 1e3:6.1f} ms)   "
+        f"x{seq_s / batch_s:.1f}"
+    )
+
+
+async def main(students: int = 300):
+    seed_progress(students)
+    port = free_port()
+    server = start_server(port)
+    users = [{"user_id": f"cohort-{i}"} for i in range(students)]
+    items = submissions(min(students, 120))
+    xai = [{"code_snippet": s["code_snippet"], "model_prediction": "debug"} for s in items]
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300) as client:
+        await client.get("/api/recommend/warm-up")
+        await client.post("/api/chat", json={"user_id": "warm", "message": "help", "code_snippet": "x = 1"})
+
+        progress_cache.clear()
+        one_by_one = await sequential(client, "GET", lambda b: f"/api/recommend/{b['user_id']}", users)
+        progress_cache.clear()
+        report("recommend", students, one_by_one, await batch(client, "/api/recommend/batch", users))
+
+        one_by_one = await sequential(client, "POST", lambda b: "/api/chat", items)
+        # New conversations, so the batch can't reuse the analysis sessions above
+        fresh = submissions(len(items))
+        report("chat", len(items), one_by_one, await batch(client, "/api/chat/batch", fresh))
+
+        one_by_one = await sequential(client, "POST", lambda b: "/api/xai/explain", xai)
+        report("xai", len(xai), one_by_one, await batch(client, "/api/xai/explain/batch", xai))
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:2]]
+    asyncio.run(main(*args))
@@ -0,0 +1,100 @@
+"""
+Load test: a class-wide burst of identical /api/chat and /api/recommend calls
+
+Boots the app under uvicorn in a background thread and fires bursts of
+identical requests (40 students pasting the same challenge snippet at once,
+a banner re-rendering the same student's recommendation), with request
+coalescing off and then on, with the response cache off (it would absorb
+requests that arrive after the first answer, hiding the herd) and on.
+Analysis runs on threads in this process (CPU_POOL_SIZE=0) so its CPU time
+can be measured with process_time(); sandbox runs happen in worker
+processes and are counted instead.
+
+Run from the backend directory:
+    python -m benchmarks.load_coalescing
+"""
+import asyncio
+import time
+
+import httpx
+
+from app.lib.executors import executors
+from app.lib.sandbox import sandbox
+from app.lib.single_flight import SingleFlight
+from app.services.ai_service import ai_service
+from app.services.rl_service import rl_service
+from benchmarks.bench_code_analyzer import make_snippet
+from benchmarks.load_health_vs_chat import free_port, start_server, summarize
+
+
+async def chat_burst(client: httpx.AsyncClient, snippet: str, size: int) -> list:
+    async def one(student: int) -> float:
+        start = time.perf_counter()
+        response = await client.post("/api/chat", json={
+            "user_id": f"STU{student:03d}",
+            "message": "help me debug this",
+            "code_snippet": snippet,
+        })
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1e3
+
+    return await asyncio.gather(*(one(i) for i in range(size)))
+
+
+async def recommend_burst(client: httpx.AsyncClient, user_id: str, size: int) -> list:
+    async def one() -> float:
+        start = time.perf_counter()
+        (await client.get(f"/api/recommend/{user_id}")).raise_for_status()
+        return (time.perf_counter() - start) * 1e3
+
+    return await asyncio.gather(*(one() for _ in range(size)))
+
+
+async def run(client: httpx.AsyncClient, coalesce: bool, cache, rounds: int, burst: int):
+    ai_service.flights = SingleFlight("chat") if coalesce else None
+    rl_service.flights = SingleFlight("recommend") if coalesce else None
+    ai_service.cache = cache
+    base = make_snippet(1000) + "\nnumbers = [1, 2, 3]\nfor i in range(4):\n    print(numbers[i])\n"
+
+    latencies = []
+    runs_before = sandbox.stats()["runs"]
+    cpu_before = time.process_time()
+    for r in range(rounds):
+        # A new snippet per round: the response cache only helps within a round
+        latencies += await chat_burst(client, f"{base}round_{coalesce}_{cache is not None}_{r} = {r}\n", burst)
+    cpu = time.process_time() - cpu_before
+    runs = sandbox.stats()["runs"] - runs_before
+
+    label = f"coalescing {'on ' if coalesce else 'off'}, cache {'on ' if cache is not None else 'off'}"
+    print(f"chat      {label}: {summarize(latencies)}  cpu={cpu:5.2f} s  sandbox runs={runs}")
+
+    if cache is None:
+        return
+    latencies = []
+    for r in range(rounds):
+        latencies += await recommend_burst(client, f"banner-{coalesce}-{r}", burst // 2)
+    computed = rl_service.flights.stats()["computations"] if coalesce else rounds * (burst // 2)
+    print(f"recommend {label}: {summarize(latencies)}  computations={computed}")
+
+
+async def main(rounds: int = 5, burst: int = 40):
+    executors.cpu_workers = 0
+    port = free_port()
+    server = start_server(port)
+    limits = httpx.Limits(max_connections=burst + 4)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        # Warm the sandbox, analyzer and catalog before measuring
+        await chat_burst(client, "x = 1", 1)
+        await recommend_burst(client, "warm", 1)
+
+        cache = ai_service.cache
+        for with_cache in (None, cache):
+            for coalesce in (False, True):
+                await run(client, coalesce, with_cache, rounds, burst)
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
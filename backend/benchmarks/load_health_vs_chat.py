@@ -0,0 +1,113 @@
+"""
+Load test: /api/health latency while /api/chat is saturated
+
+Boots the app under uvicorn in a background thread, measures /api/health
+latency at idle, then again while many clients hammer /api/chat with large
+unique snippets (so the response cache can't help). With blocking work off
+the event loop the two distributions should be close. Only answered chat
+requests count as throughput; 429s and errors are reported separately.
+
+Run from the backend directory:
+    python -m benchmarks.load_health_vs_chat
+"""
+import os
+
+# Each client chats far faster than a student would: keep the per-student rate limit out of the load
+os.environ.setdefault("SCHED_STUDENT_RATE", "0")
+
+import asyncio
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from app.lib.startup import startup
+from benchmarks.bench_code_analyzer import make_snippet
+from main import app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    # Measure a warm server: model loaded, pools and catalog ready
+    startup.wait(timeout=300)
+    return server
+
+
+def summarize(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[max(0, int(len(samples) * 0.99) - 1)]
+    return f"n={len(samples):<5} p50={statistics.median(samples):7.2f} ms  p99={p99:7.2f} ms"
+
+
+async def probe_health(client: httpx.AsyncClient, duration: float) -> list:
+    samples = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        await client.get("/api/health")
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return samples
+
+
+async def chat_worker(client: httpx.AsyncClient, worker_id: int, stop: asyncio.Event, counter: dict):
+    base = make_snippet(400)
+    n = 0
+    while not stop.is_set():
+        n += 1
+        # Unique statement per request so the response cache never hits
+        snippet = f"{base}\nunique_{worker_id}_{n} = {n}"
+        response = await client.post(
+            "/api/chat", json={"user_id": f"load-{worker_id}", "message": "help", "code_snippet": snippet}
+        )
+        if response.status_code == 200:
+            counter["answered"] += 1
+        elif response.status_code == 429:
+            counter["rejected"] += 1
+        else:
+            counter["failed"] += 1
+
+
+async def main(chat_clients: int = 32, duration: float = 5.0):
+    port = free_port()
+    server = start_server(port)
+    limits = httpx.Limits(max_connections=chat_clients + 4)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        # Warm the process pool before measuring
+        await client.post("/api/chat", json={"user_id": "warm", "message": "help", "code_snippet": "x = 1"})
+
+        idle = await probe_health(client, duration)
+
+        stop = asyncio.Event()
+        counter = {"answered": 0, "rejected": 0, "failed": 0}
+        workers = [asyncio.create_task(chat_worker(client, i, stop, counter)) for i in range(chat_clients)]
+        await asyncio.sleep(0.5)
+        started = time.perf_counter()
+        loaded = await probe_health(client, duration)
+        chat_rps = counter["answered"] / (time.perf_counter() - started + 0.5)
+        stop.set()
+        await asyncio.gather(*workers)
+
+    server.should_exit = True
+    print(f"/api/health idle:      {summarize(idle)}")
+    print(
+        f"/api/health saturated: {summarize(loaded)}  (/api/chat ~{chat_rps:.0f} answered/s, {chat_clients} clients, "
+        f"{counter['rejected']} answered 429, {counter['failed']} failed)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
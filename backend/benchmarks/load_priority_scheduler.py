@@ -0,0 +1,167 @@
+"""
+Load test: interactive chat latency while a bulk job runs, with and without admission control
+
+Students send chat turns as a Poisson process at --rate turns/sec for
+--duration seconds (open loop), each with its own snippet so the response
+cache can't answer them. Meanwhile --bulk-jobs clients each post
+/api/chat/batch requests of --bulk-items large unique snippets (think a
+regrade of a whole class's submissions) back to back for the whole run.
+
+Three phases, in-process over ASGI:
+- idle: interactive traffic only (the latency the budget is measured against)
+- bulk, unscheduled: both, with the scheduler disabled (SCHED_CAPACITY=0)
+- bulk, scheduled: both, with the scheduler configured by the SCHED_* settings
+
+Reports interactive p50/p95/p99 latency of the answered turns, the share
+answered 429 and bulk items finished per second, per phase, plus the
+scheduler's stats for the scheduled phase. DATABASE_URL defaults to a
+throwaway SQLite file.
+
+Run from the backend directory:
+    python -m benchmarks.load_priority_scheduler [--rate 10] [--output report.json]
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="phychat-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+os.environ.setdefault("MESSAGE_JOURNAL_PATH", os.path.join(_tmp, "journal.jsonl"))
+os.environ.setdefault("EVENT_LOG_DIR", os.path.join(_tmp, "events"))
+
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+
+import httpx
+
+import app.api.endpoints as endpoints
+from app.lib.batching import batch_runner
+from app.lib.scheduler import AdmissionScheduler, scheduler
+from app.lib.startup import startup
+from benchmarks.bench_code_analyzer import make_snippet
+from benchmarks.report import build_report, latency_summary, write_report
+from main import app
+
+_unique = itertools.count()
+
+
+def unique_snippet(lines: int) -> str:
+    """A snippet no earlier request has sent (defeats the response cache and coalescing)"""
+    return make_snippet(lines) + f"\nmarker_{next(_unique)} = 0"
+
+
+async def interactive(client: httpx.AsyncClient, args, rng: random.Random) -> dict:
+    latencies, rejected, failed = [], 0, 0
+    pending = []
+
+    async def turn(user_id: str):
+        nonlocal rejected, failed
+        start = time.perf_counter()
+        response = await client.post("/api/chat", json={
+            "user_id": user_id, "message": "Why does this fail?", "code_snippet": unique_snippet(args.lines)
+        })
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - start) * 1e3)
+        elif response.status_code == 429:
+            rejected += 1
+        else:
+            failed += 1
+
+    end = time.perf_counter() + args.duration
+    while time.perf_counter() < end:
+        pending.append(asyncio.ensure_future(turn(f"student-{rng.randrange(args.students)}")))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*pending)
+    total = len(pending)
+    return {
+        "turns": total,
+        "answered": len(latencies),
+        "rejected_429": rejected,
+        "failed": failed,
+        "rejected_share": round(rejected / total, 4) if total else 0.0,
+        "latency": latency_summary(latencies),
+    }
+
+
+async def bulk(client: httpx.AsyncClient, args):
+    # The ASGI transport buffers the NDJSON body, so progress is read from batch_runner instead
+    while True:
+        items = [
+            {"user_id": "regrade", "message": "Grade this", "code_snippet": unique_snippet(args.bulk_lines)}
+            for _ in range(args.bulk_items)
+        ]
+        await client.post("/api/chat/batch", json=items)
+
+
+async def phase(client: httpx.AsyncClient, args, label: str, with_bulk: bool, admission: AdmissionScheduler) -> dict:
+    endpoints.scheduler = admission
+    rng = random.Random(args.seed)
+    jobs = [asyncio.ensure_future(bulk(client, args)) for _ in range(args.bulk_jobs if with_bulk else 0)]
+    if jobs:
+        await asyncio.sleep(1.0)  # Let the bulk job saturate the workers first
+    items, errors = batch_runner.items, batch_runner.errors
+    start = time.perf_counter()
+    row = await interactive(client, args, rng)
+    elapsed = time.perf_counter() - start
+    done, errors = batch_runner.items - items, batch_runner.errors - errors
+    for job in jobs:
+        job.cancel()
+    await asyncio.gather(*jobs, return_exceptions=True)
+    # Let cancelled bulk items drain so they don't run into the next phase
+    while batch_runner.in_flight:
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(1.0)
+    row = {"phase": label, **row, "bulk_items_per_s": round((done - errors) / elapsed, 1), "bulk_item_errors": errors}
+    if admission.enabled:
+        row["scheduler"] = admission.stats()
+    return row
+
+
+async def main(args):
+    results = []
+    timeout = httpx.Timeout(120.0)
+    async with app.router.lifespan_context(app):
+        await asyncio.get_running_loop().run_in_executor(None, startup.wait, 300)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+            await client.post("/api/chat", json={"user_id": "warm-up", "message": "help", "code_snippet": "x = 1"})
+            phases = [
+                ("idle", False, scheduler),
+                ("bulk, unscheduled", True, AdmissionScheduler(capacity=0)),
+                ("bulk, scheduled", True, scheduler),
+            ]
+            print(f"{'phase':<18} {'turns':>6} {'429':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'bulk/s':>8}", file=sys.stderr)
+            for label, with_bulk, admission in phases:
+                row = await phase(client, args, label, with_bulk, admission)
+                results.append(row)
+                latency = row["latency"]
+                print(
+                    f"{label:<18} {row['turns']:>6} {row['rejected_429']:>6} {latency['p50_ms']:>7.1f}ms "
+                    f"{latency['p95_ms']:>7.1f}ms {latency['p99_ms']:>7.1f}ms {row['bulk_items_per_s']:>8.1f}",
+                    file=sys.stderr,
+                )
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    config["chat_slo_ms"] = round(scheduler.slo["chat"] * 1e3)
+    config["limits"] = scheduler.limits
+    write_report(build_report("load_priority_scheduler", config, results), args.output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=10.0, help="interactive chat turns per second (Poisson)")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of interactive traffic per phase")
+    parser.add_argument("--students", type=int, default=200, help="distinct student IDs turns are drawn from")
+    parser.add_argument("--lines", type=int, default=40, help="lines per interactive snippet")
+    parser.add_argument("--bulk-jobs", type=int, default=16, help="concurrent bulk clients")
+    parser.add_argument("--bulk-items", type=int, default=50, help="snippets per bulk request")
+    parser.add_argument("--bulk-lines", type=int, default=1500, help="lines per bulk snippet")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="JSON report path ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
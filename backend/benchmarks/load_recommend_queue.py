@@ -0,0 +1,121 @@
+"""
+Load test: recommendation latency with 5k students active at once
+
+Every student is its own coroutine on the app's event loop, as they would
+be in one worker: each one repeatedly loads the dashboard (the banner asks
+for a recommendation, twice for a re-render), thinks for an exponentially
+distributed --think seconds, attempts the recommended challenge (solving
+it with --solve-rate, which records the attempt and trains the policy) and
+thinks again. Students start spread over --ramp seconds.
+
+Runs once with recommendations computed on every request
+(RECOMMEND_QUEUE_DEPTH=0) and once with precomputed queues recomputed by
+the background scheduler, against a catalog of --challenges synthetic
+challenges. Reports p50/p95/p99 recommendation latency (which includes
+waiting for the event loop while other students' work runs on it), the
+queue hit rate and the age of the queues served. DATABASE_URL defaults to a
+throwaway SQLite file, so progress reads and writes hit a real database.
+
+Run from the backend directory:
+    python -m benchmarks.load_recommend_queue [--students 5000] [--output report.json]
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="phychat-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+os.environ.setdefault("EVENT_LOG_DIR", os.path.join(_tmp, "events"))
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from app.lib.database import db
+from app.services.progress_cache import progress_cache
+from app.services.recommendation_queue import RecommendationQueues
+from app.services.rl_service import rl_service
+from benchmarks.bench_challenge_catalog import make_rows
+from benchmarks.report import build_report, latency_summary, write_report
+
+
+async def student(user_id: str, args, rng: random.Random, latencies: list):
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    for _ in range(args.rounds):
+        for _ in range(2):  # The banner renders twice
+            start = time.perf_counter()
+            recommendation = await rl_service.generate_recommendation(user_id)
+            latencies.append((time.perf_counter() - start) * 1e3)
+        if recommendation.challenge_id == "completed":
+            return
+        await asyncio.sleep(rng.expovariate(1.0 / args.think))
+        await rl_service.update_rl_model(
+            user_id, recommendation.challenge_id, rng.random() < args.solve_rate, int(rng.uniform(60, 900))
+        )
+        await asyncio.sleep(rng.expovariate(1.0 / args.think))
+
+
+async def run(args, queued: bool) -> dict:
+    label = "queued" if queued else "on-request"
+    rl_service.queues = RecommendationQueues(depth=args.depth, ttl=args.ttl, max_students=2 * args.students) if queued else None
+    rl_service.start_scheduler()
+    progress_cache.clear()
+
+    latencies = []
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        student(f"{label}-{i}", args, random.Random(rng.random()), latencies) for i in range(args.students)
+    ))
+    elapsed = time.perf_counter() - start
+    await rl_service.stop_scheduler()
+
+    return {
+        "recommendations": label,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 2),
+        "latency": latency_summary(latencies),
+        "queues": rl_service.queue_stats(),
+    }
+
+
+async def main(args):
+    # A long TTL keeps the synthetic catalog installed for the whole run
+    rl_service.catalog_ttl = 3600.0
+    rl_service._install_catalog(make_rows(args.challenges))
+
+    results = []
+    print(f"{'recommendations':<16} {'requests':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'hit rate':>9} {'age p99':>8}",
+          file=sys.stderr)
+    for queued in (False, True):
+        row = await run(args, queued)
+        results.append(row)
+        latency, queues = row["latency"], row["queues"]
+        print(
+            f"{row['recommendations']:<16} {row['requests']:>9} {latency['p50_ms']:>6.2f} ms {latency['p95_ms']:>6.2f} ms "
+            f"{latency['p99_ms']:>6.2f} ms {latency['max_ms']:>6.1f} ms {queues.get('hit_rate', 0.0):>9.3f} "
+            f"{queues.get('age_p99_seconds', 0.0):>6.2f} s",
+            file=sys.stderr,
+        )
+    db.close()
+    write_report(build_report("load_recommend_queue", vars(args), results), args.output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--students", type=int, default=5000, help="students active at once")
+    parser.add_argument("--rounds", type=int, default=3, help="dashboard loads and attempts per student")
+    parser.add_argument("--challenges", type=int, default=2000, help="challenges in the synthetic catalog")
+    parser.add_argument("--think", type=float, default=2.0, help="mean think time between steps (s)")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which students start")
+    parser.add_argument("--solve-rate", type=float, default=0.6, help="fraction of attempts that solve the challenge")
+    parser.add_argument("--depth", type=int, default=3, help="challenges queued per student")
+    parser.add_argument("--ttl", type=float, default=60.0, help="queue TTL (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="JSON report path ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
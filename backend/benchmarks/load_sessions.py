@@ -0,0 +1,289 @@
+"""
+Load test: open-loop replay of student sessions, reported as JSON
+
+Students arrive as a Poisson process at --rate sessions/sec for --duration
+seconds, whether or not earlier sessions have finished (open loop, so a
+slow server shows up as queueing and latency instead of a quietly lower
+send rate). Each session replays what the frontend does after sign-in:
+- load the dashboard banner (GET /api/recommend/{user_id})
+- 1 to --max-turns chat turns in one conversation, editing the
+  recommended challenge's buggy code between turns (a share of them
+  streamed over /api/chat/stream)
+- submit a fix for grading, or give up and report the failed attempt
+  (POST /api/progress/update)
+
+Sign-in itself goes straight from the frontend to Supabase and never reaches
+this backend, so it is not replayed. Students think for an exponentially
+distributed --think seconds between steps. At most --concurrency requests
+are in flight; a request's latency includes any wait for a slot.
+
+The app runs in-process over ASGI (default; no sockets, so it isolates
+handler cost) or under uvicorn on a local port (--mode uvicorn), or the
+replay targets a running server (--url). DATABASE_URL defaults to a
+throwaway SQLite file, so progress writes and conversation history reads
+hit a real database. The report (stdout, or --output) has throughput,
+p50/p95/p99 latency and error rate per endpoint, plus the commit and
+configuration, so runs can be compared across commits; a summary table
+goes to stderr. The same --seed replays the same sessions.
+
+Run from the backend directory:
+    python -m benchmarks.load_sessions --rate 5 --duration 30 --output before.json
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="phychat-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'bench.db')}")
+os.environ.setdefault("MESSAGE_JOURNAL_PATH", os.path.join(_tmp, "journal.jsonl"))
+os.environ.setdefault("EVENT_LOG_DIR", os.path.join(_tmp, "events"))
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import httpx
+
+from app.lib.database import SEED_CHALLENGES
+from app.lib.startup import startup
+from benchmarks.bench_grading import FIXES
+from benchmarks.report import build_report, latency_summary, write_report
+
+BUGGY_CODE = {c[0]: c[4] for c in SEED_CHALLENGES}
+
+QUESTIONS = [
+    "why does this fail?",
+    "I don't understand the error",
+    "what is wrong with my loop?",
+    "can you give me a hint?",
+    "I changed it but it still breaks",
+]
+
+
+class Recorder:
+    """Per-endpoint latencies and outcomes for one run"""
+
+    def __init__(self, concurrency: int):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str,
+                   stream: bool = False, **kwargs):
+        """One request; returns the decoded JSON body, or None when it failed"""
+        start = time.perf_counter()
+        body, status = None, "exception"
+        try:
+            async with self.slots:
+                if stream:
+                    async with client.stream(method, url, **kwargs) as response:
+                        async for _ in response.aiter_bytes():
+                            pass
+                    status = response.status_code
+                else:
+                    response = await client.request(method, url, **kwargs)
+                    status = response.status_code
+                    if status < 400:
+                        body = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            status = type(e).__name__
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1e3)
+        self.statuses[endpoint][str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return body if body is not None else {}
+
+    def results(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            samples = self.latencies[endpoint]
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors[endpoint],
+                "error_rate": round(self.errors[endpoint] / len(samples), 4),
+                "throughput_rps": round(len(samples) / elapsed, 3),
+                **latency_summary(samples),
+                "statuses": dict(self.statuses[endpoint]),
+            }
+        every = [s for samples in self.latencies.values() for s in samples]
+        errors = sum(self.errors.values())
+        endpoints["all"] = {
+            "requests": len(every),
+            "errors": errors,
+            "error_rate": round(errors / len(every), 4) if every else 0.0,
+            "throughput_rps": round(len(every) / elapsed, 3),
+            **latency_summary(every),
+        }
+        return endpoints
+
+
+async def session(client: httpx.AsyncClient, recorder: Recorder, index: int, args) -> bool:
+    """Replay one student's session; True when every request succeeded"""
+    rng = random.Random(f"{args.seed}:{index}")
+    user_id = f"load-{args.seed}-{index % args.students}"
+    failed = False
+
+    async def think():
+        await asyncio.sleep(rng.expovariate(1 / args.think) if args.think > 0 else 0)
+
+    recommendation = await recorder.call(
+        client, "GET /api/recommend/{user_id}", "GET", f"/api/recommend/{user_id}"
+    )
+    failed |= recommendation is None
+    challenge_id = (recommendation or {}).get("challenge_id")
+    if challenge_id not in BUGGY_CODE:
+        # Finished everything, or the recommendation failed: practise a random one
+        challenge_id = rng.choice(sorted(BUGGY_CODE))
+
+    conversation_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    code = BUGGY_CODE[challenge_id]
+    for turn in range(rng.randint(1, args.max_turns)):
+        await think()
+        if turn:
+            # The student edits between turns, so each turn is new analysis work
+            code = f"{code}\nattempt_{turn} = {rng.randrange(1000)}"
+        body = {
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "message": rng.choice(QUESTIONS),
+            "code_snippet": code,
+        }
+        if rng.random() < args.stream_share:
+            reply = await recorder.call(client, "POST /api/chat/stream", "POST", "/api/chat/stream", stream=True, json=body)
+        else:
+            reply = await recorder.call(client, "POST /api/chat", "POST", "/api/chat", json=body)
+        failed |= reply is None
+
+    await think()
+    if rng.random() < args.solve_rate:
+        result = await recorder.call(
+            client, "POST /api/challenges/{challenge_id}/submit", "POST",
+            f"/api/challenges/{challenge_id}/submit",
+            json={"user_id": user_id, "code_snippet": FIXES[challenge_id]},
+        )
+    else:
+        result = await recorder.call(
+            client, "POST /api/progress/update", "POST", "/api/progress/update",
+            params={"user_id": user_id, "challenge_id": challenge_id, "success": False,
+                    "time_spent": rng.randint(60, 900)},
+        )
+    failed |= result is None
+    return not failed
+
+
+async def replay(client: httpx.AsyncClient, args) -> dict:
+    recorder = Recorder(args.concurrency)
+    arrivals = random.Random(args.seed)
+    loop = asyncio.get_running_loop()
+    tasks = []
+
+    start = loop.time()
+    offset = arrivals.expovariate(args.rate)
+    while offset < args.duration:
+        await asyncio.sleep(max(0.0, start + offset - loop.time()))
+        tasks.append(asyncio.create_task(session(client, recorder, len(tasks), args)))
+        offset += arrivals.expovariate(args.rate)
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = loop.time() - start
+
+    completed = sum(1 for o in outcomes if o is True)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "sessions": {
+            "started": len(tasks),
+            "completed": completed,
+            "with_errors": len(tasks) - completed,
+            "offered_rate": args.rate,
+            "achieved_rate": round(len(tasks) / args.duration, 3),
+        },
+        "endpoints": recorder.results(elapsed),
+    }
+
+
+@asynccontextmanager
+async def open_client(args):
+    """An HTTP client for the chosen target (booting the app if needed)"""
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+            yield client
+        return
+
+    from main import app
+
+    if args.mode == "uvicorn":
+        from benchmarks.load_health_vs_chat import free_port, start_server
+
+        port = free_port()
+        server = start_server(port)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout) as client:
+                yield client
+        finally:
+            server.should_exit = True
+        return
+
+    # In-process: the ASGI transport does not run lifespan events itself
+    async with app.router.lifespan_context(app):
+        await asyncio.get_running_loop().run_in_executor(None, startup.wait, 300)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+            yield client
+
+
+def print_table(results: dict):
+    sessions = results["sessions"]
+    print(
+        f"sessions: {sessions['started']} started, {sessions['completed']} clean, "
+        f"{sessions['achieved_rate']}/s offered over {results['elapsed_s']} s",
+        file=sys.stderr,
+    )
+    print(f"{'endpoint':<44} {'reqs':>6} {'err%':>6} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}", file=sys.stderr)
+    for name, row in results["endpoints"].items():
+        print(
+            f"{name:<44} {row['requests']:>6} {row['error_rate'] * 100:>5.1f}% {row['throughput_rps']:>8.2f} "
+            f"{row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms",
+            file=sys.stderr,
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--url", help="replay against a running server instead of booting the app")
+    parser.add_argument("--rate", type=float, default=2.0, help="session arrivals per second (Poisson)")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds during which sessions arrive")
+    parser.add_argument("--concurrency", type=int, default=32, help="max requests in flight")
+    parser.add_argument("--students", type=int, default=200, help="distinct student IDs sessions are drawn from")
+    parser.add_argument("--max-turns", type=int, default=3, help="chat turns per session (1..N)")
+    parser.add_argument("--think", type=float, default=0.5, help="mean think time between steps (s)")
+    parser.add_argument("--stream-share", type=float, default=0.3, help="fraction of chat turns that stream")
+    parser.add_argument("--solve-rate", type=float, default=0.6, help="fraction of sessions that submit a fix")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="JSON report path ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    async with open_client(args) as client:
+        # Warm the sandbox and process pools, so their start-up isn't in the numbers
+        await client.get("/api/recommend/warm-up")
+        await client.post("/api/chat", json={"user_id": "warm-up", "message": "help", "code_snippet": "x = 1"})
+        results = await replay(client, args)
+
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    config["database"] = "external" if args.url else os.environ["DATABASE_URL"].split(":", 1)[0]
+    print_table(results)
+    write_report(build_report("load_sessions", config, results), args.output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,69 @@
+"""
+JSON reports shared by the load tests and micro-benchmarks
+
+Every report carries the commit it was run on, the Python version and the
+run's configuration, so files from different commits can be diffed or
+plotted side by side.
+"""
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of already-sorted samples (0 when empty)"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def latency_summary(samples_ms: List[float]) -> dict:
+    samples = sorted(samples_ms)
+    return {
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(samples[-1], 3) if samples else 0.0,
+        "mean_ms": round(sum(samples) / len(samples), 3) if samples else 0.0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def build_report(benchmark: str, config: dict, results) -> dict:
+    return {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+
+
+def write_report(report: dict, path: Optional[str]):
+    """Write the report to `path`, or to stdout when path is None or '-'"""
+    text = json.dumps(report, indent=2, sort_keys=False)
+    if path in (None, "-"):
+        sys.stdout.write(text + "\n")
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+    print(f"wrote {path}", file=sys.stderr)
@@ -0,0 +1,93 @@
+"""
+Synthetic students for evaluating recommendation policies offline
+
+Each student has a hidden skill per error type. The chance of solving a
+challenge rises with skill relative to the challenge's difficulty, and a
+solve teaches the most when the challenge is close to the student's level
+(too easy teaches little, too hard is rarely solved). A good policy keeps
+students near that edge; the simulator reports reward, solve rate and
+skill gained.
+"""
+import math
+import random
+from typing import Callable, List
+
+from app.services.challenge_catalog import ChallengeCatalog
+from app.services.progress_cache import StudentProgress
+from app.services.bandit import ERROR_TYPES
+
+LEVEL = {"Easy": 0.2, "Medium": 0.5, "Hard": 0.8}
+
+
+class SyntheticStudent:
+    __slots__ = ("id", "skill", "progress")
+
+    def __init__(self, student_id: str, rng: random.Random):
+        self.id = student_id
+        base = rng.uniform(0.0, 0.5)
+        self.skill = {e: min(1.0, max(0.0, base + rng.gauss(0, 0.1))) for e in ERROR_TYPES}
+        self.progress = StudentProgress()
+
+    def mean_skill(self) -> float:
+        return sum(self.skill.values()) / len(self.skill)
+
+    def attempt(self, challenge, rng: random.Random) -> tuple:
+        """Returns (success, time_spent) and updates hidden skill"""
+        level = LEVEL.get(challenge.difficulty, 0.5)
+        skill = self.skill.get(challenge.error_type, self.mean_skill())
+        p_solve = 1.0 / (1.0 + math.exp(-8.0 * (skill - level + 0.15)))
+        success = rng.random() < p_solve
+        time_spent = int(120 + 900 * level * (1.2 - skill) * rng.lognormvariate(0, 0.3))
+
+        if challenge.error_type in self.skill:
+            gain = 0.08 * math.exp(-((level - skill) ** 2) / 0.05) if success else 0.01
+            self.skill[challenge.error_type] = min(1.0, skill + gain)
+        return success, time_spent
+
+
+def make_students(n: int, seed: int = 0) -> List[SyntheticStudent]:
+    rng = random.Random(seed)
+    return [SyntheticStudent(f"sim-{i}", rng) for i in range(n)]
+
+
+def simulate(
+    choose: Callable[[SyntheticStudent, ChallengeCatalog], object],
+    learn: Callable[[SyntheticStudent, ChallengeCatalog, object, bool, int], None],
+    catalog: ChallengeCatalog,
+    students: List[SyntheticStudent],
+    steps: int,
+    seed: int = 0
+) -> dict:
+    """
+    Run `steps` rounds; each round every student gets one recommendation
+
+    `choose(student, catalog)` returns a Challenge (or None when done) and
+    `learn(student, catalog, challenge, success, time_spent)` is called
+    before the attempt is recorded in the student's progress.
+    """
+    from app.services.bandit import reward
+
+    rng = random.Random(seed)
+    start_skill = sum(s.mean_skill() for s in students) / len(students)
+    total_reward = 0.0
+    solves = attempts = 0
+
+    for _ in range(steps):
+        for student in students:
+            challenge = choose(student, catalog)
+            if challenge is None:
+                continue
+            success, time_spent = student.attempt(challenge, rng)
+            learn(student, catalog, challenge, success, time_spent)
+            student.progress.apply(challenge.id, "completed" if success else "in_progress", time_spent)
+            total_reward += reward(success, time_spent)
+            solves += int(success)
+            attempts += 1
+
+    end_skill = sum(s.mean_skill() for s in students) / len(students)
+    return {
+        "attempts": attempts,
+        "solve_rate": round(solves / attempts, 3) if attempts else 0.0,
+        "mean_reward": round(total_reward / attempts, 3) if attempts else 0.0,
+        "skill_gain": round(end_skill - start_skill, 3),
+    }
@@ -1,20 +1,64 @@
-import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from contextlib import asynccontextmanager
 from app.api.endpoints import router as api_router
+from app.lib.executors import executors
+from app.lib.message_queue import message_writer
+from app.lib.database import db
+from app.lib.event_log import event_log
+from app.lib.sandbox import sandbox
+from app.lib.scheduler import scheduler
+from app.lib.startup import startup
+from app.lib.telemetry import telemetry, TelemetryMiddleware, PROMETHEUS_CONTENT_TYPE
+from app.services.response_cache import response_cache
+from app.services.progress_cache import progress_cache
+from app.services.conversation_context import context_store
+from app.services.ai_service import ai_service
+from app.services.rl_service import rl_service
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+def _warm_sandbox() -> str:
+    if not sandbox.warm():
+        raise RuntimeError("sandbox workers did not start in time")
+    return f"{sandbox.size} workers" if sandbox.size > 0 else "disabled"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background writers and sandbox workers; flush and release them on shutdown"""
+    message_writer.start()
+    sandbox.start()
+    # Slow start-up work runs on background threads: /api/health answers at
+    # once, /api/ready only when all of it is done
+    startup.launch("sandbox", _warm_sandbox)
+    startup.launch("catalog", rl_service.warm_catalog)
+    startup.launch("policy", rl_service.restore_policy)
+    startup.launch("model", ai_service.load_model)
+    startup.launch("warmup", ai_service.warm_up, after=("model",))
+    rl_service.start_scheduler()
+    yield
+    await rl_service.stop_scheduler()
+    message_writer.stop()
+    event_log.close()
+    rl_service.close()
+    if ai_service.sessions is not None:
+        ai_service.sessions.close()
+    sandbox.shutdown()
+    executors.shutdown()
+    db.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="PhyChat Backend API",
     description="AI-Powered Python Debugging Assistant - Research by Group 03",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS Configuration - Essential for Next.js communication
@@ -32,9 +76,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency, status codes and in-flight gauges for every route (outermost, so CORS is timed too)
+app.add_middleware(TelemetryMiddleware, telemetry=telemetry)
+
 # Include API routes
 app.include_router(api_router, prefix="/api", tags=["PhyChat API"])
 
+def _service_metrics():
+    """Counters and gauges read from the services' stats() at scrape time"""
+    cache = response_cache.stats()
+    progress = progress_cache.stats()
+    context = context_store.stats()
+    ready = startup.ready
+    runs = sandbox.stats()
+    writes = message_writer.stats()
+    queries = db.stats()
+    events = event_log.stats()
+    queues = rl_service.queue_stats()
+    sessions = ai_service.sessions.stats() if ai_service.sessions is not None else {}
+    admission = scheduler.stats()["classes"]
+    return [
+        ("phychat_ready", "gauge", "1 once the model is loaded and caches are warm", int(ready)),
+        ("phychat_model_fallbacks_total", "counter", "Chat turns answered without the model while it loaded", ai_service.fallbacks),
+        ("phychat_scheduler_running", "gauge", "Requests holding a scheduler slot", scheduler.running),
+        ("phychat_scheduler_waiting", "gauge", "Requests queued for a scheduler slot", scheduler.waiting),
+        ("phychat_scheduler_shed_total", "counter", "Requests answered 429 (rate limit, latency budget, full queue)", sum(c["shed"] for c in admission.values())),
+        ("phychat_scheduler_chat_shed_total", "counter", "Interactive chat requests answered 429", admission["chat"]["shed"]),
+        ("phychat_scheduler_chat_wait_p99_seconds", "gauge", "Queue wait of recent chat requests (p99)", admission["chat"]["wait_p99_ms"] / 1e3),
+        ("phychat_session_index_entries", "gauge", "Resolved debugging sessions in the retrieval index", sessions.get("entries", 0)),
+        ("phychat_session_index_served_total", "counter", "Chat turns answered from a resolved session instead of the model", sessions.get("served", 0)),
+        ("phychat_session_index_misses_total", "counter", "Chat turns with no close enough resolved session", sessions.get("queries", 0) - sessions.get("hits", 0)),
+        ("phychat_response_cache_hits_total", "counter", "Chat response cache hits", cache["hits"]),
+        ("phychat_response_cache_misses_total", "counter", "Chat response cache misses", cache["misses"]),
+        ("phychat_progress_cache_hits_total", "counter", "Progress cache hits", progress["hits"]),
+        ("phychat_progress_cache_misses_total", "counter", "Progress cache misses", progress["misses"]),
+        ("phychat_context_store_hits_total", "counter", "Conversation context store hits", context["hits"]),
+        ("phychat_context_store_misses_total", "counter", "Conversation context store misses (DB rehydrations)", context["misses"]),
+        ("phychat_context_store_bytes", "gauge", "Estimated size of the conversation context store", context["bytes"]),
+        ("phychat_sandbox_runs_total", "counter", "Snippets run in the sandbox", runs["runs"]),
+        ("phychat_sandbox_busy_workers", "gauge", "Sandbox workers running a snippet", runs["busy"]),
+        ("phychat_sandbox_waiting", "gauge", "Callers waiting for a sandbox worker", runs["waiting"]),
+        ("phychat_message_queue_depth", "gauge", "Chat messages waiting to be written", writes["queue_depth"]),
+        ("phychat_message_queue_dropped_total", "counter", "Chat messages lost", writes["dropped"]),
+        ("phychat_recommend_queue_hits_total", "counter", "Recommendations served from a fresh precomputed queue", queues.get("hits", 0)),
+        ("phychat_recommend_queue_stale_total", "counter", "Recommendations served from a queue awaiting its recompute", queues.get("stale", 0)),
+        ("phychat_recommend_queue_misses_total", "counter", "Recommendations computed on the request", queues.get("misses", 0)),
+        ("phychat_recommend_queue_age_p99_seconds", "gauge", "Age of the queues recent recommendations were served from (p99)", queues.get("age_p99_seconds", 0.0)),
+        ("phychat_recommend_queue_pending", "gauge", "Students waiting for a queue recompute", queues.get("pending", 0)),
+        ("phychat_learning_events_total", "counter", "Attempts appended to the learning event log", events["appended"]),
+        ("phychat_learning_events_dropped_total", "counter", "Learning events lost to write errors", events["dropped"]),
+        ("phychat_db_queries_total", "counter", "Database queries", queries["queries"]),
+        ("phychat_db_timeouts_total", "counter", "Database queries that timed out", queries["timeouts"]),
+        ("phychat_db_errors_total", "counter", "Database queries that failed", queries["errors"]),
+    ]
+
+telemetry.register_collector(_service_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(telemetry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -46,6 +148,8 @@ async def root():
     }
 
 if __name__ == "__main__":
+    import uvicorn
+    
     port = int(os.getenv("BACKEND_PORT", 8000))
     uvicorn.run(
         "main:app",
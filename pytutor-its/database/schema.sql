@@ -46,6 +46,8 @@ CREATE TABLE challenges (
   bug_code TEXT NOT NULL,
   error_type VARCHAR(100) NOT NULL,
   learning_objectives TEXT[] NOT NULL,
+  -- [{"name", "stdout"?, "check"?, "forbid"?}], run by POST /api/challenges/{id}/submit
+  tests JSONB NOT NULL DEFAULT '[]',
   created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -89,14 +91,15 @@ CREATE TRIGGER update_progress_updated_at BEFORE UPDATE ON progress
   FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 -- Insert sample challenges
-INSERT INTO challenges (title, description, difficulty, bug_code, error_type, learning_objectives) VALUES
+INSERT INTO challenges (title, description, difficulty, bug_code, error_type, learning_objectives, tests) VALUES
 (
   'Loop Variable Scope Error',
   'Fix the scope issue with the loop counter variable',
   'Easy',
   'for i in range(5):\n    print(i)\nprint(i)  # Error here',
   'NameError',
-  ARRAY['Understanding variable scope', 'Loop variable lifecycle']
+  ARRAY['Understanding variable scope', 'Loop variable lifecycle'],
+  '[{"name": "prints 0-4, then the last value", "stdout": "0\n1\n2\n3\n4\n4\n"}, {"name": "loop variable not used after the loop", "forbid": "NameError"}]'
 ),
 (
   'List Index Out of Range',
@@ -104,7 +107,8 @@ INSERT INTO challenges (title, description, difficulty, bug_code, error_type, le
   'Easy',
   'numbers = [1, 2, 3]\nfor i in range(4):\n    print(numbers[i])',
   'IndexError',
-  ARRAY['Array bounds checking', 'Loop iteration control']
+  ARRAY['Array bounds checking', 'Loop iteration control'],
+  '[{"name": "prints every item", "stdout": "1\n2\n3\n"}, {"name": "no index past the end of the list", "forbid": "IndexError"}]'
 ),
 (
   'Function Return Value',
@@ -112,7 +116,8 @@ INSERT INTO challenges (title, description, difficulty, bug_code, error_type, le
   'Medium',
   'def calculate_sum(a, b):\n    result = a + b\n    # Missing return\ntotal = calculate_sum(5, 3)\nprint(total)',
   'TypeError',
-  ARRAY['Function return values', 'None type handling']
+  ARRAY['Function return values', 'None type handling'],
+  '[{"name": "prints the sum", "stdout": "8\n"}, {"name": "returns a + b", "check": "assert calculate_sum(2, 3) == 5"}, {"name": "handles negative numbers", "check": "assert calculate_sum(-4, 1) == -3"}]'
 ),
 (
   'Syntax Error in Conditional',
@@ -120,7 +125,8 @@ INSERT INTO challenges (title, description, difficulty, bug_code, error_type, le
   'Easy',
   'x = 10\nif x > 5\n    print("Greater")',
   'SyntaxError',
-  ARRAY['Python syntax rules', 'Conditional statements']
+  ARRAY['Python syntax rules', 'Conditional statements'],
+  '[{"name": "prints Greater", "stdout": "Greater\n"}]'
 ),
 (
   'Type Mismatch in Operation',
@@ -128,7 +134,8 @@ INSERT INTO challenges (title, description, difficulty, bug_code, error_type, le
   'Medium',
   'age = "25"\nyears_ahead = 5\nfuture_age = age + years_ahead',
   'TypeError',
-  ARRAY['Type conversion', 'String vs numeric operations']
+  ARRAY['Type conversion', 'String vs numeric operations'],
+  '[{"name": "future_age is a number", "check": "assert future_age == 30"}]'
 ),
 (
   'Infinite Loop Logic',
@@ -136,7 +143,8 @@ INSERT INTO challenges (title, description, difficulty, bug_code, error_type, le
   'Hard',
   'counter = 0\nwhile counter < 10:\n    print(counter)\n    counter = counter + 0',
   'LogicError',
-  ARRAY['Loop termination conditions', 'Variable updates in loops']
+  ARRAY['Loop termination conditions', 'Variable updates in loops'],
+  '[{"name": "counts 0-9 and stops", "stdout": "0\n1\n2\n3\n4\n5\n6\n7\n8\n9\n"}, {"name": "counter ends at 10", "check": "assert counter == 10"}, {"name": "counter changes inside the loop", "forbid": "LogicError"}]'
 );
 
 -- Insert a sample student for testing
@@ -163,3 +171,6 @@ GRANT ALL ON conversations TO anon, authenticated;
 GRANT ALL ON messages TO anon, authenticated;
 GRANT ALL ON challenges TO anon, authenticated;
 GRANT ALL ON progress TO anon, authenticated;
+
+-- Existing databases: add test suites to challenges
+-- ALTER TABLE challenges ADD COLUMN IF NOT EXISTS tests JSONB NOT NULL DEFAULT '[]';
@@ -6,7 +6,7 @@
 
 import { useState, useCallback } from 'react';
 import { Message } from '@/types';
-import { sendChatMessage, ChatRequest } from '@/lib/api';
+import { sendChatMessage, streamChatMessage, ChatRequest, ChatResponse } from '@/lib/api';
 
 export function useChat(conversationId?: string) {
   const [messages, setMessages] = useState<Message[]>([]);
@@ -25,6 +25,7 @@ export function useChat(conversationId?: string) {
       };
 
       setMessages((prev) => [...prev, userMessage]);
+      const aiMessageId = (Date.now() + 1).toString();
       setIsLoading(true);
       setError(null);
 
@@ -40,34 +41,51 @@ export function useChat(conversationId?: string) {
           conversation_id: conversationId,
         };
 
-        // Call backend API
-        const response = await sendChatMessage(request);
+        // Show the AI message immediately and fill it in as tokens stream
+        const updateAiMessage = (patch: Partial<Message> & Record<string, unknown>) =>
+          setMessages((prev) =>
+            prev.map((m) => (m.id === aiMessageId ? { ...m, ...patch } : m))
+          );
 
-        // Add AI response
-        const aiMessage: Message = {
-          id: (Date.now() + 1).toString(),
-          role: 'assistant',
+        setMessages((prev) => [
+          ...prev,
+          { id: aiMessageId, role: 'assistant', content: '', timestamp: new Date() },
+        ]);
+
+        let streamed = '';
+        let response: ChatResponse;
+        try {
+          response = await streamChatMessage(request, {
+            onToken: (token) => {
+              streamed += token;
+              updateAiMessage({ content: streamed });
+            },
+          });
+        } catch (streamError) {
+          // Fall back to the non-streaming endpoint
+          console.warn('Streaming failed, falling back:', streamError);
+          response = await sendChatMessage(request);
+        }
+
+        // Final message with metadata from backend
+        updateAiMessage({
           content: response.reply,
-          timestamp: new Date(),
-          // Add metadata from backend
           explanation: response.explanation,
           codeExample: response.code_suggestion,
-        };
-
-        setMessages((prev) => [...prev, aiMessage]);
+        });
       } catch (err) {
         setError('Failed to get response from AI. Please try again.');
         console.error('Chat error:', err);
 
-        // Add error message
+        // Add error message (replacing the streaming placeholder, if any)
         const errorMessage: Message = {
-          id: (Date.now() + 1).toString(),
+          id: aiMessageId,
           role: 'assistant',
           content: 'Sorry, I encountered an error. Please try again.',
           timestamp: new Date(),
         };
 
-        setMessages((prev) => [...prev, errorMessage]);
+        setMessages((prev) => [...prev.filter((m) => m.id !== aiMessageId), errorMessage]);
       } finally {
         setIsLoading(false);
       }
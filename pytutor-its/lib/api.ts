@@ -67,6 +67,88 @@ export async function sendChatMessage(request: ChatRequest): Promise<ChatRespons
   }
 }
 
+export interface ChatStreamHandlers {
+  onToken?: (token: string) => void;
+  onExplanation?: (explanation: string | null) => void;
+  onCodeSuggestion?: (codeSuggestion: string | null) => void;
+  onErrorType?: (meta: { error_type?: string; confidence_score: number; learning_objective?: string }) => void;
+}
+
+/**
+ * Stream a chat response from /chat/stream (Server-Sent Events)
+ *
+ * Reply tokens are delivered through `onToken` as they are generated.
+ * Resolves with the complete response once the `done` event arrives.
+ * Aborting `signal` closes the connection, which stops generation on the server.
+ */
+export async function streamChatMessage(
+  request: ChatRequest,
+  handlers: ChatStreamHandlers = {},
+  signal?: AbortSignal
+): Promise<ChatResponse> {
+  const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    body: JSON.stringify(request),
+    signal,
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`API error: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // SSE events are separated by a blank line
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      let event = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      const payload = data ? JSON.parse(data) : null;
+
+      switch (event) {
+        case 'token':
+          handlers.onToken?.(payload);
+          break;
+        case 'explanation':
+          handlers.onExplanation?.(payload);
+          break;
+        case 'code_suggestion':
+          handlers.onCodeSuggestion?.(payload);
+          break;
+        case 'error_type':
+          handlers.onErrorType?.(payload);
+          break;
+        case 'error':
+          throw new Error(payload?.detail || 'Stream error');
+        case 'done':
+          await reader.cancel();
+          return payload as ChatResponse;
+      }
+    }
+  }
+
+  throw new Error('Stream ended before completion');
+}
+
 /**
  * Get personalized recommendation from RL agent
  */